@@ -3,6 +3,7 @@ from src.jobs import RenderJob
 from tqdm import tqdm
 
 import argparse
+import threading
 import numpy as np
 from typing import Optional
 from loguru import logger
@@ -27,6 +28,30 @@ class ProgressBar:
             self.pbar.close()
 
 
+def watch(job: RenderJob, time_ms: int, out_path: str):
+    """Re-render one frame to *out_path* whenever the .osu/.osb change."""
+    import skia
+    from src.watch import PreviewSession
+
+    def save(image):
+        image.save(out_path, skia.kPNG)
+        job.log_callback(f"Preview at {time_ms} ms written to {out_path}", "INFO")
+
+    session = PreviewSession(
+        [job.cfg.path.osu_path, job.osb_path],
+        job.base_path,
+        time_ms,
+        save,
+        width=job.cfg.renderer.width,
+        height=job.cfg.renderer.height,
+        log_callback=job.log_callback,
+    )
+    try:
+        session.run(threading.Event())
+    except KeyboardInterrupt:
+        pass
+
+
 def main():
     logger.add("render.log", rotation="10 MB")
 
@@ -58,6 +83,50 @@ def main():
     parser.add_argument(
         "--gpu", action="store_true", help="Use GPU acceleration for rendering."
     )
+    parser.add_argument(
+        "--no-parse-cache",
+        action="store_true",
+        help="Always parse the .osu/.osb from text and leave the parse cache untouched.",
+    )
+    parser.add_argument(
+        "--strict",
+        action="store_true",
+        help="Stop at the first malformed storyboard line instead of skipping it.",
+    )
+    parser.add_argument(
+        "--start",
+        type=int,
+        help="Render from this time (ms). Time-range renders only parse the objects they draw.",
+    )
+    parser.add_argument(
+        "--end", type=int, help="Render until this time (ms)."
+    )
+    parser.add_argument(
+        "--optimize",
+        action="store_true",
+        help="Drop storyboard objects that can never be seen and merge redundant commands.",
+    )
+    parser.add_argument(
+        "--keyframes",
+        action="store_true",
+        help="Faster approximate render for previews: interpolate object states from keyframe tables.",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Don't render a video; re-render one preview frame whenever the storyboard files change.",
+    )
+    parser.add_argument(
+        "--preview-at",
+        type=int,
+        help="Time (ms) of the --watch preview frame. Defaults to --start.",
+    )
+    parser.add_argument(
+        "--preview-out",
+        type=str,
+        default="preview.png",
+        help="Where --watch writes the preview frame.",
+    )
     args = parser.parse_args()
 
     config = Config.from_yaml(args.config)
@@ -76,9 +145,26 @@ def main():
         config.renderer.use_gpu = True
     else:
         config.renderer.use_gpu = False
+    if args.no_parse_cache:
+        config.parser.parse_cache = False
+    if args.strict:
+        config.parser.strict = True
+    if args.optimize:
+        config.parser.optimize = True
+    if args.keyframes:
+        config.renderer.keyframes = True
+    if args.start is not None:
+        config.renderer.start_ms = args.start
+    if args.end is not None:
+        config.renderer.end_ms = args.end
 
     job = RenderJob(config)
 
+    if args.watch:
+        time_ms = args.preview_at if args.preview_at is not None else config.renderer.start_ms
+        watch(job, time_ms, args.preview_out)
+        return
+
     pbar = ProgressBar()
     job.set_callbacks(progress_callback=pbar)
 
@@ -0,0 +1,135 @@
+"""
+Exact index of the objects alive at a time.
+
+``ActiveIndex`` sorts the rows of a ``StoryboardArrays`` by the time they
+enter (``life_start``) and leave (``life_end``) the storyboard and keeps
+the rows alive at the current time as one sorted array. Moving to another
+time applies only the enter/exit events in between, forward or backward,
+so a render that steps through time does work proportional to the objects
+that appear and disappear and to the number alive, never to the size of
+the storyboard. Layers are contiguous row ranges, so a layer's alive rows
+are a slice of that array: exactly the objects alive at that time, each
+once, in draw order.
+
+It replaces fixed time buckets, which store every object once per bucket
+its lifetime overlaps and hand the renderer objects that are in the
+bucket but already dead or not born yet.
+
+Given ``StateEngine.visible_intervals`` (see ``src.visibility``), the index
+holds an enter/exit pair per visible interval instead of per lifetime, so
+objects that are alive but faded out or scaled to nothing are not handed
+out either. ``stats`` counts what that saved.
+"""
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from src.models import Layer
+from src.storyboard_arrays import LAYER_ORDER, StoryboardArrays
+
+
+@dataclass
+class IndexStats:
+    lookups: int = 0  # ActiveIndex.rows calls
+    alive: int = 0  # rows alive by lifetime, summed over the lookups
+    returned: int = 0  # rows handed out
+
+    @property
+    def avoided(self) -> int:
+        """State evaluations saved by the visible intervals."""
+        return self.alive - self.returned
+
+    def summary(self) -> str:
+        share = self.avoided / self.alive if self.alive else 0.0
+        return (
+            f"Active index handed out {self.returned:,} of {self.alive:,} alive objects "
+            f"over {self.lookups:,} lookups ({self.avoided:,} evaluations avoided, {share:.1%})"
+        )
+
+
+class ActiveIndex:
+    """
+    Rows of a ``StoryboardArrays`` alive at a time, maintained incrementally.
+
+    *intervals* is ``(row, start, end)`` arrays of closed intervals, at most
+    one covering a row at any time, e.g. ``src.visibility.interval_arrays``;
+    without it every row has one interval, its lifetime.
+    """
+
+    def __init__(self, arrays: StoryboardArrays,
+                 intervals: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None):
+        self.arrays = arrays
+        if intervals is None:
+            rows = np.arange(len(arrays), dtype=np.int64)
+            starts, ends = arrays.life_start, arrays.life_end
+        else:
+            rows, starts, ends = intervals
+        order = np.argsort(starts, kind="stable")
+        self._enter = rows[order]
+        self._enter_times = starts[order]
+        order = np.argsort(ends, kind="stable")
+        self._exit = rows[order]
+        self._exit_times = ends[order]
+        self._layers: Dict[Layer, slice] = {layer: arrays.layer_slice(layer) for layer in LAYER_ORDER}
+        # per layer: sorted lifetimes, to count the rows alive for stats
+        self._lifetimes = {
+            layer: (np.sort(arrays.life_start[sl]), np.sort(arrays.life_end[sl]))
+            for layer, sl in self._layers.items()
+        }
+        # alive rows, ascending; replaced (not modified) on change, so returned slices stay valid
+        self._active = np.zeros(0, dtype=np.int64)
+        # events applied so far: _enter[:_entered] have started (start <= time),
+        # _exit[:_exited] have ended (end < time)
+        self._entered = 0
+        self._exited = 0
+        self.stats = IndexStats()
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the index arrays."""
+        lifetimes = sum(starts.nbytes + ends.nbytes for starts, ends in self._lifetimes.values())
+        return (self._enter.nbytes + self._enter_times.nbytes + self._exit.nbytes
+                + self._exit_times.nbytes + self._active.nbytes + lifetimes)
+
+    def seek(self, time: float):
+        """Make *time* the current time."""
+        entered = int(np.searchsorted(self._enter_times, time, side="right"))
+        exited = int(np.searchsorted(self._exit_times, time, side="left"))
+        # both counts only grow with time, so they move the same way
+        if entered >= self._entered and exited >= self._exited:
+            # forward: enter first, so rows born and dead in between are removed again
+            self._insert(self._enter[self._entered:entered])
+            self._remove(self._exit[self._exited:exited])
+        else:
+            # backward: undo the exits first, so rows not born yet are removed again
+            self._insert(self._exit[exited:self._exited])
+            self._remove(self._enter[entered:self._entered])
+        self._entered, self._exited = entered, exited
+
+    def _insert(self, rows: np.ndarray):
+        if len(rows):
+            rows = np.sort(rows)
+            self._active = np.insert(self._active, np.searchsorted(self._active, rows), rows)
+
+    def _remove(self, rows: np.ndarray):
+        if len(rows):
+            rows = np.sort(rows)
+            # a row leaving one interval and entering the next in the same step is
+            # in _active twice; the k-th copy of a row to remove is at first + k
+            repeat = np.arange(len(rows)) - np.searchsorted(rows, rows)
+            self._active = np.delete(self._active, np.searchsorted(self._active, rows) + repeat)
+
+    def rows(self, layer: Layer, time: float) -> np.ndarray:
+        """Rows of *layer* alive at *time* (``start <= time <= end`` of an interval), in draw order."""
+        self.seek(time)
+        sl = self._layers[layer]
+        active = self._active
+        rows = active[np.searchsorted(active, sl.start):np.searchsorted(active, sl.stop)]
+
+        stats = self.stats
+        starts, ends = self._lifetimes[layer]
+        stats.lookups += 1
+        stats.alive += int(np.searchsorted(starts, time, side="right") - np.searchsorted(ends, time, side="left"))
+        stats.returned += len(rows)
+        return rows
@@ -0,0 +1,417 @@
+"""
+Columnar command storage.
+
+Instead of one ``Command`` dataclass (plus a params list and boxed floats)
+per command, ``CommandStore`` keeps every command of a storyboard in a few
+flat typed columns. Objects and loops reference their entries by row
+index, and ``ColumnarCommands`` / ``CommandRow`` / ``LoopRow`` expose them
+through the regular ``Command`` / ``LoopCommand`` API, so the rest of the
+code (and the tests) can keep treating ``obj.commands`` as a list.
+
+Rows are appended to ``array.array`` buffers while parsing and exposed as
+zero-copy NumPy arrays once the store is frozen.
+"""
+from array import array
+from typing import Dict, Iterator, List, Optional, Union
+
+import numpy as np
+
+from src.models import Command, LoopCommand
+
+
+COMMAND_TYPES = ("F", "M", "MX", "MY", "S", "V", "R", "C", "P")
+TYPE_CODE = {t: i for i, t in enumerate(COMMAND_TYPES)}
+P_CODE = TYPE_CODE["P"]
+# number of params each command type carries ([start values..., end values...])
+PARAM_COUNT = (2, 4, 2, 2, 2, 4, 2, 6, 1)
+PARAM_SLOTS = 6
+
+# NaN padding for the unused param slots, indexed by the number of used slots
+_PAD = [[float("nan")] * (PARAM_SLOTS - n) for n in range(PARAM_SLOTS + 1)]
+
+NO_LOOP = -1
+# stands in for LoopCommand.sub_max = None in the int32 loop column
+_UNSET = -(2**31)
+
+
+class CommandStore:
+    """
+    Flat storage for all commands of one storyboard.
+
+    Command columns (one row per command):
+        ``type_code``  uint8, index into ``COMMAND_TYPES``
+        ``easing``     int16
+        ``start`` / ``end``  int32 milliseconds
+        ``params``     float64 ``(rows, PARAM_SLOTS)``; unused slots are NaN,
+                       P commands store an index into ``p_values``
+        ``loop``       int32 owning loop id, ``NO_LOOP`` for top-level rows
+
+    Loop columns (one row per loop): ``loop_start``, ``loop_count`` and
+    ``loop_sub_max``.
+
+    Each object and each loop owns a contiguous slice of ``object_entries``
+    or ``loop_entries``; an entry is a command row, or ``-(loop_id + 1)``
+    for a loop header inside an object.
+    """
+
+    def __init__(self):
+        self.type_code = array("B")
+        self.easing = array("h")
+        self.start = array("i")
+        self.end = array("i")
+        self.params = array("d")
+        self.loop = array("i")
+
+        self.loop_start = array("i")
+        self.loop_count = array("i")
+        self.loop_sub_max = array("i")
+
+        self.object_entries = array("i")
+        self.object_offset = array("q")
+        self.object_size = array("i")
+        self.loop_entries = array("i")
+        self.loop_offset = array("q")
+        self.loop_size = array("i")
+
+        self.p_values: List[str] = []
+        self._p_index = {}
+        # loop id -> its LoopRow; one view per loop, so caches keyed by id() hold
+        self._loop_rows: Dict[int, "LoopRow"] = {}
+        self.frozen = False
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_loop_rows"] = {}  # views are rebuilt on demand
+        return state
+
+    # -- building -----------------------------------------------------------
+
+    def new_object(self) -> "ColumnarCommands":
+        """Open the entry list of the next object and return its view."""
+        self.object_offset.append(len(self.object_entries))
+        self.object_size.append(0)
+        return ColumnarCommands(self, False, len(self.object_offset) - 1)
+
+    def add_loop(self, owner: int, start_time: int, loop_count: int) -> "LoopRow":
+        self._check_open(False, owner)
+        loop_id = len(self.loop_start)
+        self.loop_start.append(start_time)
+        self.loop_count.append(loop_count)
+        self.loop_sub_max.append(_UNSET)
+        self.loop_offset.append(len(self.loop_entries))
+        self.loop_size.append(0)
+        self.object_entries.append(-(loop_id + 1))
+        self.object_size[owner] += 1
+        return self.loop_row(loop_id)
+
+    def add_row(
+        self,
+        is_loop: bool,
+        owner: int,
+        type_: str,
+        easing: int,
+        start_time: int,
+        end_time: int,
+        params: List[Union[float, str]],
+    ) -> int:
+        """Append one command to *owner* (an object or a loop id) and return its row."""
+        if self.frozen or owner != (
+            len(self.loop_offset) if is_loop else len(self.object_offset)
+        ) - 1:
+            self._check_open(is_loop, owner)  # raises
+        code = TYPE_CODE[type_]
+        row = len(self.type_code)
+        self.type_code.append(code)
+        self.easing.append(easing)
+        self.start.append(start_time)
+        self.end.append(end_time)
+        if code == P_CODE:
+            self.params.append(self._intern_p(params[0]))
+            self.params.extend(_PAD[1])
+        else:
+            n = len(params)
+            if n > PARAM_SLOTS:
+                params, n = params[:PARAM_SLOTS], PARAM_SLOTS
+            self.params.extend(params)
+            self.params.extend(_PAD[n])
+        if is_loop:
+            self.loop.append(owner)
+            self.loop_entries.append(row)
+            self.loop_size[owner] += 1
+        else:
+            self.loop.append(NO_LOOP)
+            self.object_entries.append(row)
+            self.object_size[owner] += 1
+        return row
+
+    def _intern_p(self, value: str) -> int:
+        idx = self._p_index.get(value)
+        if idx is None:
+            idx = self._p_index[value] = len(self.p_values)
+            self.p_values.append(value)
+        return idx
+
+    def _check_open(self, is_loop: bool, owner: int):
+        if self.frozen:
+            raise RuntimeError("CommandStore is frozen; no more commands can be added")
+        last = (len(self.loop_offset) if is_loop else len(self.object_offset)) - 1
+        if owner != last:
+            raise RuntimeError("only the most recently opened object or loop can grow")
+
+    def freeze(self):
+        """Expose the columns as NumPy arrays (zero-copy) and stop accepting rows."""
+        if self.frozen:
+            return
+        self.type_code = np.frombuffer(self.type_code, dtype=np.uint8)
+        self.easing = np.frombuffer(self.easing, dtype=np.int16)
+        self.start = np.frombuffer(self.start, dtype=np.int32)
+        self.end = np.frombuffer(self.end, dtype=np.int32)
+        self.params = np.frombuffer(self.params, dtype=np.float64).reshape(-1, PARAM_SLOTS)
+        self.loop = np.frombuffer(self.loop, dtype=np.int32)
+        self.loop_start = np.frombuffer(self.loop_start, dtype=np.int32)
+        self.loop_count = np.frombuffer(self.loop_count, dtype=np.int32)
+        self.loop_sub_max = np.frombuffer(self.loop_sub_max, dtype=np.int32)
+        self.object_entries = np.frombuffer(self.object_entries, dtype=np.int32)
+        self.object_offset = np.frombuffer(self.object_offset, dtype=np.int64)
+        self.object_size = np.frombuffer(self.object_size, dtype=np.int32)
+        self.loop_entries = np.frombuffer(self.loop_entries, dtype=np.int32)
+        self.loop_offset = np.frombuffer(self.loop_offset, dtype=np.int64)
+        self.loop_size = np.frombuffer(self.loop_size, dtype=np.int32)
+        self.frozen = True
+
+    # -- reporting ----------------------------------------------------------
+
+    @property
+    def command_count(self) -> int:
+        return len(self.type_code)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by all columns (excluding the small P value table)."""
+        columns = [
+            self.type_code, self.easing, self.start, self.end, self.params, self.loop,
+            self.loop_start, self.loop_count, self.loop_sub_max,
+            self.object_entries, self.object_offset, self.object_size,
+            self.loop_entries, self.loop_offset, self.loop_size,
+        ]
+        return sum(
+            c.nbytes if isinstance(c, np.ndarray) else c.itemsize * len(c) for c in columns
+        )
+
+    # -- row access ---------------------------------------------------------
+
+    def row_params(self, row: int) -> List[Union[float, str]]:
+        code = self.type_code[row]
+        base = row * PARAM_SLOTS
+        if self.frozen:
+            values = self.params[row]
+            base = 0
+        else:
+            values = self.params
+        if code == P_CODE:
+            return [self.p_values[int(values[base])]]
+        return [float(v) for v in values[base : base + PARAM_COUNT[code]]]
+
+    def loop_row(self, loop_id: int) -> "LoopRow":
+        row = self._loop_rows.get(loop_id)
+        if row is None:
+            row = self._loop_rows[loop_id] = LoopRow(self, loop_id)
+        return row
+
+    def entry(self, entry: int) -> Union["CommandRow", "LoopRow"]:
+        if entry < 0:
+            return self.loop_row(-entry - 1)
+        return CommandRow(self, entry)
+
+
+class CommandRow(Command):
+    """A ``Command`` that reads and writes one row of a ``CommandStore``."""
+
+    __slots__ = ("_store", "_row")
+
+    def __init__(self, store: CommandStore, row: int):
+        self._store = store
+        self._row = row
+
+    @property
+    def type(self) -> str:
+        return COMMAND_TYPES[self._store.type_code[self._row]]
+
+    @property
+    def easing(self) -> int:
+        return int(self._store.easing[self._row])
+
+    @property
+    def start_time(self) -> int:
+        return int(self._store.start[self._row])
+
+    @start_time.setter
+    def start_time(self, value: int):
+        self._store.start[self._row] = value
+
+    @property
+    def end_time(self) -> int:
+        return int(self._store.end[self._row])
+
+    @end_time.setter
+    def end_time(self, value: int):
+        self._store.end[self._row] = value
+
+    @property
+    def params(self) -> List[Union[float, str]]:
+        return self._store.row_params(self._row)
+
+    def __eq__(self, other):
+        if not isinstance(other, Command) or isinstance(other, LoopCommand):
+            return NotImplemented
+        return (self.type, self.easing, self.start_time, self.end_time, self.params) == (
+            other.type, other.easing, other.start_time, other.end_time, other.params,
+        )
+
+
+class LoopRow(LoopCommand):
+    """A ``LoopCommand`` backed by one loop row of a ``CommandStore``."""
+
+    __slots__ = ("_store", "_loop")
+
+    def __init__(self, store: CommandStore, loop_id: int):
+        self._store = store
+        self._loop = loop_id
+
+    @property
+    def start_time(self) -> int:
+        return int(self._store.loop_start[self._loop])
+
+    @property
+    def loop_count(self) -> int:
+        return int(self._store.loop_count[self._loop])
+
+    @property
+    def sub_max(self) -> Optional[int]:
+        value = int(self._store.loop_sub_max[self._loop])
+        return None if value == _UNSET else value
+
+    @sub_max.setter
+    def sub_max(self, value: Optional[int]):
+        self._store.loop_sub_max[self._loop] = _UNSET if value is None else value
+
+    @property
+    def commands(self) -> "ColumnarCommands":
+        return ColumnarCommands(self._store, True, self._loop)
+
+    def __eq__(self, other):
+        if not isinstance(other, LoopCommand):
+            return NotImplemented
+        return (self.start_time, self.loop_count, self.sub_max, list(self.commands)) == (
+            other.start_time, other.loop_count, other.sub_max, list(other.commands),
+        )
+
+
+class ColumnarCommands:
+    """
+    List-like view over the entries of one object (or one loop).
+
+    Iterating yields ``CommandRow`` / ``LoopRow`` views. Only the most
+    recently opened owner can grow, which is how the parser fills it.
+    """
+
+    __slots__ = ("_store", "_is_loop", "_owner")
+
+    def __init__(self, store: CommandStore, is_loop: bool, owner: int):
+        self._store = store
+        self._is_loop = is_loop
+        self._owner = owner
+
+    def _bounds(self):
+        s = self._store
+        if self._is_loop:
+            offset, size, entries = s.loop_offset[self._owner], s.loop_size[self._owner], s.loop_entries
+        else:
+            offset, size, entries = s.object_offset[self._owner], s.object_size[self._owner], s.object_entries
+        return int(offset), int(size), entries
+
+    def entries(self) -> List[int]:
+        offset, size, entries = self._bounds()
+        return [int(e) for e in entries[offset : offset + size]]
+
+    def __len__(self) -> int:
+        return int((self._store.loop_size if self._is_loop else self._store.object_size)[self._owner])
+
+    def __iter__(self) -> Iterator[Union[CommandRow, LoopRow]]:
+        entry = self._store.entry
+        for e in self.entries():
+            yield entry(e)
+
+    def __getitem__(self, index):
+        entries = self.entries()
+        if isinstance(index, slice):
+            return [self._store.entry(e) for e in entries[index]]
+        return self._store.entry(entries[index])
+
+    def __eq__(self, other):
+        if isinstance(other, (list, ColumnarCommands)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def add(self, type_: str, easing: int, start_time: int, end_time: int, params) -> CommandRow:
+        row = self._store.add_row(
+            self._is_loop, self._owner, type_, easing, start_time, end_time, params
+        )
+        return CommandRow(self._store, row)
+
+    def add_loop(self, start_time: int, loop_count: int) -> LoopRow:
+        if self._is_loop:
+            raise ValueError("loops cannot be nested")
+        return self._store.add_loop(self._owner, start_time, loop_count)
+
+    def append(self, cmd: Union[Command, LoopCommand]):
+        if isinstance(cmd, LoopCommand):
+            loop = self.add_loop(cmd.start_time, cmd.loop_count)
+            loop.sub_max = cmd.sub_max
+            for sub_cmd in cmd.commands:
+                loop.commands.append(sub_cmd)
+        else:
+            self.add(cmd.type, cmd.easing, cmd.start_time, cmd.end_time, cmd.params)
+
+    def extend(self, cmds):
+        for cmd in cmds:
+            self.append(cmd)
+
+    def sort_by_start_time(self):
+        """Stable in-place sort of the entries by start time."""
+        offset, size, entries = self._bounds()
+        if size < 2:
+            return
+        s = self._store
+        current = entries[offset : offset + size]
+        if s.frozen:
+            idx = np.asarray(current)
+            # gather each kind over its own entries; the store may have no loops
+            # (or no plain commands), so a clamped index can be out of range
+            plain = idx >= 0
+            starts = np.empty(len(idx), dtype=np.int64)
+            starts[plain] = s.start[idx[plain]]
+            starts[~plain] = s.loop_start[-idx[~plain] - 1]
+            entries[offset : offset + size] = idx[np.argsort(starts, kind="stable")]
+        else:
+            keyed = sorted(
+                current,
+                key=lambda e: s.start[e] if e >= 0 else s.loop_start[-e - 1],
+            )
+            entries[offset : offset + size] = array("i", keyed)
+
+    def sort(self, key=None):
+        """List-compatible sort; the entries are reordered, not the rows."""
+        if key is None:
+            raise TypeError("ColumnarCommands.sort needs a key")
+        offset, size, entries = self._bounds()
+        views = list(self)
+        order = sorted(range(size), key=lambda i: key(views[i]))
+        current = [int(e) for e in entries[offset : offset + size]]
+        reordered = [current[i] for i in order]
+        entries[offset : offset + size] = (
+            np.asarray(reordered, dtype=np.int32) if self._store.frozen else array("i", reordered)
+        )
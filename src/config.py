@@ -26,6 +26,29 @@ class RendererConfig(BaseModel):
     preset_tuning: str = "default"
     audio_bitrate: str = "192k"
     audio_codec: str = "aac"
+    # Render only [start_ms, end_ms]; end_ms = 0 renders until the storyboard ends
+    start_ms: int = 0
+    end_ms: int = 0
+    batch_states: bool = False  # evaluate each layer's objects with one NumPy batch per frame
+    state_streams: bool = False  # CPU render: precompute every object's states once, workers read them
+    templates: bool = False  # evaluate repeated (particle) objects through one timeline per family
+    # previews: interpolate states from per-object keyframe tables instead of evaluating them
+    keyframes: bool = False
+    keyframe_step_ms: int = 16  # closest keyframe spacing
+    keyframe_tolerance_px: float = 0.5  # position error allowed; 0 with opacity 0 = every step_ms
+    keyframe_tolerance_opacity: float = 0.01
+    easing_lut_resolution: int = 0  # previews: easings read from tables this fine (e.g. 1024); 0 = exact
+
+
+class ParserConfig(BaseModel):
+    parse_cache: bool = True
+    cache_dir: str = ""  # empty = use default platform cache location
+    cache_max_mb: int = 512
+    parse_workers: int = 0  # 0 = one per CPU core, 1 = always serial
+    parallel_min_mb: int = 8  # smaller files are parsed serially
+    columnar_commands: bool = False  # store commands in flat arrays (less memory, serial parse)
+    strict: bool = False  # abort on the first malformed line instead of skipping it
+    optimize: bool = False  # drop never-visible objects and merge redundant commands
 
 
 class PathConfig(BaseModel):
@@ -37,6 +60,7 @@ class Config(BaseModel):
     app: AppConfig = Field(default_factory=AppConfig)
     renderer: RendererConfig = Field(default_factory=RendererConfig)
     path: PathConfig = Field(default_factory=PathConfig)
+    parser: ParserConfig = Field(default_factory=ParserConfig)
 
     @classmethod
     def from_yaml(cls, yamlpath: str) -> "Config":
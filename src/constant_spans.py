@@ -0,0 +1,62 @@
+"""
+Time spans in which an object's state cannot change.
+
+A state only changes while a command runs, where one command hands over
+to the next, and where a P flag ends. Everywhere else, before the first
+command, after the last and in the gaps between them, every property
+holds its value. ``constant_spans`` lists those gaps as open intervals, so
+a renderer that evaluated an object inside one can reuse the result for
+every later frame that falls inside the same span.
+
+Commands whose start and end values are equal (a hold, such as ``F,0,a,b,1``)
+only change anything at their start. Loops count as changing over their
+whole length, and so do animations while their frame advances.
+"""
+from typing import List, Tuple
+
+from src.models import Animation, LoopCommand, LoopType, SBObject
+
+# command types that write a property; P only matters where its flag ends
+_WRITERS = frozenset(("F", "M", "MX", "MY", "S", "V", "R", "C"))
+
+
+def _changes(obj: SBObject) -> List[Tuple[float, float]]:
+    """Closed intervals in which the state of *obj* may change."""
+    changes = []
+    for cmd in obj.commands:
+        if isinstance(cmd, LoopCommand):
+            changes.append((cmd.start_time, cmd.start_time + cmd.sub_max * cmd.loop_count))
+        elif cmd.type == "P":
+            # the flag is set whenever time <= end
+            changes.append((cmd.end_time, cmd.end_time))
+        elif cmd.type in _WRITERS:
+            params = cmd.params
+            half = len(params) // 2
+            if half and len(params) == 2 * half and params[:half] == params[half:]:
+                changes.append((cmd.start_time, cmd.start_time))
+            else:
+                changes.append((cmd.start_time, cmd.end_time))
+
+    if isinstance(obj, Animation) and obj.frame_count > 1:
+        if obj.loop_type == LoopType.LoopOnce:
+            changes.append((obj.life_start, obj.life_start + obj.frame_delay * obj.frame_count))
+        else:
+            changes.append((obj.life_start, obj.life_end))
+    return changes
+
+
+def constant_spans(obj: SBObject) -> List[Tuple[float, float]]:
+    """See ``StateEngine.constant_spans``."""
+    if not getattr(obj.commands, "loaded", True):
+        return []
+    spans = []
+    cursor = obj.life_start
+    for start, end in sorted(_changes(obj)):
+        if start > cursor:
+            spans.append((cursor, min(start, obj.life_end)))
+        cursor = max(cursor, end)
+        if cursor >= obj.life_end:
+            break
+    if cursor < obj.life_end:
+        spans.append((cursor, obj.life_end))
+    return [(a, b) for a, b in spans if a < b]
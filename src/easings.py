@@ -1,4 +1,7 @@
 import math
+from typing import Callable, Dict
+
+import numpy as np
 
 
 def apply_easing(easing_id: int, t: float) -> float:
@@ -8,62 +11,46 @@ def apply_easing(easing_id: int, t: float) -> float:
     :param t: The input value to be eased, typically between 0 and 1.
     :return: The eased value.
     """
+    return _EASINGS.get(easing_id, _linear)(t)
 
-    if t < 0.0:
-        t = 0.0
-    elif t > 1.0:
-        t = 1.0
-
-    easing_map = {
-        0: lambda t: t,  # Linear
-        1: quad_out,  # easing out, something legacy..
-        2: quad_in,  # easing in, something legacy..
-        # quad
-        3: quad_in,
-        4: quad_out,
-        5: quad_in_out,
-        # cubic
-        6: cubic_in,
-        7: cubic_out,
-        8: cubic_in_out,
-        # quart
-        9: quart_in,
-        10: quart_out,
-        11: quart_in_out,
-        # quint
-        12: quint_in,
-        13: quint_out,
-        14: quint_in_out,
-        # sine
-        15: sine_in,
-        16: sine_out,
-        17: sine_in_out,
-        # expo
-        18: expo_in,
-        19: expo_out,
-        20: expo_in_out,
-        # circ
-        21: circ_in,
-        22: circ_out,
-        23: circ_in_out,
-        # elastic
-        24: elastic_in,
-        25: elastic_out,
-        26: elastic_out_half,
-        27: elastic_out_quarter,
-        28: elastic_in_out,
-        # back
-        29: back_in,
-        30: back_out,
-        31: back_in_out,
-        # bounce
-        32: bounce_in,
-        33: bounce_out,
-        34: bounce_in_out,
-    }
 
-    func = easing_map.get(easing_id, lambda t: t)  # Default to linear if not found
-    return func(t)
+def easing_function(easing_id: int) -> Callable[[float], float]:
+    """
+    The function ``apply_easing`` calls for *easing_id*, clamping included,
+    for callers that evaluate the same easing many times. Unknown ids get
+    linear.
+    """
+    return _EASINGS.get(easing_id, _linear)
+
+
+def apply_easing_array(easing_ids, t: np.ndarray) -> np.ndarray:
+    """
+    ``apply_easing`` over an array of progress values.
+    :param easing_ids: One easing id for every value, or an array of ids
+        the same length as *t*.
+    :param t: The progress values.
+    :return: A float64 array of eased values.
+    """
+    t = np.clip(np.asarray(t, dtype=np.float64), 0.0, 1.0)
+    if np.ndim(easing_ids) == 0:
+        kernel = _ARRAY_EASINGS.get(int(easing_ids))
+        return t if kernel is None else kernel(t)
+    ids = np.broadcast_to(np.asarray(easing_ids), t.shape).ravel()
+    out = t.copy()  # linear, and the default for unknown ids
+    flat, eased = t.ravel(), out.reshape(-1)
+    # group the values by id with one sort rather than a mask per id; unknown
+    # ids count as linear, which lets the sort run on bytes (a radix sort)
+    ids = np.where((ids > 0) & (ids < 256), ids, 0).astype(np.uint8)
+    order = np.argsort(ids, kind="stable")
+    sorted_ids = ids[order]
+    bounds = np.flatnonzero(sorted_ids[1:] != sorted_ids[:-1]) + 1
+    for lo, hi in zip([0, *bounds.tolist()], [*bounds.tolist(), len(ids)]):
+        kernel = _ARRAY_EASINGS.get(int(sorted_ids[lo])) if hi > lo else None
+        if kernel is None:
+            continue
+        group = order[lo:hi]
+        eased[group] = kernel(flat[group])
+    return out
 
 
 def _reverse(function: callable, value: float) -> float:
@@ -211,3 +198,300 @@ def elastic_out_quarter(t: float) -> float:
 
 def elastic_in_out(t: float) -> float:
     return _to_in_out(elastic_in, t)
+
+
+# ---------------------------------------------------------------------------
+# Registry: one function per id, built once, with the clamping folded in
+# ---------------------------------------------------------------------------
+
+def _linear(t: float) -> float:
+    if t < 0.0:
+        return 0.0
+    if t > 1.0:
+        return 1.0
+    return t
+
+
+def _compile(function: callable) -> callable:
+    def eased(t: float) -> float:
+        if t < 0.0:
+            t = 0.0
+        elif t > 1.0:
+            t = 1.0
+        return function(t)
+    return eased
+
+
+def _compile_reverse(function: callable) -> callable:
+    # _reverse inlined: one call less per value, same arithmetic
+    def eased(t: float) -> float:
+        if t < 0.0:
+            t = 0.0
+        elif t > 1.0:
+            t = 1.0
+        return 1 - function(1 - t)
+    return eased
+
+
+def _compile_in_out(function: callable) -> callable:
+    # _to_in_out inlined
+    def eased(t: float) -> float:
+        if t < 0.0:
+            t = 0.0
+        elif t > 1.0:
+            t = 1.0
+        return 0.5 * (function(2 * t) if t < 0.5 else (2 - function(2 - 2 * t)))
+    return eased
+
+
+def _easings() -> Dict[int, Callable[[float], float]]:
+    quad = _compile(quad_in), _compile_reverse(quad_in), _compile_in_out(quad_in)
+    return {
+        0: _linear,
+        1: quad[1],  # easing out, something legacy..
+        2: quad[0],  # easing in, something legacy..
+        3: quad[0], 4: quad[1], 5: quad[2],
+        6: _compile(cubic_in), 7: _compile_reverse(cubic_in), 8: _compile_in_out(cubic_in),
+        9: _compile(quart_in), 10: _compile_reverse(quart_in), 11: _compile_in_out(quart_in),
+        12: _compile(quint_in), 13: _compile_reverse(quint_in), 14: _compile_in_out(quint_in),
+        15: _compile(sine_in), 16: _compile_reverse(sine_in), 17: _compile_in_out(sine_in),
+        18: _compile(expo_in), 19: _compile_reverse(expo_in), 20: _compile_in_out(expo_in),
+        21: _compile(circ_in), 22: _compile_reverse(circ_in), 23: _compile_in_out(circ_in),
+        24: _compile_reverse(elastic_out),
+        25: _compile(elastic_out),
+        26: _compile(elastic_out_half),
+        27: _compile(elastic_out_quarter),
+        28: _compile_in_out(elastic_in),
+        29: _compile(back_in), 30: _compile_reverse(back_in), 31: _compile_in_out(back_in),
+        32: _compile_reverse(bounce_out), 33: _compile(bounce_out), 34: _compile_in_out(bounce_in),
+    }
+
+
+_EASINGS = _easings()
+
+
+# ---------------------------------------------------------------------------
+# Array kernels: the functions above over NumPy arrays, same formulas
+# ---------------------------------------------------------------------------
+
+def _reverse_array(function: callable, t: np.ndarray) -> np.ndarray:
+    return 1 - function(1 - t)
+
+
+def _to_in_out_array(function: callable, t: np.ndarray) -> np.ndarray:
+    # each half only sees the arguments the scalar version passes it
+    out = np.empty_like(t)
+    low = t < 0.5
+    out[low] = 0.5 * function(2 * t[low])
+    high = ~low
+    out[high] = 0.5 * (2 - function(2 - 2 * t[high]))
+    return out
+
+
+def _quad_in_array(t: np.ndarray) -> np.ndarray:
+    return t * t
+
+
+def _cubic_in_array(t: np.ndarray) -> np.ndarray:
+    return t * t * t
+
+
+def _quart_in_array(t: np.ndarray) -> np.ndarray:
+    return t * t * t * t
+
+
+def _quint_in_array(t: np.ndarray) -> np.ndarray:
+    return t * t * t * t * t
+
+
+def _sine_in_array(t: np.ndarray) -> np.ndarray:
+    return 1 - np.cos((t * math.pi) / 2)
+
+
+def _expo_in_array(t: np.ndarray) -> np.ndarray:
+    return np.power(2.0, 10 * (t - 1))
+
+
+def _circ_in_array(t: np.ndarray) -> np.ndarray:
+    return 1 - np.sqrt(1 - t * t)
+
+
+def _back_in_array(t: np.ndarray) -> np.ndarray:
+    s = 1.70158
+    return t * t * ((s + 1) * t - s)
+
+
+def _bounce_out_array(t: np.ndarray) -> np.ndarray:
+    return np.select(
+        [t < 1 / 2.75, t < 2 / 2.75, t < 2.5 / 2.75],
+        [
+            7.5625 * t * t,
+            7.5625 * (t - 1.5 / 2.75) ** 2 + 0.75,
+            7.5625 * (t - 2.25 / 2.75) ** 2 + 0.9375,
+        ],
+        7.5625 * (t - 2.625 / 2.75) ** 2 + 0.984375,
+    )
+
+
+def _elastic_out_array(t: np.ndarray, frequency: float = 1.0) -> np.ndarray:
+    return np.power(2.0, -10 * t) * np.sin((frequency * t - 0.075) * (2 * math.pi) / 0.3) + 1
+
+
+def _elastic_in_array(t: np.ndarray) -> np.ndarray:
+    return _reverse_array(_elastic_out_array, t)
+
+
+def _bounce_in_array(t: np.ndarray) -> np.ndarray:
+    return _reverse_array(_bounce_out_array, t)
+
+
+def _families(function: callable):
+    """(in, out, in-out) kernels of an easing family given its "in" kernel."""
+    return (
+        function,
+        lambda t: _reverse_array(function, t),
+        lambda t: _to_in_out_array(function, t),
+    )
+
+
+def _array_easings() -> dict:
+    quad = _families(_quad_in_array)
+    cubic = _families(_cubic_in_array)
+    quart = _families(_quart_in_array)
+    quint = _families(_quint_in_array)
+    sine = _families(_sine_in_array)
+    expo = _families(_expo_in_array)
+    circ = _families(_circ_in_array)
+    back = _families(_back_in_array)
+    bounce = _families(_bounce_in_array)
+    # ids as in apply_easing; linear (0) needs no kernel
+    return {
+        1: quad[1], 2: quad[0],
+        3: quad[0], 4: quad[1], 5: quad[2],
+        6: cubic[0], 7: cubic[1], 8: cubic[2],
+        9: quart[0], 10: quart[1], 11: quart[2],
+        12: quint[0], 13: quint[1], 14: quint[2],
+        15: sine[0], 16: sine[1], 17: sine[2],
+        18: expo[0], 19: expo[1], 20: expo[2],
+        21: circ[0], 22: circ[1], 23: circ[2],
+        24: _elastic_in_array,
+        25: _elastic_out_array,
+        26: lambda t: _elastic_out_array(t, 0.5),
+        27: lambda t: _elastic_out_array(t, 0.25),
+        28: lambda t: _to_in_out_array(_elastic_in_array, t),
+        29: back[0], 30: back[1], 31: back[2],
+        32: bounce[0], 33: _bounce_out_array, 34: bounce[2],
+    }
+
+
+_ARRAY_EASINGS = _array_easings()
+
+
+# ---------------------------------------------------------------------------
+# Lookup tables: approximate easings for previews
+# ---------------------------------------------------------------------------
+
+# progress values checked per easing to measure a table's error, at least 4 per interval
+_LUT_ERROR_POINTS = 1 << 16
+
+# kinks a table interval may straddle: the in-out halves and the bounce arcs
+# (also reversed and halved), where the error can peak between grid points
+_KINKS = np.array(sorted({
+    k
+    for b in (0.5, 1 / 2.75, 2 / 2.75, 2.5 / 2.75)
+    for k in (b, 1 - b, 0.5 - b / 2, 0.5 + b / 2)
+}))
+
+
+def _lut_function(values: list, resolution: int) -> Callable[[float], float]:
+    first, last = values[0], values[-1]
+    values = values + [last]  # t * resolution may round up to resolution
+
+    def eased(t: float) -> float:
+        if t <= 0.0:
+            return first
+        if t >= 1.0:
+            return last
+        x = t * resolution
+        i = int(x)
+        a = values[i]
+        return a + (values[i + 1] - a) * (x - i)
+    return eased
+
+
+class EasingLUT:
+    """
+    Every easing precomputed at ``resolution + 1`` evenly spaced progress
+    values and interpolated linearly: an approximate ``apply_easing`` whose
+    cost does not depend on the curve.
+
+    ``errors`` maps each easing id to its worst absolute error against the
+    exact function, measured at many points per interval and at the curves'
+    kinks. Linear and unknown ids stay exact.
+    """
+
+    def __init__(self, resolution: int = 1024):
+        if resolution < 1:
+            raise ValueError(f"easing table resolution must be at least 1, got {resolution}")
+        self.resolution = resolution
+        grid = np.linspace(0.0, 1.0, resolution + 1)
+        # row = easing id; row 0 (linear) is only there to keep the rows aligned
+        self.tables = np.vstack([grid] + [_ARRAY_EASINGS[i](grid) for i in range(1, len(_EASINGS))])
+        self._functions: Dict[int, Callable[[float], float]] = {}
+        self.errors = self._measure_errors()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_functions"] = {}  # closures; rebuilt on first use
+        return state
+
+    @property
+    def max_error(self) -> float:
+        return max(self.errors.values())
+
+    def function(self, easing_id: int) -> Callable[[float], float]:
+        """The table counterpart of ``easing_function``."""
+        function = self._functions.get(easing_id)
+        if function is None:
+            if easing_id in _ARRAY_EASINGS:
+                function = _lut_function(self.tables[easing_id].tolist(), self.resolution)
+            else:
+                function = _linear
+            self._functions[easing_id] = function
+        return function
+
+    def apply(self, easing_id: int, t: float) -> float:
+        """The table counterpart of ``apply_easing``."""
+        return self.function(easing_id)(t)
+
+    def apply_array(self, easing_ids, t: np.ndarray) -> np.ndarray:
+        """
+        The table counterpart of ``apply_easing_array``. Mixed ids need no
+        grouping: each value reads its two neighbours from the flat tables.
+        """
+        t = np.clip(np.asarray(t, dtype=np.float64), 0.0, 1.0)
+        n = self.resolution
+        ids = np.asarray(easing_ids)
+        ids = np.where((ids > 0) & (ids < len(self.tables)), ids, 0)
+        x = t * n
+        i = np.minimum(x.astype(np.intp), n - 1)
+        index = ids * (n + 1) + i
+        flat = self.tables.reshape(-1)
+        lo = flat[index]
+        eased = lo + (flat[index + 1] - lo) * (x - i)
+        return np.where(ids == 0, t, eased)
+
+    def _measure_errors(self) -> Dict[int, float]:
+        per_interval = max(4, _LUT_ERROR_POINTS // self.resolution)
+        t = np.concatenate([np.linspace(0.0, 1.0, self.resolution * per_interval + 1), _KINKS])
+        errors = {0: 0.0}
+        for easing_id, kernel in _ARRAY_EASINGS.items():
+            errors[easing_id] = float(np.abs(self.apply_array(easing_id, t) - kernel(t)).max())
+        return errors
+
+    def summary(self) -> str:
+        worst = max(self.errors, key=self.errors.get)
+        return (
+            f"Easing tables: {len(self.tables):,} easings at {self.resolution:,} intervals, "
+            f"max error {self.max_error:.2e} (easing {worst})"
+        )
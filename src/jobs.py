@@ -2,13 +2,18 @@ import multiprocessing
 import os
 import subprocess
 import threading
-from typing import Callable, List, Optional
+from typing import Callable, List, Optional, Tuple
 from src.parser import StoryboardParser
+from src.parse_cache import ParseCache
 from src.models import Storyboard
 from src.config import Config
 from src.render_skia import SkiaRenderer, SkiaRendererGpu
 from src.state_engine import StateEngine
+from src.state_streams import StateStreams
+from src.keyframes import KeyframeTables
+from src.easings import EasingLUT
 from src.managers import AssetLoader
+from src.optimizer import StoryboardOptimizer, screen_bounds
 
 from loguru import logger
 import re
@@ -17,6 +22,9 @@ import numpy as np
 from src.video import VideoSource
 from src.models import VideoObject
 
+# frames compared against exact states to report the keyframe tables' error
+_KEYFRAME_CHECKS = 120
+
 # Multiprocessing needs these at module level to be picklable, but who use cpu models anyway?
 worker_renderer: Optional[SkiaRenderer] = None
 
@@ -28,6 +36,9 @@ def init_worker(
     height: int,
     video_path: str | None = None,
     video_object: VideoObject | None = None,
+    batch_states: bool = False,
+    streams: StateStreams | None = None,
+    keyframes: KeyframeTables | None = None,
 ):
     global worker_renderer
     assets_loader = AssetLoader(base_path=asset_path)
@@ -45,6 +56,9 @@ def init_worker(
         height=height,
         video_source=video_source,
         video_object=video_object,
+        batch_states=batch_states,
+        streams=streams,
+        keyframes=keyframes,
     )
 
 
@@ -95,6 +109,17 @@ class RenderJob:
         self.progress_callback: Callable[[int, int], None] | None = None
         self.log_callback: Callable[[str, str], None] = log_message
 
+        self.parse_cache: ParseCache | None = None
+        # parsers created for the file being loaded, for their diagnostics
+        self._parsers: List[StoryboardParser] = []
+        # range renders: (file name, indexing parser) whose objects parse while rendering
+        self._index_parsers: List[Tuple[str, StoryboardParser]] = []
+        if self.cfg.parser.parse_cache:
+            self.parse_cache = ParseCache(
+                self.cfg.parser.cache_dir,
+                max_bytes=self.cfg.parser.cache_max_mb * 1024 * 1024,
+            )
+
     def set_callbacks(
         self,
         progress_callback: Callable[[int, int], None],
@@ -161,16 +186,69 @@ class RenderJob:
         ]
         return ffmpeg_cmd
 
+    def _make_parser(self) -> StoryboardParser:
+        parser = StoryboardParser(
+            workers=self.cfg.parser.parse_workers,
+            parallel_min_bytes=self.cfg.parser.parallel_min_mb * 1024 * 1024,
+            columnar=self.cfg.parser.columnar_commands,
+            strict=self.cfg.parser.strict,
+        )
+        self._parsers.append(parser)
+        return parser
+
+    def _is_range_render(self) -> bool:
+        return self.cfg.renderer.start_ms > 0 or self.cfg.renderer.end_ms > 0
+
+    def _parse_storyboard(self, filepath: str) -> Storyboard:
+        self._parsers = []
+        try:
+            return self._load_storyboard(filepath)
+        finally:
+            # one summary per file instead of a line per malformed command
+            for parser in self._parsers:
+                if parser.diagnostics:
+                    self.log_callback(
+                        parser.diagnostics.summary(os.path.basename(filepath)), "WARNING"
+                    )
+                    # an index parser keeps collecting for objects parsed while rendering
+                    parser.diagnostics.clear()
+
+    def _load_storyboard(self, filepath: str) -> Storyboard:
+        if self._is_range_render():
+            # only the objects alive inside the range get their commands parsed,
+            # while rendering; see _report_lazy_diagnostics
+            parser = self._make_parser()
+            self._index_parsers.append((os.path.basename(filepath), parser))
+            return parser.index(filepath)
+
+        if self.parse_cache is None:
+            return self._make_parser().parse(filepath)
+
+        hits = self.parse_cache.hits
+        storyboard = self.parse_cache.parse(filepath, self._make_parser)
+        if self.parse_cache.hits > hits:
+            self.log_callback(
+                f"Loaded {os.path.basename(filepath)} from the parse cache.", "INFO"
+            )
+        return storyboard
+
+    def _optimize(self, storyboard: Storyboard):
+        optimizer = StoryboardOptimizer(
+            image_size=AssetLoader(base_path=self.base_path).image_size,
+            bounds=screen_bounds(self.cfg.renderer.width, self.cfg.renderer.height),
+        )
+        self.log_callback(optimizer.optimize(storyboard).summary(), "INFO")
+
     def start(self):
         # Parse storyboard events from the .osu file first.
         # osu! renders .osu storyboard objects before .osb objects within
         # each layer, so .osu forms the base and .osb is merged on top.
+        self._index_parsers = []
         self.log_callback(
             f"Parsing storyboard from .osu: {self.cfg.path.osu_path}", "INFO"
         )
-        sb_parser = StoryboardParser()
         try:
-            storyboard = sb_parser.parse(self.cfg.path.osu_path)
+            storyboard = self._parse_storyboard(self.cfg.path.osu_path)
         except Exception as e:
             self.log_callback(f"Error parsing .osu storyboard: {e}", "ERROR")
             return
@@ -179,9 +257,8 @@ class RenderJob:
             self.log_callback(
                 f"Parsing storyboard from .osb: {self.osb_path}", "INFO"
             )
-            osb_parser = StoryboardParser()
             try:
-                osb_storyboard = osb_parser.parse(self.osb_path)
+                osb_storyboard = self._parse_storyboard(self.osb_path)
                 storyboard.merge(osb_storyboard)
             except Exception as e:
                 self.log_callback(f"Error parsing .osb storyboard: {e}", "ERROR")
@@ -214,11 +291,24 @@ class RenderJob:
                     f"Failed to load video: {video_path}", "WARNING"
                 )
 
-        engine = StateEngine(storyboard)
+        easing_lut = None
+        if self.cfg.renderer.easing_lut_resolution > 0:
+            easing_lut = EasingLUT(self.cfg.renderer.easing_lut_resolution)
+            self.log_callback(easing_lut.summary(), "INFO")
+        engine = StateEngine(storyboard, easing_lut)
+        # measured before optimising so dropped objects don't shorten the video
         total_duration = self._get_video_duration(storyboard)
+        if self.cfg.parser.optimize and not self._is_range_render():
+            self._optimize(storyboard)
+        if self.cfg.renderer.templates:
+            self.log_callback(engine.collapse_templates().summary(), "INFO")
         self.log_callback(f"Total video duration: {total_duration} ms", "INFO")
 
-        total_frames = (total_duration * self.cfg.renderer.fps) // 1000 + 1
+        start_ms = self.cfg.renderer.start_ms
+        end_ms = self.cfg.renderer.end_ms or total_duration
+        if self._is_range_render():
+            self.log_callback(f"Rendering range {start_ms}-{end_ms} ms", "INFO")
+        total_frames = max(0, end_ms - start_ms) * self.cfg.renderer.fps // 1000 + 1
 
         ffmpeg_cmd = self._build_ffmpeg_command()
         self.log_callback(
@@ -243,6 +333,7 @@ class RenderJob:
             if process.stdin:
                 process.stdin.close()
             process.wait()
+        self._report_lazy_diagnostics()
 
         if not self._stop_event.is_set():
             self.log_callback(
@@ -253,6 +344,18 @@ class RenderJob:
         else:
             self.log_callback("Rendering was stopped before completion.", "WARNING")
 
+    def _report_lazy_diagnostics(self):
+        """
+        Malformed lines found in objects parsed during a range render. CPU
+        workers parse their own copies, so only in-process loads are seen.
+        """
+        for name, parser in self._index_parsers:
+            if parser.diagnostics:
+                self.log_callback(
+                    parser.diagnostics.summary(f"{name} (objects parsed while rendering)"), "WARNING"
+                )
+                parser.diagnostics.clear()
+
     def _render_gpu(
         self, process: subprocess.Popen, engine: StateEngine, total_frames: int
     ):
@@ -260,6 +363,8 @@ class RenderJob:
             f"Using GPU acceleration for rendering with {total_frames} frames.", "INFO"
         )
 
+        keyframes = self._build_keyframes(engine, total_frames) if self.cfg.renderer.keyframes else None
+
         vo = engine.storyboard.video
         renderer = SkiaRendererGpu(
             engine,
@@ -269,11 +374,13 @@ class RenderJob:
             self.cfg.renderer.sample_method,
             video_source=self._video_source,
             video_object=vo,
+            batch_states=self.cfg.renderer.batch_states,
+            keyframes=keyframes,
         )
         for i in range(total_frames):
             if self._stop_event.is_set():
                 break
-            time_ms = int(i * 1000 / self.cfg.renderer.fps)
+            time_ms = self.cfg.renderer.start_ms + int(i * 1000 / self.cfg.renderer.fps)
             frame = renderer.render_frame(time_ms)
             frame = frame.toarray(colorType=skia.kRGBA_8888_ColorType)
 
@@ -295,38 +402,74 @@ class RenderJob:
             "INFO",
         )
 
-        tasks = [int(i * 1000 / self.cfg.renderer.fps) for i in range(total_frames)]
+        start_ms = self.cfg.renderer.start_ms
+        tasks = [
+            start_ms + int(i * 1000 / self.cfg.renderer.fps) for i in range(total_frames)
+        ]
 
         vo = engine.storyboard.video
         video_path = os.path.join(self.base_path, vo.filepath) if vo else None
 
-        with multiprocessing.Pool(
-            processes=cpu_count,
-            initializer=init_worker,
-            initargs=(
-                engine,
-                self.base_path,
-                self.cfg.renderer.width,
-                self.cfg.renderer.height,
-                video_path,
-                vo,
-            ),
-        ) as pool:
-            result_iter = pool.imap(render_frame_worker, tasks, chunksize=10)
-
-            for i, frame_bytes in enumerate(result_iter):
-                if self._stop_event.is_set():
-                    pool.terminate()
-                    break
-
-                process.stdin.write(frame_bytes)
-
-                if i % 30 == 0 and self.progress_callback:
-                    self.progress_callback(i + 1, total_frames)
+        streams = None
+        if self.cfg.renderer.state_streams:
+            streams = self._build_state_streams(engine, total_frames, cpu_count)
+        keyframes = self._build_keyframes(engine, total_frames) if self.cfg.renderer.keyframes else None
+
+        try:
+            with multiprocessing.Pool(
+                processes=cpu_count,
+                initializer=init_worker,
+                initargs=(
+                    engine,
+                    self.base_path,
+                    self.cfg.renderer.width,
+                    self.cfg.renderer.height,
+                    video_path,
+                    vo,
+                    self.cfg.renderer.batch_states,
+                    streams,
+                    keyframes,
+                ),
+            ) as pool:
+                result_iter = pool.imap(render_frame_worker, tasks, chunksize=10)
+
+                for i, frame_bytes in enumerate(result_iter):
+                    if self._stop_event.is_set():
+                        pool.terminate()
+                        break
+
+                    process.stdin.write(frame_bytes)
+
+                    if i % 30 == 0 and self.progress_callback:
+                        self.progress_callback(i + 1, total_frames)
+        finally:
+            if streams is not None and os.path.exists(streams.path):
+                os.unlink(streams.path)
 
         if not self._stop_event.is_set():
             self.progress_callback(total_frames, total_frames)
 
+    def _build_state_streams(self, engine: StateEngine, total_frames: int, workers: int) -> StateStreams:
+        """Every object's states for every frame, in a file next to the output video."""
+        path = os.path.splitext(self.cfg.path.output_path)[0] + ".states.npy"
+        self.log_callback(f"Precomputing object states for {total_frames} frames into {path}", "INFO")
+        return StateStreams.build(
+            engine, path, self.cfg.renderer.fps, self.cfg.renderer.start_ms, total_frames, workers=workers
+        )
+
+    def _build_keyframes(self, engine: StateEngine, total_frames: int) -> KeyframeTables:
+        """Keyframe tables for an approximate render, checked against exact states at some frames."""
+        renderer = self.cfg.renderer
+        self.log_callback("Sampling object states into keyframe tables (approximate render)", "INFO")
+        keyframes = KeyframeTables.build(
+            engine, renderer.keyframe_step_ms, renderer.keyframe_tolerance_px, renderer.keyframe_tolerance_opacity
+        )
+        # evenly spread frames of the rendered range
+        checked = np.linspace(0, max(total_frames - 1, 0), min(total_frames, _KEYFRAME_CHECKS)).astype(np.int64)
+        times = [renderer.start_ms + int(i * 1000 / renderer.fps) for i in checked.tolist()]
+        self.log_callback(keyframes.compare(engine, times).summary(), "INFO")
+        return keyframes
+
     def _merge_audio(self):
         if self.cfg.renderer.enable_audio and os.path.exists(self.audio_path):
             self.log_callback(f"Merging audio from {self.audio_path}", "INFO")
@@ -342,6 +485,9 @@ class RenderJob:
                 "-y",
                 "-i",
                 temp_output,
+                # seek the audio to the rendered range
+                "-ss",
+                f"{self.cfg.renderer.start_ms / 1000:.3f}",
                 "-i",
                 self.audio_path,
                 "-c:v",
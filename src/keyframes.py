@@ -0,0 +1,321 @@
+"""
+Approximate states from per-object keyframe tables, for preview renders.
+
+``KeyframeTables.build`` samples every object of ``engine.arrays`` over its
+lifetime and keeps just enough keyframes that linear interpolation between
+them reproduces the exact states within the configured tolerances; a
+render then reads each state with one ``searchsorted`` and a lerp instead
+of evaluating easings, loops and command tracks.
+
+Sampling starts from a coarse grid plus keyframes on both sides of every
+command start and end (where a value may jump or stop changing), then
+splits every interval whose quarter points interpolate worse than the
+tolerance, down to ``step_ms``.
+With both tolerances 0 the tables hold a keyframe every ``step_ms`` (fixed
+rate). The check only looks at the quarter points, so the bound is not a
+guarantee; ``compare`` measures the actual error against the exact engine.
+
+Flip and additive flags hold the value of the keyframe before; animation
+frames are computed exactly. Building evaluates every object, so lazily
+indexed commands are all parsed.
+"""
+import time
+from dataclasses import dataclass
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+from src.models import Command, LoopCommand, SBObject
+from src.state_batch import BatchStates, _time_keys, frame_indices
+from src.state_engine import StateEngine
+from src.storyboard_arrays import StoryboardArrays
+
+_COLUMN = {name: i for i, name in enumerate(BatchStates.COLUMNS)}
+# interpolated columns; the rest hold the earlier keyframe's value
+_LERPED = np.array([name in ("x", "y", "sx", "sy", "rotation", "opacity", "r", "g", "b")
+                    for name in BatchStates.COLUMNS])
+# while building, the visible column says whether a sample's other columns
+# are defined; it is recomputed from the lifetime and opacity when read
+_DEFINED = _COLUMN["visible"]
+# columns an undefined sample has no value for
+_UNDEFINED_FIELDS = np.array([name not in ("visible", "opacity") for name in BatchStates.COLUMNS])
+# held columns an interval must not change within
+_FLAGS = np.array([name in ("flip_h", "flip_v", "additive") for name in BatchStates.COLUMNS])
+# a sprite of this size (px) scaled or turned by position_tolerance / _SPRITE_SIZE
+# moves its corners by about position_tolerance
+_SPRITE_SIZE = 100.0
+# the first grid is this many steps apart when sampling adaptively
+_COARSE_STEPS = 64
+# loop iterations whose starts get keyframes of their own
+_MAX_LOOP_JUMPS = 64
+# (object, time) pairs evaluated per evaluate_batch call while building
+_CHUNK = 1 << 16
+
+
+@dataclass
+class KeyframeStats:
+    objects: int = 0
+    keyframes: int = 0
+    samples: int = 0  # exact states evaluated while building
+    build_seconds: float = 0.0
+    # filled in by KeyframeTables.compare
+    states: int = 0  # states compared
+    position_error: float = 0.0  # px, storyboard space
+    scale_error: float = 0.0
+    rotation_error: float = 0.0  # radians
+    opacity_error: float = 0.0
+    color_error: float = 0.0  # 0-255
+    visibility_errors: int = 0  # states drawn by one and not the other
+    exact_seconds: float = 0.0
+    approx_seconds: float = 0.0
+
+    @property
+    def speedup(self) -> float:
+        return self.exact_seconds / self.approx_seconds if self.approx_seconds else 0.0
+
+    def summary(self) -> str:
+        text = (
+            f"Keyframes: {self.keyframes:,} keyframes for {self.objects:,} objects "
+            f"from {self.samples:,} samples in {self.build_seconds:.2f} s"
+        )
+        if self.states:
+            text += (
+                f"; max error over {self.states:,} states: position {self.position_error:.3f} px, "
+                f"scale {self.scale_error:.4f}, rotation {self.rotation_error:.4f} rad, "
+                f"opacity {self.opacity_error:.4f}, color {self.color_error:.2f}, "
+                f"{self.visibility_errors:,} visibility changes; {self.speedup:.1f}x faster than exact"
+            )
+        return text
+
+
+def _tolerances(position: float, opacity: float) -> np.ndarray:
+    """Allowed interpolation error per ``BatchStates.COLUMNS`` column."""
+    tolerance = np.zeros(len(BatchStates.COLUMNS))
+    per_column = {
+        # the distance to the exact position stays within *position*
+        "x": position / np.sqrt(2), "y": position / np.sqrt(2),
+        "sx": position / _SPRITE_SIZE, "sy": position / _SPRITE_SIZE, "rotation": position / _SPRITE_SIZE,
+        "opacity": opacity, "r": opacity * 255, "g": opacity * 255, "b": opacity * 255,
+        # recomputed when read
+        "visible": np.inf, "frame_index": np.inf,
+    }
+    for name, value in per_column.items():
+        tolerance[_COLUMN[name]] = value
+    return tolerance
+
+
+def _evaluate(engine: StateEngine, owners: np.ndarray, times: np.ndarray) -> np.ndarray:
+    """
+    ``evaluate_batch(owners, times).to_matrix()``, in chunks, with the
+    visible column telling whether the other columns are defined.
+    """
+    out = np.empty((len(owners), len(BatchStates.COLUMNS)))
+    for lo in range(0, len(owners), _CHUNK):
+        states = engine.evaluate_batch(owners[lo:lo + _CHUNK], times[lo:lo + _CHUNK])
+        chunk = states.to_matrix()
+        # objects evaluated one by one leave the fields of a hidden state unset
+        undefined = ~states.visible & engine._batch.scalar[states.rows]
+        chunk[undefined, _COLUMN["opacity"]] = 0.0
+        chunk[:, _DEFINED] = ~undefined
+        out[lo:lo + _CHUNK] = chunk
+    return out
+
+
+def _changes(cmd: Command) -> Tuple[int, ...]:
+    """
+    The first times at which *cmd* may give a value different from the time
+    before, and the time its value stops changing.
+    """
+    if cmd.type == "P":
+        return (cmd.end_time + 1,)  # the flag is set whenever time <= end
+    if cmd.start_time == cmd.end_time:
+        return (cmd.start_time, cmd.start_time + 1)  # the start value, then the end value
+    return (cmd.start_time, cmd.end_time)
+
+
+def _jumps(obj: SBObject) -> List[int]:
+    """Times around which the state of *obj* may change at once or stop changing, both sides of each."""
+    changes = []
+    for cmd in obj.commands:
+        if isinstance(cmd, LoopCommand):
+            duration = cmd.sub_max
+            # every iteration restarts the loop's commands
+            local = {0}
+            for sub in cmd.commands:
+                local.update(_changes(sub))
+            for k in range(min(cmd.loop_count, _MAX_LOOP_JUMPS) if duration else 1):
+                changes += (cmd.start_time + k * duration + t for t in local)
+            # the loop's end maps to the start of an iteration, later times to its end
+            loop_end = cmd.start_time + duration * cmd.loop_count
+            changes += (loop_end, loop_end + 1)
+        else:
+            changes += _changes(cmd)
+    return [t for change in changes for t in (change - 1, change)]
+
+
+def _interpolate(t0, v0, t1, v1, t) -> np.ndarray:
+    # undefined samples only have an opacity; take the rest from the other side
+    undefined0, undefined1 = v0[:, _DEFINED] == 0, v1[:, _DEFINED] == 0
+    v0 = np.where(undefined0[:, None] & _UNDEFINED_FIELDS, v1, v0)
+    v1 = np.where(undefined1[:, None] & _UNDEFINED_FIELDS, v0, v1)
+    span = t1 - t0
+    w = np.where(span > 0, np.clip((t - t0) / np.where(span > 0, span, 1), 0.0, 1.0), 0.0)
+    return v0 + (w[:, None] * (v1 - v0)) * _LERPED
+
+
+class KeyframeTables:
+    """
+    Keyframes of every object of a ``StoryboardArrays``, sorted by object and time.
+
+    Holds NumPy arrays only, so render workers receive it cheaply.
+    """
+
+    def __init__(self, owner: np.ndarray, times: np.ndarray, values: np.ndarray, stats: KeyframeStats):
+        self.times = times
+        self.values = values
+        self.keys = _time_keys(owner, times)
+        count = np.bincount(owner, minlength=stats.objects)
+        self.offset = np.concatenate(([0], np.cumsum(count)[:-1])).astype(np.int64)
+        self.count = count
+        self.stats = stats
+
+    @classmethod
+    def build(cls, engine: StateEngine, step_ms: int = 16, position_tolerance: float = 0.5,
+              opacity_tolerance: float = 0.01) -> "KeyframeTables":
+        """
+        Sample every object of ``engine.arrays`` into keyframes.
+
+        :param step_ms: Closest spacing of two keyframes.
+        :param position_tolerance: Interpolation error allowed in positions (px), and
+            for a 100 px sprite, in its scale and rotation.
+        :param opacity_tolerance: Interpolation error allowed in opacity, and in colour
+            as a fraction of 255.
+        """
+        began = time.perf_counter()
+        arrays = engine.arrays
+        objects = len(arrays)
+        step = max(1, int(step_ms))
+        tolerance = _tolerances(position_tolerance, opacity_tolerance)
+        adaptive = bool((tolerance[_LERPED] > 0).any())
+        coarse = step * _COARSE_STEPS if adaptive else step
+
+        # the first grid: life_start, every `coarse` ms, and life_end
+        start = arrays.life_start.astype(np.int64)
+        end = np.maximum(arrays.life_end.astype(np.int64), start)
+        length = end - start
+        knots = -(-length // coarse) + 1
+        owner = np.repeat(np.arange(objects, dtype=np.int64), knots)
+        run_start = np.repeat(np.cumsum(knots) - knots, knots)
+        offset = (np.arange(len(owner)) - run_start) * coarse
+        times = start[owner] + np.minimum(offset, length[owner])
+        # and both sides of every jump
+        jumps = [_jumps(obj) for obj in arrays.objects]
+        jump_owner = np.repeat(np.arange(objects, dtype=np.int64), [len(j) for j in jumps])
+        jump_times = np.array([t for j in jumps for t in j], dtype=np.int64)
+        inside = (jump_times >= start[jump_owner]) & (jump_times <= end[jump_owner])
+        keys, first = np.unique(
+            _time_keys(np.concatenate((owner, jump_owner[inside])), np.concatenate((times, jump_times[inside]))),
+            return_index=True,
+        )
+        owner = np.concatenate((owner, jump_owner[inside]))[first]
+        times = np.concatenate((times, jump_times[inside]))[first]
+        values = _evaluate(engine, owner, times)
+        owners, all_times, all_values = [owner], [times], [values]
+        samples = len(owner)
+
+        if adaptive:
+            pairs = np.flatnonzero(owner[:-1] == owner[1:])
+            o, t0, t1 = owner[pairs], times[pairs], times[pairs + 1]
+            v0, v1 = values[pairs], values[pairs + 1]
+            while len(o):
+                splittable = t1 - t0 > step
+                o, t0, t1, v0, v1 = o[splittable], t0[splittable], t1[splittable], v0[splittable], v1[splittable]
+                if not len(o):
+                    break
+                # the quarter points of every interval, evaluated in one batch
+                span = t1 - t0
+                probe_times = np.concatenate([t0 + span * k // 4 for k in (1, 2, 3)])
+                probes = _evaluate(engine, np.tile(o, 3), probe_times)
+                samples += len(probe_times)
+                n = len(o)
+                both = (v0[:, _DEFINED] != 0) & (v1[:, _DEFINED] != 0)
+                bad = both & (v0 != v1)[:, _FLAGS].any(axis=1)
+                for k in range(3):
+                    t = probe_times[k * n:(k + 1) * n]
+                    probe = probes[k * n:(k + 1) * n]
+                    error = np.abs(probe - _interpolate(t0, v0, t1, v1, t))
+                    error[(probe[:, _DEFINED] == 0)[:, None] & _UNDEFINED_FIELDS] = 0.0
+                    bad |= (error > tolerance).any(axis=1)
+                # split at the middle, whose state is already known
+                split = np.flatnonzero(bad)
+                mid_times, mid_values = probe_times[n:2 * n][split], probes[n:2 * n][split]
+                owners.append(o[split])
+                all_times.append(mid_times)
+                all_values.append(mid_values)
+                o = np.concatenate((o[split], o[split]))
+                t0, t1 = np.concatenate((t0[split], mid_times)), np.concatenate((mid_times, t1[split]))
+                v0, v1 = np.concatenate((v0[split], mid_values)), np.concatenate((mid_values, v1[split]))
+
+        owner, times, values = np.concatenate(owners), np.concatenate(all_times), np.concatenate(all_values)
+        order = np.argsort(_time_keys(owner, times), kind="stable")
+        stats = KeyframeStats(objects=objects, keyframes=len(order), samples=samples,
+                              build_seconds=time.perf_counter() - began)
+        return cls(owner[order], times[order], values[order], stats)
+
+    def states(self, arrays: StoryboardArrays, rows: np.ndarray, time) -> BatchStates:
+        """
+        Approximate states of *rows* at *time*, as ``evaluate_batch`` returns them.
+
+        *arrays* is the ``StoryboardArrays`` the tables were built from (or an
+        equal copy, as a render worker has).
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        times = np.array(np.broadcast_to(time, rows.shape), dtype=np.float64)
+        first = self.offset[rows]
+        last = first + np.maximum(self.count[rows], 1) - 1
+        i = np.clip(np.searchsorted(self.keys, _time_keys(rows, times), side="right") - 1, first, last)
+        j = np.minimum(i + 1, last)
+        matrix = _interpolate(self.times[i], self.values[i], self.times[j], self.values[j], times)
+        opacity = matrix[:, _COLUMN["opacity"]]
+        matrix[:, _COLUMN["visible"]] = (
+            (arrays.life_start[rows] <= times) & (times <= arrays.life_end[rows]) & ~(opacity < 0.001)
+        )
+        matrix[:, _COLUMN["frame_index"]] = frame_indices(arrays, rows, times)
+        return BatchStates.from_matrix(rows, matrix)
+
+    def compare(self, engine: StateEngine, times: Iterable[int]) -> KeyframeStats:
+        """
+        Measure the tables against ``engine.evaluate_batch`` for every object
+        alive at each of *times*: the largest error where both draw the
+        object, how many states only one of them draws, and the time each
+        took. Updates and returns ``self.stats``.
+        """
+        stats = self.stats
+        arrays = engine.arrays
+        for t in times:
+            rows = np.flatnonzero((arrays.life_start <= t) & (t <= arrays.life_end))
+            if not len(rows):
+                continue
+            began = time.perf_counter()
+            exact = engine.evaluate_batch(rows, t)
+            stats.exact_seconds += time.perf_counter() - began
+            began = time.perf_counter()
+            approx = self.states(arrays, rows, t)
+            stats.approx_seconds += time.perf_counter() - began
+
+            stats.states += len(rows)
+            stats.visibility_errors += int((exact.visible != approx.visible).sum())
+            both = exact.visible & approx.visible
+            if not both.any():
+                continue
+            errors: Tuple[Tuple[str, np.ndarray], ...] = (
+                ("position_error", np.hypot(exact.x - approx.x, exact.y - approx.y)),
+                ("scale_error", np.maximum(np.abs(exact.sx - approx.sx), np.abs(exact.sy - approx.sy))),
+                ("rotation_error", np.abs(exact.rotation - approx.rotation)),
+                ("opacity_error", np.abs(exact.opacity - approx.opacity)),
+                ("color_error", np.max(np.abs([exact.r - approx.r, exact.g - approx.g, exact.b - approx.b]),
+                                       axis=0)),
+            )
+            for name, error in errors:
+                setattr(stats, name, max(getattr(stats, name), float(error[both].max())))
+        return stats
@@ -0,0 +1,112 @@
+"""
+Commands that are parsed on first use.
+
+``StoryboardParser.index`` builds every object from its header line only and
+gives it a ``LazyCommands`` that remembers where the object's command block
+lives in the source file. The block is read and parsed the first time
+anything looks at ``obj.commands`` (normally ``StateEngine.get_object_state``
+for an object alive at the rendered time), so objects outside a preview or
+time-range window are never materialised.
+"""
+from typing import Callable, Dict, List, Optional, Union
+
+from src.models import Command, LoopCommand, SBObject
+from src.state_engine import StateEngine
+
+
+# (source path, byte offset, byte length, variables, header line) -> the parsed object
+BlockLoader = Callable[[str, int, int, Dict[str, str], int], Optional[SBObject]]
+
+
+class LazyCommands:
+    """
+    List-like stand-in for ``SBObject.commands``.
+
+    On first access the object's block is parsed, its commands are sorted and
+    its lifetime is recomputed exactly, as ``StateEngine`` would have done.
+    Afterwards every operation goes to the loaded list.
+    """
+
+    __slots__ = ("owner", "source", "offset", "length", "variables", "line_no", "_loader", "_commands")
+
+    def __init__(
+        self,
+        owner: SBObject,
+        source: str,
+        offset: int,
+        length: int,
+        variables: Dict[str, str],
+        loader: BlockLoader,
+        line_no: int = 1,
+    ):
+        self.owner = owner
+        self.source = source
+        self.offset = offset
+        self.length = length
+        self.variables = variables
+        self.line_no = line_no
+        self._loader = loader
+        self._commands: Optional[List[Union[Command, LoopCommand]]] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._commands is not None
+
+    def load(self) -> List[Union[Command, LoopCommand]]:
+        if self._commands is None:
+            parsed = self._loader(self.source, self.offset, self.length, self.variables, self.line_no)
+            if parsed is None:
+                self._commands = []
+            else:
+                StateEngine.prepare_object(parsed)
+                self._commands = parsed.commands
+                self.owner.life_start = parsed.life_start
+                self.owner.life_end = parsed.life_end
+        return self._commands
+
+    def __len__(self):
+        return len(self.load())
+
+    def __iter__(self):
+        return iter(self.load())
+
+    def __getitem__(self, index):
+        return self.load()[index]
+
+    def __setitem__(self, index, value):
+        self.load()[index] = value
+
+    def __contains__(self, item):
+        return item in self.load()
+
+    def __bool__(self):
+        return bool(self.load())
+
+    def __eq__(self, other):
+        if isinstance(other, LazyCommands):
+            other = other.load()
+        return self.load() == other
+
+    def __repr__(self):
+        if self._commands is None:
+            return f"LazyCommands(<{self.length} bytes at {self.offset} in {self.source!r}>)"
+        return repr(self._commands)
+
+
+def _delegate(name: str):
+    def method(self, *args, **kwargs):
+        return getattr(self.load(), name)(*args, **kwargs)
+
+    method.__name__ = name
+    return method
+
+
+for _name in ("append", "extend", "insert", "pop", "remove", "clear", "index", "count", "sort", "copy"):
+    setattr(LazyCommands, _name, _delegate(_name))
+
+
+def count_loaded(objects) -> int:
+    """Number of *objects* whose lazy commands have been materialised."""
+    return sum(
+        1 for obj in objects if isinstance(obj.commands, LazyCommands) and obj.commands.loaded
+    )
@@ -1,5 +1,5 @@
 import os
-from typing import Dict
+from typing import Dict, Optional, Tuple
 import numpy as np
 import skia
 from loguru import logger
@@ -9,6 +9,7 @@ class AssetLoader:
     def __init__(self, base_path: str):
         self.base_path = base_path
         self.cache: Dict[str, skia.Image] = {}
+        self.size_cache: Dict[str, Optional[Tuple[int, int]]] = {}
 
         self.placeholder = self._create_placeholder()
 
@@ -18,9 +19,11 @@ class AssetLoader:
         canvas.clear(skia.Color(0, 0, 0, 0))
         return surface.makeImageSnapshot()
 
+    def _normalize(self, filepath: str) -> str:
+        return filepath.strip('"').replace("\\", os.sep)
+
     def load_image(self, filepath: str, method: str = "pil") -> skia.Image:
-        # normalize path
-        filepath = filepath.strip('"').replace("\\", os.sep)
+        filepath = self._normalize(filepath)
         full_path = os.path.join(self.base_path, filepath)
 
         if filepath in self.cache:
@@ -47,3 +50,24 @@ class AssetLoader:
             print(f"Error loading image {full_path}: {e}")
             self.cache[filepath] = self.placeholder
             return self.placeholder
+
+    def image_size(self, filepath: str) -> Optional[Tuple[int, int]]:
+        """
+        Pixel size of an image, read from its header without decoding it.
+        None if the file is missing or not an image, i.e. whenever
+        load_image would return the placeholder.
+        """
+        filepath = self._normalize(filepath)
+        if filepath in self.size_cache:
+            return self.size_cache[filepath]
+
+        size = None
+        data = skia.Data.MakeFromFileName(os.path.join(self.base_path, filepath))
+        if data is not None:
+            try:
+                dimensions = skia.Codec.MakeFromData(data).dimensions()
+                size = (dimensions.width(), dimensions.height())
+            except RuntimeError:
+                pass
+        self.size_cache[filepath] = size
+        return size
@@ -31,7 +31,7 @@ class LoopType(Enum):
 
 
 # Some commands classes
-@dataclass
+@dataclass(slots=True)
 class Command:
     """
     Defines commands for osu! storyboard. Include Move(M), Scale(S), Rotate(R), Fade(F), Color(C), Parameter(P), ScaleVec(V).
@@ -47,7 +47,7 @@ class Command:
         return f"Command(type={self.type}, easing={self.easing}, start_time={self.start_time}, end_time={self.end_time}, params={self.params})\n"
 
 
-@dataclass
+@dataclass(slots=True)
 class LoopCommand:
     """
     Defines the Loop(L) command for osu! storyboard.
@@ -63,7 +63,7 @@ class LoopCommand:
 
 
 # helper dataclasses for storyboard
-@dataclass
+@dataclass(slots=True)
 class Vector2:
     x: float
     y: float
@@ -84,7 +84,7 @@ class Vector2:
 
 
 # The element in storyboard and the storyboard itself
-@dataclass
+@dataclass(slots=True)
 class SBObject:
     layer: Layer
     origin: Origin
@@ -98,19 +98,19 @@ class SBObject:
         return f"SBObject(layer={self.layer}, origin={self.origin}, filepath='{self.filepath}', position={self.position}, commands={self.commands})\n"
 
 
-@dataclass
+@dataclass(slots=True)
 class Sprite(SBObject):
     pass
 
 
-@dataclass
+@dataclass(slots=True)
 class Animation(SBObject):
     frame_count: int = 0
     frame_delay: float = 0.0
     loop_type: LoopType = LoopType.LoopForever
 
 
-@dataclass
+@dataclass(slots=True)
 class ObjectState:
     visible: bool = False
     position: Vector2 = field(default_factory=lambda: Vector2(0.0, 0.0))
@@ -132,7 +132,7 @@ class ObjectState:
     frame_index: int = 0
 
 
-@dataclass
+@dataclass(slots=True)
 class VideoObject:
     """
     Represents a video event in a .osu file's [Events] section.
@@ -154,7 +154,7 @@ class VideoObject:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class Storyboard:
     background_layer: List[SBObject] = field(default_factory=list)
     fail_layer: List[SBObject] = field(default_factory=list)
@@ -162,6 +162,9 @@ class Storyboard:
     foreground_layer: List[SBObject] = field(default_factory=list)
     overlay_layer: List[SBObject] = field(default_factory=list)
     video: Optional[VideoObject] = None
+    # True once StateEngine has sorted commands and filled in life_start /
+    # life_end, e.g. for storyboards loaded back from the parse cache
+    lifetimes_computed: bool = False
 
     def add_object(self, obj: SBObject):
         """
@@ -194,6 +197,7 @@ class Storyboard:
         # .osu owns the video; .osb shouldn't override it
         if other.video is not None and self.video is None:
             self.video = other.video
+        self.lifetimes_computed = self.lifetimes_computed and other.lifetimes_computed
         return self
 
     def is_empty(self) -> bool:
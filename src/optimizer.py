@@ -0,0 +1,311 @@
+"""
+Parse-time storyboard optimisation.
+
+Generated storyboards carry many objects that are never seen: faded out or
+scaled to nothing for their whole life, parked outside the screen, or
+pointing at an image that does not exist. The renderer still evaluates each
+of them on every frame it is alive. ``StoryboardOptimizer`` removes the
+objects it can *prove* invisible from their command values alone, and
+merges adjacent same-type commands that cannot change the result.
+
+The proofs are conservative: every command value an object could take is
+bounded by the hull of its start/end parameters (overshooting Back/Elastic
+easings leave a property unbounded), and an object is only dropped when the
+whole hull is invisible.
+"""
+import math
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.models import Animation, Command, LoopCommand, SBObject, Storyboard
+from src.state_engine import StateEngine
+
+
+# easing ids whose progress leaves [0, 1] (elastic and back)
+OVERSHOOTING_EASINGS = frozenset(range(24, 32))
+
+# thresholds the renderer uses to skip an object
+MIN_OPACITY = 0.001
+MIN_SCALE = 0.001
+
+TRANSPARENT = "transparent"
+ZERO_SCALE = "zero scale"
+OFF_SCREEN = "off-screen"
+MISSING_ASSET = "missing asset"
+
+# what each command type writes; M and MX share "x" and so on
+_CATEGORIES = {
+    "F": ("opacity",),
+    "M": ("x", "y"),
+    "MX": ("x",),
+    "MY": ("y",),
+    "S": ("scale",),
+    "V": ("scale",),
+    "R": ("rotation",),
+    "C": ("color",),
+}
+
+# command type -> [(property, start param, end param)]
+_BOUNDED_VALUES = {
+    "F": [("opacity", 0, 1)],
+    "M": [("x", 0, 2), ("y", 1, 3)],
+    "MX": [("x", 0, 1)],
+    "MY": [("y", 0, 1)],
+    "S": [("scale", 0, 1)],
+    "V": [("scale", 0, 2), ("scale", 1, 3)],
+}
+
+
+def screen_bounds(width: int, height: int) -> Tuple[float, float, float, float]:
+    """The (left, top, right, bottom) area a width x height render shows, in osu! pixels."""
+    visible_width = width / (height / 480.0)
+    margin = (visible_width - 640) / 2
+    return -margin, 0.0, 640 + margin, 480.0
+
+
+@dataclass
+class OptimizeStats:
+    objects_before: int = 0
+    commands_before: int = 0
+    # reason -> objects dropped for it
+    removed_objects: Dict[str, int] = field(default_factory=dict)
+    # commands of dropped objects plus merged ones
+    removed_commands: int = 0
+    merged_commands: int = 0
+
+    @property
+    def total_removed_objects(self) -> int:
+        return sum(self.removed_objects.values())
+
+    def summary(self) -> str:
+        lines = [
+            f"Optimiser removed {self.total_removed_objects:,} of {self.objects_before:,} objects "
+            f"and {self.removed_commands:,} of {self.commands_before:,} commands"
+        ]
+        for reason, count in sorted(self.removed_objects.items(), key=lambda kv: -kv[1]):
+            lines.append(f"  {reason}: {count:,} objects")
+        if self.merged_commands:
+            lines.append(f"  merged redundant commands: {self.merged_commands:,}")
+        return "\n".join(lines)
+
+
+class _Bounds:
+    """Hull of the values a property can take, or unbounded."""
+
+    __slots__ = ("lo", "hi", "bounded", "set_at_top_level")
+
+    def __init__(self):
+        self.lo = math.inf
+        self.hi = -math.inf
+        self.bounded = True
+        self.set_at_top_level = False
+
+    def add(self, value: float):
+        if value < self.lo:
+            self.lo = value
+        if value > self.hi:
+            self.hi = value
+
+    def include_base(self, value: float):
+        # the object's own value shows unless a top-level command writes the
+        # property before any loop claims it (see _value_bounds)
+        if not self.set_at_top_level:
+            self.add(value)
+
+
+def _command_count(commands: Iterable) -> int:
+    total = 0
+    for cmd in commands:
+        total += 1 + len(getattr(cmd, "commands", ()))
+    return total
+
+
+def _value_bounds(obj: SBObject) -> Dict[str, _Bounds]:
+    bounds = {name: _Bounds() for name in ("opacity", "x", "y", "scale")}
+
+    # StateEngine applies commands in start order. Before it starts, a command
+    # only writes its start value if nothing earlier claimed its category; a
+    # loop claims its categories as soon as it is reached, even before it
+    # starts, and then the object's own value shows until the loop runs.
+    claimed = set()
+    for cmd in sorted(obj.commands, key=lambda c: c.start_time):
+        if isinstance(cmd, LoopCommand):
+            claimed.update(cat for sub in cmd.commands for cat in _CATEGORIES.get(sub.type, ()))
+            continue
+        for name, _, _ in _BOUNDED_VALUES.get(cmd.type, ()):
+            if name not in claimed:
+                bounds[name].set_at_top_level = True
+        claimed.update(_CATEGORIES.get(cmd.type, ()))
+
+    def visit(commands):
+        for cmd in commands:
+            if isinstance(cmd, LoopCommand):
+                visit(cmd.commands)
+                continue
+            values = _BOUNDED_VALUES.get(cmd.type)
+            if values is None:
+                continue
+            params = cmd.params
+            overshoots = cmd.easing in OVERSHOOTING_EASINGS
+            for name, start, end in values:
+                b = bounds[name]
+                if overshoots and params[start] != params[end]:
+                    b.bounded = False
+                b.add(params[start])
+                b.add(params[end])
+
+    visit(obj.commands)
+    bounds["opacity"].include_base(1.0)
+    bounds["scale"].include_base(1.0)
+    bounds["x"].include_base(obj.position.x)
+    bounds["y"].include_base(obj.position.y)
+    return bounds
+
+
+def _image_paths(obj: SBObject) -> List[str]:
+    if isinstance(obj, Animation) and obj.frame_count > 0 and "." in obj.filepath:
+        base, ext = obj.filepath.rsplit(".", 1)
+        return [f"{base}{i}.{ext}" for i in range(obj.frame_count)]
+    return [obj.filepath]
+
+
+class StoryboardOptimizer:
+    """
+    Drop never-visible objects and merge redundant commands, in place.
+
+    *image_size* maps an image path (as written in the storyboard) to its
+    pixel size, or None when the renderer would not find or decode it, e.g.
+    ``AssetLoader.image_size``. Without it the missing-asset and off-screen
+    checks are skipped. *bounds* is the visible area in osu! pixels, see
+    ``screen_bounds``; None skips the off-screen check.
+    """
+
+    def __init__(
+        self,
+        image_size: Optional[Callable[[str], Optional[Tuple[int, int]]]] = None,
+        bounds: Optional[Tuple[float, float, float, float]] = None,
+        merge_commands: bool = True,
+    ):
+        self.image_size = image_size
+        self.bounds = bounds
+        self.merge_commands = merge_commands
+
+    def optimize(self, storyboard: Storyboard) -> OptimizeStats:
+        if not storyboard.lifetimes_computed:
+            StateEngine(storyboard)
+
+        stats = OptimizeStats()
+        for layer in (
+            storyboard.background_layer,
+            storyboard.fail_layer,
+            storyboard.pass_layer,
+            storyboard.foreground_layer,
+            storyboard.overlay_layer,
+        ):
+            kept = []
+            for obj in layer:
+                if not getattr(obj.commands, "loaded", True):
+                    kept.append(obj)  # lazily indexed, not worth loading here
+                    continue
+                count = _command_count(obj.commands)
+                stats.objects_before += 1
+                stats.commands_before += count
+
+                reason = self.invisible_reason(obj)
+                if reason is not None:
+                    stats.removed_objects[reason] = stats.removed_objects.get(reason, 0) + 1
+                    stats.removed_commands += count
+                    continue
+                if self.merge_commands and type(obj.commands) is list:
+                    merged = merge_redundant_commands(obj.commands)
+                    stats.merged_commands += merged
+                    stats.removed_commands += merged
+                kept.append(obj)
+            layer[:] = kept
+        return stats
+
+    def invisible_reason(self, obj: SBObject) -> Optional[str]:
+        """Why *obj* can never be drawn, or None if it might be."""
+        bounds = _value_bounds(obj)
+
+        opacity = bounds["opacity"]
+        if opacity.bounded and opacity.hi < MIN_OPACITY:
+            return TRANSPARENT
+
+        scale = bounds["scale"]
+        max_scale = max(abs(scale.lo), abs(scale.hi))
+        if scale.bounded and max_scale < MIN_SCALE:
+            return ZERO_SCALE
+
+        if self.image_size is None:
+            return None
+        sizes = [size for size in map(self.image_size, _image_paths(obj)) if size is not None]
+        if not sizes:
+            return MISSING_ASSET
+
+        if self.bounds is None or not (scale.bounded and bounds["x"].bounded and bounds["y"].bounded):
+            return None
+        # any pixel lies within scale * diagonal of the origin, whatever the
+        # origin, rotation or flip
+        reach = max_scale * max(math.hypot(w, h) for w, h in sizes)
+        left, top, right, bottom = self.bounds
+        x, y = bounds["x"], bounds["y"]
+        if x.hi + reach < left or x.lo - reach > right or y.hi + reach < top or y.lo - reach > bottom:
+            return OFF_SCREEN
+        return None
+
+
+def _is_constant(cmd: Command) -> bool:
+    half = len(cmd.params) // 2
+    return cmd.params[:half] == cmd.params[half:]
+
+
+def merge_redundant_commands(commands: List) -> int:
+    """
+    Merge adjacent same-type commands that cannot change the object's state.
+
+    *commands* must be sorted by start time. Two commands are adjacent when
+    no command in between writes any of the same properties. A repeat of
+    the previous command is dropped, and a constant command with the same
+    value as a constant predecessor extends it (a constant holds its value
+    before, during and after its span, so the gap between them is covered
+    too). Returns the number of commands removed.
+    """
+    merged = []
+    last: Dict[str, int] = {}  # property -> index in merged of its last writer
+    removed = 0
+    for cmd in commands:
+        if isinstance(cmd, LoopCommand):
+            categories = {
+                cat for sub in cmd.commands for cat in _CATEGORIES.get(sub.type, ())
+            }
+        else:
+            categories = set(_CATEGORIES.get(cmd.type, ()))
+
+        if isinstance(cmd, Command) and categories:
+            writers = {last.get(cat) for cat in categories}
+            previous = merged[writers.pop()] if len(writers) == 1 and None not in writers else None
+            if (
+                isinstance(previous, Command)
+                and previous.type == cmd.type
+                and previous.params == cmd.params
+            ):
+                if (
+                    previous.easing == cmd.easing
+                    and previous.start_time == cmd.start_time
+                    and previous.end_time == cmd.end_time
+                ):
+                    removed += 1
+                    continue
+                if _is_constant(cmd):
+                    previous.end_time = max(previous.end_time, cmd.end_time)
+                    removed += 1
+                    continue
+
+        merged.append(cmd)
+        for cat in categories:
+            last[cat] = len(merged) - 1
+
+    if removed:
+        commands[:] = merged
+    return removed
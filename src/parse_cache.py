@@ -0,0 +1,261 @@
+import gc
+import hashlib
+import json
+import os
+import platform
+import struct
+import tempfile
+from typing import Callable, List, Optional, Tuple
+
+from loguru import logger
+
+from src.models import Storyboard
+from src.storyboard_codec import encode_storyboard, decode_storyboard
+from src.parser import StoryboardParser
+from src.parse_diagnostics import DiagnosticSample, ParseDiagnostics
+from src.state_engine import StateEngine
+
+
+# Bump whenever the storyboard encoding or the header changes; entries
+# written by another version are treated as misses and removed.
+CACHE_VERSION = 4
+
+_MAGIC = b"OSBC"
+# magic, version, source size, source mtime (ns), blake2b digest of the source
+_HEADER = struct.Struct("<4sHQq32s")
+# length of the JSON diagnostics block that follows the header
+_DIAGNOSTICS_SIZE = struct.Struct("<I")
+_SUFFIX = ".sbc"
+
+
+def default_cache_dir() -> str:
+    if platform.system() == "Windows":
+        base = os.environ.get("LOCALAPPDATA", os.path.expanduser("~"))
+    else:
+        base = os.environ.get(
+            "XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")
+        )
+    return os.path.join(base, "osb-render", "parse")
+
+
+def parser_options(parser: StoryboardParser) -> str:
+    """The parser settings a cache entry is keyed on; empty for a default parser."""
+    options = []
+    if parser.columnar:
+        options.append("columnar")
+    if parser.diagnostics.strict:
+        options.append("strict")
+    return ",".join(options)
+
+
+def _encode_diagnostics(diagnostics: Optional[ParseDiagnostics]) -> bytes:
+    if not diagnostics:
+        return _DIAGNOSTICS_SIZE.pack(0)
+    data = json.dumps({
+        "counts": diagnostics.counts,
+        "samples": {
+            category: [[s.line_no, s.line, s.detail] for s in samples]
+            for category, samples in diagnostics.samples.items()
+        },
+    }).encode("utf-8")
+    return _DIAGNOSTICS_SIZE.pack(len(data)) + data
+
+
+def _decode_diagnostics(data: bytes) -> ParseDiagnostics:
+    diagnostics = ParseDiagnostics()
+    if data:
+        raw = json.loads(data)
+        diagnostics.counts.update(raw["counts"])
+        for category, samples in raw["samples"].items():
+            diagnostics.samples[category] = [DiagnosticSample(*s) for s in samples]
+    return diagnostics
+
+
+def _file_digest(filepath: str) -> bytes:
+    h = hashlib.blake2b(digest_size=32)
+    with open(filepath, "rb") as f:
+        while chunk := f.read(1 << 20):
+            h.update(chunk)
+    return h.digest()
+
+
+class ParseCache:
+    """
+    On-disk cache of parsed storyboards.
+
+    Each source file maps to one entry holding the parsed ``Storyboard``
+    with lifetimes already computed by ``StateEngine``, so a warm load skips
+    both text parsing and the lifetime pass. Entries are keyed by the source
+    path and the parser settings (``parser_options``), and only used when
+    the source size, mtime and content hash all match the header.
+
+    Entries are a small fixed header, the parse diagnostics (so a hit still
+    reports the malformed lines) and the column encoding of
+    ``src.storyboard_codec``.
+    The directory is capped at *max_bytes*; least recently used entries are
+    evicted first (a hit refreshes the entry's mtime).
+    """
+
+    def __init__(self, cache_dir: str = "", max_bytes: int = 512 * 1024 * 1024):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def entry_path(self, filepath: str, options: str = "") -> str:
+        source = os.path.abspath(filepath)
+        if options:
+            source += "\0" + options
+        key = hashlib.blake2b(source.encode("utf-8"), digest_size=16).hexdigest()
+        return os.path.join(self.cache_dir, key + _SUFFIX)
+
+    def parse(
+        self,
+        filepath: str,
+        parser_factory: Callable[[], StoryboardParser] = StoryboardParser,
+    ) -> Storyboard:
+        """
+        Return the storyboard for *filepath*, from the cache when possible.
+
+        On a miss the file is parsed with a fresh parser from
+        *parser_factory*, its lifetimes are computed and the result is stored.
+        Parsers with other settings (strict, columnar, ...) use other entries.
+        """
+        parser = parser_factory()
+        options = parser_options(parser)
+        storyboard = self.load(
+            filepath, options, columnar=parser.columnar, diagnostics=parser.diagnostics
+        )
+        if storyboard is not None:
+            self.hits += 1
+            return storyboard
+
+        self.misses += 1
+        storyboard = parser.parse(filepath)
+        StateEngine(storyboard)  # fills in life_start / life_end
+        self.store(filepath, storyboard, options, diagnostics=parser.diagnostics)
+        return storyboard
+
+    def load(
+        self,
+        filepath: str,
+        options: str = "",
+        columnar: bool = False,
+        diagnostics: Optional[ParseDiagnostics] = None,
+    ) -> Optional[Storyboard]:
+        """
+        The cached storyboard for *filepath*, or None. On a hit the problems
+        recorded with the entry are merged into *diagnostics*.
+        """
+        entry = self.entry_path(filepath, options)
+        try:
+            st = os.stat(filepath)
+            with open(entry, "rb") as f:
+                header = f.read(_HEADER.size)
+                if len(header) != _HEADER.size:
+                    raise ValueError("truncated header")
+                magic, version, size, mtime_ns, digest = _HEADER.unpack(header)
+                if magic != _MAGIC or version != CACHE_VERSION:
+                    raise ValueError(f"unsupported cache entry version {version}")
+                if size != st.st_size or mtime_ns != st.st_mtime_ns:
+                    return None
+                if digest != _file_digest(filepath):
+                    return None
+                size_bytes = f.read(_DIAGNOSTICS_SIZE.size)
+                if len(size_bytes) != _DIAGNOSTICS_SIZE.size:
+                    raise ValueError("truncated diagnostics")
+                (n,) = _DIAGNOSTICS_SIZE.unpack(size_bytes)
+                cached_diagnostics = _decode_diagnostics(f.read(n))
+                data = f.read()
+            # rebuilding ~100k small objects; generational GC passes would
+            # only rescan them
+            gc.disable()
+            try:
+                storyboard = decode_storyboard(data, columnar=columnar)
+            finally:
+                gc.enable()
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Discarding unreadable parse cache entry {entry}: {e}")
+            self._remove(entry)
+            return None
+
+        if diagnostics is not None:
+            diagnostics.merge(cached_diagnostics)
+        try:
+            os.utime(entry)  # mark as recently used
+        except OSError:
+            pass
+        return storyboard
+
+    def store(
+        self,
+        filepath: str,
+        storyboard: Storyboard,
+        options: str = "",
+        diagnostics: Optional[ParseDiagnostics] = None,
+    ):
+        try:
+            st = os.stat(filepath)
+            header = _HEADER.pack(
+                _MAGIC, CACHE_VERSION, st.st_size, st.st_mtime_ns, _file_digest(filepath)
+            )
+            payload = encode_storyboard(storyboard)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(header)
+                    f.write(_encode_diagnostics(diagnostics))
+                    f.write(payload)
+                os.replace(tmp_path, self.entry_path(filepath, options))
+            except BaseException:
+                self._remove(tmp_path)
+                raise
+        except Exception as e:
+            logger.warning(f"Could not write parse cache for {filepath}: {e}")
+            return
+
+        self._evict()
+
+    def clear(self):
+        for path, _, _ in self._entries():
+            self._remove(path)
+
+    def _entries(self) -> List[Tuple[str, int, float]]:
+        """(path, size, last use) of every cache entry."""
+        entries = []
+        try:
+            names = os.listdir(self.cache_dir)
+        except FileNotFoundError:
+            return entries
+        for name in names:
+            if not name.endswith(_SUFFIX):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, st.st_size, st.st_mtime))
+        return entries
+
+    def _evict(self):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+        entries.sort(key=lambda e: e[2])  # oldest use first
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
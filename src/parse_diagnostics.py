@@ -0,0 +1,98 @@
+"""
+Problems found while parsing a storyboard.
+
+The parser used to print() every malformed line, which gets very slow when a
+storyboard has tens of thousands of them and the output is captured by the
+GUI. ``ParseDiagnostics`` counts problems per category instead and keeps a
+few samples, so a job can log a single summary after parsing.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+
+INVALID_VIDEO = "invalid video event"
+INVALID_OBJECT = "invalid object"
+INVALID_LOOP = "invalid loop"
+INVALID_COMMAND = "invalid command"
+UNKNOWN_COMMAND = "unknown command type"
+
+MAX_SAMPLES = 3
+
+
+class StoryboardParseError(ValueError):
+    """Raised by a strict parser on the first malformed line."""
+
+    def __init__(self, category: str, line_no: int, line: str, detail: str = ""):
+        message = f"line {line_no}: {category}: {line!r}"
+        if detail:
+            message += f" ({detail})"
+        super().__init__(message)
+        self.category = category
+        self.line_no = line_no
+        self.line = line
+        self.detail = detail
+
+    def __reduce__(self):
+        return (type(self), (self.category, self.line_no, self.line, self.detail))
+
+
+@dataclass
+class DiagnosticSample:
+    line_no: int
+    line: str
+    detail: str = ""
+
+
+@dataclass
+class ParseDiagnostics:
+    """
+    Per-category problem counts with the first few offending lines.
+
+    With *strict* set, ``add`` raises ``StoryboardParseError`` instead.
+    """
+
+    strict: bool = False
+    counts: Dict[str, int] = field(default_factory=dict)
+    samples: Dict[str, List[DiagnosticSample]] = field(default_factory=dict)
+
+    def add(self, category: str, line_no: int, line: str, detail: str = ""):
+        if self.strict:
+            raise StoryboardParseError(category, line_no, line, detail)
+        self.counts[category] = self.counts.get(category, 0) + 1
+        samples = self.samples.setdefault(category, [])
+        if len(samples) < MAX_SAMPLES:
+            samples.append(DiagnosticSample(line_no, line, detail))
+
+    def merge(self, other: "ParseDiagnostics", line_offset: int = 0):
+        """Add *other*'s problems, shifting its line numbers by *line_offset*."""
+        for category, count in other.counts.items():
+            self.counts[category] = self.counts.get(category, 0) + count
+            samples = self.samples.setdefault(category, [])
+            for sample in other.samples.get(category, []):
+                if len(samples) >= MAX_SAMPLES:
+                    break
+                samples.append(
+                    DiagnosticSample(sample.line_no + line_offset, sample.line, sample.detail)
+                )
+
+    def clear(self):
+        self.counts.clear()
+        self.samples.clear()
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def __bool__(self) -> bool:
+        return bool(self.counts)
+
+    def summary(self, source: Optional[str] = None) -> str:
+        """One multi-line report, most frequent category first."""
+        where = f" in {source}" if source else ""
+        lines = [f"Skipped {self.total:,} malformed storyboard line(s){where}:"]
+        for category, count in sorted(self.counts.items(), key=lambda kv: -kv[1]):
+            lines.append(f"  {category}: {count:,}")
+            for sample in self.samples.get(category, []):
+                detail = f" ({sample.detail})" if sample.detail else ""
+                lines.append(f"    line {sample.line_no}: {sample.line}{detail}")
+        return "\n".join(lines)
@@ -1,4 +1,9 @@
+import functools
+import io
+import multiprocessing
 import os
+import re
+import sys
 from src.models import (
     Storyboard,
     SBObject,
@@ -12,60 +17,547 @@ from src.models import (
     LoopType,
     Vector2,
 )
-from typing import List, Optional, Union
+from src.storyboard_codec import encode_storyboard, decode_storyboard
+from src.columnar import CommandStore
+from src.lazy_commands import LazyCommands
+from src.parse_diagnostics import (
+    ParseDiagnostics,
+    StoryboardParseError,
+    INVALID_VIDEO,
+    INVALID_OBJECT,
+    INVALID_LOOP,
+    INVALID_COMMAND,
+    UNKNOWN_COMMAND,
+)
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple, Union
+
+# Files smaller than this are parsed serially even when workers are enabled;
+# below it, process start-up and result transfer outweigh the gain.
+PARALLEL_MIN_BYTES = 8 * 1024 * 1024
+# Lower bound for the size of one [Events] chunk handed to a worker
+PARALLEL_CHUNK_MIN_BYTES = 256 * 1024
+
+# Values per state for each interpolated command type (a command carries a
+# start and an end state). F=Opacity(1), M=x,y(2), S=Scale(1),
+# V=ScaleX,ScaleY(2), R=Angle(1), C=r,g,b(3); P is handled separately.
+COMMAND_ARITY: Dict[str, int] = {
+    "F": 1,
+    "S": 1,
+    "R": 1,
+    "MX": 1,
+    "MY": 1,
+    "M": 2,
+    "V": 2,
+    "C": 3,
+}
+_COMMAND_ARITY_BYTES = {k.encode(): v for k, v in COMMAND_ARITY.items()}
+
+
+class VariableSubstituter:
+    """
+    Replaces $variable references declared in [Variables].
+
+    All names are compiled into one regex alternation, longest name first,
+    so every line is scanned once no matter how many variables exist and
+    ``$ab`` is never clobbered by a shorter ``$a``. Lines without a "$" are
+    returned untouched.
+    """
+
+    def __init__(self, variables: Optional[Dict[str, str]] = None):
+        self.variables: Dict[str, str] = dict(variables) if variables else {}
+        self.count = 0  # number of references replaced so far
+        self._pattern: Optional[re.Pattern] = None
+
+    def add(self, name: str, value: str):
+        if not name:
+            return
+        self.variables[name] = value
+        self._pattern = None  # recompiled on the next substitution
 
+    def substitute(self, line: str) -> str:
+        if "$" not in line or not self.variables:
+            return line
+
+        if self._pattern is None:
+            names = sorted(self.variables, key=len, reverse=True)
+            self._pattern = re.compile("|".join(re.escape(n) for n in names))
+
+        line, n = self._pattern.subn(self._replace, line)
+        self.count += n
+        return line
+
+    def _replace(self, match: re.Match) -> str:
+        return self.variables[match.group(0)]
+
+
+def _parse_events_chunk(
+    args: Tuple[str, Dict[str, str]],
+) -> Tuple[bytes, ParseDiagnostics]:
+    """Process-pool worker: parse one slice of [Events] into an encoded storyboard."""
+    text, variables = args
+    parser = StoryboardParser()
+    parser.parse_stream(io.StringIO("[Events]\n" + text), variables=variables)
+    return encode_storyboard(parser.storyboard), parser.diagnostics
+
+
+def load_object_block(
+    source: str,
+    offset: int,
+    length: int,
+    variables: Dict[str, str],
+    line_no: int = 1,
+    diagnostics: Optional[ParseDiagnostics] = None,
+) -> Optional[SBObject]:
+    """
+    Parse the object whose header and commands span ``source[offset:offset+length]``.
+
+    *line_no* is the file line of the header. Problems go to *diagnostics*
+    (the indexing parser's), which also decides whether the parse is strict.
+    """
+    with open(source, "rb") as f:
+        f.seek(offset)
+        text = f.read(length).decode("utf-8")
+    parser = StoryboardParser(strict=diagnostics is not None and diagnostics.strict)
+    try:
+        objects = list(parser.iter_objects(io.StringIO("[Events]\n" + text), variables=variables))
+    except StoryboardParseError as e:
+        # block line 2 is file line line_no
+        raise StoryboardParseError(e.category, e.line_no + line_no - 2, e.line, e.detail) from None
+    if diagnostics is not None:
+        diagnostics.merge(parser.diagnostics, line_offset=line_no - 2)
+    return objects[0] if objects else None
+
+
+def _starts_object(line: str) -> bool:
+    """True for [Events] lines that replace the parser's current object."""
+    if line.startswith(("_", " ")):
+        return False
+    return line.split(",", 1)[0].strip() in ("Sprite", "Animation")
+
+
+class _LifetimeScan:
+    """
+    Lifetime bounds of one object from its command lines alone.
+
+    Mirrors ``StateEngine._compute_object_lifetime`` (loops span
+    ``start + sub_max * loop_count``, repeated segments extend the end) but
+    only converts the times and counts the values. A line the full parser
+    would reject for a bad value can only widen the bounds, never narrow them.
+    """
+
+    __slots__ = ("min_t", "max_t", "loop_start", "loop_count", "sub_max", "loop_open", "count")
 
-class StoryboardParser:
     def __init__(self):
+        self.min_t = float("inf")
+        self.max_t = float("-inf")
+        self.loop_open = False
+        self.loop_start = self.loop_count = self.sub_max = 0
+        self.count = 0
+
+    def command(self, line: bytes):
+        if line.startswith(b"L,"):
+            parts = line.split(b",")
+            try:
+                start, count = int(parts[1].strip()), int(parts[2].strip())
+            except (ValueError, IndexError):
+                return  # the parser keeps the previous loop open as well
+            self._close_loop()
+            self.loop_open = True
+            self.loop_start, self.loop_count, self.sub_max = start, count, 0
+            self.count += 1
+        elif not line.startswith(b"T,"):
+            if self.loop_open:
+                self._close_loop()
+            span = _command_span(line)
+            if span is not None:
+                self.count += 1
+                start, end = span
+                if start < self.min_t:
+                    self.min_t = start
+                if end > self.max_t:
+                    self.max_t = end
+
+    def sub_command(self, line: bytes):
+        if self.loop_open:
+            span = _command_span(line)
+            if span is not None and span[1] > self.sub_max:
+                self.sub_max = span[1]
+
+    def _close_loop(self):
+        if self.loop_open:
+            self.min_t = min(self.min_t, self.loop_start)
+            self.max_t = max(self.max_t, self.loop_start + self.sub_max * self.loop_count)
+            self.loop_open = False
+
+    def result(self) -> Tuple[int, int]:
+        self._close_loop()
+        if not self.count:
+            return 0, 0
+        return self.min_t, self.max_t
+
+
+def _command_span(line: bytes) -> Optional[Tuple[int, int]]:
+    """(first start, last end) of the command(s) a basic command line expands to."""
+    n_values = line.count(b",") - 3
+    parts = line.split(b",", 4)
+    try:
+        start_time = int(parts[2])
+        end_time = int(parts[3]) if n_values >= 0 and parts[3] else start_time
+    except (ValueError, IndexError):
+        return None
+
+    event = parts[0]
+    arity = _COMMAND_ARITY_BYTES.get(event)
+    if arity is None:
+        if event == b"P" and n_values > 0:
+            return start_time, end_time
+        return None
+
+    if n_values != arity and n_values != 2 * arity:
+        n_values = sum(1 for p in parts[4].split(b",") if p) if n_values > 0 else 0
+        if n_values == arity:
+            return start_time, end_time
+        if n_values < 2 * arity:
+            return None
+        shift = (n_values // arity - 2) * (end_time - start_time)
+        return min(start_time, start_time + shift), max(end_time, end_time + shift)
+    return start_time, end_time
+
+
+class StoryboardParser:
+    substituter_class = VariableSubstituter
+
+    def __init__(
+        self,
+        workers: int = 1,
+        parallel_min_bytes: int = PARALLEL_MIN_BYTES,
+        columnar: bool = False,
+        strict: bool = False,
+    ):
+        """
+        :param workers: Processes used for large files; 1 parses serially,
+            0 uses one per CPU core.
+        :param parallel_min_bytes: Files below this size are always parsed serially.
+        :param columnar: Store commands as rows of a ``CommandStore`` instead of
+            one ``Command`` object each. Objects then expose ``ColumnarCommands``
+            views; columnar parses always run serially.
+        :param strict: Raise ``StoryboardParseError`` on the first malformed
+            line instead of recording it in ``diagnostics``; strict parses
+            always run serially.
+        """
+        self.workers = workers
+        self.parallel_min_bytes = parallel_min_bytes
+        self.columnar = columnar
+        self.command_store: Optional[CommandStore] = CommandStore() if columnar else None
+        self._emit = self._emit_row if columnar else self._emit_command
+        self.diagnostics = ParseDiagnostics(strict=strict)
+        # position of the line being parsed, for diagnostics
+        self._line_no = 0
+        self._line = ""
         self.storyboard = Storyboard()
         self.current_object: Optional[SBObject] = None
         self.current_loop: Optional[LoopCommand] = None
+        self.substituter = self.substituter_class()
+        # set when a [Variables] section shows up after [Events] lines that
+        # already referenced variables; parse_stream() re-reads the file then
+        self._late_variables = False
+
+    @property
+    def variables(self) -> Dict[str, str]:
+        return self.substituter.variables
+
+    @property
+    def substitution_count(self) -> int:
+        """Number of $variable references replaced by the last parse."""
+        return self.substituter.count
 
     def parse(self, filepath: str) -> Storyboard:
         if not os.path.isfile(filepath):
             raise FileNotFoundError(f"The file {filepath} does not exist.")
 
+        workers = self.workers or os.cpu_count() or 1
+        if workers > 1 and not (self.columnar or self.diagnostics.strict) and os.path.getsize(filepath) >= self.parallel_min_bytes:
+            return self._parse_parallel(filepath, workers)
+
+        with open(filepath, "r", encoding="utf-8") as file:
+            return self.parse_stream(file)
+
+    def _parse_parallel(self, filepath: str, workers: int) -> Storyboard:
+        """
+        Parse [Events] in a process pool.
+
+        The section is cut into chunks right before Sprite/Animation lines
+        (the top-level lines that start a new current object), so every
+        command stays with its object. Chunks are parsed independently and
+        merged back in file order, which keeps the draw order within each
+        layer identical to a serial parse.
+        """
+        size = os.path.getsize(filepath)
+        target = max(PARALLEL_CHUNK_MIN_BYTES, size // (workers * 4))
+
+        substituter = self.substituter_class()
+        chunks: List[str] = []
+        chunk_lines: List[int] = []  # file line number of each chunk's first line
+        current: List[str] = []
+        current_bytes = 0
+        is_variables_section = False
+        is_events_section = False
+
         with open(filepath, "r", encoding="utf-8") as file:
-            lines = file.readlines()
+            for line_no, line in enumerate(file, 1):
+                if line.startswith("["):
+                    header = line.rstrip()
+                    is_variables_section = header == "[Variables]"
+                    is_events_section = header == "[Events]"
+                    continue
+                if is_variables_section:
+                    line = line.rstrip()
+                    if "=" in line and not line.startswith("//"):
+                        name, value = line.split("=", 1)
+                        substituter.add(name.strip(), value.strip())
+                elif is_events_section:
+                    if current_bytes >= target and _starts_object(line):
+                        chunks.append("".join(current))
+                        current, current_bytes = [], 0
+                    if not current:
+                        chunk_lines.append(line_no)
+                    current.append(line)
+                    current_bytes += len(line)
+        if current:
+            chunks.append("".join(current))
+
+        tasks = [(chunk, substituter.variables) for chunk in chunks]
+        with multiprocessing.Pool(processes=min(workers, len(tasks))) as pool:
+            results = pool.imap(_parse_events_chunk, tasks)
+            for first_line, (data, diagnostics) in zip(chunk_lines, results):
+                # worker line 1 is the "[Events]" header it prepends
+                self.diagnostics.merge(diagnostics, line_offset=first_line - 2)
+                part = decode_storyboard(data)
+                self.storyboard.background_layer.extend(part.background_layer)
+                self.storyboard.fail_layer.extend(part.fail_layer)
+                self.storyboard.pass_layer.extend(part.pass_layer)
+                self.storyboard.foreground_layer.extend(part.foreground_layer)
+                self.storyboard.overlay_layer.extend(part.overlay_layer)
+                if part.video is not None:
+                    self.storyboard.video = part.video  # last one wins, as in a serial parse
+
+        return self.storyboard
+
+    def parse_stream(
+        self, file: TextIO, variables: Optional[Dict[str, str]] = None
+    ) -> Storyboard:
+        """
+        Parse an opened storyboard file in a single streaming pass.
+
+        The file is consumed line by line, so only the current line and the
+        objects built so far are kept in memory. [Variables] declared before
+        [Events] (the usual layout) are substituted on the fly. If variables
+        are only declared after [Events] lines that reference them, the file
+        is rewound and parsed once more with the complete variable table; only
+        that fallback requires *file* to be seekable.
+
+        *variables* pre-seeds the variable table, see ``iter_objects``.
+        """
+        for obj in self.iter_objects(file, variables=variables):
+            self.storyboard.add_object(obj)
+
+        if self._late_variables:
+            variables = self.substituter.variables
+            file.seek(0)
+            self.storyboard = Storyboard()
+            self.current_object = None
+            self.current_loop = None
+            self.diagnostics.clear()
+            if self.columnar:
+                self.command_store = CommandStore()
+            for obj in self.iter_objects(file, variables=variables):
+                self.storyboard.add_object(obj)
+
+        if self.command_store is not None:
+            self.command_store.freeze()
+        return self.storyboard
+
+    def iter_objects(
+        self, file: TextIO, variables: Optional[Dict[str, str]] = None
+    ) -> Iterator[SBObject]:
+        """
+        Yield storyboard objects from *file* as soon as their command block ends.
+
+        Objects are yielded in file order and are not added to
+        ``self.storyboard`` (the video event still is). When *variables* is
+        given the [Variables] sections of the file are ignored and that table
+        is used instead.
+        """
+        frozen = variables is not None
+        self.substituter = self.substituter_class(variables)
+        self._late_variables = False
 
-        # First pass: collect [Variables] section entries
-        # Format: $varname=value1,value2,...
-        variables = {}
         is_variables_section = False
-        for line in lines:
+        is_events_section = False
+        referenced = False  # an [Events] line contained "$"
+
+        for line_no, line in enumerate(file, 1):
             line = line.rstrip()
+
             if not line or line.startswith("//"):
-                continue
+                continue  # Skip empty lines and comments
+
             if line.startswith("["):
-                is_variables_section = (line == "[Variables]")
+                is_variables_section = line == "[Variables]"
+                is_events_section = line == "[Events]"
+                if is_variables_section and referenced and not frozen:
+                    self._late_variables = True
+                continue
+
+            # Format: $varname=value1,value2,...
+            if is_variables_section:
+                if not frozen and "=" in line:
+                    name, value = line.split("=", 1)
+                    self.substituter.add(name.strip(), value.strip())
+                continue
+
+            if not is_events_section:
                 continue
-            if is_variables_section and "=" in line:
-                name, value = line.split("=", 1)
-                variables[name.strip()] = value.strip()
 
-        # Second pass: parse [Events] section
+            if "$" in line:
+                referenced = True
+            # Substitute $variable references before parsing
+            line = self.substituter.substitute(line)
+
+            self._line_no, self._line = line_no, line
+            previous = self.current_object
+            self._parse_line(line)
+            if previous is not None and self.current_object is not previous:
+                yield previous
+
+        if self.current_object is not None:
+            yield self.current_object
+
+    def index(self, filepath: str) -> Storyboard:
+        """
+        Build a storyboard from object headers only.
+
+        Each object gets its header fields and lifetime bounds, while its
+        commands stay in the file as a ``LazyCommands`` (byte offset and
+        length of the object's block) that is parsed on first access. The
+        lifetime scan only reads command times and value counts, so indexing
+        costs little more than reading the file; a preview or time-range
+        render then parses just the objects it actually draws.
+
+        The returned storyboard has ``lifetimes_computed`` set.
+        """
+        if not os.path.isfile(filepath):
+            raise FileNotFoundError(f"The file {filepath} does not exist.")
+
+        with open(filepath, "rb") as file:
+            self._index_stream(file, filepath)
+            if self._late_variables:
+                variables = self.substituter.variables
+                file.seek(0)
+                self.storyboard = Storyboard()
+                self.diagnostics.clear()
+                self._index_stream(file, filepath, variables=variables)
+
+        self.storyboard.lifetimes_computed = True
+        return self.storyboard
+
+    def _index_stream(
+        self, file, source: str, variables: Optional[Dict[str, str]] = None
+    ):
+        frozen = variables is not None
+        self.substituter = self.substituter_class(variables)
+        self._late_variables = False
+        self.current_object = None
+        self.current_loop = None
+
+        is_variables_section = False
         is_events_section = False
-        for line in lines:
-            line = line.rstrip()
+        referenced = False
+
+        block_start = block_end = 0
+        block_line = 1
+        bounds = _LifetimeScan()
+        # lazily parsed blocks report to (and are as strict as) this parser
+        loader = functools.partial(load_object_block, diagnostics=self.diagnostics)
+
+        def close_block():
+            obj = self.current_object
+            if obj is None:
+                return
+            obj.life_start, obj.life_end = bounds.result()
+            obj.commands = LazyCommands(
+                obj, source, block_start, block_end - block_start,
+                self.substituter.variables, loader, block_line,
+            )
+            self.storyboard.add_object(obj)
+            self.current_object = None
+
+        offset = 0
+        for line_no, raw in enumerate(file, 1):
+            line_offset = offset
+            offset += len(raw)
+
+            # command lines are the bulk of the file; only their times are
+            # needed, and int() reads them straight from bytes
+            if raw.startswith((b"_", b" ")) and is_events_section:
+                if self.current_object is None:
+                    continue
+                if b"$" in raw:
+                    referenced = True
+                    raw = self.substituter.substitute(raw.decode("utf-8")).encode("utf-8")
+                line = raw.rstrip()
+                stripped = line.lstrip(b"_ ")
+                depth = len(line) - len(stripped)
+                if depth == 1:
+                    bounds.command(stripped)
+                elif depth == 2:
+                    bounds.sub_command(stripped)
+                block_end = offset
+                continue
+
+            line = raw.decode("utf-8").rstrip()
 
             if not line or line.startswith("//"):
-                continue  # Skip empty lines and comments
+                continue
 
             if line.startswith("["):
-                if line == "[Events]":
-                    is_events_section = True
-                else:
-                    is_events_section = False
+                close_block()
+                is_variables_section = line == "[Variables]"
+                is_events_section = line == "[Events]"
+                if is_variables_section and referenced and not frozen:
+                    self._late_variables = True
                 continue
 
-            if is_events_section:
-                # Substitute $variable references before parsing
-                if variables:
-                    for name, value in variables.items():
-                        line = line.replace(name, value)
-                self._parse_line(line)
+            if is_variables_section:
+                if not frozen and "=" in line:
+                    name, value = line.split("=", 1)
+                    self.substituter.add(name.strip(), value.strip())
+                continue
 
-        return self.storyboard
+            if not is_events_section:
+                continue
+
+            if "$" in line:
+                referenced = True
+            line = self.substituter.substitute(line)
+
+            self._line_no, self._line = line_no, line
+            previous = self.current_object
+            self._parse_object(line.split(","))
+            if self.current_object is not previous:
+                # a new object; _parse_object leaves current_object alone for
+                # video and unsupported lines
+                new_object = self.current_object
+                self.current_object = previous
+                close_block()
+                self.current_object = new_object
+                block_start = line_offset
+                block_line = line_no
+                bounds = _LifetimeScan()
+            if self.current_object is not None:
+                block_end = offset
+
+        close_block()
 
     def _parse_line(self, line: str):
         indent_level = 0
@@ -100,7 +592,7 @@ class StoryboardParser:
                     y_offset=y_offset,
                 )
             except Exception as e:
-                print(f"Error parsing video event {parts}: {e}")
+                self._report(INVALID_VIDEO, str(e))
             return
 
         if object_type not in ["Sprite", "Animation"]:
@@ -109,7 +601,8 @@ class StoryboardParser:
         try:
             layer = Layer[parts[1].strip()]
             origin = Origin[parts[2].strip()]
-            filepath = parts[3].strip().strip('"')
+            # storyboards reuse a handful of images across many objects
+            filepath = sys.intern(parts[3].strip().strip('"'))
             x = float(parts[4].strip())
             y = float(parts[5].strip())
 
@@ -143,12 +636,15 @@ class StoryboardParser:
             else:
                 return  # Unsupported object type
 
+            if self.command_store is not None:
+                storyboard_object.commands = self.command_store.new_object()
             self.current_object = storyboard_object
-            self.storyboard.add_object(storyboard_object)
+            self.current_loop = None
 
         except Exception as e:
-            print(f"Error parsing {parts}: {e}")
+            self._report(INVALID_OBJECT, str(e))
             self.current_object = None
+            self.current_loop = None
 
     def _parse_command_l1(self, parts: List[str]):
         if not self.current_object:
@@ -161,118 +657,142 @@ class StoryboardParser:
             try:
                 start_time = int(parts[1].strip())
                 loop_count = int(parts[2].strip())
-                loop_command = LoopCommand(start_time=start_time, loop_count=loop_count)
-                self.current_loop = loop_command
-                self.current_object.commands.append(loop_command)
+                if self.command_store is not None:
+                    self.current_loop = self.current_object.commands.add_loop(
+                        start_time, loop_count
+                    )
+                else:
+                    loop_command = LoopCommand(start_time=start_time, loop_count=loop_count)
+                    self.current_loop = loop_command
+                    self.current_object.commands.append(loop_command)
             except Exception as e:
-                print(f"Error parsing loop command {parts}: {e}")
+                self._report(INVALID_LOOP, str(e))
         elif command_type == "T":
             pass  # Trigger command, I think we can ignore it for now
         else:
             self.current_loop = None
-            commands = self._parse_basic_command(parts)
-            if commands:
-                self.current_object.commands.extend(commands)
+            self._parse_basic_command(parts, self.current_object.commands)
 
     def _parse_command_l2(self, parts: List[str]):
         if not self.current_loop:
             return  # No current loop to attach commands to
 
-        commands = self._parse_basic_command(parts)
-        if commands:
-            self.current_loop.commands.extend(commands)
+        self._parse_basic_command(parts, self.current_loop.commands)
+
+    def _report(self, category: str, detail: str = ""):
+        """Record a problem with the line being parsed (raises in strict mode)."""
+        self.diagnostics.add(category, self._line_no, self._line, detail)
+
+    @staticmethod
+    def _emit_command(target, event, easing, start_time, end_time, params):
+        target.append(Command(event, easing, start_time, end_time, params))
+
+    @staticmethod
+    def _emit_row(target, event, easing, start_time, end_time, params):
+        target.add(event, easing, start_time, end_time, params)
+
+    def _parse_basic_command(self, parts: List[str], target) -> int:
+        """
+        Parse one command line and emit the resulting command(s) into *target*
+        (a command list, or ``ColumnarCommands`` in columnar mode).
+
+        The per-event value counts come from ``COMMAND_ARITY``. The two shapes
+        that make up nearly every storyboard, a full start/end pair and a
+        single state (``_F,0,100,,1``), are converted directly; anything else
+        (empty values, repeated segments) goes through
+        ``_expand_command_segments``.
 
-    def _parse_basic_command(self, parts: List[str]) -> List[Command]:
-        got_commands: List[Command] = []
+        Returns the number of commands emitted.
+        """
+        event = parts[0]
+        arity = COMMAND_ARITY.get(event)
+        n_parts = len(parts)
 
         try:
-            event = parts[0]
             easing = int(parts[1])
             start_time = int(parts[2])
+            end_time = int(parts[3]) if n_parts > 3 and parts[3] else start_time
+        except (ValueError, IndexError) as e:
+            self._report(INVALID_COMMAND, str(e))
+            return 0
 
-            end_time_str = parts[3] if len(parts) > 3 else ""
-            if not end_time_str:
-                end_time = start_time
-            else:
-                end_time = int(end_time_str)
-
-            raw_params = parts[4:]
-            params: List[Union[float, str]] = []
-
+        if arity is None:
             if event == "P":
-                # A, H, V commands have string parameters
-                if raw_params:
-                    params.append(raw_params[0])
-                    return [Command(event, easing, start_time, end_time, params)]
+                # A, H, V commands have a string parameter
+                if n_parts > 4:
+                    self._emit(target, event, easing, start_time, end_time, [parts[4]])
+                    return 1
+                return 0
+            self._report(UNKNOWN_COMMAND, event)
+            return 0
+
+        n_values = n_parts - 4
+        if n_values == 2 * arity or n_values == arity:
+            try:
+                params = [float(p) for p in parts[4:]]
+            except ValueError:
+                pass  # probably an empty value; let the general path sort it out
             else:
-                for p in raw_params:
-                    if p:
-                        params.append(float(p))
-
-                # the fucking shorten commands!
-                # F=Opacity(1), M=x,y(2), S=Scale(1), V=ScaleX,ScaleY(2), R=Angle(1), C=r,g,b(3)
-                vars_count_map = {
-                    "F": 1,
-                    "S": 1,
-                    "R": 1,
-                    "MX": 1,
-                    "MY": 1,
-                    "M": 2,
-                    "V": 2,
-                    "C": 3,
-                }
-
-                if event not in vars_count_map:
-                    print(f"Unknown command type: {event}")
-                    return []
-
-                vars_count = vars_count_map[event]
-                total_params = len(params)
-
-                # 2nd: start_params == end_params
-                # something like:
-                # `_(event),(easing),(starttime),(endtime),(value(s))` => `_(event),(easing),(starttime),(endtime),(value(s)),(value(s))`
-                if total_params == vars_count:
-                    params.extend(params[:])
-                    total_params = len(params)
-
-                # 1st: same duration for multiple params
-                # something like:
-                # `_(event),(easing),(starttime),(endtime),(value1),(value2),...,(valueN)`
-                # will be
-                # _(event),(easing),(starttime_of_first),(endtime_of_first),(value(s)_1),(value(s)_2)
-                # _(event),(easing),((starttime_of_first) + (duration)),((endtime_of_first) + duration),(value(s)_2),(value(s)_3)
-                # ...
-                # _(event),(easing),((starttime_of_first) + (N-2)*duration),((endtime_of_first) + (N-2)*duration),(value(s)_(N-1)),(value(s)_N)
-                if total_params < vars_count * 2:
-                    return got_commands  # Not enough parameters
-
-                state_count = total_params // vars_count
-                commands_count = state_count - 1
-
-                duration = end_time - start_time
-                for i in range(commands_count):
-                    curr_start_time = start_time + i * duration
-                    curr_end_time = end_time + i * duration
-
-                    start_idx = i * vars_count
-                    end_idx = (i + 2) * vars_count  # python slice is exclusive
-
-                    current_segment_params = params[start_idx:end_idx]
-                    got_commands.append(
-                        Command(
-                            type=event,
-                            easing=easing,
-                            start_time=curr_start_time,
-                            end_time=curr_end_time,
-                            params=current_segment_params,
-                        )
-                    )
-            return got_commands
-
-        except Exception as e:
-            print(f"Error parsing command '{parts}': {e}")
-            return None
+                if n_values == arity:
+                    # single state: start values == end values
+                    params.extend(params)
+                self._emit(target, event, easing, start_time, end_time, params)
+                return 1
+
+        return self._expand_command_segments(
+            parts, target, event, arity, easing, start_time, end_time
+        )
+
+    def _expand_command_segments(
+        self,
+        parts: List[str],
+        target,
+        event: str,
+        arity: int,
+        easing: int,
+        start_time: int,
+        end_time: int,
+    ) -> int:
+        try:
+            params = [float(p) for p in parts[4:] if p]
+        except ValueError as e:
+            self._report(INVALID_COMMAND, str(e))
+            return 0
+
+        total_params = len(params)
+
+        # 2nd: start_params == end_params
+        # something like:
+        # `_(event),(easing),(starttime),(endtime),(value(s))` => `_(event),(easing),(starttime),(endtime),(value(s)),(value(s))`
+        if total_params == arity:
+            params.extend(params)
+            total_params = len(params)
+
+        # 1st: same duration for multiple params
+        # something like:
+        # `_(event),(easing),(starttime),(endtime),(value1),(value2),...,(valueN)`
+        # will be
+        # _(event),(easing),(starttime_of_first),(endtime_of_first),(value(s)_1),(value(s)_2)
+        # _(event),(easing),((starttime_of_first) + (duration)),((endtime_of_first) + duration),(value(s)_2),(value(s)_3)
+        # ...
+        # _(event),(easing),((starttime_of_first) + (N-2)*duration),((endtime_of_first) + (N-2)*duration),(value(s)_(N-1)),(value(s)_N)
+        if total_params < arity * 2:
+            return 0  # Not enough parameters
+
+        commands_count = total_params // arity - 1
+        duration = end_time - start_time
+        emit = self._emit
+        for i in range(commands_count):
+            offset = i * duration
+            emit(
+                target,
+                event,
+                easing,
+                start_time + offset,
+                end_time + offset,
+                params[i * arity : (i + 2) * arity],  # python slice is exclusive
+            )
+        return commands_count
 
 
 if __name__ == "__main__":
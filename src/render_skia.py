@@ -1,16 +1,24 @@
-from collections import defaultdict
 import time
+import heapq
 import skia
 import math
-from typing import Tuple, Dict
+from typing import Tuple, Dict, List, Optional
 import numpy as np
-from src.models import Layer, Origin, ObjectState, Vector2, VideoObject
+from src.models import Animation, Layer, Origin, ObjectState, Vector2, VideoObject
 from src.state_engine import StateEngine
+from src.state_streams import StateStreams
+from src.keyframes import KeyframeTables
+from src.active_index import ActiveIndex
+from src.visibility import interval_arrays
 from src.managers import AssetLoader
 from src.video import VideoSource
 import glfw
 
 
+# drawn back to front; the Fail layer is never shown
+DRAWN_LAYERS = (Layer.Background, Layer.Pass, Layer.Foreground, Layer.Overlay)
+
+
 class SkiaRenderer:
     def __init__(
         self,
@@ -21,8 +29,22 @@ class SkiaRenderer:
         method: str = "linear",
         video_source: VideoSource | None = None,
         video_object: VideoObject | None = None,
+        batch_states: bool = False,
+        streams: StateStreams | None = None,
+        keyframes: KeyframeTables | None = None,
     ):
         self.engine = engine
+        # precomputed states, read by frame; these draw through the batch path too
+        self.streams = streams
+        # approximate states interpolated from keyframes, for previews; batch path as well
+        self.keyframes = keyframes
+        # evaluate each layer's objects with one StateEngine.evaluate_batch call
+        self.batch_states = batch_states or streams is not None or keyframes is not None
+        # frames are mostly asked for in increasing time order
+        self.states = engine.cursor()
+        # reusable ObjectState records, handed out by _next_state
+        self._state_pool: List[ObjectState] = []
+        self._pool_used = 0
         self.asset_loader = asset_loader
         self.width = width
         self.height = height
@@ -42,44 +64,28 @@ class SkiaRenderer:
         self.offset_x = (self.width - 640 * self.scale_factor) / 2
         self.offset_y = 0
 
-        self.layers = [
-            self.engine.storyboard.background_layer,
-            self.engine.storyboard.pass_layer,
-            self.engine.storyboard.foreground_layer,
-            self.engine.storyboard.overlay_layer,
-        ]
-
-        self.layer_names = [
-            "Background",
-            "Pass",
-            "Foreground",
-            "Overlay",
-        ]
-
-        self.layer_bucket = {
-            "Background": defaultdict(list),
-            "Fail": defaultdict(list),
-            "Pass": defaultdict(list),
-            "Foreground": defaultdict(list),
-            "Overlay": defaultdict(list),
-        }
-        self._preprocess_buckets()
-
-    def _preprocess_buckets(self, interval: int = 1000):
-        layer_maps = {
-            "Background": self.engine.storyboard.background_layer,
-            "Fail": self.engine.storyboard.fail_layer,
-            "Pass": self.engine.storyboard.pass_layer,
-            "Foreground": self.engine.storyboard.foreground_layer,
-            "Overlay": self.engine.storyboard.overlay_layer,
-        }
-
-        for layer, objects in layer_maps.items():
-            for obj in objects:
-                start = int(obj.life_start // interval)
-                end = int(obj.life_end // interval)
-                for bucket in range(start, end + 1):
-                    self.layer_bucket[layer][bucket].append(obj)
+        self._build_index()
+
+    def _build_index(self):
+        arrays = self.engine.arrays
+        # objects that may be visible at the rendered time, per layer, in draw order
+        self.index = ActiveIndex(arrays, interval_arrays(self.engine))
+        # object column, so each layer's list is gathered by numpy
+        self._objects = np.fromiter(arrays.objects, dtype=object, count=len(arrays))
+        # id(obj) -> (lo, hi, state or None if not drawn) for a constant span
+        self._held: Dict[int, Tuple[float, float, Optional[ObjectState]]] = {}
+        # (hi, id(obj)) of the held spans, to drop them once the render passes them
+        self._held_ends: List[Tuple[float, int]] = []
+        self._held_time = -math.inf
+
+    def update_objects(self):
+        """
+        Pick up objects removed from or added to the storyboard's layers.
+
+        The engine must have been told with ``invalidate``; the index is
+        rebuilt from its fresh ``arrays`` and all held states are dropped.
+        """
+        self._build_index()
 
     def _draw_video(self, canvas: skia.Canvas, time_ms: int):
         """Draw the current video frame, scaled to fill the output."""
@@ -200,17 +206,29 @@ class SkiaRenderer:
         # Video renders on the background layer, behind everything
         self._draw_video(canvas, time_ms)
 
-        bucket_index = time_ms // 1000
-        for layer in self.layer_names:
-            active_objects = self.layer_bucket[layer][bucket_index]
-
-            for obj in active_objects:
-                state = self.engine.get_object_state(obj, time_ms)
-
-                if not state or not state.visible or state.opacity < 0.001:
-                    continue
-                if abs(state.scale_vec.x) < 0.001 and abs(state.scale_vec.y) < 0.001:
-                    continue
+        self._pool_used = 0
+        if not self.batch_states:
+            self._release_held(time_ms)
+        for layer in DRAWN_LAYERS:
+            rows = self.index.rows(layer, time_ms)
+            if not len(rows):
+                continue
+            if self.batch_states:
+                self._draw_layer_batch(canvas, rows, time_ms)
+                continue
+
+            held = self._held
+            for obj in self._objects[rows].tolist():
+                entry = held.get(id(obj))
+                if entry is not None and entry[0] < time_ms < entry[1]:
+                    # nothing changed since the state was evaluated
+                    state = entry[2]
+                    if state is None:
+                        continue
+                else:
+                    state = self._evaluate(obj, time_ms)
+                    if state is None:
+                        continue
 
                 img = self.asset_loader.load_image(state.image_path)
                 if img is None:
@@ -218,6 +236,100 @@ class SkiaRenderer:
 
                 self._draw_sprite(canvas, obj, state, img)
 
+    def _evaluate(self, obj, time_ms: int) -> Optional[ObjectState]:
+        """
+        The state *obj* is drawn with at *time_ms*, or None if it is not drawn.
+
+        Inside one of the engine's constant spans the state goes into a record
+        of its own, held in ``_held`` for the later frames of the span;
+        elsewhere it goes into a pooled record.
+        """
+        span = self.engine.constant_span_at(obj, time_ms)
+        state = self._next_state() if span is None else ObjectState()
+        drawn = self.states.get_object_state_into(obj, time_ms, state) and not (
+            abs(state.scale_vec.x) < 0.001 and abs(state.scale_vec.y) < 0.001
+        )
+        if span is not None:
+            self._held[id(obj)] = (span[0], span[1], state if drawn else None)
+            heapq.heappush(self._held_ends, (span[1], id(obj)))
+        elif not drawn:
+            self._pool_used -= 1  # give the record back
+        return state if drawn else None
+
+    def _release_held(self, time_ms: int):
+        """
+        Drop the held states of spans that ended at or before *time_ms*, so
+        ``_held`` only keeps objects still inside one. Seeking back drops all.
+        """
+        held, ends = self._held, self._held_ends
+        if time_ms < self._held_time:
+            held.clear()
+            ends.clear()
+        while ends and ends[0][0] <= time_ms:
+            hi, key = heapq.heappop(ends)
+            entry = held.get(key)
+            if entry is not None and entry[1] == hi:
+                del held[key]
+        self._held_time = time_ms
+
+    def _next_state(self) -> ObjectState:
+        """
+        A state record from the renderer's pool. Records handed out during a
+        frame are not reused before the next one, so ``_draw_sprite``
+        overrides may keep them until then.
+        """
+        pool = self._state_pool
+        if self._pool_used == len(pool):
+            pool.append(ObjectState())
+        state = pool[self._pool_used]
+        self._pool_used += 1
+        return state
+
+    def _draw_layer_batch(self, canvas: skia.Canvas, rows: np.ndarray, time_ms: int):
+        """draw_to_canvas for one layer's alive *rows*, with every state from one batch."""
+        frame = self.streams.frame_of(time_ms) if self.streams is not None else None
+        if frame is not None:
+            states = self.streams.states(rows, frame)
+        elif self.keyframes is not None:
+            states = self.keyframes.states(self.engine.arrays, rows, time_ms)
+        else:
+            states = self.engine.evaluate_batch(rows, time_ms)
+        drawn = states.visible & ~((np.abs(states.sx) < 0.001) & (np.abs(states.sy) < 0.001))
+        picked = np.flatnonzero(drawn)
+        if not len(picked):
+            return
+
+        objects = self.engine.arrays.objects
+        columns = zip(
+            rows[picked].tolist(), states.x[picked].tolist(), states.y[picked].tolist(),
+            states.sx[picked].tolist(), states.sy[picked].tolist(),
+            states.rotation[picked].tolist(), states.opacity[picked].tolist(),
+            states.r[picked].tolist(), states.g[picked].tolist(), states.b[picked].tolist(),
+            states.flip_h[picked].tolist(), states.flip_v[picked].tolist(),
+            states.additive[picked].tolist(), states.frame_index[picked].tolist(),
+        )
+        for row, x, y, sx, sy, rotation, opacity, r, g, b, flip_h, flip_v, additive, frame in columns:
+            obj = objects[row]
+            image_path = obj.filepath
+            if isinstance(obj, Animation) and obj.frame_count > 0:
+                base, ext = image_path.rsplit(".", 1)
+                image_path = f"{base}{frame}.{ext}"
+
+            img = self.asset_loader.load_image(image_path)
+            if img is None:
+                continue
+            state = self._next_state()
+            state.visible = True
+            state.position.x, state.position.y = x, y
+            state.opacity = opacity
+            state.scale_vec.x, state.scale_vec.y = sx, sy
+            state.rotation = rotation
+            state.r, state.g, state.b = r, g, b
+            state.flip_h, state.flip_v, state.additive = flip_h, flip_v, additive
+            state.image_path = image_path
+            state.frame_index = frame
+            self._draw_sprite(canvas, obj, state, img)
+
     def render_frame(self, time_ms: int) -> skia.Image:
         """
         The main rendering function using Skia
@@ -270,10 +382,13 @@ class SkiaRendererGpu(SkiaRenderer):
         method: str = "linear",
         video_source: VideoSource | None = None,
         video_object: VideoObject | None = None,
+        batch_states: bool = False,
+        keyframes: KeyframeTables | None = None,
     ):
         super().__init__(
             engine, asset_loader, width, height, method,
             video_source=video_source, video_object=video_object,
+            batch_states=batch_states, keyframes=keyframes,
         )
         self._init_gl_context()
 
@@ -0,0 +1,317 @@
+"""
+Vectorised state evaluation for many objects at one time.
+
+``BatchEvaluator`` flattens the per-property tracks ``StateEngine`` compiles
+for every object into NumPy tables (one row range per object, sorted by
+start time), so the states of all objects drawn in a frame come out of a
+few ``searchsorted`` calls and array expressions instead of one
+``get_object_state`` call per object. Object ids are rows of a
+``StoryboardArrays``; the results equal ``get_object_state`` field by field.
+
+Loops become a second table level, evaluated at the loop-local time.
+Objects the engine does not compile, and loops carrying P commands, are
+evaluated one by one and written into the arrays.
+"""
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from src.easings import apply_easing_array
+from src.models import LoopType
+from src.state_engine import StateEngine, _LoopSegment, _Track
+from src.storyboard_arrays import KIND_ANIMATION, StoryboardArrays
+
+
+# (property, values per writer); order matches _Timeline
+_PROPERTIES = (
+    ("opacity", 1), ("x", 1), ("y", 1), ("scale", 2), ("rotation", 1), ("color", 3),
+)
+
+# times are stored as row << 32 | (time + 2**31) so one searchsorted covers all rows
+_TIME_BIAS = 1 << 31
+
+
+def _time_keys(owner: np.ndarray, time) -> np.ndarray:
+    # start <= time  <=>  start <= floor(time), since starts are whole ms
+    t = np.clip(np.floor(time), -_TIME_BIAS, _TIME_BIAS - 1).astype(np.int64)
+    return (owner.astype(np.int64) << 32) + (t + _TIME_BIAS)
+
+
+@dataclass
+class BatchStates:
+    """States of a batch of objects; entry i belongs to ``rows[i]``."""
+
+    rows: np.ndarray
+    visible: np.ndarray  # bool, False where get_object_state returns None
+    x: np.ndarray
+    y: np.ndarray
+    sx: np.ndarray
+    sy: np.ndarray
+    rotation: np.ndarray
+    opacity: np.ndarray
+    r: np.ndarray
+    g: np.ndarray
+    b: np.ndarray
+    flip_h: np.ndarray
+    flip_v: np.ndarray
+    additive: np.ndarray
+    frame_index: np.ndarray  # int32, 0 for sprites
+
+    # field order of to_matrix() columns
+    COLUMNS = (
+        "visible", "x", "y", "sx", "sy", "rotation", "opacity", "r", "g", "b",
+        "flip_h", "flip_v", "additive", "frame_index",
+    )
+
+    def to_matrix(self) -> np.ndarray:
+        """One float64 row per object, one column per ``COLUMNS`` field."""
+        return np.column_stack([getattr(self, name) for name in self.COLUMNS]).astype(np.float64)
+
+    @classmethod
+    def from_matrix(cls, rows: np.ndarray, matrix: np.ndarray) -> "BatchStates":
+        """Inverse of ``to_matrix``; *matrix* has one row per entry of *rows*."""
+        columns = dict(zip(cls.COLUMNS, np.asarray(matrix).T))
+        for name in ("visible", "flip_h", "flip_v", "additive"):
+            columns[name] = columns[name] != 0
+        columns["frame_index"] = columns["frame_index"].astype(np.int32)
+        return cls(rows=rows, **columns)
+
+
+def frame_indices(arrays: StoryboardArrays, rows: np.ndarray, times: np.ndarray) -> np.ndarray:
+    """Vectorised StateEngine._update_animation_frame for *rows* of *arrays*."""
+    frame_index = np.zeros(len(rows), dtype=np.int32)
+    animated = np.flatnonzero(
+        (arrays.kind[rows] == KIND_ANIMATION) & (arrays.frame_count[rows] > 0)
+        & (arrays.frame_delay[rows] > 0)
+    )
+    if len(animated):
+        anim_rows = rows[animated]
+        count = arrays.frame_count[anim_rows]
+        delay = arrays.frame_delay[anim_rows]
+        run_time = np.maximum(times[animated] - arrays.life_start[anim_rows], 0)
+        total = delay * count
+        once = arrays.loop_type[anim_rows] == LoopType.LoopOnce.value
+        frame_index[animated] = np.where(
+            once,
+            np.where(run_time >= total, count - 1, (run_time / delay).astype(np.int64)),
+            ((run_time % total) / delay).astype(np.int64),
+        )
+    return frame_index
+
+
+class _Table:
+    """Writers of one property for a set of owners (objects or loops), flattened."""
+
+    def __init__(self, width: int):
+        self.width = width
+        self.owner: List[int] = []
+        self.start: List[int] = []
+        self.end: List[int] = []
+        self.easing: List[int] = []
+        self.value: List[Tuple] = []
+        self.delta: List[Tuple] = []
+        self.loop: List[int] = []  # -1, or the loop table entry this writer defers to
+        self.pending: List[int] = []  # per owner: writer index, or -1
+
+    def add_track(self, owner: int, track: Optional[_Track], loops: Optional["_Table"] = None):
+        pending = -1
+        if track is not None:
+            for writer in track.writers:
+                if writer is track.pending:
+                    pending = len(self.start)
+                self.owner.append(owner)
+                self.start.append(writer.start)
+                self.end.append(writer.end)
+                if isinstance(writer, _LoopSegment):
+                    self.easing.append(0)
+                    self.value.append((0.0,) * self.width)
+                    self.delta.append((0.0,) * self.width)
+                    self.loop.append(loops.add_loop(writer))
+                else:
+                    self.easing.append(writer.easing)
+                    self.value.append(writer.value if self.width > 1 else (writer.value,))
+                    self.delta.append(writer.delta if self.width > 1 else (writer.delta,))
+                    self.loop.append(-1)
+        self.pending.append(pending)
+
+    def freeze(self):
+        self.keys = _time_keys(np.array(self.owner, dtype=np.int64), np.array(self.start, dtype=np.float64))
+        self.start = np.array(self.start, dtype=np.int64)
+        self.end = np.array(self.end, dtype=np.int64)
+        self.easing = np.array(self.easing, dtype=np.int32)
+        self.value = np.array(self.value, dtype=np.float64).reshape(-1, self.width)
+        self.delta = np.array(self.delta, dtype=np.float64).reshape(-1, self.width)
+        self.loop = np.array(self.loop, dtype=np.int64)
+        self.pending = np.array(self.pending, dtype=np.int64)
+        self.empty = len(self.start) == 0
+
+    def lookup(self, owners: np.ndarray, times) -> Tuple[np.ndarray, np.ndarray]:
+        """(entries, writer index) of the owners the property is written for at *times*."""
+        if self.empty:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        idx = np.searchsorted(self.keys, _time_keys(owners, times), side="right") - 1
+        found = idx >= 0
+        found[found] = self.owner_of(idx[found]) == owners[found]
+        pending = self.pending[owners]
+        use_pending = pending >= 0
+        use_pending[use_pending] = (np.broadcast_to(times, owners.shape)[use_pending]
+                                    < self.start[pending[use_pending]])
+        writer = np.where(use_pending, pending, idx)
+        entries = np.flatnonzero(use_pending | found)
+        return entries, writer[entries]
+
+    def owner_of(self, idx: np.ndarray) -> np.ndarray:
+        return self.keys[idx] >> 32
+
+    def values(self, writers: np.ndarray, times: np.ndarray, ease=apply_easing_array) -> np.ndarray:
+        """Values of command writers at *times*, as _Segment.value_at computes them."""
+        start, end = self.start[writers], self.end[writers]
+        progress = np.zeros(len(writers))
+        progress[times > end] = 1.0
+        mid = np.flatnonzero((times <= end) & (times >= start) & (end != start))
+        if len(mid):
+            normed = (times[mid] - start[mid]) / (end[mid] - start[mid])
+            progress[mid] = ease(self.easing[writers[mid]], normed)
+        return self.value[writers] + self.delta[writers] * progress[:, None]
+
+
+class _LoopTable(_Table):
+    """Second level: loops and the writers of their own tracks."""
+
+    def __init__(self, width: int):
+        super().__init__(width)
+        self.loop_start: List[int] = []
+        self.loop_end: List[int] = []
+        self.duration: List[int] = []
+
+    def add_loop(self, segment: _LoopSegment) -> int:
+        loop_id = len(self.loop_start)
+        self.loop_start.append(segment.start)
+        self.loop_end.append(segment.end)
+        self.duration.append(segment.duration)
+        self.add_track(loop_id, segment.track)
+        return loop_id
+
+    def freeze(self):
+        super().freeze()
+        self.loop_start = np.array(self.loop_start, dtype=np.int64)
+        self.loop_end = np.array(self.loop_end, dtype=np.int64)
+        self.duration = np.array(self.duration, dtype=np.int64)
+
+    def local_times(self, loops: np.ndarray, time) -> np.ndarray:
+        start, end, duration = self.loop_start[loops], self.loop_end[loops], self.duration[loops]
+        held = (time > end) | (duration == 0)
+        return np.where(held, duration, (time - start) % np.where(held, 1, duration))
+
+
+class BatchEvaluator:
+    """Compiled tables for every object of a ``StoryboardArrays``."""
+
+    def __init__(self, engine: StateEngine, arrays: StoryboardArrays):
+        self.engine = engine
+        self.arrays = arrays
+        self.ease = apply_easing_array if engine.easing_lut is None else engine.easing_lut.apply_array
+        n = len(arrays)
+        self.tables = [(name, _Table(width), _LoopTable(width)) for name, width in _PROPERTIES]
+        # rows evaluated one by one: no compiled timeline, or loops with P commands
+        self.scalar = np.zeros(n, dtype=bool)
+        self.flag_until = np.full((n, 3), -np.inf)  # H, V, A
+
+        for row, obj in enumerate(arrays.objects):
+            timeline = engine._timeline(obj)
+            if timeline is None or timeline.flag_loops:
+                self.scalar[row] = True
+                timeline = None
+            for name, table, loops in self.tables:
+                table.add_track(row, getattr(timeline, name) if timeline else None, loops)
+            if timeline is not None:
+                for i, flag in enumerate(("H", "V", "A")):
+                    if flag in timeline.flag_until:
+                        self.flag_until[row, i] = timeline.flag_until[flag]
+
+        for _, table, loops in self.tables:
+            table.freeze()
+            loops.freeze()
+
+    def _property(self, index: int, rows: np.ndarray, times: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(entries written, their values) of property *index* for *rows* at *times*."""
+        _, table, loops = self.tables[index]
+        entries, writers = table.lookup(rows, times)
+        times = times[entries]
+        values = np.empty((len(entries), table.width))
+        is_loop = table.loop[writers] >= 0
+
+        direct = np.flatnonzero(~is_loop)
+        values[direct] = table.values(writers[direct], times[direct], self.ease)
+
+        looped = np.flatnonzero(is_loop)
+        if len(looped):
+            loop_ids = table.loop[writers[looped]]
+            local = loops.local_times(loop_ids, times[looped])
+            sub_entries, sub_writers = loops.lookup(loop_ids, local)
+            # a started loop always writes what its commands touch
+            values[looped[sub_entries]] = loops.values(sub_writers, local[sub_entries], self.ease)
+            keep = np.ones(len(entries), dtype=bool)
+            keep[looped] = False
+            keep[looped[sub_entries]] = True
+            entries, values = entries[keep], values[keep]
+        return entries, values
+
+    def evaluate(self, rows: np.ndarray, time) -> BatchStates:
+        """States of *rows* at *time*: one time for all of them, or one time per row."""
+        arrays = self.arrays
+        rows = np.asarray(rows, dtype=np.int64)
+        n = len(rows)
+        times = np.array(np.broadcast_to(time, rows.shape), dtype=np.float64)
+        visible = (arrays.life_start[rows] <= times) & (times <= arrays.life_end[rows])
+
+        opacity = np.ones(n)
+        entries, values = self._property(0, rows, times)
+        opacity[entries] = values[:, 0]
+        visible &= ~(opacity < 0.001)
+
+        x = arrays.x[rows].copy()
+        entries, values = self._property(1, rows, times)
+        x[entries] = values[:, 0]
+        y = arrays.y[rows].copy()
+        entries, values = self._property(2, rows, times)
+        y[entries] = values[:, 0]
+
+        sx, sy = np.ones(n), np.ones(n)
+        entries, values = self._property(3, rows, times)
+        sx[entries], sy[entries] = values[:, 0], values[:, 1]
+
+        rotation = np.zeros(n)
+        entries, values = self._property(4, rows, times)
+        rotation[entries] = values[:, 0]
+
+        r, g, b = np.full(n, 255.0), np.full(n, 255.0), np.full(n, 255.0)
+        entries, values = self._property(5, rows, times)
+        r[entries], g[entries], b[entries] = values[:, 0], values[:, 1], values[:, 2]
+
+        flags = times[:, None] <= self.flag_until[rows]
+        states = BatchStates(
+            rows=rows, visible=visible, x=x, y=y, sx=sx, sy=sy, rotation=rotation,
+            opacity=opacity, r=r, g=g, b=b,
+            flip_h=flags[:, 0], flip_v=flags[:, 1], additive=flags[:, 2],
+            frame_index=frame_indices(arrays, rows, times),
+        )
+        for i in np.flatnonzero(self.scalar[rows] & visible).tolist():
+            self._fill_scalar(states, i, time if np.ndim(time) == 0 else time[i])
+        return states
+
+    def _fill_scalar(self, states: BatchStates, i: int, time):
+        obj = self.arrays.objects[states.rows[i]]
+        state = self.engine.get_object_state(obj, time)
+        if state is None:
+            states.visible[i] = False
+            return
+        states.x[i], states.y[i] = state.position.x, state.position.y
+        states.sx[i], states.sy[i] = state.scale_vec.x, state.scale_vec.y
+        states.rotation[i] = state.rotation
+        states.opacity[i] = state.opacity
+        states.r[i], states.g[i], states.b[i] = state.r, state.g, state.b
+        states.flip_h[i], states.flip_v[i] = state.flip_h, state.flip_v
+        states.additive[i] = state.additive
+        states.frame_index[i] = state.frame_index
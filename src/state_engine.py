@@ -1,4 +1,5 @@
-from typing import Optional, Set, Tuple, List, Union
+from bisect import bisect_right
+from typing import Dict, Optional, Set, Tuple, List, Union
 import math
 
 from src.models import (
@@ -15,16 +16,375 @@ from src.models import (
 import src.easings as easings
 
 
+# Which state properties a command affects. Using categories helps prevent
+# future commands from overwriting past commands if they affect the same
+# property (e.g., M and MX).
+_COMMAND_CATEGORIES = {
+    "F": ("opacity",),
+    "M": ("x", "y"),
+    "MX": ("x",),
+    "MY": ("y",),
+    "S": ("scale",),
+    "V": ("scale",),
+    "R": ("rotation",),
+    "C": ("color",),
+}
+
+
+# P command parameters and the ObjectState flag each one sets
+_PARAMETER_FLAGS = {"H": "flip_h", "V": "flip_v", "A": "additive"}
+
+
+class _Segment:
+    """
+    One command's contribution to a single-value property.
+
+    Evaluates ``start + delta * progress`` exactly like
+    ``_apply_command_value``, so compiled and scanned states compare equal.
+    """
+
+    __slots__ = ("start", "end", "easing", "ease", "value", "delta")
+
+    def __init__(self, cmd: Command, start_value: float, end_value: float, ease=easings.easing_function):
+        self.start = cmd.start_time
+        self.end = cmd.end_time
+        self.easing = cmd.easing
+        self.ease = ease(cmd.easing)
+        self.value = start_value
+        self.delta = end_value - start_value
+
+    def progress(self, time: int) -> float:
+        end = self.end
+        if time > end:
+            return 1.0
+        start = self.start
+        if time < start or start == end:
+            return 0.0
+        return self.ease((time - start) / (end - start))
+
+    def value_at(self, time: int):
+        return self.value + self.delta * self.progress(time)
+
+
+class _VectorSegment(_Segment):
+    """A command's contribution to a multi-value property (scale, colour)."""
+
+    __slots__ = ()
+
+    def __init__(self, cmd: Command, start_values: Tuple, end_values: Tuple, ease=easings.easing_function):
+        self.start = cmd.start_time
+        self.end = cmd.end_time
+        self.easing = cmd.easing
+        self.ease = ease(cmd.easing)
+        self.value = start_values
+        self.delta = tuple(b - a for a, b in zip(start_values, end_values))
+
+    def value_at(self, time: int):
+        progress = self.progress(time)
+        return [a + d * progress for a, d in zip(self.value, self.delta)]
+
+
+class _LoopSegment:
+    """A loop's contribution to a property: its own timeline at the loop-local time."""
+
+    __slots__ = ("start", "end", "duration", "track", "loop")
+
+    def __init__(self, loop: "_LoopTable", track: "_Track"):
+        self.start = loop.start
+        self.duration = loop.duration
+        self.end = loop.end
+        self.track = track
+        self.loop = loop
+
+    def value_at(self, time: int):
+        return self.track.value_at(self.loop.local_time(time))
+
+
+class _Track:
+    """
+    Everything that can write one property, ordered by start time.
+
+    ``_process_commands`` applies commands in start order, so a property
+    ends up with the value of the last command that wrote it. Commands that
+    have started always write; a command that has not started yet writes its
+    start value only if it was the first to touch one of its categories.
+    That makes the winner at *time* either the last such not-yet-started
+    command (``pending``) or the last writer with ``start <= time``.
+    """
+
+    __slots__ = ("starts", "writers", "pending")
+
+    def __init__(self):
+        self.starts: List[int] = []
+        self.writers: List[Union[_Segment, _LoopSegment]] = []
+        self.pending: Optional[_Segment] = None
+
+    def add(self, writer: Union[_Segment, _LoopSegment], first: bool = False):
+        self.starts.append(writer.start)
+        self.writers.append(writer)
+        if first:
+            self.pending = writer
+
+    def value_at(self, time: int, cursor: Optional[List[int]] = None, slot: int = 0):
+        """
+        The property's value at *time*, or None if nothing writes it.
+
+        With a *cursor*, ``cursor[slot]`` holds the writer index found for an
+        earlier time and is walked forward instead of bisecting the track.
+        """
+        writer = self.writer_at(time, cursor, slot)
+        if writer is None:
+            return None
+        return writer.value_at(time)
+
+    def segment_at(self, time: int, cursor: Optional[List[int]] = None, slot: int = 0):
+        """(segment in effect, the time to evaluate it at), looking through loops; segment may be None."""
+        writer = self.writer_at(time, cursor, slot)
+        if isinstance(writer, _LoopSegment):
+            time = writer.loop.local_time(time)
+            writer = writer.track.writer_at(time)  # loop bodies hold no loops
+        return writer, time
+
+    def writer_at(self, time: int, cursor: Optional[List[int]] = None, slot: int = 0):
+        """The writer ``value_at`` evaluates at *time*, or None."""
+        pending = self.pending
+        if pending is not None and time < pending.start:
+            return pending
+        starts = self.starts
+        if cursor is None:
+            i = bisect_right(starts, time)
+        else:
+            i = cursor[slot]
+            n = len(starts)
+            if i < n and starts[i] <= time:
+                i += 1
+                if i < n and starts[i] <= time:
+                    i = bisect_right(starts, time, i)  # skipped several writers
+                cursor[slot] = i
+        if i == 0:
+            return None
+        return self.writers[i - 1]
+
+
+def _command_segments(cmd: Command, ease=easings.easing_function) -> List[Tuple[str, _Segment]]:
+    p = cmd.params
+    cmd_type = cmd.type
+    if cmd_type == "F":
+        return [("opacity", _Segment(cmd, p[0], p[1], ease))]
+    if cmd_type == "M":
+        return [("x", _Segment(cmd, p[0], p[2], ease)), ("y", _Segment(cmd, p[1], p[3], ease))]
+    if cmd_type == "MX":
+        return [("x", _Segment(cmd, p[0], p[1], ease))]
+    if cmd_type == "MY":
+        return [("y", _Segment(cmd, p[0], p[1], ease))]
+    if cmd_type == "S":
+        return [("scale", _VectorSegment(cmd, (p[0], p[0]), (p[1], p[1]), ease))]
+    if cmd_type == "V":
+        return [("scale", _VectorSegment(cmd, (p[0], p[1]), (p[2], p[3]), ease))]
+    if cmd_type == "R":
+        return [("rotation", _Segment(cmd, p[0], p[1], ease))]
+    if cmd_type == "C":
+        return [("color", _VectorSegment(cmd, (p[0], p[1], p[2]), (p[3], p[4], p[5]), ease))]
+    return []
+
+
+def _compile_tracks(commands, loop_table=None, ease=easings.easing_function) -> Optional[Dict[str, _Track]]:
+    """
+    Per-property tracks for a command list, or None if it cannot be compiled.
+
+    *loop_table* maps a ``LoopCommand`` to its ``_LoopTable``; without one,
+    loops are not allowed (loop bodies cannot nest loops). *ease* maps an
+    easing id to the function segments call. Lists that are
+    not sorted by start time (nothing has prepared the object) and loops
+    whose body does not compile are left to the scanning evaluator.
+    """
+    tracks: Dict[str, _Track] = {}
+    processed: Set[str] = set()
+    last_start = -math.inf
+    for cmd in commands:
+        if cmd.start_time < last_start:
+            return None
+        last_start = cmd.start_time
+
+        if isinstance(cmd, LoopCommand):
+            if loop_table is None:
+                return None
+            loop = loop_table(cmd)
+            if loop.tracks is None:
+                return None
+            # a started loop writes every property its commands touch
+            for name, loop_track in loop.tracks.items():
+                tracks.setdefault(name, _Track()).add(_LoopSegment(loop, loop_track))
+            processed.update(loop.categories)
+        elif isinstance(cmd, Command):
+            categories = _COMMAND_CATEGORIES.get(cmd.type)
+            if not categories:
+                continue
+            first = not processed.issuperset(categories)
+            processed.update(categories)
+            for name, segment in _command_segments(cmd, ease):
+                tracks.setdefault(name, _Track()).add(segment, first)
+    return tracks
+
+
+class _LoopTable:
+    """
+    A loop compiled once: the tracks of its commands, evaluated at the
+    loop-local time, and the categories its commands claim in the object's
+    command order.
+    """
+
+    __slots__ = ("start", "duration", "end", "categories", "tracks", "flag_ends")
+
+    def __init__(self, loop: LoopCommand, ease=easings.easing_function):
+        duration = loop.sub_max  # set by StateEngine.prepare_object
+        self.start = loop.start_time
+        self.duration = duration
+        self.end = loop.start_time + duration * loop.loop_count
+        self.categories = frozenset(
+            category
+            for cmd in loop.commands if isinstance(cmd, Command)
+            for category in _COMMAND_CATEGORIES.get(cmd.type, ())
+        )
+        # None: the loop's commands are not sorted, scan them instead
+        self.tracks = _compile_tracks(loop.commands, ease=ease)
+        self.flag_ends = _flag_ends(loop.commands)
+
+    def local_time(self, time: int) -> int:
+        """The time inside one iteration that *time* (>= start) maps to."""
+        if time > self.end or not self.duration:
+            return self.duration  # after the loop, or a loop with no length
+        return (time - self.start) % self.duration
+
+
+class _Timeline:
+    """An object's commands compiled for ``StateEngine.get_object_state``."""
+
+    __slots__ = (
+        "opacity", "x", "y", "scale", "rotation", "color", "flag_until", "flag_loops",
+    )
+
+    def __init__(self, tracks: Dict[str, _Track], commands, loop_table):
+        self.opacity = tracks.get("opacity")
+        self.x = tracks.get("x")
+        self.y = tracks.get("y")
+        self.scale = tracks.get("scale")
+        self.rotation = tracks.get("rotation")
+        self.color = tracks.get("color")
+
+        # P commands set their flag whenever time <= end, in any order
+        self.flag_until = _flag_ends(commands)
+        # loops with P commands, which are rare
+        self.flag_loops: List[_LoopTable] = [
+            loop
+            for loop in (loop_table(cmd) for cmd in commands if isinstance(cmd, LoopCommand))
+            if loop.flag_ends
+        ]
+
+    def flags_at(self, time: int) -> Set[str]:
+        """P parameters (H, V, A) in effect at *time*."""
+        flags = {flag for flag, until in self.flag_until.items() if time <= until}
+        for loop in self.flag_loops:
+            if time < loop.start:
+                continue
+            local = loop.local_time(time)
+            flags.update(flag for flag, until in loop.flag_ends.items() if local <= until)
+        return flags
+
+
+class _Instance:
+    """
+    An object evaluated through another object's timeline: its template at
+    ``time - time_offset``, moved by (dx, dy). See ``src.templates``.
+    """
+
+    __slots__ = ("template", "time_offset", "dx", "dy")
+
+    def __init__(self, template: SBObject, time_offset: int, dx: float, dy: float):
+        self.template = template
+        self.time_offset = time_offset
+        self.dx = dx
+        self.dy = dy
+
+
+def _flag_ends(commands) -> Dict[str, int]:
+    """Latest end time of the top-level P commands of each parameter."""
+    ends: Dict[str, int] = {}
+    for cmd in commands:
+        if isinstance(cmd, Command) and cmd.type == "P" and cmd.params[0] in _PARAMETER_FLAGS:
+            flag = cmd.params[0]
+            ends[flag] = max(cmd.end_time, ends.get(flag, cmd.end_time))
+    return ends
+
+
+def _reset_state(obj: SBObject, out: ObjectState):
+    """Set *out* to the state of *obj* before any command applies, keeping its own vectors."""
+    out.visible = True
+    out.position.x, out.position.y = obj.position.x, obj.position.y
+    out.opacity = 1.0
+    out.scale = 1.0
+    out.scale_vec.x = out.scale_vec.y = 1.0
+    out.rotation = 0.0
+    out.r = out.g = out.b = 255.0
+    out.flip_h = out.flip_v = out.additive = False
+    out.image_path = obj.filepath
+    out.frame_index = 0
+
+
+def _sort_by_start_time(commands):
+    """Stable sort by start time; columnar command views sort their entries in place."""
+    if hasattr(commands, "sort_by_start_time"):
+        commands.sort_by_start_time()
+    else:
+        commands.sort(key=lambda c: c.start_time)
+
+
 class StateEngine:
-    def __init__(self, storyboard: Storyboard):
+    def __init__(self, storyboard: Storyboard, easing_lut: Optional[easings.EasingLUT] = None):
         self.storyboard: Storyboard = storyboard
+        # approximate easings read from lookup tables (previews), or the exact functions
+        self.easing_lut = easing_lut
+        self._ease = easings.easing_function if easing_lut is None else easing_lut.function
+        # id(obj) -> (obj, compiled commands or None); holding obj keeps the id unique
+        self._timelines: Dict[int, Tuple[SBObject, Optional[_Timeline]]] = {}
+        # id(loop) -> (loop, compiled loop), shared by the timelines and the scan
+        self._loops: Dict[int, Tuple[LoopCommand, _LoopTable]] = {}
+        # id(obj) -> (obj, visible intervals), see visible_intervals
+        self._intervals: Dict[int, Tuple[SBObject, List[Tuple[float, float]]]] = {}
+        # id(obj) -> (obj, constant spans), see constant_spans
+        self._spans: Dict[int, Tuple[SBObject, List[Tuple[float, float]]]] = {}
+        # id(obj) -> (obj, _Instance) for objects evaluated through a template
+        self._instances: Dict[int, Tuple[SBObject, _Instance]] = {}
+        # built on first use by the arrays property / evaluate_batch
+        self._arrays = None
+        self._batch = None
         self._calculate_lifetime()
 
+    def __getstate__(self):
+        # worker processes get copies of the objects, so the ids would not match
+        state = self.__dict__.copy()
+        state["_timelines"] = {}
+        state["_loops"] = {}
+        state["_intervals"] = {}
+        state["_spans"] = {}
+        state["_arrays"] = state["_batch"] = None
+        # the pickled copies share identity with the copied storyboard; re-keyed on load
+        state["_instances"] = list(self._instances.values())
+        return state
+
+    def __setstate__(self, state):
+        instances = state.pop("_instances")
+        self.__dict__.update(state)
+        self._instances = {id(obj): (obj, instance) for obj, instance in instances}
+
     def _calculate_lifetime(self):
         """
         Calculate the lifetime for every object in the storyboard.
         Should be called after parsing the storyboard.
+        Skipped when the storyboard already carries its lifetimes.
         """
+        if self.storyboard.lifetimes_computed:
+            return
 
         all_list = [
             self.storyboard.background_layer,
@@ -36,10 +396,21 @@ class StateEngine:
 
         for layer in all_list:
             for obj in layer:
-                obj.commands.sort(key=lambda c: c.start_time)
-                self._compute_object_lifetime(obj)
+                self.prepare_object(obj)
+
+        self.storyboard.lifetimes_computed = True
+
+    @staticmethod
+    def prepare_object(obj: SBObject):
+        """
+        Sort one object's commands and fill in its lifetime.
+        Also used for objects whose commands are loaded after the engine was built.
+        """
+        _sort_by_start_time(obj.commands)
+        StateEngine._compute_object_lifetime(obj)
 
-    def _compute_object_lifetime(self, obj: SBObject):
+    @staticmethod
+    def _compute_object_lifetime(obj: SBObject):
         min_t = float("inf")
         max_t = float("-inf")
 
@@ -57,7 +428,7 @@ class StateEngine:
                 if cmd.type == "P":
                     p_command_indices.append(idx)
             elif isinstance(cmd, LoopCommand):
-                cmd.commands.sort(key=lambda c: c.start_time)
+                _sort_by_start_time(cmd.commands)
 
                 sub_max = 0
                 for sub_cmd in cmd.commands:
@@ -97,73 +468,415 @@ class StateEngine:
                     p_cmd.start_time = obj.life_start
                     p_cmd.end_time = obj.life_end
 
-    def _get_command_categories(self, cmd_type: str) -> List[str]:
+    def _get_command_categories(self, cmd_type: str) -> Tuple[str, ...]:
         """
         Identify which state properties a command affects.
-        Using categories helps prevent future commands from overwriting
-        past commands if they affect the same property (e.g., M and MX).
-        """
-        if cmd_type == "F":
-            return ["opacity"]
-        if cmd_type == "M":
-            return ["x", "y"]
-        if cmd_type == "MX":
-            return ["x"]
-        if cmd_type == "MY":
-            return ["y"]
-        if cmd_type == "S":
-            return ["scale"]
-        if cmd_type == "V":
-            return ["scale"]
-        if cmd_type == "R":
-            return ["rotation"]
-        if cmd_type == "C":
-            return ["color"]
-        return []
+        """
+        return _COMMAND_CATEGORIES.get(cmd_type, ())
+
+    def invalidate(self, obj: Optional[SBObject] = None):
+        """
+        Forget the compiled commands of *obj* (of every object if None).
+        Call it after editing, adding or removing an object; the batch tables
+        and ``arrays`` are rebuilt on next use.
+        """
+        if obj is None:
+            self._timelines.clear()
+            self._intervals.clear()
+            self._spans.clear()
+            self._instances.clear()
+        else:
+            self._timelines.pop(id(obj), None)
+            self._intervals.pop(id(obj), None)
+            self._spans.pop(id(obj), None)
+            self._instances.pop(id(obj), None)
+            if self._instances:
+                # objects following obj's commands no longer match them
+                for key, (_, instance) in list(self._instances.items()):
+                    if instance.template is obj:
+                        del self._instances[key]
+                        self._intervals.pop(key, None)
+        # cheap to rebuild, and finding only obj's loops would load lazy commands
+        self._loops.clear()
+        self._arrays = None
+        self._batch = None
+
+    @property
+    def arrays(self):
+        """The storyboard's ``StoryboardArrays``; its rows are the ids ``evaluate_batch`` takes."""
+        if self._arrays is None:
+            # imported here, storyboard_arrays uses this module
+            from src.storyboard_arrays import StoryboardArrays
+
+            self._arrays = StoryboardArrays.from_storyboard(self.storyboard)
+        return self._arrays
+
+    def evaluate_batch(self, object_ids, time_ms: int):
+        """
+        States of many objects at once, as a ``BatchStates`` of NumPy arrays.
+
+        *object_ids* are rows of ``self.arrays``. Every object is compiled the
+        first time this is called, which loads lazily indexed commands.
+        """
+        if self._batch is None:
+            from src.state_batch import BatchEvaluator
+
+            self._batch = BatchEvaluator(self, self.arrays)
+        return self._batch.evaluate(object_ids, time_ms)
+
+    def state_stream(self, object_id: int, fps: float, start_ms: int = 0):
+        """
+        States of one object at every output frame of its lifetime, in one batch.
+
+        Frame i is shown at ``start_ms + int(i * 1000 / fps)``, as the render
+        job steps through time.
+        :param object_id: A row of ``self.arrays``.
+        :return: (index of the first frame, frames × ``BatchStates.COLUMNS`` float64 array).
+        """
+        from src.state_streams import object_stream
+
+        return object_stream(self, object_id, fps, start_ms)
+
+    def collapse_templates(self):
+        """
+        Find families of objects whose commands repeat one template up to a
+        time and position offset (generated particles), and evaluate every
+        member through the template's compiled timeline from now on.
+
+        Saves compiling and holding one timeline per member. ``invalidate``
+        drops the members of an edited template; ``invalidate()`` drops
+        them all. ``evaluate_batch`` still compiles members on their own.
+        :return: A ``src.templates.TemplateStats``.
+        """
+        from src.templates import find_instances
+
+        objects = [
+            obj
+            for layer in (self.storyboard.background_layer, self.storyboard.fail_layer,
+                          self.storyboard.pass_layer, self.storyboard.foreground_layer,
+                          self.storyboard.overlay_layer)
+            for obj in layer
+        ]
+        instances, stats = find_instances(objects)
+        self._instances = {id(obj): (obj, instance) for obj, instance in instances}
+        for obj, _ in instances:
+            self._timelines.pop(id(obj), None)
+            self._intervals.pop(id(obj), None)
+        return stats
+
+    def visible_intervals(self, obj: SBObject) -> List[Tuple[float, float]]:
+        """
+        Closed time intervals, within the lifetime, in which *obj* may be drawn.
+
+        Outside them the object is certainly hidden: opacity below 0.001, or
+        scaled to nothing. The bounds are conservative; an interval may still
+        contain hidden times. Objects whose commands are not compiled or not
+        parsed yet get their whole lifetime. Cached until ``invalidate``.
+        """
+        entry = self._intervals.get(id(obj))
+        if entry is None:
+            from src.visibility import visible_intervals
+
+            entry = (obj, visible_intervals(self, obj))
+            self._intervals[id(obj)] = entry
+        return entry[1]
+
+    def constant_spans(self, obj: SBObject) -> List[Tuple[float, float]]:
+        """
+        Open time intervals, within the lifetime, in which the state of *obj*
+        does not change: no command runs, no P flag ends, no animation frame
+        advances. A state evaluated at any time inside a span holds for the
+        whole span. Objects whose commands are not parsed yet get none.
+        Cached until ``invalidate``.
+        """
+        entry = self._spans.get(id(obj))
+        if entry is None:
+            from src.constant_spans import constant_spans
+
+            spans = constant_spans(obj)
+            if not getattr(obj.commands, "loaded", True):
+                return spans  # asked again once the commands are parsed
+            entry = (obj, spans)
+            self._spans[id(obj)] = entry
+        return entry[1]
+
+    def constant_span_at(self, obj: SBObject, time: float) -> Optional[Tuple[float, float]]:
+        """The span of ``constant_spans(obj)`` holding *time*, or None."""
+        spans = self.constant_spans(obj)
+        if not spans:
+            return None
+        i = bisect_right(spans, (time, math.inf)) - 1
+        if i >= 0 and spans[i][0] < time < spans[i][1]:
+            return spans[i]
+        return None
+
+    def _timeline(self, obj: SBObject) -> Optional[_Timeline]:
+        entry = self._timelines.get(id(obj))
+        if entry is None:
+            commands = obj.commands
+            tracks = _compile_tracks(commands, self._loop_table, self._ease)
+            entry = (obj, None if tracks is None else _Timeline(tracks, commands, self._loop_table))
+            self._timelines[id(obj)] = entry
+        return entry[1]
+
+    def _loop_table(self, loop: LoopCommand) -> _LoopTable:
+        entry = self._loops.get(id(loop))
+        if entry is None:
+            entry = (loop, _LoopTable(loop, self._ease))
+            self._loops[id(loop)] = entry
+        return entry[1]
 
     def get_object_state(self, obj: SBObject, time: int) -> ObjectState | None:
         """
         Get the state of the object at a specific time by applying all relevant commands.
+
+        The object's commands are compiled into per-property tracks on first
+        use, so each call is a bisect per property instead of a scan over
+        every command; the result is the same as ``_scan_object_state``.
         """
         if time < obj.life_start or time > obj.life_end:
             return None
 
+        if self._instances:
+            entry = self._instances.get(id(obj))
+            if entry is not None:
+                instance = entry[1]
+                return self._instance_state(instance, time, self._timeline(instance.template))
+
+        timeline = self._timeline(obj)
+        if timeline is None:
+            return self._scan_object_state(obj, time)
+        return self._compiled_state(obj, time, timeline)
+
+    def cursor(self) -> "StateCursor":
+        """A ``StateCursor`` over this engine, for times that mostly increase."""
+        return StateCursor(self)
+
+    def get_object_state_into(self, obj: SBObject, time: int, out: ObjectState) -> bool:
+        """
+        ``get_object_state`` writing into a caller-owned *out* instead of
+        allocating a new state, for render loops that reuse their records.
+
+        Every field of *out* is overwritten. ``out.position`` and
+        ``out.scale_vec`` are updated in place, so *out* must own them, as a
+        fresh ``ObjectState()`` does.
+        :return: False where ``get_object_state`` returns None; *out* then
+            holds partial values.
+        """
+        if time < obj.life_start or time > obj.life_end:
+            return False
+        if self._instances:
+            entry = self._instances.get(id(obj))
+            if entry is not None:
+                instance = entry[1]
+                return self._instance_state_into(instance, time, self._timeline(instance.template), out)
+        timeline = self._timeline(obj)
+        if timeline is None:
+            _reset_state(obj, out)
+            return self._scan_into(obj, time, out)
+        return self._compiled_state_into(obj, time, timeline, out)
+
+    def _instance_state(
+        self, instance: _Instance, time: int, timeline: Optional[_Timeline],
+        cursor: Optional[List[int]] = None,
+    ) -> ObjectState | None:
+        template, local = instance.template, time - instance.time_offset
+        if timeline is None:
+            state = self._scan_object_state(template, local)
+        else:
+            state = self._compiled_state(template, local, timeline, cursor)
+        if state is not None:
+            # may be the template's own position vector
+            state.position = Vector2(state.position.x + instance.dx, state.position.y + instance.dy)
+        return state
+
+    def _instance_state_into(
+        self, instance: _Instance, time: int, timeline: Optional[_Timeline], out: ObjectState,
+        cursor: Optional[List[int]] = None,
+    ) -> bool:
+        template, local = instance.template, time - instance.time_offset
+        if timeline is None:
+            _reset_state(template, out)
+            drawn = self._scan_into(template, local, out)
+        else:
+            drawn = self._compiled_state_into(template, local, timeline, out, cursor)
+        if drawn:
+            out.position.x += instance.dx
+            out.position.y += instance.dy
+        return drawn
+
+    def _compiled_state(
+        self, obj: SBObject, time: int, timeline: _Timeline, cursor: Optional[List[int]] = None
+    ) -> ObjectState | None:
+        # mirrors _compiled_state_into; building a fresh state here costs
+        # less than resetting every field of one
+        # cursor slots: opacity, x, y, scale, rotation, color
+        opacity = 1.0
+        if timeline.opacity is not None:
+            value = timeline.opacity.value_at(time, cursor, 0)
+            if value is not None:
+                opacity = value
+                if opacity < 0.001:
+                    return None  # Invisible due to opacity
+
         state = ObjectState(
-            visible=True, position=obj.position, opacity=1.0, image_path=obj.filepath
+            visible=True, position=obj.position, opacity=opacity, image_path=obj.filepath
         )
 
+        x_track, y_track = timeline.x, timeline.y
+        if x_track is not None or y_track is not None:
+            x = x_track.value_at(time, cursor, 1) if x_track is not None else None
+            y = y_track.value_at(time, cursor, 2) if y_track is not None else None
+            if x is not None or y is not None:
+                state.position = Vector2(
+                    obj.position.x if x is None else x,
+                    obj.position.y if y is None else y,
+                )
+
+        if timeline.scale is not None:
+            value = timeline.scale.value_at(time, cursor, 3)
+            if value is not None:
+                state.scale_vec = Vector2(*value)
+
+        if timeline.rotation is not None:
+            value = timeline.rotation.value_at(time, cursor, 4)
+            if value is not None:
+                state.rotation = value
+
+        if timeline.color is not None:
+            value = timeline.color.value_at(time, cursor, 5)
+            if value is not None:
+                state.r, state.g, state.b = value
+
+        if timeline.flag_until or timeline.flag_loops:
+            for flag in timeline.flags_at(time):
+                setattr(state, _PARAMETER_FLAGS[flag], True)
+
+        if isinstance(obj, Animation):
+            self._update_animation_frame(obj, time, state)
+
+        return state
+
+    def _compiled_state_into(
+        self, obj: SBObject, time: int, timeline: _Timeline, out: ObjectState,
+        cursor: Optional[List[int]] = None,
+    ) -> bool:
+        # cursor slots: opacity, x, y, scale, rotation, color
+        opacity = 1.0
+        if timeline.opacity is not None:
+            value = timeline.opacity.value_at(time, cursor, 0)
+            if value is not None:
+                opacity = value
+                if opacity < 0.001:
+                    return False  # Invisible due to opacity
+
+        out.visible = True
+        out.opacity = opacity
+        out.scale = 1.0
+        out.image_path = obj.filepath
+        out.frame_index = 0
+
+        position = out.position
+        position.x, position.y = obj.position.x, obj.position.y
+        if timeline.x is not None:
+            value = timeline.x.value_at(time, cursor, 1)
+            if value is not None:
+                position.x = value
+        if timeline.y is not None:
+            value = timeline.y.value_at(time, cursor, 2)
+            if value is not None:
+                position.y = value
+
+        scale = out.scale_vec
+        scale.x = scale.y = 1.0
+        if timeline.scale is not None:
+            # components are written straight from the segment, without a list
+            segment, at = timeline.scale.segment_at(time, cursor, 3)
+            if segment is not None:
+                progress = segment.progress(at)
+                value, delta = segment.value, segment.delta
+                scale.x = value[0] + delta[0] * progress
+                scale.y = value[1] + delta[1] * progress
+
+        out.rotation = 0.0
+        if timeline.rotation is not None:
+            value = timeline.rotation.value_at(time, cursor, 4)
+            if value is not None:
+                out.rotation = value
+
+        out.r = out.g = out.b = 255.0
+        if timeline.color is not None:
+            segment, at = timeline.color.segment_at(time, cursor, 5)
+            if segment is not None:
+                progress = segment.progress(at)
+                value, delta = segment.value, segment.delta
+                out.r = value[0] + delta[0] * progress
+                out.g = value[1] + delta[1] * progress
+                out.b = value[2] + delta[2] * progress
+
+        out.flip_h = out.flip_v = out.additive = False
+        if timeline.flag_until or timeline.flag_loops:
+            for flag in timeline.flags_at(time):
+                setattr(out, _PARAMETER_FLAGS[flag], True)
+
+        if isinstance(obj, Animation):
+            self._update_animation_frame(obj, time, out)
+
+        return True
+
+    def _scan_object_state(self, obj: SBObject, time: int) -> ObjectState | None:
+        """
+        Reference evaluator: apply every command in start order.
+        Used for command lists the timelines do not handle.
+        """
+        if time < obj.life_start or time > obj.life_end:
+            return None
+
+        # the state owns its vectors; commands update them in place
+        state = ObjectState(
+            visible=True, position=Vector2(obj.position.x, obj.position.y), opacity=1.0,
+            image_path=obj.filepath,
+        )
+        if not self._scan_into(obj, time, state):
+            return None
+        return state
+
+    def _scan_into(self, obj: SBObject, time: int, state: ObjectState) -> bool:
+        """_scan_object_state's work on a *state* reset to the object's defaults."""
         self._process_commands(obj.commands, time, state)
 
         if state.opacity < 0.001:
-            return None  # Invisible due to opacity
+            return False  # Invisible due to opacity
 
         if isinstance(obj, Animation):
             self._update_animation_frame(obj, time, state)
 
-        return state
+        return True
 
     def _process_commands(
         self, commands: List[Union[Command, LoopCommand]], time: int, state: ObjectState
     ):
 
         processed_categories: Set[str] = set()
+        mark_processed = processed_categories.update
         for cmd in commands:
             if isinstance(cmd, LoopCommand):
-                self._process_loop(cmd, time, state)
+                loop = self._loop_table(cmd)
+                self._process_loop(cmd, time, state, loop)
                 # Propagate loop sub-command categories to prevent later
                 # top-level commands from overriding values the loop already set
-                for sub_cmd in cmd.commands:
-                    if isinstance(sub_cmd, Command):
-                        for cat in self._get_command_categories(sub_cmd.type):
-                            processed_categories.add(cat)
+                mark_processed(loop.categories)
             elif isinstance(cmd, Command):
-                if cmd.type == "P":
+                cmd_type = cmd.type
+                if cmd_type == "P":
                     self._apply_parameter(cmd, state, time)
                     continue
 
-                categories = self._get_command_categories(cmd.type)
+                categories = _COMMAND_CATEGORIES.get(cmd_type, ())
+                start_time = cmd.start_time
+                end_time = cmd.end_time
 
-                if time < cmd.start_time:
+                if time < start_time:
                     should_apply_start = False
                     for cat in categories:
                         if cat not in processed_categories:
@@ -171,95 +884,96 @@ class StateEngine:
                             processed_categories.add(cat)
                     if should_apply_start:
                         self._apply_command_value(cmd, state, 0.0)
-                elif time > cmd.end_time:
+                elif time > end_time:
                     self._apply_command_value(cmd, state, 1.0)
-                    for cat in categories:
-                        processed_categories.add(cat)
+                    mark_processed(categories)
                 else:
-                    duration = cmd.end_time - cmd.start_time
+                    duration = end_time - start_time
                     progress = 0.0
                     if duration != 0:
-                        normed_time = (time - cmd.start_time) / duration
-                        progress = easings.apply_easing(cmd.easing, normed_time)
+                        normed_time = (time - start_time) / duration
+                        progress = self._ease(cmd.easing)(normed_time)
 
                     self._apply_command_value(cmd, state, progress)
+                    mark_processed(categories)
 
-                    for cat in categories:
-                        processed_categories.add(cat)
-
-    def _process_loop(self, loop_cmd: LoopCommand, time: int, state: ObjectState):
+    def _process_loop(
+        self, loop_cmd: LoopCommand, time: int, state: ObjectState, loop: Optional[_LoopTable] = None
+    ):
         """
-        Handle the loop commands
+        Handle the loop commands: its compiled tracks at the loop-local time,
+        or its commands scanned at that time if they do not compile.
         """
-        loop_duration = loop_cmd.sub_max
-        if loop_duration is None:
-            print("Error: LoopCommand missing sub_max value.")
-            return
-
-        total_duration = loop_duration * loop_cmd.loop_count
-
-        start_abs = loop_cmd.start_time
-        end_abs = start_abs + total_duration
-
-        if time < start_abs:
+        if loop is None:
+            loop = self._loop_table(loop_cmd)
+        if time < loop.start:
             return  # Outside loop time
 
-        if time > end_abs:
-            self._process_commands(loop_cmd.commands, loop_duration, state)
-            return  # After loop time
-
-        elapsed = time - start_abs
-        # current_iteration = elapsed // loop_duration # Not used currently
-        time_in_iteration = elapsed % loop_duration
+        local = loop.local_time(time)
+        if loop.tracks is None:
+            self._process_commands(loop_cmd.commands, local, state)
+            return
 
-        self._process_commands(loop_cmd.commands, time_in_iteration, state)
+        for name, track in loop.tracks.items():
+            value = track.value_at(local)
+            if value is None:
+                continue
+            if name == "opacity":
+                state.opacity = value
+            elif name == "x":
+                state.position.x = value
+            elif name == "y":
+                state.position.y = value
+            elif name == "scale":
+                state.scale_vec.x, state.scale_vec.y = value
+            elif name == "rotation":
+                state.rotation = value
+            else:
+                state.r, state.g, state.b = value
+        for flag, until in loop.flag_ends.items():
+            if local <= until:
+                setattr(state, _PARAMETER_FLAGS[flag], True)
 
     def _apply_command_value(self, cmd: Command, state: ObjectState, progress: float):
         """
         Apply the command values to the object state based on the progress.
         """
 
-        # params should be [start_value, end_value] or similar
+        # params should be [start_value, end_value] or similar; the lerps
+        # are written out and the state's vectors updated in place since this
+        # runs for every command of every frame
         p = cmd.params
+        cmd_type = cmd.type
+
+        if cmd_type == "F":  # Fade: [o1, o2]
+            state.opacity = p[0] + (p[1] - p[0]) * progress
+
+        elif cmd_type == "M":  # Move: [x1, y1, x2, y2]
+            position = state.position
+            position.x = p[0] + (p[2] - p[0]) * progress
+            position.y = p[1] + (p[3] - p[1]) * progress
+
+        elif cmd_type == "MX":  # MoveX: [x1, x2]
+            state.position.x = p[0] + (p[1] - p[0]) * progress
+
+        elif cmd_type == "MY":  # MoveY: [y1, y2]
+            state.position.y = p[0] + (p[1] - p[0]) * progress
 
-        if cmd.type == "F":  # Fade: [o1, o2]
-            val = self._lerp(p[0], p[1], progress)
-            state.opacity = val
-
-        elif cmd.type == "M":  # Move: [x1, y1, x2, y2]
-            state.position = Vector2(
-                self._lerp(p[0], p[2], progress),
-                self._lerp(p[1], p[3], progress),
-            )
-
-        elif cmd.type == "MX":  # MoveX: [x1, x2]
-            state.position = Vector2(
-                self._lerp(p[0], p[1], progress),
-                state.position.y,
-            )
-
-        elif cmd.type == "MY":  # MoveY: [y1, y2]
-            state.position = Vector2(
-                state.position.x,
-                self._lerp(p[0], p[1], progress),
-            )
-
-        elif cmd.type == "S":  # Scale: [s1, s2]
-            scale = self._lerp(p[0], p[1], progress)
-            state.scale_vec = Vector2(scale, scale)
-
-        elif cmd.type == "V":  # Vector Scale: [w1, h1, w2, h2]
-            state.scale_vec = Vector2(
-                self._lerp(p[0], p[2], progress),
-                self._lerp(p[1], p[3], progress),
-            )
-        elif cmd.type == "R":  # Rotate: [r1, r2]
-            state.rotation = self._lerp(p[0], p[1], progress)
-
-        elif cmd.type == "C":  # Color: [r1, g1, b1, r2, g2, b2]
-            state.r = self._lerp(p[0], p[3], progress)
-            state.g = self._lerp(p[1], p[4], progress)
-            state.b = self._lerp(p[2], p[5], progress)
+        elif cmd_type == "S":  # Scale: [s1, s2]
+            scale = p[0] + (p[1] - p[0]) * progress
+            state.scale_vec.x = state.scale_vec.y = scale
+
+        elif cmd_type == "V":  # Vector Scale: [w1, h1, w2, h2]
+            scale_vec = state.scale_vec
+            scale_vec.x = p[0] + (p[2] - p[0]) * progress
+            scale_vec.y = p[1] + (p[3] - p[1]) * progress
+        elif cmd_type == "R":  # Rotate: [r1, r2]
+            state.rotation = p[0] + (p[1] - p[0]) * progress
+
+        elif cmd_type == "C":  # Color: [r1, g1, b1, r2, g2, b2]
+            state.r = p[0] + (p[3] - p[0]) * progress
+            state.g = p[1] + (p[4] - p[1]) * progress
+            state.b = p[2] + (p[5] - p[2]) * progress
 
     def _apply_parameter(self, cmd: Command, state: ObjectState, time: int):
         param_type = cmd.params[0]
@@ -301,3 +1015,74 @@ class StateEngine:
         base, ext = obj.filepath.rsplit(".", 1)
         state.image_path = f"{base}{frame_index}.{ext}"
         state.frame_index = frame_index
+
+
+class StateCursor:
+    """
+    ``get_object_state`` for sequential rendering.
+
+    Keeps, per object and property, the index of the command in effect and
+    walks it forward as time increases, so a frame costs the same however
+    many commands an object has already gone through. Asking for an earlier
+    time than the previous call (a seek) resets every cursor; the results
+    are always the same as ``StateEngine.get_object_state``.
+    """
+
+    def __init__(self, engine: StateEngine):
+        self.engine = engine
+        self._time = -math.inf
+        # id(obj) -> (the timeline the indices point into, writer index per property)
+        self._cursors: Dict[int, Tuple[_Timeline, List[int]]] = {}
+
+    def reset(self):
+        self._cursors.clear()
+        self._time = -math.inf
+
+    def get_object_state(self, obj: SBObject, time: int) -> ObjectState | None:
+        if time < self._time:
+            self._cursors.clear()
+        self._time = time
+
+        if time < obj.life_start or time > obj.life_end:
+            return None
+        engine = self.engine
+        if engine._instances:
+            entry = engine._instances.get(id(obj))
+            if entry is not None:
+                instance = entry[1]
+                timeline = engine._timeline(instance.template)
+                cursor = None if timeline is None else self._cursor(obj, timeline)
+                return engine._instance_state(instance, time, timeline, cursor)
+        timeline = engine._timeline(obj)
+        if timeline is None:
+            return engine._scan_object_state(obj, time)
+
+        return engine._compiled_state(obj, time, timeline, self._cursor(obj, timeline))
+
+    def get_object_state_into(self, obj: SBObject, time: int, out: ObjectState) -> bool:
+        """``StateEngine.get_object_state_into`` with this cursor's indices."""
+        if time < self._time:
+            self._cursors.clear()
+        self._time = time
+
+        if time < obj.life_start or time > obj.life_end:
+            return False
+        engine = self.engine
+        if engine._instances:
+            entry = engine._instances.get(id(obj))
+            if entry is not None:
+                instance = entry[1]
+                timeline = engine._timeline(instance.template)
+                cursor = None if timeline is None else self._cursor(obj, timeline)
+                return engine._instance_state_into(instance, time, timeline, out, cursor)
+        timeline = engine._timeline(obj)
+        if timeline is None:
+            return engine.get_object_state_into(obj, time, out)
+        return engine._compiled_state_into(obj, time, timeline, out, self._cursor(obj, timeline))
+
+    def _cursor(self, obj: SBObject, timeline: _Timeline) -> List[int]:
+        entry = self._cursors.get(id(obj))
+        if entry is None or entry[0] is not timeline:
+            # first sight of the object, or the engine recompiled it
+            entry = self._cursors[id(obj)] = (timeline, [0] * 6)
+        return entry[1]
@@ -0,0 +1,175 @@
+"""
+Per-object state streams, precomputed for process-pool rendering.
+
+A render worker normally evaluates every drawn object again for every frame
+it renders. ``StateStreams.build`` instead evaluates each object once for
+all output frames of its lifetime (one ``evaluate_batch`` call covers many
+objects × frames) and stores the states in a memory-mapped ``.npy`` file,
+one float64 row per (object, frame) in ``BatchStates.COLUMNS`` order.
+Workers map the file read-only and gather a frame's states by index.
+
+The file holds ``sum(frames alive) × 14`` float64 values: 5,000 objects
+alive for 10 s at 60 fps take ~340 MB of disk, paged in as frames need it.
+"""
+import multiprocessing
+from typing import Optional, Tuple
+
+import numpy as np
+
+from src.state_batch import BatchStates
+from src.state_engine import StateEngine
+from src.storyboard_arrays import StoryboardArrays
+
+# rows evaluated per evaluate_batch call while building
+_CHUNK = 1 << 16
+
+
+def frame_times(fps: float, start_ms: int, frames: int) -> np.ndarray:
+    """Time of every output frame, ``start_ms + int(i * 1000 / fps)`` like the render job."""
+    return start_ms + (np.arange(frames) * 1000 / fps).astype(np.int64)
+
+
+def lifetime_frames(arrays: StoryboardArrays, object_id: int, fps: float,
+                    start_ms: int = 0) -> Tuple[int, np.ndarray]:
+    """(first frame index, frame times) of the frames *object_id* is alive in."""
+    life_start, life_end = arrays.life_start[object_id], arrays.life_end[object_id]
+    # one frame past the last that can show the object, int() truncation included
+    frames = max(0, int((life_end - start_ms) * fps / 1000) + 2)
+    times = frame_times(fps, start_ms, frames)
+    first = int(np.searchsorted(times, life_start, side="left"))
+    end = int(np.searchsorted(times, life_end, side="right"))
+    return first, times[first:max(first, end)]
+
+
+def object_stream(engine: StateEngine, object_id: int, fps: float,
+                  start_ms: int = 0) -> Tuple[int, np.ndarray]:
+    """See ``StateEngine.state_stream``."""
+    first, times = lifetime_frames(engine.arrays, object_id, fps, start_ms)
+    rows = np.full(len(times), object_id, dtype=np.int64)
+    return first, engine.evaluate_batch(rows, times).to_matrix()
+
+
+class StateStreams:
+    """
+    The state of every object at every output frame, read from a memory-mapped file.
+
+    Picklable: workers receive the index arrays and reopen the file themselves.
+    """
+
+    def __init__(self, path: str, fps: float, start_ms: int, first: np.ndarray, offset: np.ndarray,
+                 length: np.ndarray, times: np.ndarray):
+        self.path = path
+        self.fps = fps
+        self.start_ms = start_ms
+        self.first = first  # per object: first frame index
+        self.offset = offset  # per object: first row in the file
+        self.length = length  # per object: frames alive
+        self.times = times  # time of every output frame
+        self._data: Optional[np.ndarray] = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_data"] = None
+        return state
+
+    @property
+    def data(self) -> np.ndarray:
+        if self._data is None:
+            self._data = np.load(self.path, mmap_mode="r")
+        return self._data
+
+    @classmethod
+    def build(cls, engine: StateEngine, path: str, fps: float, start_ms: int, frames: int,
+              workers: int = 1) -> "StateStreams":
+        """
+        Evaluate every object of ``engine.arrays`` at every frame it is alive in.
+
+        :param path: The ``.npy`` file to write.
+        :param frames: Number of output frames, starting at *start_ms*.
+        :param workers: Processes sharing the work; 1 builds in this process.
+        """
+        arrays = engine.arrays
+        times = frame_times(fps, start_ms, frames)
+        first = np.searchsorted(times, arrays.life_start, side="left")
+        length = np.searchsorted(times, arrays.life_end, side="right") - first
+        length = np.maximum(length, 0)
+        offset = np.concatenate(([0], np.cumsum(length)[:-1])).astype(np.int64) if len(length) else length
+        total = int(length.sum())
+
+        # a zero-length file cannot be mapped
+        data = np.lib.format.open_memmap(path, mode="w+", dtype=np.float64,
+                                         shape=(max(total, 1), len(BatchStates.COLUMNS)))
+        del data
+        streams = cls(path, fps, start_ms, first, offset, length, times)
+
+        chunks = streams._chunks()
+        if workers > 1 and len(chunks) > 1:
+            with multiprocessing.Pool(processes=workers, initializer=_init_builder,
+                                      initargs=(engine, streams)) as pool:
+                for _ in pool.imap_unordered(_build_chunk, chunks):
+                    pass
+        else:
+            _init_builder(engine, streams)
+            for chunk in chunks:
+                _build_chunk(chunk)
+            _init_builder(None, None)
+        return streams
+
+    def _chunks(self) -> list:
+        """(first object, end object) ranges of about _CHUNK rows each."""
+        chunks = []
+        start, rows = 0, 0
+        for i, n in enumerate(self.length.tolist()):
+            rows += n
+            if rows >= _CHUNK:
+                chunks.append((start, i + 1))
+                start, rows = i + 1, 0
+        if start < len(self.length):
+            chunks.append((start, len(self.length)))
+        return chunks
+
+    def frame_of(self, time_ms: int) -> Optional[int]:
+        """Index of the output frame shown at *time_ms*, or None if it is not one."""
+        i = int(np.searchsorted(self.times, time_ms, side="left"))
+        if i < len(self.times) and self.times[i] == time_ms:
+            return i
+        return None
+
+    def states(self, rows: np.ndarray, frame: int) -> BatchStates:
+        """The states of *rows* at output frame *frame*, as ``evaluate_batch`` returns them."""
+        rows = np.asarray(rows, dtype=np.int64)
+        local = frame - self.first[rows]
+        alive = (local >= 0) & (local < self.length[rows])
+        matrix = np.zeros((len(rows), len(BatchStates.COLUMNS)))
+        matrix[alive] = self.data[self.offset[rows[alive]] + local[alive]]
+        return BatchStates.from_matrix(rows, matrix)
+
+
+# ---------------------------------------------------------------------------
+# Build workers (module level so multiprocessing can pickle them)
+# ---------------------------------------------------------------------------
+
+_builder: Optional[Tuple[StateEngine, StateStreams]] = None
+
+
+def _init_builder(engine: Optional[StateEngine], streams: Optional[StateStreams]):
+    global _builder
+    _builder = (engine, streams) if engine is not None else None
+
+
+def _build_chunk(chunk: Tuple[int, int]):
+    engine, streams = _builder
+    begin, end = chunk
+    length = streams.length[begin:end]
+    if not length.sum():
+        return
+    rows = np.repeat(np.arange(begin, end), length)
+    # frame index of every row: first[object] + position within the object's run
+    run_start = np.repeat(np.cumsum(length) - length, length)
+    frames = np.repeat(streams.first[begin:end], length) + np.arange(len(rows)) - run_start
+    states = engine.evaluate_batch(rows, streams.times[frames])
+    data = np.load(streams.path, mmap_mode="r+")
+    lo = streams.offset[begin]
+    data[lo:lo + len(rows)] = states.to_matrix()
+    data.flush()
+    del data
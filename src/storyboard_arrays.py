@@ -0,0 +1,160 @@
+"""
+Struct-of-arrays view of a ``Storyboard``.
+
+``Storyboard`` keeps five lists of heterogeneous objects, which is what the
+parser and the state engine want, but per-object questions asked of the
+whole storyboard (which objects are alive in this window, which bucket does
+each object fall into, how many use this texture) then turn into Python
+loops. ``StoryboardArrays`` holds the same per-object header data as NumPy
+columns, one row per object, so those questions become array operations.
+
+Rows are in storyboard order: Background, Fail, Pass, Foreground, Overlay,
+each in the layer's own (draw) order, so every layer is a contiguous slice.
+The view is a snapshot; rebuild it after the storyboard's layers change.
+"""
+from dataclasses import dataclass
+from operator import attrgetter
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from src.models import Animation, Layer, SBObject, Storyboard
+from src.state_engine import StateEngine
+
+
+KIND_SPRITE = 0
+KIND_ANIMATION = 1
+
+# storyboard order; the renderer draws all of them except Fail
+LAYER_ORDER = (Layer.Background, Layer.Fail, Layer.Pass, Layer.Foreground, Layer.Overlay)
+
+
+def _layer_lists(storyboard: Storyboard) -> List[List[SBObject]]:
+    return [
+        storyboard.background_layer,
+        storyboard.fail_layer,
+        storyboard.pass_layer,
+        storyboard.foreground_layer,
+        storyboard.overlay_layer,
+    ]
+
+
+@dataclass
+class StoryboardArrays:
+    objects: List[SBObject]  # row -> object
+    textures: List[str]  # texture id -> image path as written in the storyboard
+    layer: np.ndarray  # uint8 Layer.value
+    origin: np.ndarray  # uint8 Origin.value
+    x: np.ndarray  # float64 base position
+    y: np.ndarray
+    life_start: np.ndarray  # float64 ms
+    life_end: np.ndarray
+    kind: np.ndarray  # uint8 KIND_SPRITE / KIND_ANIMATION
+    texture_id: np.ndarray  # int32 index into textures
+    frame_count: np.ndarray  # int32, 0 for sprites
+    frame_delay: np.ndarray  # float64, 0 for sprites
+    loop_type: np.ndarray  # uint8 LoopType.value, 0 for sprites
+    draw_order: np.ndarray  # int32 position within the object's layer
+    layer_offsets: np.ndarray  # int64, rows of LAYER_ORDER[i] are offsets[i]:offsets[i + 1]
+
+    @classmethod
+    def from_storyboard(cls, storyboard: Storyboard) -> "StoryboardArrays":
+        """Build the columns; computes lifetimes first if the storyboard lacks them."""
+        if not storyboard.lifetimes_computed:
+            StateEngine(storyboard)
+
+        layers = _layer_lists(storyboard)
+        objects = [obj for layer in layers for obj in layer]
+        sizes = [len(layer) for layer in layers]
+        offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+        n = len(objects)
+
+        def column(getter: str, dtype) -> np.ndarray:
+            return np.fromiter(map(attrgetter(getter), objects), dtype, n)
+
+        texture_ids: Dict[str, int] = {}
+        texture_id = [texture_ids.setdefault(obj.filepath, len(texture_ids)) for obj in objects]
+
+        animated = [isinstance(obj, Animation) for obj in objects]
+        frame_count = np.zeros(n, dtype=np.int32)
+        frame_delay = np.zeros(n, dtype=np.float64)
+        loop_type = np.zeros(n, dtype=np.uint8)
+        rows = np.flatnonzero(animated)
+        if len(rows):
+            animations = [objects[i] for i in rows.tolist()]
+            frame_count[rows] = [obj.frame_count for obj in animations]
+            frame_delay[rows] = [obj.frame_delay for obj in animations]
+            loop_type[rows] = [obj.loop_type.value for obj in animations]
+
+        return cls(
+            objects=objects,
+            textures=list(texture_ids),
+            # objects sit in the list of their own layer
+            layer=np.repeat(np.array([layer.value for layer in LAYER_ORDER], dtype=np.uint8), sizes),
+            origin=column("origin.value", np.uint8),
+            x=column("position.x", np.float64),
+            y=column("position.y", np.float64),
+            life_start=column("life_start", np.float64),
+            life_end=column("life_end", np.float64),
+            kind=np.array(animated, dtype=np.uint8),
+            texture_id=np.array(texture_id, dtype=np.int32),
+            frame_count=frame_count,
+            frame_delay=frame_delay,
+            loop_type=loop_type,
+            draw_order=(np.arange(n) - np.repeat(offsets[:-1], sizes)).astype(np.int32),
+            layer_offsets=offsets,
+        )
+
+    def __len__(self) -> int:
+        return len(self.objects)
+
+    def layer_slice(self, layer: Layer) -> slice:
+        i = LAYER_ORDER.index(layer)
+        return slice(int(self.layer_offsets[i]), int(self.layer_offsets[i + 1]))
+
+    def alive(self, start: float, end: Optional[float] = None) -> np.ndarray:
+        """Rows alive at some point of [start, end] (just *start* if end is omitted), in row order."""
+        if end is None:
+            end = start
+        return np.flatnonzero((self.life_start <= end) & (self.life_end >= start))
+
+    def buckets(self, layer: Layer, interval: int) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Group a layer's rows into fixed time buckets.
+
+        Yields ``(bucket, rows)`` for every bucket any object of *layer*
+        is alive in, where bucket ``b`` covers ``[b * interval, (b + 1) *
+        interval)`` and *rows* are in draw order. Buckets come in ascending
+        order.
+        """
+        sl = self.layer_slice(layer)
+        first = (self.life_start[sl] // interval).astype(np.int64)
+        last = (self.life_end[sl] // interval).astype(np.int64)
+        counts = np.maximum(last - first + 1, 0)
+        total = int(counts.sum())
+        if total == 0:
+            return
+
+        # one (bucket, row) pair per bucket an object covers
+        rows = np.repeat(np.arange(sl.start, sl.stop), counts)
+        run_start = np.repeat(np.cumsum(counts) - counts, counts)
+        bucket = np.repeat(first, counts) + (np.arange(total) - run_start)
+
+        # stable, so rows keep their draw order inside each bucket; numpy
+        # radix-sorts 16-bit keys, which is several times faster on the
+        # millions of pairs a long storyboard produces
+        lowest = int(bucket.min())
+        keys = bucket - lowest
+        if int(bucket.max()) - lowest < 1 << 16:
+            keys = keys.astype(np.uint16)
+        order = np.argsort(keys, kind="stable")
+        bucket, rows = bucket[order], rows[order]
+        cuts = np.flatnonzero(np.diff(bucket)) + 1
+        starts = np.concatenate([[0], cuts])
+        ends = np.concatenate([cuts, [total]])
+        for s, e in zip(starts.tolist(), ends.tolist()):
+            yield int(bucket[s]), rows[s:e]
+
+    def texture_usage(self) -> np.ndarray:
+        """Number of objects per texture id."""
+        return np.bincount(self.texture_id, minlength=len(self.textures))
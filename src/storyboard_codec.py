@@ -0,0 +1,279 @@
+"""
+Compact binary encoding of a ``Storyboard``.
+
+Used by the on-disk parse cache and to ship parsed chunks back from parser
+worker processes, where it is much cheaper to build and load than a pickle
+of the model objects.
+"""
+import math
+import struct
+import sys
+from array import array
+from typing import Dict, List
+
+from src.columnar import CommandStore
+from src.models import (
+    Storyboard,
+    SBObject,
+    Sprite,
+    Animation,
+    VideoObject,
+    Layer,
+    Origin,
+    Command,
+    LoopCommand,
+    LoopType,
+    Vector2,
+)
+
+
+# Entry codes in the flattened command column. Loops are stored as one
+# _LOOP row followed by their sub-command rows.
+_COMMAND_CODES = ["F", "M", "MX", "MY", "S", "V", "R", "C", "P"]
+_CODE_OF = {t: i for i, t in enumerate(_COMMAND_CODES)}
+_P_CODE = _CODE_OF["P"]
+_LOOP = 255
+
+_LAYERS = [Layer.Background, Layer.Fail, Layer.Pass, Layer.Foreground, Layer.Overlay]
+_ORIGINS = list(Origin)
+_LOOP_TYPES = list(LoopType)
+
+# per-storyboard fields: layer sizes (5), lifetimes_computed, has_video,
+# video path id, video start, video x/y offset
+_META = struct.Struct("<5IBBIqii")
+
+
+def _layer_lists(storyboard: Storyboard) -> List[List[SBObject]]:
+    return [
+        storyboard.background_layer,
+        storyboard.fail_layer,
+        storyboard.pass_layer,
+        storyboard.foreground_layer,
+        storyboard.overlay_layer,
+    ]
+
+
+def encode_storyboard(storyboard: Storyboard) -> bytes:
+    """
+    Flatten a storyboard into a compact column layout.
+
+    Every column is a typed ``array`` written as raw bytes, so loading is a
+    handful of ``frombytes`` calls plus one pass that rebuilds the models.
+    Strings (file paths, P parameters) are interned into one table.
+    """
+    strings: Dict[str, int] = {}
+
+    def intern(text: str) -> int:
+        idx = strings.get(text)
+        if idx is None:
+            idx = strings[text] = len(strings)
+        return idx
+
+    # objects
+    kind = array("B")
+    origin = array("B")
+    loop_type = array("B")
+    path_id = array("I")
+    pos = array("d")  # x, y
+    life = array("q")  # life_start, life_end
+    frame_count = array("i")
+    frame_delay = array("d")
+    n_entries = array("I")
+
+    # commands / loops, flattened in order
+    code = array("B")
+    easing = array("h")
+    times = array("q")  # start, end (loops: start_time, loop_count)
+    n_items = array("I")  # param count (loops: sub-command count)
+    params = array("d")  # loops: sub_max (nan if unset)
+
+    def add_command(cmd: Command):
+        code.append(_CODE_OF[cmd.type])
+        easing.append(cmd.easing)
+        times.append(cmd.start_time)
+        times.append(cmd.end_time)
+        if cmd.type == "P":
+            n_items.append(1)
+            params.append(intern(cmd.params[0]))
+        else:
+            n_items.append(len(cmd.params))
+            params.extend(cmd.params)
+
+    layers = _layer_lists(storyboard)
+    for objects in layers:
+        for obj in objects:
+            is_anim = isinstance(obj, Animation)
+            kind.append(1 if is_anim else 0)
+            origin.append(_ORIGINS.index(obj.origin))
+            path_id.append(intern(obj.filepath))
+            pos.append(obj.position.x)
+            pos.append(obj.position.y)
+            life.append(obj.life_start)
+            life.append(obj.life_end)
+            frame_count.append(obj.frame_count if is_anim else 0)
+            frame_delay.append(obj.frame_delay if is_anim else 0.0)
+            loop_type.append(_LOOP_TYPES.index(obj.loop_type) if is_anim else 0)
+            n_entries.append(len(obj.commands))
+
+            for cmd in obj.commands:
+                if isinstance(cmd, LoopCommand):
+                    code.append(_LOOP)
+                    easing.append(0)
+                    times.append(cmd.start_time)
+                    times.append(cmd.loop_count)
+                    n_items.append(len(cmd.commands))
+                    params.append(math.nan if cmd.sub_max is None else cmd.sub_max)
+                    for sub_cmd in cmd.commands:
+                        add_command(sub_cmd)
+                else:
+                    add_command(cmd)
+
+    video = storyboard.video
+    meta = _META.pack(
+        *(len(objects) for objects in layers),
+        storyboard.lifetimes_computed,
+        video is not None,
+        intern(video.filepath) if video else 0,
+        video.start_time if video else 0,
+        video.x_offset if video else 0,
+        video.y_offset if video else 0,
+    )
+
+    string_blob = "\0".join(strings).encode("utf-8")
+    columns = [
+        kind, origin, loop_type, path_id, pos, life, frame_count, frame_delay,
+        n_entries, code, easing, times, n_items, params,
+    ]
+    chunks = [meta, struct.pack("<Q", len(string_blob)), string_blob]
+    for column in columns:
+        raw = column.tobytes()
+        chunks.append(struct.pack("<Q", len(raw)))
+        chunks.append(raw)
+    return b"".join(chunks)
+
+
+def decode_storyboard(data: bytes, columnar: bool = False) -> Storyboard:
+    """
+    Rebuild the storyboard written by ``encode_storyboard``. With *columnar*
+    the commands go into one frozen ``CommandStore``, as a columnar parse
+    would leave them.
+    """
+    view = memoryview(data)
+    meta = _META.unpack_from(view, 0)
+    offset = _META.size
+
+    def read_blob() -> memoryview:
+        nonlocal offset
+        (length,) = struct.unpack_from("<Q", view, offset)
+        offset += 8
+        blob = view[offset : offset + length]
+        if len(blob) != length:
+            raise ValueError("truncated cache entry")
+        offset += length
+        return blob
+
+    def read_column(typecode: str) -> list:
+        column = array(typecode)
+        column.frombytes(read_blob())
+        return column.tolist()
+
+    blob = bytes(read_blob())
+    # interned so the .osu and .osb halves (and fresh parses) share paths
+    strings = [sys.intern(s) for s in blob.decode("utf-8").split("\0")] if blob else [""]
+    kind = read_column("B")
+    origin = read_column("B")
+    loop_type = read_column("B")
+    path_id = read_column("I")
+    pos = read_column("d")
+    life = read_column("q")
+    frame_count = read_column("i")
+    frame_delay = read_column("d")
+    n_entries = read_column("I")
+    code = read_column("B")
+    easing = read_column("h")
+    times = read_column("q")
+    n_items = read_column("I")
+    params = read_column("d")
+
+    row = 0  # command row
+    p = 0  # params cursor
+
+    def read_command() -> Command:
+        nonlocal row, p
+        c = code[row]
+        k = n_items[row]
+        if c == _P_CODE:
+            cmd_params = [strings[int(params[p])]]
+        else:
+            cmd_params = params[p : p + k]
+        cmd = Command(
+            _COMMAND_CODES[c], easing[row], times[2 * row], times[2 * row + 1], cmd_params
+        )
+        row += 1
+        p += k
+        return cmd
+
+    store = CommandStore() if columnar else None
+    storyboard = Storyboard()
+    layers = _layer_lists(storyboard)
+    i = 0
+    for layer_idx, count in enumerate(meta[:5]):
+        target = layers[layer_idx]
+        layer = _LAYERS[layer_idx]
+        for _ in range(count):
+            filepath = strings[path_id[i]]
+            position = Vector2(pos[2 * i], pos[2 * i + 1])
+            if kind[i]:
+                obj = Animation(
+                    layer=layer,
+                    origin=_ORIGINS[origin[i]],
+                    filepath=filepath,
+                    position=position,
+                    frame_count=frame_count[i],
+                    frame_delay=frame_delay[i],
+                    loop_type=_LOOP_TYPES[loop_type[i]],
+                )
+            else:
+                obj = Sprite(
+                    layer=layer,
+                    origin=_ORIGINS[origin[i]],
+                    filepath=filepath,
+                    position=position,
+                )
+            obj.life_start = life[2 * i]
+            obj.life_end = life[2 * i + 1]
+
+            if store is not None:
+                obj.commands = store.new_object()
+            commands = obj.commands
+            for _ in range(n_entries[i]):
+                if code[row] == _LOOP:
+                    sub_max = params[p]
+                    loop = LoopCommand(
+                        start_time=times[2 * row],
+                        loop_count=times[2 * row + 1],
+                        sub_max=None if math.isnan(sub_max) else int(sub_max),
+                    )
+                    n_sub = n_items[row]
+                    row += 1
+                    p += 1
+                    loop.commands = [read_command() for _ in range(n_sub)]
+                    commands.append(loop)  # copied into the store when columnar
+                else:
+                    commands.append(read_command())
+
+            target.append(obj)
+            i += 1
+
+    lifetimes_computed, has_video, video_path, video_start, x_offset, y_offset = meta[5:]
+    if has_video:
+        storyboard.video = VideoObject(
+            filepath=strings[video_path],
+            start_time=video_start,
+            x_offset=x_offset,
+            y_offset=y_offset,
+        )
+    storyboard.lifetimes_computed = bool(lifetimes_computed)
+    if store is not None:
+        store.freeze()
+    return storyboard
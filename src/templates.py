@@ -0,0 +1,117 @@
+"""
+Families of objects that repeat one template.
+
+Storybrew-style particle effects write thousands of sprites from one
+generator loop: the same commands, shifted in time by the spawn time and in
+space by the spawn point. ``find_instances`` groups such objects under one
+template object; ``StateEngine.collapse_templates`` then compiles a single
+timeline per family and evaluates every other member as the template at
+``time - time_offset``, moved by ``(dx, dy)``.
+
+Members must match their template in everything else: command types,
+easings, durations, every non-position value, loop structure, image and
+animation settings. Position values (the base position and the M / MX / MY
+parameters) may all be shifted by one offset per axis, as long as shifting
+the template's values reproduces the member's exactly. Interpolated
+positions then differ from a per-object timeline by float rounding at most.
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+from src.models import Animation, LoopCommand, SBObject
+from src.state_engine import _Instance
+
+# parameter positions holding x / y values
+_X_PARAMS = {"M": (0, 2), "MX": (0, 1)}
+_Y_PARAMS = {"M": (1, 3), "MY": (0, 1)}
+
+
+@dataclass
+class TemplateStats:
+    objects: int = 0  # objects examined
+    templates: int = 0  # families of two or more objects
+    instances: int = 0  # family members evaluated through their template
+
+    @property
+    def collapsed(self) -> int:
+        """Objects in a family, templates included."""
+        return self.templates + self.instances
+
+    def summary(self) -> str:
+        return (
+            f"Templates: {self.collapsed:,} objects collapsed into {self.templates:,} templates "
+            f"({self.objects:,} objects examined)"
+        )
+
+
+def _shape(commands, time_offset: int, shape: list, xs: list, ys: list):
+    """Append the commands to *shape* with times relative to *time_offset*, positions to *xs* / *ys*."""
+    for cmd in commands:
+        if isinstance(cmd, LoopCommand):
+            body: list = []
+            _shape(cmd.commands, 0, body, xs, ys)  # loop bodies are in loop-local time
+            shape.append(("L", cmd.start_time - time_offset, cmd.loop_count, tuple(body)))
+            continue
+        params = cmd.params
+        x_params = _X_PARAMS.get(cmd.type, ())
+        y_params = _Y_PARAMS.get(cmd.type, ())
+        if x_params or y_params:
+            xs.extend(params[i] for i in x_params)
+            ys.extend(params[i] for i in y_params)
+            params = ()
+        shape.append((cmd.type, cmd.easing, cmd.start_time - time_offset, cmd.end_time - time_offset,
+                      tuple(params)))
+
+
+def _signature(obj: SBObject) -> Tuple[tuple, List[float], List[float]]:
+    """(family key, x values, y values); the key holds positions relative to the base position."""
+    shape: list = []
+    xs: List[float] = [obj.position.x]
+    ys: List[float] = [obj.position.y]
+    _shape(obj.commands, obj.life_start, shape, xs, ys)
+    looks: tuple = (type(obj), obj.filepath)
+    if isinstance(obj, Animation):
+        looks += (obj.frame_count, obj.frame_delay, obj.loop_type)
+    key = (
+        looks, obj.life_end - obj.life_start, tuple(shape),
+        tuple(x - xs[0] for x in xs), tuple(y - ys[0] for y in ys),
+    )
+    return key, xs, ys
+
+
+def find_instances(objects) -> Tuple[List[Tuple[SBObject, _Instance]], TemplateStats]:
+    """
+    Group *objects* into families and return (member, its ``_Instance``) for
+    every member except the templates, plus the counts.
+
+    Objects without commands, and objects whose commands have not been
+    parsed yet (lazy loading), are left alone.
+    """
+    stats = TemplateStats()
+    families: Dict[tuple, List[Tuple[SBObject, List[float], List[float]]]] = {}
+    for obj in objects:
+        stats.objects += 1
+        if not getattr(obj.commands, "loaded", True) or not len(obj.commands):
+            continue
+        key, xs, ys = _signature(obj)
+        families.setdefault(key, []).append((obj, xs, ys))
+
+    instances: List[Tuple[SBObject, _Instance]] = []
+    for members in families.values():
+        if len(members) < 2:
+            continue
+        template, template_xs, template_ys = members[0]
+        count = 0
+        for obj, xs, ys in members[1:]:
+            dx, dy = xs[0] - template_xs[0], ys[0] - template_ys[0]
+            # the shifted template must give the member's own values, bit for bit
+            if any(t + dx != x for t, x in zip(template_xs, xs)) or any(
+                t + dy != y for t, y in zip(template_ys, ys)
+            ):
+                continue
+            instances.append((obj, _Instance(template, obj.life_start - template.life_start, dx, dy)))
+            count += 1
+        if count:
+            stats.templates += 1
+            stats.instances += count
+    return instances, stats
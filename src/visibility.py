@@ -0,0 +1,215 @@
+"""
+Conservative visible intervals per object.
+
+Many objects spend most of ``life_start``..``life_end`` faded out or scaled
+to nothing: fade in, hold, fade out, then a long gap until the next loop
+iteration brings them back. The renderer would evaluate them at every frame
+of their lifetime only to drop them at the ``opacity < 0.001`` check.
+``visible_intervals`` walks an object's compiled tracks once and returns the
+closed time intervals in which it *may* be drawn; outside them it is
+certainly hidden (opacity below ``MIN_OPACITY``, or both scale components
+below ``MIN_SCALE``). ``ActiveIndex`` indexes these intervals instead of the
+lifetime.
+
+The bounds are the optimiser's: a command's values lie between its start
+and end parameters, and an overshooting (Back, Elastic) easing leaves the
+property unbounded, i.e. possibly visible. Objects whose commands cannot be
+compiled, or have not been parsed yet, keep their whole lifetime.
+"""
+import math
+from bisect import bisect_right
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from src.models import SBObject
+from src.optimizer import MIN_OPACITY, MIN_SCALE, OVERSHOOTING_EASINGS
+from src.state_engine import StateEngine, _LoopSegment, _Segment, _Track
+
+# a loop's hidden spans are listed per iteration up to this many; longer
+# loops count as visible for their whole length
+_MAX_LOOP_SPANS = 256
+# slack for the rounding of start + delta * progress
+_EPSILON = 1e-9
+
+# (start, end, start is hidden too); the end is never hidden
+_Span = Tuple[float, float, bool]
+# (lo, hi) of every component of a property
+_Bounds = List[Tuple[float, float]]
+
+
+def _components(value) -> tuple:
+    return value if isinstance(value, tuple) else (value,)
+
+
+def _start_bounds(segment: _Segment) -> _Bounds:
+    return [(v, v) for v in _components(segment.value)]
+
+
+def _end_bounds(segment: _Segment) -> _Bounds:
+    # progress is exactly 1.0 after the end, as _Segment.value_at computes it
+    return [(v + d, v + d) for v, d in zip(_components(segment.value), _components(segment.delta))]
+
+
+def _eased_bounds(segment: _Segment) -> Optional[_Bounds]:
+    """Bounds while the command runs, or None if its easing overshoots."""
+    deltas = _components(segment.delta)
+    if segment.easing in OVERSHOOTING_EASINGS and any(deltas):
+        return None
+    return [(min(v, v + d), max(v, v + d)) for v, d in zip(_components(segment.value), deltas)]
+
+
+def _transparent(bounds: _Bounds) -> bool:
+    return bounds[0][1] < MIN_OPACITY - _EPSILON
+
+
+def _zero_scale(bounds: _Bounds) -> bool:
+    limit = MIN_SCALE - _EPSILON
+    return all(-limit < lo and hi < limit for lo, hi in bounds)
+
+
+def _hidden_at(track: _Track, time: float, hidden: Callable[[_Bounds], bool]) -> bool:
+    writer = track.writer_at(time)
+    if writer is None or isinstance(writer, _LoopSegment):
+        return False
+    if time < writer.start:
+        return hidden(_start_bounds(writer))
+    if time > writer.end:
+        return hidden(_end_bounds(writer))
+    bounds = _eased_bounds(writer)
+    return bounds is not None and hidden(bounds)
+
+
+def _windows(track: _Track, lo: float, hi: float):
+    """(start, end, writer, pending) for each writer in effect over [start, end), from *lo* to *hi*."""
+    pending = track.pending
+    if pending is not None and lo < pending.start:
+        yield lo, pending.start, pending, True
+        lo = pending.start
+    starts, writers = track.starts, track.writers
+    for j in range(max(bisect_right(starts, lo) - 1, 0), len(writers)):
+        start = starts[j]
+        if start > hi:
+            break
+        end = starts[j + 1] if j + 1 < len(starts) else math.inf
+        # the next writer starts at the same time and always wins
+        if end <= lo or end <= start:
+            continue
+        yield max(start, lo), end, writers[j], False
+
+
+def _hidden_spans(track: _Track, lo: float, hi: float, hidden: Callable[[_Bounds], bool]) -> List[_Span]:
+    """Spans of [lo, hi] in which *track* certainly holds a *hidden* value, in time order."""
+    spans: List[_Span] = []
+    for start, end, writer, pending in _windows(track, lo, hi):
+        if isinstance(writer, _LoopSegment):
+            _loop_spans(writer, start, end, hidden, spans)
+        elif pending:
+            if hidden(_start_bounds(writer)):
+                spans.append((start, end, True))
+        else:
+            bounds = _eased_bounds(writer)
+            if bounds is not None and hidden(bounds):
+                spans.append((start, end, True))
+            elif writer.end < end and hidden(_end_bounds(writer)):
+                # held at the end value until the next writer
+                spans.append((max(start, writer.end), end, start > writer.end))
+    return spans
+
+
+def _loop_spans(segment: _LoopSegment, start: float, end: float, hidden, spans: List[_Span]):
+    loop, body = segment.loop, segment.track
+    duration = loop.duration
+    if not duration:
+        # every time maps to the loop-local time 0
+        if _hidden_at(body, 0, hidden):
+            spans.append((start, end, True))
+        return
+
+    # one iteration's spans; local time runs from 0 up to (not including) duration
+    local = [(a, min(b, duration), closed) for a, b, closed in _hidden_spans(body, 0, duration, hidden)
+             if min(b, duration) > a]
+    stop = min(end, loop.end)
+    if local and start < stop:
+        count = round((loop.end - loop.start) / duration)
+        first = max(0, int((start - loop.start) // duration))
+        last = min(count, math.ceil((stop - loop.start) / duration))
+        if (last - first) * len(local) <= _MAX_LOOP_SPANS:
+            for k in range(first, last):
+                base = loop.start + k * duration
+                for a, b, closed in local:
+                    a, b = base + a, base + b
+                    if b <= start or a >= stop:
+                        continue
+                    if a < start:
+                        a, closed = start, True
+                    b = min(b, stop)
+                    if closed and spans and spans[-1][1] == a:
+                        # hidden across the end of one iteration into the next
+                        spans[-1] = (spans[-1][0], b, spans[-1][2])
+                    else:
+                        spans.append((a, b, closed))
+
+    # after the loop every property holds its value at the end of an iteration
+    if end > loop.end and _hidden_at(body, duration, hidden):
+        spans.append((max(start, loop.end), end, start > loop.end))
+
+
+def _complement(life_start: float, life_end: float, hidden: List[_Span]) -> List[Tuple[float, float]]:
+    """Closed intervals of [life_start, life_end] not covered by the *hidden* spans."""
+    visible: List[Tuple[float, float]] = []
+    cursor = life_start  # first time not known to be hidden
+    for a, b, closed in sorted(hidden):
+        if b <= a or a > life_end:
+            continue
+        if a > cursor or (a == cursor and not closed):
+            if visible and visible[-1][1] >= cursor:
+                visible[-1] = (visible[-1][0], a)
+            else:
+                visible.append((cursor, a))
+        cursor = max(cursor, b)
+    if cursor <= life_end:
+        if visible and visible[-1][1] >= cursor:
+            visible[-1] = (visible[-1][0], life_end)
+        else:
+            visible.append((cursor, life_end))
+    return visible
+
+
+def visible_intervals(engine: StateEngine, obj: SBObject) -> List[Tuple[float, float]]:
+    """See ``StateEngine.visible_intervals``."""
+    life_start, life_end = obj.life_start, obj.life_end
+    lifetime = [(life_start, life_end)]
+    entry = engine._instances.get(id(obj))
+    if entry is not None:
+        # a template's intervals, moved with the object
+        instance = entry[1]
+        offset = instance.time_offset
+        return [(a + offset, b + offset) for a, b in engine.visible_intervals(instance.template)]
+    # parsing an indexed object's commands here would defeat lazy loading
+    if not getattr(obj.commands, "loaded", True):
+        return lifetime
+    timeline = engine._timeline(obj)
+    if timeline is None:
+        return lifetime
+
+    hidden: List[_Span] = []
+    if timeline.opacity is not None:
+        hidden += _hidden_spans(timeline.opacity, life_start, life_end, _transparent)
+    if timeline.scale is not None:
+        hidden += _hidden_spans(timeline.scale, life_start, life_end, _zero_scale)
+    if not hidden:
+        return lifetime
+    return _complement(life_start, life_end, hidden)
+
+
+def interval_arrays(engine: StateEngine) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(row, start, end) of every visible interval of every object of ``engine.arrays``, by row."""
+    rows: List[int] = []
+    bounds: List[Tuple[float, float]] = []
+    for row, obj in enumerate(engine.arrays.objects):
+        intervals = engine.visible_intervals(obj)
+        rows += [row] * len(intervals)
+        bounds += intervals
+    bounds = np.array(bounds, dtype=np.float64).reshape(-1, 2)
+    return np.array(rows, dtype=np.int64), bounds[:, 0].copy(), bounds[:, 1].copy()
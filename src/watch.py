@@ -0,0 +1,424 @@
+"""
+Live-reload preview for storyboard authoring.
+
+``IncrementalStoryboard`` keeps the parsed storyboard of a beatmap's
+``.osu`` and ``.osb`` in memory. When a file changes, its [Events] text is
+cut into object blocks (an object header plus its command lines) and only
+blocks whose text is new are parsed again; unchanged blocks keep their
+already prepared objects. ``PreviewSession`` polls the files, invalidates
+the added/removed objects in the engine, has the renderer rebuild its index
+of active objects and re-renders the single preview frame.
+"""
+import bisect
+import io
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.models import Storyboard, SBObject, VideoObject, Layer
+from src.parser import StoryboardParser
+from src.parse_diagnostics import ParseDiagnostics
+from src.state_engine import StateEngine
+
+
+# any line starting with "[" switches section, as in StoryboardParser
+_SECTION_RE = re.compile(r"^\[.*$", re.M)
+# lines that start a new current object (see parser._starts_object)
+# (an indented line is a command, a tab-indented one is still an object)
+_OBJECT_RE = re.compile(r"^(?=\t*(?:Sprite|Animation)[ \t]*,)", re.M)
+
+
+def _scan(text: str):
+    """
+    Split *text* into variables, [Events] body spans and object blocks.
+
+    Blocks are ``(offset, first line number, text)`` and start right before a
+    Sprite/Animation line (the first block of a section may instead hold
+    video or other lines that precede it).
+    """
+    variables: Dict[str, str] = {}
+    events: List[Tuple[int, int]] = []
+    blocks: List[Tuple[int, int, str]] = []
+
+    headers = list(_SECTION_RE.finditer(text))
+    for i, header in enumerate(headers):
+        name = header.group(0).rstrip()
+        body_start = header.end() + 1
+        body_end = headers[i + 1].start() if i + 1 < len(headers) else len(text)
+
+        if name == "[Variables]":
+            for line in text[body_start:body_end].splitlines():
+                line = line.rstrip()
+                if line and not line.startswith("//") and "=" in line:
+                    var_name, value = line.split("=", 1)
+                    if var_name.strip():
+                        variables[var_name.strip()] = value.strip()
+        elif name == "[Events]":
+            events.append((body_start, body_end))
+            section = _split_blocks(text, body_start, body_end, text.count("\n", 0, body_start) + 1)
+            if blocks and section and not _OBJECT_RE.match(section[0][2]):
+                # the parser's current object carries over a section switch;
+                # blank lines keep the lines of the tail at their file line
+                start, line_no, block = blocks[-1]
+                gap = section[0][1] - line_no - block.count("\n")
+                blocks[-1] = (start, line_no, block + "\n" * gap + section.pop(0)[2])
+            blocks.extend(section)
+
+    return variables, events, blocks
+
+
+def _split_blocks(text: str, start: int, end: int, line_no: int) -> List[Tuple[int, int, str]]:
+    # *start* must be at the beginning of a line
+    cuts = [m.start() for m in _OBJECT_RE.finditer(text, start, end) if m.start() > start]
+    cuts.append(end)
+    blocks = []
+    for cut in cuts:
+        block = text[start:cut]
+        if block.strip():
+            blocks.append((start, line_no, block))
+        line_no += block.count("\n")
+        start = cut
+    return blocks
+
+
+def split_events(text: str) -> Tuple[Dict[str, str], List[Tuple[int, str]]]:
+    """
+    Split a storyboard file into its variables and its [Events] object blocks.
+
+    Returns ``(variables, blocks)`` where each block is ``(first line number,
+    text)``.
+    """
+    variables, _, blocks = _scan(text)
+    return variables, [(line_no, block) for _, line_no, block in blocks]
+
+
+_CHUNK = 1 << 16
+
+
+def _common_prefix(a: str, b: str, limit: int) -> int:
+    """Length of the common prefix of *a* and *b*, at most *limit*."""
+    lo = 0
+    # whole chunks compare in C; only the mismatching one is bisected
+    while lo < limit:
+        hi = min(lo + _CHUNK, limit)
+        if a[lo:hi] != b[lo:hi]:
+            break
+        lo = hi
+    else:
+        return limit
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if a[lo:mid] == b[lo:mid]:
+            lo = mid
+        else:
+            hi = mid
+    return lo if a[lo] != b[lo] else hi
+
+
+def _common_suffix(a: str, b: str, limit: int) -> int:
+    """Length of the common suffix of *a* and *b*, at most *limit*."""
+    la, lb = len(a), len(b)
+    n = 0
+    while n < limit:
+        m = min(n + _CHUNK, limit)
+        if a[la - m:la - n] != b[lb - m:lb - n]:
+            break
+        n = m
+    else:
+        return limit
+    while m - n > 1:
+        mid = (n + m) // 2
+        if a[la - mid:la - n] == b[lb - mid:lb - n]:
+            n = mid
+        else:
+            m = mid
+    return n if a[la - n - 1] != b[lb - n - 1] else m
+
+
+@dataclass
+class _Block:
+    start: int  # offset in the file text
+    text: str
+    objects: List[SBObject]
+    video: Optional[VideoObject]
+
+
+@dataclass
+class _WatchedFile:
+    path: str
+    stamp: Optional[Tuple[int, int]] = None  # (mtime_ns, size)
+    text: str = ""
+    variables: Dict[str, str] = field(default_factory=dict)
+    events: List[Tuple[int, int]] = field(default_factory=list)
+    blocks: List[_Block] = field(default_factory=list)
+
+
+@dataclass
+class StoryboardChange:
+    added: List[SBObject]
+    removed: List[SBObject]
+    reparsed_blocks: int
+    seconds: float
+    diagnostics: ParseDiagnostics
+
+
+class IncrementalStoryboard:
+    """
+    A storyboard assembled from several files (``.osu`` first, then ``.osb``)
+    that can be refreshed after edits.
+
+    ``storyboard`` is the same object for the whole session; its layer lists
+    are updated in place so an engine or renderer holding it stays valid.
+    Missing files are treated as empty until they appear.
+    """
+
+    def __init__(self, paths: List[str], parser_factory: Callable[[], StoryboardParser] = StoryboardParser):
+        self.files = [_WatchedFile(path) for path in paths]
+        self.parser_factory = parser_factory
+        self.storyboard = Storyboard(lifetimes_computed=True)
+
+    def refresh(self, force: bool = False) -> Optional[StoryboardChange]:
+        """Re-read changed files; returns None when nothing changed."""
+        t0 = time.perf_counter()
+        added: List[SBObject] = []
+        removed: List[SBObject] = []
+        diagnostics = ParseDiagnostics()
+        reparsed = 0
+        changed = False
+
+        for watched in self.files:
+            try:
+                st = os.stat(watched.path)
+                stamp = (st.st_mtime_ns, st.st_size)
+            except FileNotFoundError:
+                stamp = None
+            if stamp == watched.stamp and not force:
+                continue
+            changed = True
+            watched.stamp = stamp
+
+            text = ""
+            if stamp is not None:
+                with open(watched.path, "r", encoding="utf-8") as f:
+                    text = f.read()
+            reparsed += self._update_file(watched, text, added, removed, diagnostics)
+
+        if not changed:
+            return None
+
+        if added or removed:
+            self._assemble()
+        else:
+            # an edit to a Video line reparses a block without objects
+            self.storyboard.video = self._video()
+        for obj in added:
+            StateEngine.prepare_object(obj)
+        return StoryboardChange(added, removed, reparsed, time.perf_counter() - t0, diagnostics)
+
+    def _update_file(
+        self,
+        watched: _WatchedFile,
+        text: str,
+        added: List[SBObject],
+        removed: List[SBObject],
+        diagnostics: ParseDiagnostics,
+    ) -> int:
+        old_text = watched.text
+        if text == old_text:
+            return 0
+        watched.text = text
+
+        region = self._edited_region(watched, old_text, text)
+        if region is None:
+            variables, watched.events, blocks = _scan(text)
+            if variables != watched.variables:
+                # a changed variable table invalidates every block
+                removed.extend(obj for block in watched.blocks for obj in block.objects)
+                watched.blocks = []
+            watched.variables = variables
+            head, old_blocks, tail = [], watched.blocks, []
+        else:
+            first, last, start, end = region
+            blocks = _split_blocks(text, start, end, text.count("\n", 0, start) + 1)
+            head, old_blocks, tail = watched.blocks[:first], watched.blocks[first:last], watched.blocks[last:]
+            delta = len(text) - len(old_text)
+            for block in tail:
+                block.start += delta
+            watched.events = [(s, e + delta) for s, e in watched.events]
+
+        # blocks keyed by text
+        previous: Dict[str, List[_Block]] = {}
+        for block in old_blocks:
+            previous.setdefault(block.text, []).append(block)
+
+        parser = self.parser_factory()
+        new_blocks: List[_Block] = []
+        reparsed = 0
+        for offset, line_no, block_text in blocks:
+            candidates = previous.get(block_text)
+            if candidates:
+                block = candidates.pop(0)
+                block.start = offset
+                new_blocks.append(block)
+                continue
+
+            reparsed += 1
+            parser.current_object = None
+            parser.current_loop = None
+            parser.storyboard = Storyboard()
+            parser.diagnostics.clear()
+            objects = list(
+                parser.iter_objects(io.StringIO("[Events]\n" + block_text), variables=watched.variables)
+            )
+            # block line 2 is file line line_no
+            diagnostics.merge(parser.diagnostics, line_offset=line_no - 2)
+            new_blocks.append(_Block(offset, block_text, objects, parser.storyboard.video))
+            added.extend(objects)
+
+        for leftovers in previous.values():
+            removed.extend(obj for block in leftovers for obj in block.objects)
+
+        watched.blocks = head + new_blocks + tail
+        return reparsed
+
+    @staticmethod
+    def _edited_region(watched: _WatchedFile, old: str, new: str) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Narrow an edit down to the blocks it touches.
+
+        Returns ``(first, last, start, end)``: ``watched.blocks[first:last]``
+        are replaced by whatever ``new[start:end]`` splits into. None means
+        the edit reaches outside the single [Events] section (or adds a
+        section header) and the whole file has to be split again.
+        """
+        if len(watched.events) != 1:
+            return None
+        body_start, body_end = watched.events[0]
+        limit = min(len(old), len(new))
+        prefix = _common_prefix(old, new, limit)
+        suffix = _common_suffix(old, new, limit - prefix)
+        boundary = len(old) - suffix  # the edit is old[prefix:boundary]
+        if prefix < body_start or boundary > body_end:
+            return None
+
+        starts = [block.start for block in watched.blocks]
+        # a block is unchanged if the header line of the block after it is
+        # still inside the common prefix
+        first = bisect.bisect_right(starts, prefix) - 1
+        if first >= 0 and not 0 <= old.find("\n", starts[first]) < prefix:
+            first -= 1
+        first = max(first, 0)
+        # ... or if the newline before its own header is in the common suffix
+        last = max(bisect.bisect_left(starts, boundary + 1), first)
+
+        # re-splitting from the section start also covers its leading lines
+        start = starts[first] if first > 0 else body_start
+        end = (starts[last] if last < len(starts) else body_end) + len(new) - len(old)
+        if _SECTION_RE.search(new, start, end):
+            return None
+        return first, last, start, end
+
+    def _assemble(self):
+        layers = {
+            Layer.Background: [],
+            Layer.Fail: [],
+            Layer.Pass: [],
+            Layer.Foreground: [],
+            Layer.Overlay: [],
+        }
+        # keyed by id(): Enum.__hash__ is a Python-level call per object
+        appenders = {id(layer): objects.append for layer, objects in layers.items()}
+        for watched in self.files:
+            for block in watched.blocks:
+                for obj in block.objects:
+                    appenders[id(obj.layer)](obj)
+
+        sb = self.storyboard
+        sb.background_layer[:] = layers[Layer.Background]
+        sb.fail_layer[:] = layers[Layer.Fail]
+        sb.pass_layer[:] = layers[Layer.Pass]
+        sb.foreground_layer[:] = layers[Layer.Foreground]
+        sb.overlay_layer[:] = layers[Layer.Overlay]
+        sb.video = self._video()
+
+    def _video(self) -> Optional[VideoObject]:
+        for watched in self.files:
+            file_video = None
+            for block in watched.blocks:
+                if block.video is not None:
+                    file_video = block.video  # last one wins within a file
+            # the first file with a video (.osu) owns it, as in Storyboard.merge
+            if file_video is not None:
+                return file_video
+        return None
+
+
+class PreviewSession:
+    """
+    Watch a beatmap's storyboard files and re-render one preview frame on edits.
+
+    *on_frame* receives the rendered ``skia.Image`` after the initial load
+    and after every change.
+    """
+
+    def __init__(
+        self,
+        paths: List[str],
+        asset_path: str,
+        time_ms: int,
+        on_frame: Callable[[object], None],
+        width: int = 1280,
+        height: int = 720,
+        log_callback: Callable[[str, str], None] = lambda message, level: None,
+    ):
+        # imported here so the incremental reparse does not need skia
+        from src.managers import AssetLoader
+        from src.render_skia import SkiaRenderer
+
+        self.time_ms = time_ms
+        self.on_frame = on_frame
+        self.log_callback = log_callback
+        self.source = IncrementalStoryboard(paths)
+        change = self.source.refresh(force=True)
+        self._report(change)
+
+        self.engine = StateEngine(self.source.storyboard)
+        self.renderer = SkiaRenderer(
+            self.engine, AssetLoader(base_path=asset_path), width=width, height=height
+        )
+        self.on_frame(self.renderer.render_frame(self.time_ms))
+
+    def poll(self) -> bool:
+        """Apply pending file changes; returns True if a new frame was rendered."""
+        change = self.source.refresh()
+        if change is None:
+            return False
+        for obj in change.removed + change.added:
+            self.engine.invalidate(obj)
+        self.renderer.update_objects()
+        self.on_frame(self.renderer.render_frame(self.time_ms))
+        self._report(change)
+        return True
+
+    def run(self, stop_event: threading.Event, interval: float = 0.2):
+        while not stop_event.is_set():
+            t0 = time.perf_counter()
+            if self.poll():
+                self.log_callback(
+                    f"Preview updated in {(time.perf_counter() - t0) * 1000:.0f} ms", "INFO"
+                )
+            stop_event.wait(interval)
+
+    def _report(self, change: Optional[StoryboardChange]):
+        if change is None:
+            return
+        self.log_callback(
+            f"Reparsed {change.reparsed_blocks} block(s): +{len(change.added)} "
+            f"-{len(change.removed)} objects in {change.seconds * 1000:.0f} ms",
+            "INFO",
+        )
+        if change.diagnostics:
+            self.log_callback(change.diagnostics.summary(), "WARNING")
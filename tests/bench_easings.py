@@ -0,0 +1,165 @@
+"""
+Micro-benchmarks for the easing functions.
+
+Usage:
+    uv run tests/bench_easings.py calls [--calls 200000] [--resolution 1024]
+    uv run tests/bench_easings.py kernels [--values 1000000]
+    uv run tests/bench_easings.py mixed [--values 1000000] [--resolution 1024]
+
+Prints a Markdown table of the best of ``--repeat`` runs, in calls or eased values per second.
+"""
+
+import os
+import sys
+import math
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import src.easings as easings
+from src.easings import apply_easing, apply_easing_array, easing_function, EasingLUT
+from tests.bench_parser import _best_of, _print_table
+
+# easing ids and their names, in apply_easing order
+EASINGS = (
+    "Linear", "Out (legacy)", "In (legacy)",
+    "QuadIn", "QuadOut", "QuadInOut", "CubicIn", "CubicOut", "CubicInOut",
+    "QuartIn", "QuartOut", "QuartInOut", "QuintIn", "QuintOut", "QuintInOut",
+    "SineIn", "SineOut", "SineInOut", "ExpoIn", "ExpoOut", "ExpoInOut",
+    "CircIn", "CircOut", "CircInOut",
+    "ElasticIn", "ElasticOut", "ElasticHalfOut", "ElasticQuarterOut", "ElasticInOut",
+    "BackIn", "BackOut", "BackInOut", "BounceIn", "BounceOut", "BounceInOut",
+)
+
+# the Python loop is ~1000x slower; time it on fewer values
+_SCALAR_VALUES = 20000
+
+
+def _rebuilt_map(easing_id: int, t: float) -> float:
+    """apply_easing before the registry: clamps, then builds its id -> function dict on every call."""
+    if t < 0.0:
+        t = 0.0
+    elif t > 1.0:
+        t = 1.0
+    e = easings
+    easing_map = {
+        0: lambda t: t, 1: e.quad_out, 2: e.quad_in,
+        3: e.quad_in, 4: e.quad_out, 5: e.quad_in_out,
+        6: e.cubic_in, 7: e.cubic_out, 8: e.cubic_in_out,
+        9: e.quart_in, 10: e.quart_out, 11: e.quart_in_out,
+        12: e.quint_in, 13: e.quint_out, 14: e.quint_in_out,
+        15: e.sine_in, 16: e.sine_out, 17: e.sine_in_out,
+        18: e.expo_in, 19: e.expo_out, 20: e.expo_in_out,
+        21: e.circ_in, 22: e.circ_out, 23: e.circ_in_out,
+        24: e.elastic_in, 25: e.elastic_out, 26: e.elastic_out_half, 27: e.elastic_out_quarter,
+        28: e.elastic_in_out,
+        29: e.back_in, 30: e.back_out, 31: e.back_in_out,
+        32: e.bounce_in, 33: e.bounce_out, 34: e.bounce_in_out,
+    }
+    return easing_map.get(easing_id, lambda t: t)(t)
+
+
+def _calls_per_second(function, values, repeat: int) -> float:
+    return len(values) / _best_of(lambda: [function(t) for t in values], repeat)
+
+
+def bench_calls(calls: int, resolution: int, repeat: int):
+    """Scalar calls per easing id, as StateEngine makes them: per-call dict, registry, LUT."""
+    values = np.random.default_rng(0).random(calls).tolist()
+    lut = EasingLUT(resolution)
+    rows = []
+    for easing_id, name in enumerate(EASINGS):
+        rebuilt = _calls_per_second(lambda t: _rebuilt_map(easing_id, t), values, repeat)
+        registry = _calls_per_second(lambda t: apply_easing(easing_id, t), values, repeat)
+        direct = _calls_per_second(easing_function(easing_id), values, repeat)
+        table = _calls_per_second(lut.function(easing_id), values, repeat)
+        rows.append([
+            easing_id, name, f"{rebuilt / 1e6:,.2f} M/s", f"{registry / 1e6:,.2f} M/s",
+            f"{direct / 1e6:,.2f} M/s", f"{table / 1e6:,.2f} M/s", f"{lut.errors[easing_id]:.1e}",
+        ])
+    geo = [math.exp(sum(math.log(float(row[i].split()[0].replace(",", ""))) for row in rows) / len(rows))
+           for i in range(2, 6)]
+    rows.append(["", "Geometric mean", *(f"{g:,.2f} M/s" for g in geo), f"{lut.max_error:.1e} (max)"])
+    print(f"\n{calls:,} calls per easing; LUT at {resolution:,} intervals ({lut.summary()})\n")
+    _print_table(["Id", "Easing", "Dict per call", "apply_easing", "easing_function", "LUT", "LUT error"],
+                 rows)
+
+
+def _scalar_fallback(easing_ids, t: np.ndarray) -> np.ndarray:
+    """apply_easing_array before the NumPy kernels: one apply_easing call per value."""
+    t = np.clip(np.asarray(t, dtype=np.float64), 0.0, 1.0)
+    ids = np.broadcast_to(np.asarray(easing_ids), t.shape)
+    out = t.copy()
+    for easing_id in np.unique(ids).tolist():
+        if easing_id == 0:
+            continue
+        mask = ids == easing_id
+        out[mask] = [apply_easing(easing_id, value) for value in t[mask].tolist()]
+    return out
+
+
+def bench_kernels(values: int, repeat: int):
+    """One easing id over an array of progress values, for every id."""
+    t = np.random.default_rng(0).random(values)
+    few = t[:_SCALAR_VALUES]
+    rows = []
+    for easing_id, name in enumerate(EASINGS):
+        scalar = _best_of(lambda: _scalar_fallback(easing_id, few), repeat)
+        kernel = _best_of(lambda: apply_easing_array(easing_id, t), repeat)
+        rows.append([
+            easing_id, name, f"{len(few) / scalar / 1e6:,.2f} M/s", f"{values / kernel / 1e6:,.1f} M/s",
+            f"{(values / kernel) / (len(few) / scalar):,.0f}x",
+        ])
+    print(f"\n{values:,} progress values per easing ({_SCALAR_VALUES:,} for the per-value loop)\n")
+    _print_table(["Id", "Easing", "Per value", "NumPy kernel", "Speedup"], rows)
+
+
+def bench_mixed(values: int, resolution: int, repeat: int):
+    """Values with random easing ids, as evaluate_batch passes them."""
+    lut = EasingLUT(resolution)
+    rng = np.random.default_rng(1)
+    t = rng.random(values)
+    ids = rng.integers(0, len(EASINGS), values)
+    # what storyboards mostly use: linear and a few quad / sine easings
+    common = rng.choice([0, 0, 0, 1, 2, 3, 4, 15, 16], values)
+    rows = []
+    for label, easing_ids in (("All 35 ids", ids), ("Mostly linear / quad / sine", common)):
+        scalar = _best_of(lambda: _scalar_fallback(easing_ids[:_SCALAR_VALUES], t[:_SCALAR_VALUES]), repeat)
+        kernel = _best_of(lambda: apply_easing_array(easing_ids, t), repeat)
+        table = _best_of(lambda: lut.apply_array(easing_ids, t), repeat)
+        rows.append([label, f"{_SCALAR_VALUES / scalar / 1e6:,.2f} M/s", f"{values / kernel / 1e6:,.1f} M/s",
+                     f"{(values / kernel) / (_SCALAR_VALUES / scalar):,.0f}x", f"{values / table / 1e6:,.1f} M/s"])
+    print(f"\n{values:,} progress values with an easing id each; LUT at {resolution:,} intervals\n")
+    _print_table(["Ids", "Per value", "NumPy kernels", "Speedup", "LUT"], rows)
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Easing micro-benchmarks")
+    ap.add_argument("--repeat", type=int, default=3)
+    sub = ap.add_subparsers(dest="bench", required=True)
+
+    p_c = sub.add_parser("calls", help="Per easing id: scalar calls/s with a dict per call, the registry and a LUT")
+    p_c.add_argument("--calls", type=int, default=200000)
+    p_c.add_argument("--resolution", type=int, default=1024)
+
+    p_k = sub.add_parser("kernels", help="Per easing id: apply_easing per value vs the NumPy kernel")
+    p_k.add_argument("--values", type=int, default=1000000)
+
+    p_m = sub.add_parser("mixed", help="Random easing ids per value: apply_easing per value vs apply_easing_array")
+    p_m.add_argument("--values", type=int, default=1000000)
+    p_m.add_argument("--resolution", type=int, default=1024)
+
+    args = ap.parse_args()
+
+    if args.bench == "calls":
+        bench_calls(args.calls, args.resolution, args.repeat)
+    elif args.bench == "kernels":
+        bench_kernels(args.values, args.repeat)
+    elif args.bench == "mixed":
+        bench_mixed(args.values, args.resolution, args.repeat)
@@ -0,0 +1,581 @@
+"""
+Micro-benchmarks for the state engine on synthetic storyboards.
+
+Usage:
+    uv run tests/bench_engine.py timeline [--objects 5000] [--heavy-commands 2000]
+    uv run tests/bench_engine.py cursor [--objects 200] [--fps 60]
+    uv run tests/bench_engine.py loops [--iterations 10000]
+    uv run tests/bench_engine.py alloc [--sprites 2000] [--frames 60]
+    uv run tests/bench_engine.py batch [--sprites 5000] [--frames 60]
+    uv run tests/bench_engine.py streams [--sprites 5000] [--frames 600]
+    uv run tests/bench_engine.py visible [--sprites 5000] [--frames 600]
+    uv run tests/bench_engine.py templates [--particles 20000] [--frames 600]
+    uv run tests/bench_engine.py static [--sprites 5000] [--frames 600]
+    uv run tests/bench_engine.py keyframes [--sprites 1000] [--frames 600]
+
+Prints a Markdown table of the best of ``--repeat`` runs.
+"""
+
+import os
+import sys
+import random
+import argparse
+import tempfile
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models import Storyboard, Sprite, Layer, Origin, Command, LoopCommand, ObjectState, Vector2
+from src.parser import StoryboardParser
+from src.state_engine import StateEngine
+from src.state_streams import StateStreams, frame_times
+from src.storyboard_arrays import LAYER_ORDER
+from src.active_index import ActiveIndex
+from src.visibility import interval_arrays
+from src.render_skia import SkiaRenderer
+from src.keyframes import KeyframeTables
+from tests.bench_parser import make_large_osb, _write_temp, _best_of, _print_table
+
+
+def _alive_objects(storyboard):
+    return [
+        obj
+        for layer in (storyboard.background_layer, storyboard.fail_layer, storyboard.pass_layer,
+                      storyboard.foreground_layer, storyboard.overlay_layer)
+        for obj in layer
+    ]
+
+
+def make_heavy_object(commands: int, seed: int = 0) -> Sprite:
+    """One sprite driven by *commands* back-to-back commands, like a generated particle path."""
+    rng = random.Random(seed)
+    obj = Sprite(Layer.Pass, Origin.Centre, "sb/heavy.png", Vector2(320, 240))
+    for i in range(commands):
+        kind = rng.choice(["F", "MX", "MY", "S", "R"])
+        obj.commands.append(Command(kind, rng.randint(0, 3), i * 100, i * 100 + 100,
+                                    [rng.random(), rng.random()]))
+    return obj
+
+
+# ---------------------------------------------------------------------------
+# Compiled timelines
+# ---------------------------------------------------------------------------
+
+def bench_timeline(objects: int, heavy_commands: int, repeat: int, step: int = 100):
+    """get_object_state calls/s: scanning every command vs compiled per-property tracks."""
+    path = _write_temp(make_large_osb(objects))
+    try:
+        storyboard = StoryboardParser().parse(path)
+    finally:
+        os.unlink(path)
+    heavy = make_heavy_object(heavy_commands)
+    storyboard.add_object(heavy)
+    engine = StateEngine(storyboard)
+
+    typical = [
+        (obj, t)
+        for obj in _alive_objects(storyboard) if obj is not heavy
+        for t in range(int(obj.life_start), int(obj.life_end) + 1, step)
+    ]
+    heavy_work = [(heavy, t) for t in range(int(heavy.life_start), int(heavy.life_end) + 1, step * 10)]
+
+    def rate(evaluate, work, runs):
+        def go():
+            for obj, t in work:
+                evaluate(obj, t)
+        return f"{len(work) / _best_of(go, runs):,.0f}/s"
+
+    rows = []
+    for label, work in ((f"{objects:,} storyboard objects", typical),
+                        (f"1 object with {heavy_commands:,} commands", heavy_work)):
+        scan = rate(engine._scan_object_state, work, repeat)
+        engine.invalidate()
+        first = rate(engine.get_object_state, work, 1)  # compiles every object
+        rows.append([label, scan, first, rate(engine.get_object_state, work, repeat)])
+    print(f"\nStates every {step} ms of each object's life\n")
+    _print_table(["Workload", "Scan", "Compiled, first pass", "Compiled"], rows)
+
+
+# ---------------------------------------------------------------------------
+# Sequential cursor
+# ---------------------------------------------------------------------------
+
+def bench_cursor(objects: int, fps: int, repeat: int):
+    """States/s over a sequential render as command histories grow: scan, bisect, cursor."""
+    rows = []
+    for commands in (10, 100, 1000, 10000):
+        storyboard = Storyboard()
+        sprites = [make_heavy_object(commands, seed=i) for i in range(objects)]
+        for obj in sprites:
+            storyboard.add_object(obj)
+        engine = StateEngine(storyboard)
+        # 5 s of frames spread over the whole history, always moving forward
+        span = commands * 100
+        frames = [span * i // (5 * fps) for i in range(5 * fps)]
+        calls = len(frames) * objects
+
+        def render(evaluate):
+            def go():
+                for t in frames:
+                    for obj in sprites:
+                        evaluate(obj, t)
+            return f"{calls / _best_of(go, repeat):,.0f}/s"
+
+        def with_cursor():
+            cursor = engine.cursor()
+            for t in frames:
+                for obj in sprites:
+                    cursor.get_object_state(obj, t)
+
+        scan = render(engine._scan_object_state) if commands <= 1000 else "-"
+        rows.append([f"{commands:,}", scan, render(engine.get_object_state),
+                     f"{calls / _best_of(with_cursor, repeat):,.0f}/s"])
+    print(f"\n{objects} objects, {5 * fps} frames moving forward through their commands\n")
+    _print_table(["Commands/object", "Scan", "Compiled (bisect)", "StateCursor"], rows)
+
+
+# ---------------------------------------------------------------------------
+# Loops
+# ---------------------------------------------------------------------------
+
+def bench_loops(iterations: int, repeat: int, samples: int = 2000):
+    """Loop evaluations/s: walking the loop's commands vs its compiled loop table."""
+    rows = []
+    for commands in (10, 100, 1000):
+        rng = random.Random(commands)
+        loop = LoopCommand(0, iterations)
+        for i in range(commands):
+            loop.commands.append(Command(rng.choice(["F", "MX", "MY", "S", "R"]), rng.randint(0, 3),
+                                         i * 10, i * 10 + 10, [rng.random(), rng.random()]))
+        loop.sub_max = commands * 10
+        engine = StateEngine(Storyboard())
+        span = loop.sub_max * iterations
+        times = [span * i // samples for i in range(samples)]
+
+        def evaluate():
+            for t in times:
+                engine._process_loop(loop, t, ObjectState(visible=True, position=Vector2(0, 0)))
+
+        compiled = _best_of(evaluate, repeat)
+        engine._loop_table(loop).tracks = None  # fall back to walking the commands
+        walked = _best_of(evaluate, repeat)
+        rows.append([f"{commands:,}", f"{samples / walked:,.0f}/s", f"{samples / compiled:,.0f}/s"])
+    print(f"\nOne loop of {iterations:,} iterations, {samples:,} times spread over it\n")
+    _print_table(["Commands in loop", "Walk commands", "Loop table"], rows)
+
+
+# ---------------------------------------------------------------------------
+# Allocations
+# ---------------------------------------------------------------------------
+
+def _frame_allocations(draw_frame, times):
+    """Mean (blocks, bytes) tracemalloc sees allocated per frame while the frame's states are held."""
+    blocks = size = 0
+    tracemalloc.start()
+    try:
+        for t in times:
+            before = tracemalloc.take_snapshot().statistics("filename")
+            held = draw_frame(t)
+            after = tracemalloc.take_snapshot().statistics("filename")
+            blocks += sum(s.count for s in after) - sum(s.count for s in before)
+            size += sum(s.size for s in after) - sum(s.size for s in before)
+            del held
+    finally:
+        tracemalloc.stop()
+    return blocks / len(times), size / len(times)
+
+
+def bench_alloc(sprites: int, frames: int, repeat: int):
+    """Per-frame allocations and states/s: get_object_state vs get_object_state_into a pool."""
+    storyboard = make_particle_storyboard(sprites)
+    engine = StateEngine(storyboard)
+    objects = list(engine.arrays.objects)
+    times = [10000 * i // frames for i in range(frames)]
+    pool = [ObjectState() for _ in objects]
+
+    def allocating(t, cursor):
+        # a renderer holds the states of the objects it draws until the frame is done
+        return [cursor.get_object_state(obj, t) for obj in objects]
+
+    def pooled(t, cursor):
+        for obj, out in zip(objects, pool):
+            cursor.get_object_state_into(obj, t, out)
+        return pool
+
+    rows = []
+    for label, evaluate in (("get_object_state", allocating), ("get_object_state_into + pool", pooled)):
+        cursor = engine.cursor()
+        evaluate(0, cursor)  # compile outside the measurements
+        blocks, size = _frame_allocations(lambda t: evaluate(t, cursor), times[: min(frames, 20)])
+
+        def run():
+            run_cursor = engine.cursor()
+            for t in times:
+                evaluate(t, run_cursor)
+
+        rows.append([label, f"{blocks:,.0f}", f"{size / 1024:,.0f} KiB",
+                     f"{frames * sprites / _best_of(run, repeat):,.0f}/s"])
+    print(f"\n{sprites:,} sprites, {frames} frames\n")
+    _print_table(["State path", "Blocks/frame", "Bytes/frame", "States"], rows)
+
+
+# ---------------------------------------------------------------------------
+# Batch evaluation
+# ---------------------------------------------------------------------------
+
+def make_particle_storyboard(sprites: int, seed: int = 0) -> Storyboard:
+    """*sprites* particles alive over the same 10 s, each with a handful of commands."""
+    rng = random.Random(seed)
+    storyboard = Storyboard()
+    for _ in range(sprites):
+        obj = Sprite(Layer.Foreground, Origin.Centre, "sb/p.png",
+                     Vector2(rng.randrange(640), rng.randrange(480)))
+        obj.commands.append(Command("F", 0, 0, 500, [0.0, 1.0]))
+        obj.commands.append(Command("M", rng.randint(0, 20), 0, 10000,
+                                    [obj.position.x, obj.position.y, rng.randrange(640), rng.randrange(480)]))
+        obj.commands.append(Command("S", 1, 0, 10000, [rng.random(), rng.random()]))
+        obj.commands.append(Command("R", 0, 0, 10000, [0.0, rng.random() * 6]))
+        obj.commands.append(Command("F", 0, 9500, 10000, [1.0, 0.0]))
+        storyboard.add_object(obj)
+    return storyboard
+
+
+def bench_batch(sprites: int, frames: int, repeat: int):
+    """States/s for one frame of many simultaneous sprites: per object vs evaluate_batch."""
+    rows = []
+    for count in (sprites // 10, sprites):
+        storyboard = make_particle_storyboard(count)
+        engine = StateEngine(storyboard)
+        row_ids = np.arange(len(engine.arrays))
+        objects = list(engine.arrays.objects)
+        times = [10000 * i // frames for i in range(frames)]
+        calls = frames * count
+
+        def per_object():
+            for t in times:
+                for obj in objects:
+                    engine.get_object_state(obj, t)
+
+        def batch():
+            for t in times:
+                engine.evaluate_batch(row_ids, t)
+
+        engine.evaluate_batch(row_ids, 0)  # build the tables outside the timing
+        rows.append([f"{count:,}", f"{calls / _best_of(per_object, repeat):,.0f}/s",
+                     f"{calls / _best_of(batch, repeat):,.0f}/s"])
+    print(f"\n{frames} frames of sprites alive at the same time\n")
+    _print_table(["Sprites", "get_object_state", "evaluate_batch"], rows)
+
+
+# ---------------------------------------------------------------------------
+# State streams
+# ---------------------------------------------------------------------------
+
+def bench_streams(sprites: int, frames: int, repeat: int, fps: int = 60):
+    """A render worker's per-frame state cost: StateCursor vs reading precomputed streams."""
+    storyboard = make_particle_storyboard(sprites)
+    engine = StateEngine(storyboard)
+    row_ids = np.arange(len(engine.arrays))
+    objects = list(engine.arrays.objects)
+    times = frame_times(fps, 0, frames).tolist()
+    calls = frames * sprites
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "states.npy")
+        build = _best_of(lambda: StateStreams.build(engine, path, fps, 0, frames), 1)
+        streams = StateStreams.build(engine, path, fps, 0, frames)
+
+        def with_cursor():
+            cursor = engine.cursor()
+            for t in times:
+                for obj in objects:
+                    cursor.get_object_state(obj, t)
+
+        def read_streams():
+            for frame in range(frames):
+                streams.states(row_ids, frame)
+
+        rows = [
+            ["StateCursor", "-", f"{calls / _best_of(with_cursor, repeat):,.0f}/s"],
+            ["State streams", f"{build * 1000:,.0f} ms ({os.path.getsize(path) / 2**20:,.0f} MiB)",
+             f"{calls / _best_of(read_streams, repeat):,.0f}/s"],
+        ]
+        del streams
+    print(f"\n{sprites:,} sprites over {frames} frames at {fps} fps\n")
+    _print_table(["Worker reads", "Precompute", "States"], rows)
+
+
+# ---------------------------------------------------------------------------
+# Visible intervals
+# ---------------------------------------------------------------------------
+
+def make_pulse_storyboard(sprites: int, seed: int = 0) -> Storyboard:
+    """*sprites* lights alive for 60 s that flash for 400 ms of every 2 s loop iteration."""
+    rng = random.Random(seed)
+    storyboard = Storyboard()
+    for _ in range(sprites):
+        obj = Sprite(Layer.Foreground, Origin.Centre, "sb/light.png",
+                     Vector2(rng.randrange(640), rng.randrange(480)))
+        loop = LoopCommand(rng.randrange(2000), 30)
+        offset = rng.randrange(0, 1600, 100)
+        loop.commands.append(Command("F", 0, 0, 0, [0.0, 0.0]))
+        loop.commands.append(Command("F", 0, offset, offset + 200, [0.0, 1.0]))
+        loop.commands.append(Command("F", 0, offset + 200, offset + 400, [1.0, 0.0]))
+        loop.commands.append(Command("F", 0, 2000, 2000, [0.0, 0.0]))
+        obj.commands.append(Command("S", 0, 0, 60000, [0.5, 1.5]))
+        obj.commands.append(loop)
+        storyboard.add_object(obj)
+    return storyboard
+
+
+def bench_visible(sprites: int, frames: int, repeat: int, fps: int = 60):
+    """State evaluations per frame: objects alive by lifetime vs by visible interval."""
+    engine = StateEngine(make_pulse_storyboard(sprites))
+    arrays = engine.arrays
+    times = frame_times(fps, 2000, frames).tolist()
+
+    def frame_states(index):
+        def run():
+            cursor, state, objects = engine.cursor(), ObjectState(), arrays.objects
+            for t in times:
+                for layer in LAYER_ORDER:
+                    for row in index.rows(layer, t).tolist():
+                        cursor.get_object_state_into(objects[row], t, state)
+        return run
+
+    build = _best_of(lambda: (engine.invalidate(), interval_arrays(engine)), 1)
+    lifetime = ActiveIndex(arrays)
+    visible = ActiveIndex(arrays, interval_arrays(engine))
+    frame_states(visible)()  # count one pass for the stats
+    rows = [
+        ["Lifetime", "-", f"{sum(len(lifetime.rows(layer, t)) for t in times for layer in LAYER_ORDER) / frames:,.0f}",
+         f"{_best_of(frame_states(lifetime), repeat) / frames * 1000:,.2f} ms"],
+        ["Visible intervals", f"{build * 1000:,.0f} ms", f"{visible.stats.returned / frames:,.0f}",
+         f"{_best_of(frame_states(visible), repeat) / frames * 1000:,.2f} ms"],
+    ]
+    print(f"\n{sprites:,} pulsing sprites over {frames} frames at {fps} fps\n")
+    _print_table(["Index", "Build", "Objects/frame", "States/frame"], rows)
+    print(f"\n{visible.stats.summary()}")
+
+
+# ---------------------------------------------------------------------------
+# Templates
+# ---------------------------------------------------------------------------
+
+def make_particle_effect(particles: int, seed: int = 0) -> Storyboard:
+    """A generated effect: *particles* sprites with one command list, moved in time and space."""
+    rng = random.Random(seed)
+    storyboard = Storyboard()
+    for _ in range(particles):
+        spawn, x, y = rng.randrange(0, 60000, 10), rng.randrange(640), rng.randrange(480)
+        obj = Sprite(Layer.Foreground, Origin.Centre, "sb/dot.png", Vector2(x, y))
+        obj.commands.append(Command("F", 1, spawn, spawn + 300, [0.0, 0.8]))
+        obj.commands.append(Command("M", 7, spawn, spawn + 2000, [x, y, x + 120, y - 80]))
+        obj.commands.append(Command("S", 0, spawn + 500, spawn + 1500, [1.0, 0.2]))
+        obj.commands.append(Command("R", 0, spawn, spawn + 2000, [0.0, 3.14]))
+        obj.commands.append(Command("C", 0, spawn, spawn + 2000, [255, 200, 120, 120, 160, 255]))
+        obj.commands.append(Command("P", 0, spawn, spawn + 2000, ["A"]))
+        obj.commands.append(Command("F", 0, spawn + 1800, spawn + 2000, [0.8, 0.0]))
+        storyboard.add_object(obj)
+    return storyboard
+
+
+def bench_templates(particles: int, frames: int, repeat: int, fps: int = 60):
+    """Compiled timeline memory and render passes: one timeline per object vs per template."""
+    times = frame_times(fps, 0, 60 * fps).tolist()[::max(1, 60 * fps // frames)]
+    rows = []
+    for collapse in (False, True):
+        engine = StateEngine(make_particle_effect(particles))
+        objects = _alive_objects(engine.storyboard)
+        alive = [[obj for obj in objects if obj.life_start <= t <= obj.life_end] for t in times]
+        calls = sum(map(len, alive))
+        collapsed = "-"
+        if collapse:
+            stats = engine.collapse_templates()
+            collapsed = f"{stats.collapsed:,} into {stats.templates:,}"
+            collapsed += f" ({_best_of(engine.collapse_templates, 1) * 1000:,.0f} ms)"
+        state = ObjectState()
+
+        def render():
+            cursor = engine.cursor()
+            for t, drawn in zip(times, alive):
+                for obj in drawn:
+                    cursor.get_object_state_into(obj, t, state)
+
+        tracemalloc.start()
+        first = _best_of(render, 1)  # compiles what it touches
+        compiled = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        rows.append(["Per template" if collapse else "Per object", collapsed, f"{compiled / 2**20:,.1f} MiB",
+                     f"{calls / first:,.0f}/s", f"{calls / _best_of(render, repeat):,.0f}/s"])
+    print(f"\n{particles:,} particles over 60 s, {len(times)} frames\n")
+    _print_table(["Timelines", "Collapsed", "Compiled", "First pass", "States"], rows)
+
+
+# ---------------------------------------------------------------------------
+# Constant spans
+# ---------------------------------------------------------------------------
+
+def make_static_storyboard(sprites: int, moving: float = 0.05, seed: int = 0) -> Storyboard:
+    """A mostly static scene: *sprites* that fade in, hold for 60 s and fade out; a few keep moving."""
+    rng = random.Random(seed)
+    storyboard = Storyboard()
+    for _ in range(sprites):
+        x, y = rng.randrange(640), rng.randrange(480)
+        obj = Sprite(Layer.Background, Origin.Centre, "sb/bg.png", Vector2(x, y))
+        start = rng.randrange(0, 1000, 10)
+        obj.commands.append(Command("F", 0, start, start + 500, [0.0, 1.0]))
+        if rng.random() < moving:
+            obj.commands.append(Command("M", 0, start, start + 60000, [x, y, x + 50, y + 50]))
+        else:
+            obj.commands.append(Command("S", 0, start, start + 60000, [0.8, 0.8]))
+        obj.commands.append(Command("F", 0, start + 60000, start + 60500, [1.0, 0.0]))
+        storyboard.add_object(obj)
+    return storyboard
+
+
+def bench_static(sprites: int, frames: int, repeat: int, fps: int = 60):
+    """The renderer's state stage on a mostly static scene: evaluating every frame vs held states."""
+    engine = StateEngine(make_static_storyboard(sprites))
+    renderer = SkiaRenderer(engine, None, 640, 480)
+    arrays = engine.arrays
+    times = frame_times(fps, 2000, frames).tolist()
+
+    def evaluate_all():
+        cursor, state, objects = engine.cursor(), ObjectState(), renderer._objects
+        for t in times:
+            for layer in LAYER_ORDER:
+                for obj in objects[renderer.index.rows(layer, t)].tolist():
+                    cursor.get_object_state_into(obj, t, state)
+
+    def held_states():
+        # draw_to_canvas without the drawing
+        renderer._build_index()
+        renderer.states = engine.cursor()
+        evaluated = 0
+        for t in times:
+            renderer._pool_used = 0
+            held = renderer._held
+            for layer in LAYER_ORDER:
+                for obj in renderer._objects[renderer.index.rows(layer, t)].tolist():
+                    entry = held.get(id(obj))
+                    if entry is None or not entry[0] < t < entry[1]:
+                        renderer._evaluate(obj, t)
+                        evaluated += 1
+        return evaluated
+
+    evaluated = held_states()
+    calls = sum(len(renderer.index.rows(layer, t)) for t in times for layer in LAYER_ORDER)
+    build = _best_of(lambda: [engine.invalidate(), [engine.constant_spans(obj) for obj in arrays.objects]], 1)
+    rows = [
+        ["Every frame", "-", f"{calls / frames:,.0f}", f"{_best_of(evaluate_all, repeat) / frames * 1000:,.2f} ms"],
+        ["Held states", f"{build * 1000:,.0f} ms", f"{evaluated / frames:,.1f}",
+         f"{_best_of(held_states, repeat) / frames * 1000:,.2f} ms"],
+    ]
+    print(f"\n{sprites:,} sprites, {frames} frames at {fps} fps\n")
+    _print_table(["States", "Spans", "Evaluated/frame", "State stage/frame"], rows)
+
+
+# ---------------------------------------------------------------------------
+# Keyframes
+# ---------------------------------------------------------------------------
+
+def bench_keyframes(sprites: int, frames: int, repeat: int, fps: int = 60):
+    """Approximate states from keyframe tables vs exact evaluate_batch, on particles and pulsing lights."""
+    boards = (("Particles", make_particle_effect(sprites)), ("Pulses", make_pulse_storyboard(sprites)))
+    settings = (("Every 16 ms", 16, 0.0, 0.0), ("0.5 px / 0.01", 16, 0.5, 0.01), ("2 px / 0.05", 16, 2.0, 0.05))
+    rows = []
+    for name, storyboard in boards:
+        engine = StateEngine(storyboard)
+        times = frame_times(fps, 2000, frames).tolist()
+        engine.evaluate_batch([0], 0)  # build the batch tables outside the timings
+        for label, step, position, opacity in settings:
+            best = None
+            for _ in range(repeat):
+                tables = KeyframeTables.build(engine, step, position, opacity)
+                stats = tables.compare(engine, times)
+                if best is None or stats.approx_seconds < best.approx_seconds:
+                    best = stats
+            rows.append([
+                name, label, f"{best.keyframes:,}", f"{best.build_seconds:,.2f} s",
+                f"{best.position_error:.3f} px", f"{best.opacity_error:.4f}", f"{best.visibility_errors:,}",
+                f"{best.exact_seconds / frames * 1000:,.2f} ms", f"{best.approx_seconds / frames * 1000:,.2f} ms",
+                f"{best.speedup:.1f}x",
+            ])
+    print(f"\n{sprites:,} sprites per storyboard, {frames} frames at {fps} fps\n")
+    _print_table(["Storyboard", "Tolerance", "Keyframes", "Build", "Max position", "Max opacity",
+                  "Visibility", "Exact/frame", "Keyframes/frame", "Speedup"], rows)
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="State engine micro-benchmarks")
+    ap.add_argument("--repeat", type=int, default=3)
+    sub = ap.add_subparsers(dest="bench", required=True)
+
+    p_tl = sub.add_parser("timeline", help="Command scan vs compiled per-property timelines")
+    p_tl.add_argument("--objects", type=int, default=5000)
+    p_tl.add_argument("--heavy-commands", type=int, default=2000)
+
+    p_cur = sub.add_parser("cursor", help="Sequential render: bisect per frame vs StateCursor")
+    p_cur.add_argument("--objects", type=int, default=200)
+    p_cur.add_argument("--fps", type=int, default=60)
+
+    p_loop = sub.add_parser("loops", help="Loop evaluation: walking its commands vs the compiled loop table")
+    p_loop.add_argument("--iterations", type=int, default=10000)
+
+    p_alloc = sub.add_parser("alloc", help="Per-frame allocations: new states vs reused state records")
+    p_alloc.add_argument("--sprites", type=int, default=2000)
+    p_alloc.add_argument("--frames", type=int, default=60)
+
+    p_batch = sub.add_parser("batch", help="Per-object states vs one evaluate_batch call per frame")
+    p_batch.add_argument("--sprites", type=int, default=5000)
+    p_batch.add_argument("--frames", type=int, default=60)
+
+    p_st = sub.add_parser("streams", help="Worker state reads: StateCursor vs precomputed state streams")
+    p_st.add_argument("--sprites", type=int, default=5000)
+    p_st.add_argument("--frames", type=int, default=600)
+
+    p_vis = sub.add_parser("visible", help="Objects evaluated per frame: lifetimes vs visible intervals")
+    p_vis.add_argument("--sprites", type=int, default=5000)
+    p_vis.add_argument("--frames", type=int, default=600)
+
+    p_tpl = sub.add_parser("templates", help="Particle effects: one compiled timeline per object vs per template")
+    p_tpl.add_argument("--particles", type=int, default=20000)
+    p_tpl.add_argument("--frames", type=int, default=600)
+
+    p_sta = sub.add_parser("static", help="Mostly static scene: evaluating every frame vs held constant states")
+    p_sta.add_argument("--sprites", type=int, default=5000)
+    p_sta.add_argument("--frames", type=int, default=600)
+
+    p_kf = sub.add_parser("keyframes", help="Approximate previews: keyframe tables vs exact batch states")
+    p_kf.add_argument("--sprites", type=int, default=1000)
+    p_kf.add_argument("--frames", type=int, default=600)
+
+    args = ap.parse_args()
+
+    if args.bench == "timeline":
+        bench_timeline(args.objects, args.heavy_commands, args.repeat)
+    elif args.bench == "cursor":
+        bench_cursor(args.objects, args.fps, args.repeat)
+    elif args.bench == "loops":
+        bench_loops(args.iterations, args.repeat)
+    elif args.bench == "alloc":
+        bench_alloc(args.sprites, args.frames, args.repeat)
+    elif args.bench == "batch":
+        bench_batch(args.sprites, args.frames, args.repeat)
+    elif args.bench == "streams":
+        bench_streams(args.sprites, args.frames, args.repeat)
+    elif args.bench == "visible":
+        bench_visible(args.sprites, args.frames, args.repeat)
+    elif args.bench == "templates":
+        bench_templates(args.particles, args.frames, args.repeat)
+    elif args.bench == "static":
+        bench_static(args.sprites, args.frames, args.repeat)
+    elif args.bench == "keyframes":
+        bench_keyframes(args.sprites, args.frames, args.repeat)
@@ -0,0 +1,652 @@
+"""
+Micro-benchmarks for the storyboard parser on synthetic storyboards.
+
+Usage:
+    uv run tests/bench_parser.py variables [--objects 20000] [--variables 200]
+    uv run tests/bench_parser.py parallel [--objects 100000] [--workers 0]
+    uv run tests/bench_parser.py memory [--objects 100000]
+    uv run tests/bench_parser.py commands [--commands 500000]
+    uv run tests/bench_parser.py preview [--objects 100000] [--window 10000]
+    uv run tests/bench_parser.py arrays [--objects 100000]
+    uv run tests/bench_parser.py index [--objects 100000]
+
+Each benchmark writes its synthetic ``.osb`` to a temp file, parses it a few
+times and prints a Markdown table of the best run.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import bisect
+import tempfile
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.parser import StoryboardParser
+from src.state_engine import StateEngine
+from src.lazy_commands import count_loaded
+from src.watch import IncrementalStoryboard
+from src.optimizer import StoryboardOptimizer, screen_bounds
+from src.storyboard_arrays import StoryboardArrays, LAYER_ORDER
+from src.active_index import ActiveIndex
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+def _write_temp(content: str) -> str:
+    fd, path = tempfile.mkstemp(suffix=".osb", text=True)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(content)
+    return path
+
+
+def _count_lines(path: str) -> int:
+    with open(path, "r", encoding="utf-8") as f:
+        return sum(1 for _ in f)
+
+
+def _best_of(fn, repeat: int) -> float:
+    """Return the fastest of *repeat* runs of *fn*, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _print_table(header, rows):
+    lines = ["| " + " | ".join(header) + " |", "| " + " | ".join(":--" for _ in header) + " |"]
+    for row in rows:
+        lines.append("| " + " | ".join(str(c) for c in row) + " |")
+    print("\n".join(lines))
+
+
+# ---------------------------------------------------------------------------
+# [Variables] substitution
+# ---------------------------------------------------------------------------
+
+class _LegacySubstituter:
+    """The pre-compiled behaviour: one str.replace per variable on every line."""
+
+    def __init__(self, variables=None):
+        self.variables = dict(variables) if variables else {}
+        self.count = 0
+
+    def add(self, name, value):
+        self.variables[name] = value
+
+    def substitute(self, line):
+        for name, value in self.variables.items():
+            line = line.replace(name, value)
+        return line
+
+
+class _LegacyParser(StoryboardParser):
+    substituter_class = _LegacySubstituter
+
+
+def make_variable_heavy_osb(objects: int, variables: int, seed: int = 0) -> str:
+    """Every object references several variables; half the command lines do too."""
+    rng = random.Random(seed)
+    # zero-padded names so none is a prefix of another (the legacy replace
+    # would otherwise produce different output and skew the comparison)
+    names = [f"$v{i:04d}" for i in range(variables)]
+    out = ["[Variables]"]
+    for name in names:
+        out.append(f"{name}={rng.randint(0, 640)}")
+    out.append("[Events]")
+    for i in range(objects):
+        x, y = rng.choice(names), rng.choice(names)
+        out.append(f'Sprite,Foreground,Centre,"sb/p{i % 50}.png",{x},{y}')
+        out.append(f"_F,0,{i},{i + 500},0,1")
+        out.append(f"_M,0,{i},{i + 1000},{rng.choice(names)},{y},{x},{rng.choice(names)}")
+        out.append(f"_S,0,{i},{i + 1000},0.5,1")
+        out.append(f"_R,0,{i},{i + 1000},0,3.14")
+    return "\n".join(out) + "\n"
+
+
+def bench_variables(objects: int, variables: int, repeat: int):
+    path = _write_temp(make_variable_heavy_osb(objects, variables))
+    try:
+        n_lines = _count_lines(path)
+        rows = []
+        for label, cls in [("per-variable replace", _LegacyParser), ("compiled regex", StoryboardParser)]:
+            subs = 0
+
+            def run():
+                nonlocal subs
+                parser = cls()
+                parser.parse(path)
+                subs = parser.substitution_count
+
+            secs = _best_of(run, repeat)
+            rows.append([label, n_lines, f"{n_lines / secs:,.0f}", f"{secs * 1000:.0f} ms", subs if cls is StoryboardParser else "-"])
+
+        print(f"\nVariable-heavy storyboard: {objects} objects, {variables} variables\n")
+        _print_table(["Substitution", "Lines", "Lines/s", "Parse time", "Substitutions"], rows)
+    finally:
+        os.unlink(path)
+
+
+# ---------------------------------------------------------------------------
+# Large generic storyboards
+# ---------------------------------------------------------------------------
+
+def make_large_osb(objects: int, seed: int = 0) -> str:
+    """A storybrew-like mix of sprites, animations, shorthand and loops."""
+    rng = random.Random(seed)
+    layers = ["Background", "Pass", "Foreground", "Overlay"]
+    out = ["[Events]"]
+    for i in range(objects):
+        t = rng.randint(0, 600_000)
+        layer = layers[i % 4]
+        if i % 10 == 0:
+            out.append(f'Animation,{layer},Centre,"sb/anim/a.png",{rng.randint(0, 640)},{rng.randint(0, 480)},8,40,LoopForever')
+        else:
+            out.append(f'Sprite,{layer},Centre,"sb/p{i % 50}.png",{rng.randint(0, 640)},{rng.randint(0, 480)}')
+        out.append(f"_F,0,{t},{t + 300},0,1")
+        out.append(f"_M,{rng.randint(0, 34)},{t},{t + 2000},{rng.randint(0, 640)},{rng.randint(0, 480)},{rng.randint(0, 640)},{rng.randint(0, 480)}")
+        out.append(f"_S,0,{t},,{rng.random():.3f}")
+        out.append(f"_R,3,{t},{t + 2000},0,{rng.random() * 6:.4f}")
+        out.append(f"_C,0,{t},{t + 500},255,255,255,{rng.randint(0, 255)},{rng.randint(0, 255)},{rng.randint(0, 255)}")
+        if i % 5 == 0:
+            out.append(f"_L,{t},{rng.randint(2, 20)}")
+            out.append("__F,0,0,100,1,0.5")
+            out.append("__F,0,100,200,0.5,1")
+        out.append(f"_F,0,{t + 1700},{t + 2000},1,0")
+        out.append(f"_P,0,{t},{t + 2000},A")
+    return "\n".join(out) + "\n"
+
+
+def bench_parallel(objects: int, workers: int, repeat: int):
+    path = _write_temp(make_large_osb(objects))
+    try:
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        rows = []
+        serial_secs = None
+        for label, n_workers in [("serial", 1), (f"parallel ({workers or os.cpu_count()} workers)", workers)]:
+            secs = _best_of(
+                lambda: StoryboardParser(workers=n_workers, parallel_min_bytes=0).parse(path),
+                repeat,
+            )
+            serial_secs = serial_secs or secs
+            rows.append([label, f"{size_mb:.1f} MB", f"{secs * 1000:.0f} ms", f"{serial_secs / secs:.2f}x"])
+
+        print(f"\nLarge storyboard: {objects} objects\n")
+        _print_table(["Mode", "File", "Parse time", "Speedup"], rows)
+    finally:
+        os.unlink(path)
+
+
+def _count_commands(storyboard) -> int:
+    total = 0
+    for layer in (storyboard.background_layer, storyboard.fail_layer, storyboard.pass_layer,
+                  storyboard.foreground_layer, storyboard.overlay_layer):
+        for obj in layer:
+            for cmd in obj.commands:
+                total += 1 + len(getattr(cmd, "commands", ()))
+    return total
+
+
+def bench_memory(objects: int):
+    """Memory retained by a parsed storyboard, object commands vs columnar rows."""
+    path = _write_temp(make_large_osb(objects))
+    try:
+        rows = []
+        for label, columnar in [("Command objects", False), ("columnar", True)]:
+            tracemalloc.start()
+            t0 = time.perf_counter()
+            parser = StoryboardParser(columnar=columnar)
+            storyboard = parser.parse(path)
+            secs = time.perf_counter() - t0
+            retained, peak = tracemalloc.get_traced_memory()
+            n = _count_commands(storyboard)
+            store = parser.command_store
+            store_bytes = store.nbytes if store else 0
+
+            # what is left once the commands are gone is the objects' share
+            del parser, store
+            for layer in (storyboard.background_layer, storyboard.fail_layer, storyboard.pass_layer,
+                          storyboard.foreground_layer, storyboard.overlay_layer):
+                for obj in layer:
+                    obj.commands = []
+            objects_only, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            rows.append([
+                label, f"{n:,}", f"{retained / 2**20:.1f} MB", f"{peak / 2**20:.1f} MB",
+                f"{objects_only / objects:.0f}", f"{(retained - objects_only) / n:.0f}",
+                f"{store_bytes / n:.0f}" if store_bytes else "-",
+                f"{secs * 1000:.0f} ms",
+            ])
+            del storyboard
+
+        # parse times are inflated by tracemalloc and only comparable to each other
+        print(f"\nLarge storyboard: {objects} objects\n")
+        _print_table(
+            ["Storage", "Commands", "Retained", "Peak", "Bytes/object", "Bytes/command",
+             "Column bytes/command", "Parse time"],
+            rows,
+        )
+    finally:
+        os.unlink(path)
+
+
+# ---------------------------------------------------------------------------
+# Command line parsing
+# ---------------------------------------------------------------------------
+
+class _LegacyCommandParser(StoryboardParser):
+    """The previous _parse_basic_command: dict rebuilt per call, every param generic."""
+
+    def _parse_basic_command(self, parts, target):
+        emitted = 0
+        try:
+            event = parts[0]
+            easing = int(parts[1])
+            start_time = int(parts[2])
+            end_time_str = parts[3] if len(parts) > 3 else ""
+            end_time = int(end_time_str) if end_time_str else start_time
+            raw_params = parts[4:]
+            params = []
+            if event == "P":
+                if raw_params:
+                    self._emit(target, event, easing, start_time, end_time, [raw_params[0]])
+                    return 1
+            else:
+                for p in raw_params:
+                    if p:
+                        params.append(float(p))
+                vars_count_map = {"F": 1, "S": 1, "R": 1, "MX": 1, "MY": 1, "M": 2, "V": 2, "C": 3}
+                if event not in vars_count_map:
+                    return 0
+                vars_count = vars_count_map[event]
+                if len(params) == vars_count:
+                    params.extend(params[:])
+                if len(params) < vars_count * 2:
+                    return emitted
+                duration = end_time - start_time
+                for i in range(len(params) // vars_count - 1):
+                    self._emit(
+                        target, event, easing, start_time + i * duration, end_time + i * duration,
+                        params[i * vars_count:(i + 2) * vars_count],
+                    )
+                    emitted += 1
+            return emitted
+        except Exception:
+            return emitted
+
+
+def make_command_lines(commands: int, seed: int = 0):
+    """Pre-split command lines in roughly the mix storybrew output has."""
+    rng = random.Random(seed)
+    shapes = [
+        lambda t: f"F,0,{t},{t + 500},0,1",
+        lambda t: f"F,0,{t},,0.5",
+        lambda t: f"S,0,{t},{t + 500},0.2,{rng.random():.3f}",
+        lambda t: f"R,3,{t},{t + 800},0,{rng.random() * 6:.4f}",
+        lambda t: f"M,1,{t},{t + 1000},{rng.randint(0, 640)},{rng.randint(0, 480)},{rng.randint(0, 640)},{rng.randint(0, 480)}",
+        lambda t: f"MX,0,{t},{t + 300},{rng.randint(0, 640)},{rng.randint(0, 640)}",
+        lambda t: f"V,0,{t},{t + 300},1,1,2,0.5",
+        lambda t: f"C,0,{t},,255,{rng.randint(0, 255)},0",
+        lambda t: f"P,0,{t},{t + 100},A",
+        lambda t: f"F,0,{t},{t + 100},0,1,0,1,0",
+    ]
+    weights = [20, 10, 10, 10, 20, 5, 5, 5, 3, 2]
+    lines = []
+    for _ in range(commands):
+        shape = rng.choices(shapes, weights)[0]
+        lines.append(shape(rng.randint(0, 600_000)).split(","))
+    return lines
+
+
+def bench_commands(commands: int, repeat: int):
+    lines = make_command_lines(commands)
+    rows = []
+    baseline = None
+    for label, cls in [("legacy", _LegacyCommandParser), ("table-driven", StoryboardParser)]:
+        parser = cls()
+        emitted = 0
+
+        def run():
+            nonlocal emitted
+            target = []
+            parse = parser._parse_basic_command
+            for parts in lines:
+                parse(parts, target)
+            emitted = len(target)
+
+        secs = _best_of(run, repeat)
+        baseline = baseline or secs
+        rows.append([label, f"{emitted:,}", f"{emitted / secs:,.0f}", f"{baseline / secs:.2f}x"])
+
+    print(f"\n_parse_basic_command on {commands:,} pre-split lines\n")
+    _print_table(["Implementation", "Commands", "Commands/s", "Speedup"], rows)
+
+
+# ---------------------------------------------------------------------------
+# Lazy index for previews
+# ---------------------------------------------------------------------------
+
+def bench_preview(objects: int, window: int, fps: int = 60):
+    """Startup plus the states of a short preview window: full parse vs index."""
+    path = _write_temp(make_large_osb(objects))  # objects spread over 10 minutes
+    try:
+        start = 300_000
+        times = range(start, start + window, 1000 // fps)
+        rows = []
+        for label, load in [("full parse", "parse"), ("index + lazy commands", "index")]:
+            t0 = time.perf_counter()
+            storyboard = getattr(StoryboardParser(), load)(path)
+            engine = StateEngine(storyboard)
+            t1 = time.perf_counter()
+            all_objects = [
+                obj
+                for layer in (storyboard.background_layer, storyboard.pass_layer,
+                              storyboard.foreground_layer, storyboard.overlay_layer)
+                for obj in layer
+            ]
+            # objects overlapping the window, as the renderer's buckets would pick them
+            alive = [o for o in all_objects if o.life_start <= times[-1] and o.life_end >= start]
+            for t in times:
+                for obj in alive:
+                    engine.get_object_state(obj, t)
+            t2 = time.perf_counter()
+            loaded = count_loaded(all_objects) if load == "index" else len(all_objects)
+            rows.append([
+                label, f"{(t1 - t0) * 1000:.0f} ms", f"{(t2 - t1) * 1000:.0f} ms",
+                f"{(t2 - t0) * 1000:.0f} ms", f"{loaded:,} / {len(all_objects):,}",
+            ])
+
+        print(f"\n{window / 1000:.0f} s preview of a {objects}-object storyboard\n")
+        _print_table(["Mode", "Startup", f"{len(times)} frames", "Total", "Objects parsed"], rows)
+    finally:
+        os.unlink(path)
+
+
+# ---------------------------------------------------------------------------
+# Optimiser
+# ---------------------------------------------------------------------------
+
+def make_invisible_objects(objects: int, seed: int = 1) -> str:
+    """Objects a generator leaves behind: faded out, zero scale, off-screen, missing image."""
+    rng = random.Random(seed)
+    out = []
+    for i in range(objects):
+        t = rng.randint(0, 600_000)
+        kind = i % 4
+        path = "sb/missing.png" if kind == 3 else f"sb/p{i % 50}.png"
+        x = rng.choice([-400, 1100]) if kind == 2 else rng.randint(0, 640)
+        out.append(f'Sprite,Foreground,Centre,"{path}",{x},{rng.randint(0, 480)}')
+        out.append(f"_F,0,{t},{t + 2000},{0 if kind == 0 else 1}")
+        out.append(f"_S,0,{t},{t + 2000},{0 if kind == 1 else 1}")
+        out.append(f"_R,3,{t},{t + 2000},0,{rng.random() * 6:.4f}")
+    return "\n".join(out) + "\n"
+
+
+def bench_optimize(objects: int, invisible: int, fps: int = 10):
+    """get_object_state work per frame with and without the optimiser."""
+    text = make_large_osb(objects) + make_invisible_objects(invisible)
+    path = _write_temp(text)
+    try:
+        storyboard = StoryboardParser().parse(path)
+        engine = StateEngine(storyboard)
+        layers = (storyboard.background_layer, storyboard.pass_layer,
+                  storyboard.foreground_layer, storyboard.overlay_layer)
+        times = range(0, 602_000, 1000 // fps)
+
+        def render_states():
+            calls = 0
+            t0 = time.perf_counter()
+            for layer in layers:
+                for obj in layer:
+                    # every frame of the object's life, as the bucketed renderer does
+                    for t in times[bisect.bisect_left(times, obj.life_start):bisect.bisect_right(times, obj.life_end)]:
+                        engine.get_object_state(obj, t)
+                        calls += 1
+            return calls, time.perf_counter() - t0
+
+        before_calls, before = render_states()
+        # every generated image exists except sb/missing.png
+        image_size = lambda p: None if "missing" in p else (100, 100)
+        t0 = time.perf_counter()
+        stats = StoryboardOptimizer(image_size=image_size, bounds=screen_bounds(1920, 1080)).optimize(storyboard)
+        took = time.perf_counter() - t0
+        after_calls, after = render_states()
+
+        print(f"\n{objects:,} objects + {invisible:,} never-visible ones, states at {fps} fps\n")
+        print(stats.summary())
+        print(f"  optimiser took {took * 1000:.0f} ms\n")
+        _print_table(
+            ["Storyboard", "get_object_state calls", "Time"],
+            [["as parsed", f"{before_calls:,}", f"{before:.2f} s"],
+             ["optimised", f"{after_calls:,}", f"{after:.2f} s"]],
+        )
+    finally:
+        os.unlink(path)
+
+
+# ---------------------------------------------------------------------------
+# Live reload
+# ---------------------------------------------------------------------------
+
+def bench_watch(objects: int, repeat: int):
+    """Time to pick up a one-object edit: full reparse vs IncrementalStoryboard."""
+    text = make_large_osb(objects)
+    path = _write_temp(text)
+    try:
+        source = IncrementalStoryboard([path])
+        t0 = time.perf_counter()
+        source.refresh()
+        initial = time.perf_counter() - t0
+
+        edits = []
+
+        def edit():
+            # move one object in the middle of the file by a pixel
+            nonlocal text
+            header = text.index("Sprite,", len(text) // 2)
+            eol = text.index("\n", header)
+            text = text[:eol] + "1" + text[eol:]
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+            edits.append(source.refresh(force=True))
+
+        for _ in range(repeat):
+            edit()
+        incremental = min(change.seconds for change in edits)
+
+        def reparse():
+            storyboard = StoryboardParser().parse(path)
+            StateEngine(storyboard)
+
+        full = _best_of(reparse, repeat)
+        rows = [
+            ["full parse", f"{full * 1000:.0f} ms", f"{objects:,}"],
+            ["incremental", f"{incremental * 1000:.0f} ms", f"{edits[-1].reparsed_blocks:,}"],
+        ]
+        print(f"\nOne-object edit in a {objects}-object storyboard "
+              f"(initial incremental load {initial:.2f} s)\n")
+        _print_table(["Mode", "Refresh", "Objects parsed"], rows)
+    finally:
+        os.unlink(path)
+
+
+# ---------------------------------------------------------------------------
+# Struct-of-arrays view
+# ---------------------------------------------------------------------------
+
+def make_long_lived_osb(objects: int, seed: int = 0) -> str:
+    """Sprites alive for up to a minute each, so most span many render buckets."""
+    rng = random.Random(seed)
+    layers = ["Background", "Pass", "Foreground", "Overlay"]
+    out = ["[Events]"]
+    for i in range(objects):
+        t = rng.randint(0, 600_000)
+        out.append(f'Sprite,{layers[i % 4]},Centre,"sb/p{i % 50}.png",{rng.randint(0, 640)},{rng.randint(0, 480)}')
+        out.append(f"_F,0,{t},{t + rng.randint(0, 60_000)},1")
+    return "\n".join(out) + "\n"
+
+
+def bench_arrays(objects: int, repeat: int, interval: int = 1000):
+    """Renderer time buckets: per-object Python loop vs StoryboardArrays."""
+    path = _write_temp(make_long_lived_osb(objects))
+    try:
+        storyboard = StoryboardParser().parse(path)
+        StateEngine(storyboard)
+        layer_lists = dict(zip(LAYER_ORDER, (
+            storyboard.background_layer, storyboard.fail_layer, storyboard.pass_layer,
+            storyboard.foreground_layer, storyboard.overlay_layer,
+        )))
+
+        def legacy():
+            # SkiaRenderer._preprocess_buckets before StoryboardArrays
+            for layer, objs in layer_lists.items():
+                buckets = {}
+                for obj in objs:
+                    for bucket in range(int(obj.life_start // interval), int(obj.life_end // interval) + 1):
+                        buckets.setdefault(bucket, []).append(obj)
+
+        def build():
+            return StoryboardArrays.from_storyboard(storyboard)
+
+        arrays = build()
+
+        def vectorised():
+            sb_arrays = build()
+            rows_to_objects = np.fromiter(sb_arrays.objects, dtype=object, count=len(sb_arrays))
+            for layer in LAYER_ORDER:
+                buckets = {}
+                for bucket, rows in sb_arrays.buckets(layer, interval):
+                    buckets[bucket] = rows_to_objects[rows].tolist()
+
+        entries = sum(int(life_end // interval) - int(life_start // interval) + 1
+                      for life_start, life_end in zip(arrays.life_start, arrays.life_end))
+        print(f"\n{objects:,} objects in {interval} ms buckets ({entries:,} bucket entries)\n")
+        _print_table(
+            ["Step", "Time"],
+            [["Python loop", f"{_best_of(legacy, repeat) * 1000:.0f} ms"],
+             ["StoryboardArrays build", f"{_best_of(build, repeat) * 1000:.0f} ms"],
+             ["build + vectorised buckets", f"{_best_of(vectorised, repeat) * 1000:.0f} ms"]],
+        )
+    finally:
+        os.unlink(path)
+
+
+# ---------------------------------------------------------------------------
+# Alive-object index
+# ---------------------------------------------------------------------------
+
+def bench_index(objects: int, repeat: int, fps: int = 60, interval: int = 1000):
+    """Objects handed to the renderer per frame and memory: 1000 ms buckets vs ActiveIndex."""
+    path = _write_temp(make_long_lived_osb(objects))
+    try:
+        storyboard = StoryboardParser().parse(path)
+    finally:
+        os.unlink(path)
+    StateEngine(storyboard)
+    arrays = StoryboardArrays.from_storyboard(storyboard)
+    end = int(arrays.life_end.max())
+    times = [i * 1000 // fps for i in range(end * fps // 1000 + 1)][::10]  # every 10th frame
+
+    def buckets():
+        # SkiaRenderer's buckets before ActiveIndex
+        objs = np.fromiter(arrays.objects, dtype=object, count=len(arrays))
+        return {layer: {b: objs[rows].tolist() for b, rows in arrays.buckets(layer, interval)}
+                for layer in LAYER_ORDER}
+
+    def held(build):
+        tracemalloc.start()
+        try:
+            built = build()
+            return built, tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+
+    bucket_map, bucket_bytes = held(buckets)
+    index, index_bytes = held(lambda: ActiveIndex(arrays))
+
+    def bucket_frames():
+        return sum(len(bucket_map[layer].get(t // interval, ())) for t in times for layer in LAYER_ORDER)
+
+    def index_frames():
+        return sum(len(index.rows(layer, t)) for t in times for layer in LAYER_ORDER)
+
+    bucket_candidates, alive = bucket_frames(), index_frames()
+    rows = [
+        ["1000 ms buckets", f"{_best_of(buckets, repeat) * 1000:,.0f} ms", f"{bucket_bytes / 2**20:,.1f} MiB",
+         f"{bucket_candidates / len(times):,.0f}", f"{_best_of(bucket_frames, repeat) / len(times) * 1e6:,.1f} us"],
+        ["ActiveIndex", f"{_best_of(lambda: ActiveIndex(arrays), repeat) * 1000:,.0f} ms",
+         f"{index_bytes / 2**20:,.1f} MiB", f"{alive / len(times):,.0f}",
+         f"{_best_of(index_frames, repeat) / len(times) * 1e6:,.1f} us"],
+    ]
+    print(f"\n{objects:,} long-lived objects, {len(times):,} frames sampled in order\n")
+    _print_table(["Scheme", "Build", "Memory", "Objects/frame", "Lookup/frame"], rows)
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Parser micro-benchmarks")
+    ap.add_argument("--repeat", type=int, default=3)
+    sub = ap.add_subparsers(dest="bench", required=True)
+
+    p_vars = sub.add_parser("variables", help="[Variables] substitution throughput")
+    p_vars.add_argument("--objects", type=int, default=20000)
+    p_vars.add_argument("--variables", type=int, default=200)
+
+    p_par = sub.add_parser("parallel", help="Serial vs process-pool parsing")
+    p_par.add_argument("--objects", type=int, default=100000)
+    p_par.add_argument("--workers", type=int, default=0)
+
+    p_mem = sub.add_parser("memory", help="Retained memory per command, object vs columnar storage")
+    p_mem.add_argument("--objects", type=int, default=132000, help="default gives ~1M commands")
+
+    p_cmd = sub.add_parser("commands", help="_parse_basic_command throughput, legacy vs table-driven")
+    p_cmd.add_argument("--commands", type=int, default=500000)
+
+    p_prev = sub.add_parser("preview", help="Full parse vs lazy index for a short preview window")
+    p_prev.add_argument("--objects", type=int, default=100000)
+    p_prev.add_argument("--window", type=int, default=10000, help="preview length in ms")
+
+    p_opt = sub.add_parser("optimize", help="Per-frame state work before/after the optimiser")
+    p_opt.add_argument("--objects", type=int, default=20000)
+    p_opt.add_argument("--invisible", type=int, default=20000)
+
+    p_watch = sub.add_parser("watch", help="Full reparse vs incremental refresh after an edit")
+    p_watch.add_argument("--objects", type=int, default=100000)
+
+    p_arr = sub.add_parser("arrays", help="Renderer bucketing, Python loop vs StoryboardArrays")
+    p_arr.add_argument("--objects", type=int, default=100000)
+
+    p_idx = sub.add_parser("index", help="Renderer candidates per frame, time buckets vs ActiveIndex")
+    p_idx.add_argument("--objects", type=int, default=100000)
+
+    args = ap.parse_args()
+
+    if args.bench == "variables":
+        bench_variables(args.objects, args.variables, args.repeat)
+    elif args.bench == "parallel":
+        bench_parallel(args.objects, args.workers, args.repeat)
+    elif args.bench == "memory":
+        bench_memory(args.objects)
+    elif args.bench == "commands":
+        bench_commands(args.commands, args.repeat)
+    elif args.bench == "preview":
+        bench_preview(args.objects, args.window)
+    elif args.bench == "optimize":
+        bench_optimize(args.objects, args.invisible)
+    elif args.bench == "watch":
+        bench_watch(args.objects, args.repeat)
+    elif args.bench == "arrays":
+        bench_arrays(args.objects, args.repeat)
+    elif args.bench == "index":
+        bench_index(args.objects, args.repeat)
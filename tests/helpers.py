@@ -0,0 +1,69 @@
+"""Object factories and comparisons shared by the unit tests."""
+
+import pytest
+from src.models import (
+    Storyboard, Sprite, Animation, Layer, Origin, LoopType, Command, LoopCommand, Vector2,
+)
+from src.state_engine import StateEngine
+
+
+# parameter count of each command type (P takes one flag)
+WIDTHS = {"F": 2, "M": 4, "MX": 2, "MY": 2, "S": 2, "V": 4, "R": 2, "C": 6}
+
+
+def sprite(*commands, position=(320, 240), path="x.png") -> Sprite:
+    obj = Sprite(Layer.Pass, Origin.Centre, path, Vector2(*position))
+    obj.commands.extend(commands)
+    return obj
+
+
+def engine_for(objects) -> StateEngine:
+    sb = Storyboard()
+    for obj in objects:
+        sb.add_object(obj)
+    return StateEngine(sb)
+
+
+def random_command(rng, start_range) -> Command:
+    kind = rng.choice(list(WIDTHS) + ["P"])
+    start = rng.randrange(*start_range)
+    end = start + rng.choice([0, 0, 50, 100, 400])
+    if kind == "P":
+        return Command("P", 0, start, end, [rng.choice("HVA")])
+    params = [rng.choice([0.0, 0.5, 1.0, 3.0]) for _ in range(WIDTHS[kind])]
+    return Command(kind, rng.choice([0, 1, 3, 7, 26, 34]), start, end, params)
+
+
+def random_object(rng, loop_p=True):
+    """A sprite or animation on a random layer with a few commands and loops; no P inside loops unless *loop_p*."""
+    layer = rng.choice([Layer.Background, Layer.Pass, Layer.Foreground, Layer.Overlay])
+    position = Vector2(rng.randrange(640), rng.randrange(480))
+    if rng.random() < 0.3:
+        obj = Animation(layer, Origin.Centre, "f.png", position, frame_count=rng.randrange(0, 4),
+                        frame_delay=40.0, loop_type=rng.choice(list(LoopType)))
+    else:
+        obj = Sprite(layer, Origin.Centre, "x.png", position)
+    for _ in range(rng.randrange(1, 12)):
+        if rng.random() < 0.2:
+            loop = LoopCommand(rng.randrange(0, 2000, 50), rng.randrange(1, 4))
+            for _ in range(rng.randrange(1, 4)):
+                cmd = random_command(rng, (0, 300, 50))
+                if cmd.type != "P" or loop_p:
+                    loop.commands.append(cmd)
+            obj.commands.append(loop)
+        else:
+            obj.commands.append(random_command(rng, (0, 2000, 50)))
+    return obj
+
+
+def same_state(a, b) -> bool:
+    """Whether two ObjectStates (or Nones) match, floats up to rounding."""
+    if a is None or b is None:
+        return a is None and b is None
+    return (
+        (a.position.x, a.position.y, a.scale_vec.x, a.scale_vec.y, a.rotation, a.opacity, a.r, a.g, a.b)
+        == pytest.approx((b.position.x, b.position.y, b.scale_vec.x, b.scale_vec.y, b.rotation,
+                          b.opacity, b.r, b.g, b.b), abs=1e-9)
+        and (a.flip_h, a.flip_v, a.additive, a.image_path, a.frame_index)
+        == (b.flip_h, b.flip_v, b.additive, b.image_path, b.frame_index)
+    )
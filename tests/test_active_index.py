@@ -0,0 +1,61 @@
+"""Unit tests for src/active_index.py — exact alive-object index."""
+
+import random
+import numpy as np
+from src.active_index import ActiveIndex
+from src.models import Storyboard, Sprite, Layer, Origin, Command, Vector2
+from src.storyboard_arrays import LAYER_ORDER, StoryboardArrays
+
+
+def _storyboard(count, seed=0):
+    rng = random.Random(seed)
+    sb = Storyboard()
+    for _ in range(count):
+        obj = Sprite(rng.choice(LAYER_ORDER), Origin.Centre, "x.png", Vector2(0, 0))
+        start = rng.randrange(0, 10000, 10)
+        obj.commands.append(Command("F", 0, start, start + rng.choice([0, 10, 500, 4000]), [1.0, 1.0]))
+        sb.add_object(obj)
+    return sb
+
+
+def _expected(arrays, layer, t):
+    sl = arrays.layer_slice(layer)
+    rows = np.arange(sl.start, sl.stop)
+    return rows[(arrays.life_start[sl] <= t) & (t <= arrays.life_end[sl])]
+
+
+# ---------------------------------------------------------------------------
+# ActiveIndex
+# ---------------------------------------------------------------------------
+class TestActiveIndex:
+    def test_matches_lifetimes_forward_backward_and_seeks(self):
+        arrays = StoryboardArrays.from_storyboard(_storyboard(800))
+        index = ActiveIndex(arrays)
+        rng = random.Random(1)
+        times = list(range(-100, 15000, 17)) + list(range(15000, -100, -23))
+        times += [rng.randrange(-100, 15000) for _ in range(200)]
+        for t in times:
+            for layer in LAYER_ORDER:
+                assert np.array_equal(index.rows(layer, t), _expected(arrays, layer, t)), (layer, t)
+
+    def test_boundaries_are_inclusive(self):
+        sb = Storyboard()
+        obj = Sprite(Layer.Pass, Origin.Centre, "x.png", Vector2(0, 0))
+        obj.commands.append(Command("F", 0, 100, 200, [1.0, 1.0]))
+        sb.add_object(obj)
+        index = ActiveIndex(StoryboardArrays.from_storyboard(sb))
+        assert [len(index.rows(Layer.Pass, t)) for t in (99, 100, 200, 201, 150, 99.5)] == [0, 1, 1, 0, 1, 0]
+
+    def test_objects_living_between_two_frames_are_not_returned(self):
+        sb = Storyboard()
+        obj = Sprite(Layer.Pass, Origin.Centre, "x.png", Vector2(0, 0))
+        obj.commands.append(Command("F", 0, 105, 110, [1.0, 1.0]))
+        sb.add_object(obj)
+        index = ActiveIndex(StoryboardArrays.from_storyboard(sb))
+        assert len(index.rows(Layer.Pass, 100)) == 0
+        assert len(index.rows(Layer.Pass, 120)) == 0
+        assert len(index.rows(Layer.Pass, 100)) == 0
+
+    def test_empty_storyboard(self):
+        index = ActiveIndex(StoryboardArrays.from_storyboard(Storyboard()))
+        assert len(index.rows(Layer.Pass, 0)) == 0
@@ -0,0 +1,237 @@
+"""Unit tests for src/columnar.py — columnar command storage and its views."""
+
+import os
+import pickle
+import tempfile
+import numpy as np
+import pytest
+from src.columnar import CommandStore, ColumnarCommands, CommandRow, LoopRow, NO_LOOP
+from src.models import Command, LoopCommand
+from src.parser import StoryboardParser
+from src.state_engine import StateEngine
+from src.storyboard_codec import encode_storyboard, decode_storyboard
+
+
+OSB = """
+[Events]
+Sprite,Pass,Centre,"a.png",320,240
+_M,1,500,1000,0,0,100,200
+_F,0,0,500,0,1,0.5
+_L,2000,3
+__S,0,100,300,1,2
+__S,0,0,100,2,1
+__P,0,0,0,H
+_C,0,800,,255,128,0
+_P,0,0,0,A
+Sprite,Foreground,TopLeft,"b.png",0,0
+_R,0,0,1000,0,3.14159
+"""
+
+# no loops: every entry sorts by a plain command row
+OSB_NO_LOOPS = """
+[Events]
+Sprite,Foreground,Centre,"a.png",320,240
+_F,0,500,1000,0,1
+_F,0,0,100,1,0
+_M,0,200,300,0,0,10,10
+"""
+
+
+def _write_temp_osb(content: str) -> str:
+    fd, path = tempfile.mkstemp(suffix=".osb", text=True)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(content)
+    return path
+
+
+def _parse(content: str, columnar: bool):
+    path = _write_temp_osb(content)
+    try:
+        parser = StoryboardParser(columnar=columnar)
+        return parser, parser.parse(path)
+    finally:
+        os.unlink(path)
+
+
+# ---------------------------------------------------------------------------
+# Store building
+# ---------------------------------------------------------------------------
+class TestCommandStore:
+    def test_rows_and_freeze(self):
+        store = CommandStore()
+        cmds = store.new_object()
+        cmds.add("M", 2, 0, 100, [1.0, 2.0, 3.0, 4.0])
+        loop = cmds.add_loop(500, 4)
+        loop.commands.add("F", 0, 0, 50, [0.0, 1.0])
+        cmds.add("P", 0, 0, 0, ["H"])
+        store.freeze()
+
+        assert store.command_count == 3
+        assert isinstance(store.start, np.ndarray)
+        assert store.params.shape == (3, 6)
+        assert list(store.loop) == [NO_LOOP, 0, NO_LOOP]
+        assert len(cmds) == 3
+        assert cmds[0].params == [1.0, 2.0, 3.0, 4.0]
+        assert isinstance(cmds[1], LoopRow)
+        assert cmds[1].loop_count == 4
+        assert cmds[1].commands[0].type == "F"
+        assert cmds[2].params == ["H"]
+
+    def test_frozen_store_rejects_rows(self):
+        store = CommandStore()
+        cmds = store.new_object()
+        store.freeze()
+        with pytest.raises(RuntimeError):
+            cmds.add("F", 0, 0, 1, [0.0, 1.0])
+
+    def test_only_last_object_grows(self):
+        store = CommandStore()
+        first = store.new_object()
+        store.new_object()
+        with pytest.raises(RuntimeError):
+            first.add("F", 0, 0, 1, [0.0, 1.0])
+
+    def test_no_nested_loops(self):
+        store = CommandStore()
+        loop = store.new_object().add_loop(0, 1)
+        with pytest.raises(ValueError):
+            loop.commands.add_loop(0, 1)
+
+    def test_append_converts_objects(self):
+        store = CommandStore()
+        cmds = store.new_object()
+        loop = LoopCommand(100, 2, commands=[Command("S", 0, 0, 10, [1.0, 2.0])])
+        cmds.append(Command("F", 0, 0, 10, [0.0, 1.0]))
+        cmds.append(loop)
+        assert cmds == [Command("F", 0, 0, 10, [0.0, 1.0]), loop]
+
+    def test_nbytes_counts_columns(self):
+        store = CommandStore()
+        cmds = store.new_object()
+        for i in range(10):
+            cmds.add("F", 0, i, i + 1, [0.0, 1.0])
+        before = store.nbytes
+        store.freeze()
+        assert store.nbytes == before
+        # 6 float64 param slots dominate the row size
+        assert store.nbytes >= 10 * 6 * 8
+
+
+# ---------------------------------------------------------------------------
+# Views
+# ---------------------------------------------------------------------------
+class TestViews:
+    def test_views_are_commands(self):
+        _, sb = _parse(OSB, columnar=True)
+        cmds = sb.pass_layer[0].commands
+        assert isinstance(cmds, ColumnarCommands)
+        assert all(isinstance(c, (Command, LoopCommand)) for c in cmds)
+        assert isinstance(cmds[0], CommandRow)
+
+    def test_write_through(self):
+        _, sb = _parse(OSB, columnar=True)
+        row = sb.pass_layer[0].commands[0]
+        row.start_time = 42
+        row.end_time = 84
+        again = sb.pass_layer[0].commands[0]
+        assert (again.start_time, again.end_time) == (42, 84)
+
+    def test_sort_by_start_time_is_stable(self):
+        store = CommandStore()
+        cmds = store.new_object()
+        cmds.add("F", 0, 500, 600, [0.0, 1.0])
+        cmds.add("S", 0, 100, 200, [1.0, 2.0])
+        cmds.add_loop(100, 2)
+        cmds.add("R", 0, 0, 10, [0.0, 1.0])
+        store.freeze()
+        cmds.sort_by_start_time()
+        kinds = [c.type if isinstance(c, Command) else "L" for c in cmds]
+        assert kinds == ["R", "S", "L", "F"]
+
+    def test_generic_sort_key(self):
+        store = CommandStore()
+        cmds = store.new_object()
+        cmds.add("F", 0, 0, 600, [0.0, 1.0])
+        cmds.add("S", 0, 100, 200, [1.0, 2.0])
+        cmds.sort(key=lambda c: c.end_time)
+        assert [c.type for c in cmds] == ["S", "F"]
+
+
+# ---------------------------------------------------------------------------
+# Parser integration
+# ---------------------------------------------------------------------------
+class TestColumnarParse:
+    def test_same_storyboard_as_object_parse(self):
+        _, plain = _parse(OSB, columnar=False)
+        parser, columnar = _parse(OSB, columnar=True)
+        assert parser.command_store.frozen
+        assert parser.command_store.command_count == 9
+        assert columnar.pass_layer[0].commands == plain.pass_layer[0].commands
+        assert columnar == plain
+
+    def test_same_states_after_engine(self):
+        _, plain = _parse(OSB, columnar=False)
+        _, columnar = _parse(OSB, columnar=True)
+        engine_a, engine_b = StateEngine(plain), StateEngine(columnar)
+        for a, b in [(plain.pass_layer[0], columnar.pass_layer[0]),
+                     (plain.foreground_layer[0], columnar.foreground_layer[0])]:
+            assert (a.life_start, a.life_end) == (b.life_start, b.life_end)
+            assert a.commands == b.commands
+            for t in range(-100, 3000, 37):
+                assert engine_a.get_object_state(a, t) == engine_b.get_object_state(b, t)
+
+    def test_loop_tables_are_reused(self):
+        _, columnar = _parse(OSB, columnar=True)
+        obj = columnar.pass_layer[0]
+        loop = next(cmd for cmd in obj.commands if isinstance(cmd, LoopRow))
+        assert next(cmd for cmd in obj.commands if isinstance(cmd, LoopRow)) is loop
+        engine = StateEngine(columnar)
+        for t in range(0, 3000, 10):
+            engine._scan_object_state(obj, t)
+            engine.get_object_state(obj, t)
+            assert len(engine._loops) <= 1
+
+    def test_pickles_with_loop_views(self):
+        _, columnar = _parse(OSB, columnar=True)
+        list(columnar.pass_layer[0].commands)  # caches the loop's view
+        assert pickle.loads(pickle.dumps(columnar)) == columnar
+
+    def test_storyboard_without_loops(self):
+        _, plain = _parse(OSB_NO_LOOPS, columnar=False)
+        _, columnar = _parse(OSB_NO_LOOPS, columnar=True)
+        engine_a, engine_b = StateEngine(plain), StateEngine(columnar)
+        a, b = plain.foreground_layer[0], columnar.foreground_layer[0]
+        assert [cmd.start_time for cmd in b.commands] == [0, 200, 500]
+        assert a.commands == b.commands
+        for t in range(-100, 1200, 37):
+            assert engine_a.get_object_state(a, t) == engine_b.get_object_state(b, t)
+
+    def test_codec_round_trip(self):
+        _, columnar = _parse(OSB, columnar=True)
+        StateEngine(columnar)
+        decoded = decode_storyboard(encode_storyboard(columnar))
+        assert decoded.pass_layer[0].commands == columnar.pass_layer[0].commands
+
+    def test_late_variables_rebuild_store(self):
+        content = """
+[Events]
+Sprite,Pass,Centre,"a.png",$x,0
+_F,0,0,100,0,1
+[Variables]
+$x=10
+"""
+        parser, sb = _parse(content, columnar=True)
+        assert sb.pass_layer[0].position.x == 10
+        assert parser.command_store.command_count == 1
+
+    def test_columnar_forces_serial(self, monkeypatch):
+        called = []
+        monkeypatch.setattr(
+            StoryboardParser, "_parse_parallel", lambda *a: called.append(a)
+        )
+        path = _write_temp_osb(OSB)
+        try:
+            StoryboardParser(workers=4, parallel_min_bytes=0, columnar=True).parse(path)
+        finally:
+            os.unlink(path)
+        assert called == []
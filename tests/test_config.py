@@ -3,7 +3,7 @@
 import os
 import tempfile
 import pytest
-from src.config import Config, AppConfig, RendererConfig, PathConfig
+from src.config import Config, AppConfig, RendererConfig, PathConfig, ParserConfig
 
 
 # ---------------------------------------------------------------------------
@@ -42,6 +42,7 @@ class TestRendererConfig:
         assert cfg.preset_tuning == "default"
         assert cfg.audio_bitrate == "192k"
         assert cfg.audio_codec == "aac"
+        assert (cfg.start_ms, cfg.end_ms) == (0, 0)
 
     def test_custom_resolution(self):
         cfg = RendererConfig(width=1920, height=1080, fps=30)
@@ -74,6 +75,26 @@ class TestPathConfig:
         assert cfg.osu_path == "/maps/beatmap.osu"
 
 
+# ---------------------------------------------------------------------------
+# ParserConfig
+# ---------------------------------------------------------------------------
+class TestParserConfig:
+    def test_defaults(self):
+        cfg = ParserConfig()
+        assert cfg.parse_cache is True
+        assert cfg.cache_dir == ""
+        assert cfg.cache_max_mb == 512
+        assert cfg.parse_workers == 0
+        assert cfg.parallel_min_mb == 8
+        assert cfg.columnar_commands is False
+        assert cfg.strict is False
+        assert cfg.optimize is False
+
+    def test_disable_cache(self):
+        cfg = Config(parser=ParserConfig(parse_cache=False))
+        assert cfg.parser.parse_cache is False
+
+
 # ---------------------------------------------------------------------------
 # Config (top-level)
 # ---------------------------------------------------------------------------
@@ -82,6 +103,11 @@ class TestConfig:
         cfg = Config()
         assert cfg.app.theme == "dark"
         assert cfg.renderer.width == 1280
+        assert cfg.renderer.batch_states is False
+        assert cfg.renderer.state_streams is False
+        assert cfg.renderer.templates is False
+        assert cfg.renderer.keyframes is False
+        assert cfg.renderer.easing_lut_resolution == 0
         assert cfg.path.osu_path == "./example.osu"
 
     def test_nested_override(self):
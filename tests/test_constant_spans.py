@@ -0,0 +1,143 @@
+"""Unit tests for src/constant_spans.py — spans of constant state and the renderer's reuse of them."""
+
+import pickle
+import random
+import numpy as np
+import pytest
+import skia
+from src.managers import AssetLoader
+from src.models import Animation, Layer, Origin, LoopType, Command, LoopCommand, Vector2
+from src.render_skia import SkiaRenderer
+from tests.helpers import engine_for, random_object, same_state, sprite
+
+
+def _hold(rng, obj):
+    """Give *obj* a few commands that keep their value, as optimised storyboards often do."""
+    for _ in range(rng.randrange(0, 3)):
+        start = rng.randrange(0, 2500, 50)
+        value = rng.choice([0.0, 0.5, 1.0])
+        obj.commands.append(Command(rng.choice(["F", "S", "R"]), 0, start, start + rng.randrange(0, 400, 50),
+                                    [value, value]))
+    return obj
+
+
+# ---------------------------------------------------------------------------
+# StateEngine.constant_spans
+# ---------------------------------------------------------------------------
+class TestConstantSpans:
+    def test_state_is_constant_inside_every_span(self):
+        rng = random.Random(8)
+        objects = [_hold(rng, random_object(rng)) for _ in range(300)]
+        engine = engine_for(objects)
+        checked = 0
+        for obj in objects:
+            for lo, hi in engine.constant_spans(obj):
+                assert obj.life_start <= lo < hi <= obj.life_end
+                times = [lo + (hi - lo) * f for f in (0.001, 0.3, 0.5, 0.999)] + [rng.uniform(lo, hi)]
+                first = engine.get_object_state(obj, times[0])
+                for t in times[1:]:
+                    assert same_state(engine.get_object_state(obj, t), first), (obj, lo, hi, t)
+                    checked += 1
+        assert checked > 500
+
+    def test_gaps_between_commands(self):
+        obj = sprite(
+            Command("F", 0, 100, 300, [0.0, 1.0]),
+            Command("F", 0, 800, 800, [1.0, 0.5]),
+            Command("S", 0, 1000, 1400, [2.0, 2.0]),  # a hold changes nothing after its start
+            Command("M", 0, 1500, 2000, [0, 0, 10, 10]),
+        )
+        engine = engine_for([obj])
+        assert engine.constant_spans(obj) == [(300, 800), (800, 1000), (1000, 1500)]
+        assert engine.constant_span_at(obj, 500) == (300, 800)
+        assert engine.constant_span_at(obj, 800) is None  # the boundaries are evaluated
+        assert engine.constant_span_at(obj, 1700) is None
+
+    def test_loops_flags_and_animations(self):
+        loop = LoopCommand(500, 3)
+        loop.commands.append(Command("R", 0, 0, 100, [0.0, 1.0]))
+        obj = sprite(Command("F", 0, 0, 100, [0.0, 1.0]), loop, Command("P", 0, 0, 1000, ["A"]),
+                      Command("F", 0, 1500, 1600, [1.0, 0.0]))
+        engine = engine_for([obj])
+        assert engine.constant_spans(obj) == [(100, 500), (800, 1000), (1000, 1500)]
+
+        once = Animation(Layer.Pass, Origin.Centre, "f.png", Vector2(0, 0), frame_count=4, frame_delay=50.0,
+                         loop_type=LoopType.LoopOnce)
+        once.commands.append(Command("F", 0, 0, 1000, [1.0, 1.0]))
+        forever = Animation(Layer.Pass, Origin.Centre, "f.png", Vector2(0, 0), frame_count=4, frame_delay=50.0)
+        forever.commands.append(Command("F", 0, 0, 1000, [1.0, 1.0]))
+        engine = engine_for([once, forever])
+        assert engine.constant_spans(once) == [(200, 1000)]
+        assert engine.constant_spans(forever) == []
+
+    def test_cached_until_invalidated(self):
+        obj = sprite(Command("F", 0, 0, 100, [0.0, 1.0]), Command("F", 0, 900, 1000, [1.0, 0.0]))
+        engine = engine_for([obj])
+        assert engine.constant_spans(obj) is engine.constant_spans(obj)
+        obj.commands[1].start_time = 500
+        engine.invalidate(obj)
+        assert engine.constant_spans(obj) == [(100, 500)]
+        copy = pickle.loads(pickle.dumps(engine))
+        assert copy._spans == {}
+
+
+# ---------------------------------------------------------------------------
+# SkiaRenderer state reuse
+# ---------------------------------------------------------------------------
+class TestRendererReuse:
+    @pytest.fixture
+    def assets(self, tmp_path):
+        surface = skia.Surface(16, 16)
+        surface.getCanvas().clear(skia.Color(200, 80, 40, 255))
+        for name in ["x.png"] + [f"f{i}.png" for i in range(4)]:
+            surface.makeImageSnapshot().save(str(tmp_path / name), skia.kPNG)
+        return AssetLoader(str(tmp_path))
+
+    def test_frames_are_unchanged(self, assets):
+        rng = random.Random(17)
+        engine = engine_for([_hold(rng, random_object(rng)) for _ in range(150)])
+        renderer = SkiaRenderer(engine, assets, 640, 480)
+        fresh = SkiaRenderer(engine, assets, 640, 480)
+        for t in list(range(0, 3000, 41)) + list(range(3000, 0, -173)):
+            fresh._held.clear()
+            assert np.array_equal(renderer.render_frame(t).toarray(), fresh.render_frame(t).toarray()), t
+        assert renderer._held
+
+    def test_held_states_skip_evaluation(self, assets):
+        obj = sprite(Command("F", 0, 0, 100, [0.0, 1.0]), Command("F", 0, 5000, 5100, [1.0, 0.0]))
+        renderer = SkiaRenderer(engine_for([obj]), assets, 640, 480)
+        calls = []
+        evaluate = renderer.states.get_object_state_into
+        renderer.states.get_object_state_into = lambda *args: calls.append(args[1]) or evaluate(*args)
+        for t in range(0, 5200, 50):
+            renderer.render_frame(t)
+        # the fade in, one evaluation for the whole hold, the fade out
+        assert calls == [0, 50, 100, 150, 5000, 5050, 5100]
+
+    def test_held_states_released_after_their_span(self, assets):
+        # short-lived objects that each hold still for a while
+        objects = [sprite(Command("F", 0, t, t + 50, [0.0, 1.0]), Command("F", 0, t + 400, t + 450, [1.0, 0.0]))
+                   for t in range(0, 4000, 100)]
+        renderer = SkiaRenderer(engine_for(objects), assets, 640, 480)
+        for t in range(0, 4500, 20):
+            renderer.render_frame(t)
+            assert len(renderer._held) <= 5
+            assert all(lo < t < hi for lo, hi, _ in renderer._held.values())
+        assert not renderer._held
+        renderer.render_frame(2075)
+        assert renderer._held
+        renderer.render_frame(1000)  # seeking back starts over
+        assert all(lo < 1000 < hi for lo, hi, _ in renderer._held.values())
+
+    def test_update_objects_drops_held_states(self, assets):
+        obj = sprite(Command("F", 0, 0, 100, [0.0, 1.0]), Command("F", 0, 900, 1000, [1.0, 0.0]))
+        engine = engine_for([obj])
+        renderer = SkiaRenderer(engine, assets, 640, 480)
+        renderer.render_frame(500)
+        assert renderer._held[id(obj)][2].opacity == 1.0
+        obj.commands[0].params = [0.0, 0.5]
+        obj.commands[1].params = [0.5, 0.0]
+        engine.invalidate(obj)
+        renderer.update_objects()
+        renderer.render_frame(500)
+        assert renderer._held[id(obj)][2].opacity == 0.5
@@ -1,9 +1,12 @@
 """Unit tests for src/easings.py — all 34 osu! easing functions."""
 
 import math
+import pickle
+import warnings
+import numpy as np
 import pytest
 from src.easings import (
-    apply_easing,
+    apply_easing, apply_easing_array, easing_function, EasingLUT,
     quad_in, quad_out, quad_in_out,
     cubic_in, cubic_out, cubic_in_out,
     quart_in, quart_out, quart_in_out,
@@ -300,3 +303,125 @@ class TestEasingDispatch:
         ]:
             val = func(0.5)
             assert val == pytest.approx(0.5, abs=1e-9), f"{func.__name__}(0.5) = {val}"
+
+
+# ---------------------------------------------------------------------------
+# apply_easing_array (NumPy kernels)
+# ---------------------------------------------------------------------------
+# a dense grid plus the points where piecewise easings switch formula
+ARRAY_PROGRESS = np.concatenate([
+    np.linspace(0.0, 1.0, 20001),
+    [0.5 - 1e-12, 0.5, 0.5 + 1e-12, 1 / 2.75, 2 / 2.75, 2.5 / 2.75, 1e-300, 1 - 1e-16],
+])
+
+
+class TestApplyEasingArray:
+    @pytest.mark.parametrize("eid", ALL_EASING_IDS)
+    def test_matches_scalar(self, eid):
+        expected = [apply_easing(eid, t) for t in ARRAY_PROGRESS.tolist()]
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")  # e.g. sqrt of a negative in an in-out half
+            result = apply_easing_array(eid, ARRAY_PROGRESS)
+        assert result.dtype == np.float64
+        assert np.abs(result - expected).max() <= 1e-9
+
+    def test_array_of_ids(self):
+        rng = np.random.default_rng(4)
+        t = rng.random(5000)
+        ids = rng.integers(0, 35, len(t))
+        expected = [apply_easing(eid, value) for eid, value in zip(ids.tolist(), t.tolist())]
+        assert np.abs(apply_easing_array(ids, t) - expected).max() <= 1e-9
+
+    def test_clamps_like_scalar(self):
+        t = np.array([-0.5, 1.5])
+        for eid in ALL_EASING_IDS:
+            assert apply_easing_array(eid, t).tolist() == pytest.approx(
+                [apply_easing(eid, -0.5), apply_easing(eid, 1.5)], abs=1e-12)
+
+    def test_unknown_ids_are_linear(self):
+        t = np.array([0.3, 0.7])
+        assert apply_easing_array(999, t).tolist() == pytest.approx([0.3, 0.7])
+        assert apply_easing_array(np.array([-1, 999]), t).tolist() == pytest.approx([0.3, 0.7])
+
+    def test_empty(self):
+        assert apply_easing_array(5, np.zeros(0)).shape == (0,)
+        assert apply_easing_array(np.zeros(0, dtype=np.int32), np.zeros(0)).shape == (0,)
+
+
+# ---------------------------------------------------------------------------
+# easing_function (the registry apply_easing dispatches through)
+# ---------------------------------------------------------------------------
+class TestEasingFunction:
+    def test_same_values_as_the_named_functions(self):
+        named = {
+            1: quad_out, 2: quad_in, 3: quad_in, 4: quad_out, 5: quad_in_out,
+            8: cubic_in_out, 13: quint_out, 17: sine_in_out, 19: expo_out, 23: circ_in_out,
+            24: elastic_in, 26: elastic_out_half, 28: elastic_in_out, 31: back_in_out,
+            32: bounce_in, 33: bounce_out, 34: bounce_in_out,
+        }
+        for eid, func in named.items():
+            for t in ARRAY_PROGRESS[::97].tolist():
+                assert easing_function(eid)(t) == func(t), (eid, t)
+
+    def test_clamps(self):
+        for eid in ALL_EASING_IDS:
+            function = easing_function(eid)
+            assert function(-0.5) == function(0.0)
+            assert function(1.5) == function(1.0)
+
+    def test_built_once(self):
+        assert easing_function(17) is easing_function(17)
+        assert easing_function(999)(0.3) == 0.3
+        assert easing_function(-1)(2.0) == 1.0
+
+
+# ---------------------------------------------------------------------------
+# EasingLUT
+# ---------------------------------------------------------------------------
+class TestEasingLUT:
+    @pytest.fixture(scope="class")
+    def lut(self):
+        return EasingLUT(256)
+
+    @pytest.mark.parametrize("eid", ALL_EASING_IDS)
+    def test_errors_bound_the_scalar_lookup(self, lut, eid):
+        exact = [apply_easing(eid, t) for t in ARRAY_PROGRESS.tolist()]
+        approx = [lut.apply(eid, t) for t in ARRAY_PROGRESS.tolist()]
+        # errors are measured on a dense grid, so they may miss the true peak by a hair
+        assert np.abs(np.subtract(approx, exact)).max() <= lut.errors[eid] * 1.001 + 1e-12
+        # grid points are exact
+        for i in (0, 1, 128, 255, 256):
+            assert lut.apply(eid, i / 256) == pytest.approx(apply_easing(eid, i / 256), abs=1e-12)
+
+    def test_errors_shrink_with_resolution(self, lut):
+        assert lut.errors[0] == 0.0
+        assert lut.errors[5] < 1e-4  # quad in-out: error ~ 1 / resolution^2
+        finer = EasingLUT(1024)
+        for eid in ALL_EASING_IDS[1:]:
+            assert finer.errors[eid] < lut.errors[eid]
+        assert finer.max_error == max(finer.errors.values())
+        assert "max error" in finer.summary()
+
+    def test_array_matches_scalar(self, lut):
+        rng = np.random.default_rng(5)
+        t = rng.uniform(-0.2, 1.2, 5000)
+        ids = rng.integers(-2, 40, len(t))
+        expected = [lut.apply(eid, value) for eid, value in zip(ids.tolist(), t.tolist())]
+        assert lut.apply_array(ids, t).tolist() == expected
+        assert lut.apply_array(28, t).tolist() == [lut.apply(28, value) for value in t.tolist()]
+
+    def test_unknown_ids_and_linear_are_exact(self, lut):
+        t = np.array([0.0, 0.3, 1 - 1e-16, 1.0])
+        for eid in (0, -1, 999):
+            assert lut.apply_array(eid, t).tolist() == t.tolist()
+            assert [lut.apply(eid, value) for value in t.tolist()] == t.tolist()
+
+    def test_pickles(self, lut):
+        lut.apply(17, 0.4)
+        copy = pickle.loads(pickle.dumps(lut))
+        assert copy.apply(17, 0.4) == lut.apply(17, 0.4)
+        assert copy.errors == lut.errors
+
+    def test_resolution_must_be_positive(self):
+        with pytest.raises(ValueError):
+            EasingLUT(0)
@@ -0,0 +1,121 @@
+"""Unit tests for src/keyframes.py — approximate states from keyframe tables."""
+
+import pickle
+import random
+import numpy as np
+import pytest
+import skia
+from src.keyframes import KeyframeTables
+from src.managers import AssetLoader
+from src.models import Animation, Layer, Origin, LoopType, Command, LoopCommand, Vector2
+from src.render_skia import SkiaRenderer
+from tests.helpers import engine_for, random_object, sprite
+
+
+def _smooth(rng):
+    """An object that moves, fades and turns smoothly, with a few jumps between commands."""
+    obj = sprite()
+    t = rng.randrange(0, 500, 10)
+    for _ in range(rng.randrange(1, 5)):
+        length = rng.randrange(200, 1500, 10)
+        x, y = rng.randrange(640), rng.randrange(480)
+        obj.commands.append(Command("M", rng.choice([0, 1, 2, 3]), t, t + length, [x, y, x + rng.randrange(-200, 200),
+                                                                                     y + rng.randrange(-200, 200)]))
+        obj.commands.append(Command("F", rng.choice([0, 1, 2]), t, t + length, [rng.random(), rng.random()]))
+        obj.commands.append(Command("R", 0, t, t + length, [0.0, rng.uniform(-1, 1)]))
+        t += length + rng.randrange(0, 300, 10)
+    return obj
+
+
+# ---------------------------------------------------------------------------
+# KeyframeTables.build / states
+# ---------------------------------------------------------------------------
+class TestKeyframeTables:
+    def test_one_ms_steps_are_exact(self):
+        rng = random.Random(3)
+        engine = engine_for([random_object(rng) for _ in range(60)])
+        tables = KeyframeTables.build(engine, step_ms=1, position_tolerance=0, opacity_tolerance=0)
+        stats = tables.compare(engine, range(-20, 3000, 7))
+        assert stats.states > 0
+        assert stats.visibility_errors == 0
+        assert (stats.position_error, stats.scale_error, stats.rotation_error, stats.opacity_error,
+                stats.color_error) == pytest.approx((0, 0, 0, 0, 0), abs=1e-9)
+
+    def test_adaptive_keyframes_stay_within_tolerance(self):
+        rng = random.Random(9)
+        engine = engine_for([_smooth(rng) for _ in range(200)])
+        tables = KeyframeTables.build(engine, step_ms=16, position_tolerance=0.5, opacity_tolerance=0.01)
+        stats = tables.compare(engine, range(0, 7000, 13))
+        assert stats.position_error <= 0.5
+        assert stats.opacity_error <= 0.01
+        assert stats.rotation_error <= 0.005
+        # far fewer keyframes than a fixed 16 ms grid
+        fixed = KeyframeTables.build(engine, step_ms=16, position_tolerance=0, opacity_tolerance=0)
+        assert stats.keyframes < fixed.stats.keyframes / 2
+        assert "max error over" in stats.summary()
+
+    def test_jumps_between_commands_are_exact(self):
+        obj = sprite(
+            Command("M", 0, 0, 1000, [0, 0, 100, 0]),
+            Command("M", 0, 1000, 1000, [400, 0, 500, 0]),  # starts at 400 at 1000, 500 after
+            Command("F", 0, 0, 0, [1.0, 1.0]),
+            Command("F", 0, 500, 500, [0.2, 0.2]),
+            Command("P", 0, 0, 700, ["H"]),
+            Command("S", 0, 1500, 1500, [1.0, 1.0]),
+        )
+        engine = engine_for([obj])
+        tables = KeyframeTables.build(engine, step_ms=64, position_tolerance=1, opacity_tolerance=0.05)
+        states = tables.states(engine.arrays, np.zeros(6, dtype=np.int64), np.array([499, 500, 700, 701, 1000, 1001]))
+        assert states.x.tolist() == pytest.approx([49.9, 50, 70, 70.1, 400, 500])
+        assert states.opacity.tolist() == pytest.approx([1, 0.2, 0.2, 0.2, 0.2, 0.2])
+        assert states.flip_h.tolist() == [True, True, True, False, False, False]
+
+    def test_hidden_outside_the_lifetime_and_exact_frames(self):
+        anim = Animation(Layer.Pass, Origin.Centre, "f.png", Vector2(0, 0), frame_count=4, frame_delay=30.0,
+                         loop_type=LoopType.LoopForever)
+        anim.commands.append(Command("F", 0, 100, 1000, [1.0, 1.0]))
+        engine = engine_for([anim])
+        tables = KeyframeTables.build(engine)
+        times = np.arange(0, 1100, 7)
+        states = tables.states(engine.arrays, np.zeros(len(times), dtype=np.int64), times)
+        exact = engine.evaluate_batch(np.zeros(len(times), dtype=np.int64), times)
+        assert states.visible.tolist() == exact.visible.tolist()
+        assert states.frame_index.tolist() == exact.frame_index.tolist()
+
+    def test_loops(self):
+        loop = LoopCommand(200, 5)
+        loop.commands.append(Command("MX", 0, 0, 300, [0.0, 300.0]))
+        loop.commands.append(Command("F", 0, 100, 100, [0.5, 0.5]))
+        engine = engine_for([sprite(loop)])
+        tables = KeyframeTables.build(engine, step_ms=32, position_tolerance=0.5, opacity_tolerance=0.01)
+        stats = tables.compare(engine, range(0, 2000, 3))
+        assert stats.position_error <= 0.5
+        assert stats.opacity_error == 0
+        assert stats.visibility_errors == 0
+
+    def test_pickles(self):
+        engine = engine_for([_smooth(random.Random(1)) for _ in range(5)])
+        tables = KeyframeTables.build(engine)
+        copy = pickle.loads(pickle.dumps(tables))
+        rows = np.arange(5)
+        assert copy.states(engine.arrays, rows, 700).to_matrix().tolist() == \
+            tables.states(engine.arrays, rows, 700).to_matrix().tolist()
+
+
+# ---------------------------------------------------------------------------
+# SkiaRenderer with keyframes
+# ---------------------------------------------------------------------------
+class TestRendererKeyframes:
+    def test_frames_match_exact_states_at_one_ms(self, tmp_path):
+        surface = skia.Surface(16, 16)
+        surface.getCanvas().clear(skia.Color(200, 80, 40, 255))
+        for name in ["x.png"] + [f"f{i}.png" for i in range(4)]:
+            surface.makeImageSnapshot().save(str(tmp_path / name), skia.kPNG)
+        rng = random.Random(13)
+        engine = engine_for([random_object(rng) for _ in range(80)])
+        tables = KeyframeTables.build(engine, step_ms=1, position_tolerance=0, opacity_tolerance=0)
+        exact = SkiaRenderer(engine, AssetLoader(str(tmp_path)), 640, 480, batch_states=True)
+        approx = SkiaRenderer(engine, AssetLoader(str(tmp_path)), 640, 480, keyframes=tables)
+        assert approx.batch_states
+        for t in range(0, 2500, 131):
+            assert np.array_equal(approx.render_frame(t).toarray(), exact.render_frame(t).toarray()), t
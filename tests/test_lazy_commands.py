@@ -0,0 +1,184 @@
+"""Unit tests for src/lazy_commands.py and StoryboardParser.index — lazy command loading."""
+
+import os
+import pickle
+import tempfile
+import pytest
+from src.lazy_commands import LazyCommands, count_loaded
+from src.models import Command
+from src.parse_diagnostics import StoryboardParseError, INVALID_COMMAND
+from src.parser import StoryboardParser
+from src.state_engine import StateEngine
+
+
+OSB = """[Variables]
+$fade=0,1
+[Events]
+//Background and Video events
+Video,0,"bg.mp4"
+Sprite,Background,Centre,"bg.jpg",320,240
+_F,0,0,1000,$fade
+_P,0,0,,A
+Sprite,Pass,Centre,"a.png",320,240
+_M,1,5000,6000,0,0,100,200
+_F,0,4000,,1
+_L,7000,3
+__S,0,0,300,1,2
+__S,0,300,600,2,1
+__P,0,0,0,H
+_T,HitSound,0,100
+_C,0,8000,8500,255,255,255,0,0,0
+Sample,0,0,"hit.wav",100
+_R,0,9000,9500,0,1,2,3
+Animation,Foreground,TopLeft,"f.png",0,0,4,50,LoopOnce
+_F,0,20000,19000,1,0,1
+_V,0,20000,,1,1
+Sprite,Overlay,Centre,"broken.png",x,0
+_F,0,0,100,0,1
+Sprite,Overlay,Centre,"empty.png",0,0
+"""
+
+
+def _write_temp_osb(content: str, newline: str = "\n") -> str:
+    fd, path = tempfile.mkstemp(suffix=".osb", text=True)
+    with os.fdopen(fd, "w", encoding="utf-8", newline=newline) as f:
+        f.write(content)
+    return path
+
+
+@pytest.fixture
+def osb_path():
+    path = _write_temp_osb(OSB)
+    yield path
+    os.unlink(path)
+
+
+def _objects(sb):
+    return [
+        obj
+        for layer in (sb.background_layer, sb.fail_layer, sb.pass_layer,
+                      sb.foreground_layer, sb.overlay_layer)
+        for obj in layer
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Index parse
+# ---------------------------------------------------------------------------
+class TestIndex:
+    def test_headers_and_lifetimes_match_full_parse(self, osb_path):
+        full = StoryboardParser().parse(osb_path)
+        StateEngine(full)
+        lazy = StoryboardParser().index(osb_path)
+
+        assert lazy.lifetimes_computed
+        assert lazy.video == full.video
+        assert len(_objects(lazy)) == len(_objects(full)) == 4
+        for a, b in zip(_objects(full), _objects(lazy)):
+            assert (a.layer, a.origin, a.filepath, a.position) == (b.layer, b.origin, b.filepath, b.position)
+            assert (a.life_start, a.life_end) == (b.life_start, b.life_end)
+        assert count_loaded(_objects(lazy)) == 0
+
+    def test_commands_match_full_parse(self, osb_path):
+        full = StoryboardParser().parse(osb_path)
+        StateEngine(full)
+        lazy = StoryboardParser().index(osb_path)
+        assert lazy == full
+
+    def test_crlf_offsets(self):
+        path = _write_temp_osb(OSB, newline="\r\n")
+        try:
+            full = StoryboardParser().parse(path)
+            StateEngine(full)
+            assert StoryboardParser().index(path) == full
+        finally:
+            os.unlink(path)
+
+    def test_late_variables(self):
+        path = _write_temp_osb("""[Events]
+Sprite,Pass,Centre,"a.png",$x,0
+_F,0,$t,2000,0,1
+[Variables]
+$x=10
+$t=500
+""")
+        try:
+            sb = StoryboardParser().index(path)
+            obj = sb.pass_layer[0]
+            assert obj.position.x == 10
+            assert (obj.life_start, obj.life_end) == (500, 2000)
+            assert obj.commands[0].start_time == 500
+        finally:
+            os.unlink(path)
+
+    def test_missing_file(self):
+        with pytest.raises(FileNotFoundError):
+            StoryboardParser().index("/nonexistent/x.osb")
+
+
+# ---------------------------------------------------------------------------
+# Lazy loading
+# ---------------------------------------------------------------------------
+class TestLazyLoading:
+    def test_only_drawn_objects_load(self, osb_path):
+        sb = StoryboardParser().index(osb_path)
+        engine = StateEngine(sb)
+        objects = _objects(sb)
+
+        for obj in objects:
+            engine.get_object_state(obj, 5500)
+        # only the Pass sprite is alive at 5.5 s
+        assert count_loaded(objects) == 1
+        assert sb.pass_layer[0].commands.loaded
+
+    def test_loaded_object_is_prepared(self, osb_path):
+        sb = StoryboardParser().index(osb_path)
+        cmds = sb.pass_layer[0].commands
+        assert [c.start_time for c in cmds] == sorted(c.start_time for c in cmds)
+        loop = [c for c in cmds if not isinstance(c, Command)][0]
+        assert loop.sub_max == 600
+        # zero-length P inside the loop spans the whole iteration
+        assert loop.commands[-1].end_time == 600
+
+    def test_list_operations(self, osb_path):
+        sb = StoryboardParser().index(osb_path)
+        cmds = sb.background_layer[0].commands
+        assert isinstance(cmds, LazyCommands)
+        assert "bytes at" in repr(cmds)
+        assert len(cmds) == 2
+        cmds.append(Command("R", 0, 0, 1, [0.0, 1.0]))
+        assert cmds.count(cmds[-1]) == 1
+        assert cmds[-1].type == "R"
+
+    def test_malformed_command_reported_on_load(self):
+        content = """[Events]
+Sprite,Pass,Centre,"a.png",320,240
+_F,0,0,100,0,1
+Sprite,Pass,Centre,"b.png",320,240
+_F,0,0,100,0,1
+_M,0,oops,100,0,0,1,1
+"""
+        path = _write_temp_osb(content)
+        try:
+            full = StoryboardParser()
+            full.parse(path)
+            parser = StoryboardParser()
+            sb = parser.index(path)
+            assert not parser.diagnostics
+            assert len(sb.pass_layer[1].commands) == 1
+            assert parser.diagnostics.counts == full.diagnostics.counts
+            assert parser.diagnostics.samples == full.diagnostics.samples
+
+            sb = StoryboardParser(strict=True).index(path)
+            assert len(sb.pass_layer[0].commands) == 1
+            with pytest.raises(StoryboardParseError) as error:
+                len(sb.pass_layer[1].commands)
+            assert error.value.line_no == full.diagnostics.samples[INVALID_COMMAND][0].line_no == 6
+        finally:
+            os.unlink(path)
+
+    def test_pickles_unloaded(self, osb_path):
+        sb = StoryboardParser().index(osb_path)
+        clone = pickle.loads(pickle.dumps(sb))
+        assert count_loaded(_objects(clone)) == 0
+        assert clone.pass_layer[0].commands == sb.pass_layer[0].commands
@@ -1,6 +1,8 @@
 """Unit tests for src/models.py — dataclass models and enums."""
 
+import pickle
 import pytest
+from src.parser import StoryboardParser
 from src.models import (
     Layer,
     Origin,
@@ -331,3 +333,36 @@ class TestStoryboard:
         sb2 = Storyboard()
         result = sb1.merge(sb2)
         assert result is sb1
+
+
+# ---------------------------------------------------------------------------
+# Compact representation
+# ---------------------------------------------------------------------------
+class TestSlots:
+    @pytest.mark.parametrize("instance", [
+        Vector2(1, 2),
+        Command("F", 0, 0, 100, [0.0, 1.0]),
+        LoopCommand(0, 2),
+        Sprite(Layer.Pass, Origin.Centre, "a.png", Vector2(0, 0)),
+        Animation(Layer.Pass, Origin.Centre, "a.png", Vector2(0, 0), frame_count=2),
+        ObjectState(),
+        VideoObject("v.mp4", 0),
+    ])
+    def test_no_instance_dict(self, instance):
+        assert not hasattr(instance, "__dict__")
+        with pytest.raises(AttributeError):
+            instance.not_a_field = 1
+
+    def test_pickle_round_trip(self):
+        obj = Animation(Layer.Pass, Origin.Centre, "a.png", Vector2(1, 2), frame_count=2)
+        obj.commands.append(Command("F", 0, 0, 100, [0.0, 1.0]))
+        assert pickle.loads(pickle.dumps(obj)) == obj
+
+    def test_parsed_paths_are_shared(self, tmp_path):
+        path = tmp_path / "a.osb"
+        path.write_text(
+            '[Events]\nSprite,Pass,Centre,"sb/a.png",0,0\n_F,0,0,1,0,1\n'
+            'Sprite,Pass,Centre,"sb/a.png",1,1\n_F,0,0,1,0,1\n'
+        )
+        a, b = StoryboardParser().parse(str(path)).pass_layer
+        assert a.filepath is b.filepath
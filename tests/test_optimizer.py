@@ -0,0 +1,239 @@
+"""Unit tests for src/optimizer.py — dropping never-visible objects and merging commands."""
+
+import copy
+import random
+import pytest
+from src import easings
+from src.models import (
+    Storyboard, Animation, Layer, Origin, Command, LoopCommand, Vector2,
+)
+from src.optimizer import (
+    StoryboardOptimizer,
+    merge_redundant_commands,
+    screen_bounds,
+    OVERSHOOTING_EASINGS,
+    TRANSPARENT,
+    ZERO_SCALE,
+    OFF_SCREEN,
+    MISSING_ASSET,
+)
+from src.state_engine import StateEngine
+from tests.helpers import sprite
+
+
+def _reason(obj, **kwargs):
+    sb = Storyboard()
+    sb.add_object(obj)
+    StateEngine(sb)
+    return StoryboardOptimizer(**kwargs).invisible_reason(obj)
+
+
+def _sizes(**known):
+    return lambda path: known.get(path)
+
+
+# 4:3 render: the visible area is exactly the 640x480 playfield
+BOUNDS_4_3 = screen_bounds(640, 480)
+
+
+# ---------------------------------------------------------------------------
+# Invisibility proofs
+# ---------------------------------------------------------------------------
+class TestInvisibleReason:
+    def test_always_transparent(self):
+        obj = sprite(Command("F", 0, 0, 1000, [0.0, 0.0]), Command("M", 0, 0, 1000, [0, 0, 100, 100]))
+        assert _reason(obj) == TRANSPARENT
+
+    def test_fade_in_is_visible(self):
+        assert _reason(sprite(Command("F", 0, 0, 1000, [0.0, 1.0]))) is None
+
+    def test_fade_only_inside_loop_is_visible(self):
+        # before the loop starts the object shows at full opacity
+        loop = LoopCommand(500, 2)
+        loop.commands.append(Command("F", 0, 0, 100, [0.0, 0.0]))
+        obj = sprite(Command("M", 0, 0, 1000, [0, 0, 1, 1]), loop)
+        assert _reason(obj) is None
+
+    def test_loop_before_top_level_fade_shows_base_opacity(self):
+        # the loop claims opacity when reached, so the later fade writes
+        # nothing before it starts and the sprite shows at full opacity
+        loop = LoopCommand(1000, 1)
+        loop.commands.append(Command("F", 0, 0, 100, [0.0, 0.0]))
+        obj = sprite(Command("M", 0, 0, 500, [320, 240, 320, 240]), loop,
+                      Command("F", 0, 2000, 3000, [0.0, 0.0]))
+        sb = Storyboard()
+        sb.add_object(obj)
+        assert StateEngine(sb).get_object_state(obj, 250).opacity == 1.0
+        assert StoryboardOptimizer().invisible_reason(obj) is None
+
+    def test_loop_values_count(self):
+        loop = LoopCommand(500, 2)
+        loop.commands.append(Command("F", 0, 0, 100, [0.0, 0.5]))
+        obj = sprite(Command("F", 0, 0, 1000, [0.0, 0.0]), loop)
+        assert _reason(obj) is None
+
+    def test_overshooting_easing_is_not_bounded(self):
+        back_out = min(OVERSHOOTING_EASINGS)
+        obj = sprite(Command("F", back_out, 0, 1000, [0.0, 0.0009]))
+        assert _reason(obj) is None
+        constant = sprite(Command("F", back_out, 0, 1000, [0.0, 0.0]))
+        assert _reason(constant) == TRANSPARENT
+
+    def test_zero_scale(self):
+        assert _reason(sprite(Command("S", 0, 0, 1000, [0.0, 0.0]))) == ZERO_SCALE
+        obj = sprite(Command("V", 0, 0, 1000, [0.0, 0.0, 0.0, 0.0]))
+        assert _reason(obj) == ZERO_SCALE
+
+    def test_one_axis_scaled_is_visible(self):
+        assert _reason(sprite(Command("V", 0, 0, 1000, [0.0, 1.0, 0.0, 1.0]))) is None
+
+    def test_missing_asset(self):
+        obj = sprite(Command("F", 0, 0, 1000, [0.0, 1.0]))
+        assert _reason(obj, image_size=_sizes()) == MISSING_ASSET
+        assert _reason(obj, image_size=_sizes(**{"x.png": (10, 10)})) is None
+
+    def test_animation_needs_one_frame(self):
+        obj = Animation(Layer.Pass, Origin.Centre, "a.png", Vector2(320, 240), frame_count=3, frame_delay=10)
+        obj.commands.append(Command("F", 0, 0, 1000, [0.0, 1.0]))
+        assert _reason(obj, image_size=_sizes()) == MISSING_ASSET
+        assert _reason(obj, image_size=_sizes(**{"a2.png": (4, 4)})) is None
+
+    def test_off_screen(self):
+        obj = sprite(Command("M", 0, 0, 1000, [800, 0, 900, 100]))
+        kwargs = dict(image_size=_sizes(**{"x.png": (100, 100)}), bounds=BOUNDS_4_3)
+        assert _reason(obj, **kwargs) == OFF_SCREEN
+
+    def test_off_screen_accounts_for_sprite_size_and_scale(self):
+        move = Command("MX", 0, 0, 1000, [800.0, 800.0])
+        kwargs = dict(image_size=_sizes(**{"x.png": (100, 100)}), bounds=BOUNDS_4_3)
+        assert _reason(sprite(move), **kwargs) == OFF_SCREEN
+        # scaled up, its corner can reach back onto the screen
+        assert _reason(sprite(move, Command("S", 0, 0, 1000, [1.0, 1.0])), **kwargs) == OFF_SCREEN
+        assert _reason(sprite(move, Command("S", 0, 0, 1000, [1.0, 2.0])), **kwargs) is None
+
+    def test_off_screen_depends_on_aspect_ratio(self):
+        obj = sprite(Command("MX", 0, 0, 1000, [-60.0, -60.0]))
+        kwargs = dict(image_size=_sizes(**{"x.png": (10, 10)}))
+        assert _reason(obj, bounds=BOUNDS_4_3, **kwargs) == OFF_SCREEN
+        assert _reason(obj, bounds=screen_bounds(1280, 720), **kwargs) is None
+
+    def test_base_position_counts_without_move(self):
+        obj = sprite(Command("F", 0, 0, 1000, [0.0, 1.0]), position=(320, 240))
+        kwargs = dict(image_size=_sizes(**{"x.png": (10, 10)}), bounds=BOUNDS_4_3)
+        assert _reason(obj, **kwargs) is None
+
+
+class TestScreenBounds:
+    def test_widescreen(self):
+        left, top, right, bottom = screen_bounds(1280, 720)
+        assert left == pytest.approx(-320 / 3)
+        assert right == pytest.approx(640 + 320 / 3)
+        assert (top, bottom) == (0.0, 480.0)
+
+    def test_non_overshooting_easings_stay_in_range(self):
+        for easing in range(35):
+            if easing in OVERSHOOTING_EASINGS:
+                continue
+            values = [easings.apply_easing(easing, i / 1000) for i in range(1001)]
+            assert min(values) >= -1e-9 and max(values) <= 1 + 1e-9, easing
+
+
+# ---------------------------------------------------------------------------
+# Command merging
+# ---------------------------------------------------------------------------
+class TestMergeRedundantCommands:
+    def test_repeated_command_dropped(self):
+        cmds = [Command("F", 1, 0, 100, [0.0, 1.0]), Command("F", 1, 0, 100, [0.0, 1.0])]
+        assert merge_redundant_commands(cmds) == 1
+        assert len(cmds) == 1
+
+    def test_constant_runs_merge(self):
+        cmds = [
+            Command("F", 0, 0, 100, [1.0, 1.0]),
+            Command("M", 0, 50, 60, [0, 0, 1, 1]),
+            Command("F", 0, 200, 300, [1.0, 1.0]),
+            Command("F", 0, 400, 500, [1.0, 1.0]),
+        ]
+        assert merge_redundant_commands(cmds) == 2
+        assert [(c.type, c.start_time, c.end_time) for c in cmds] == [("F", 0, 500), ("M", 50, 60)]
+
+    def test_different_values_kept(self):
+        cmds = [Command("F", 0, 0, 100, [1.0, 1.0]), Command("F", 0, 200, 300, [0.5, 0.5])]
+        assert merge_redundant_commands(cmds) == 0
+
+    def test_shared_property_in_between_blocks_merge(self):
+        cmds = [
+            Command("M", 0, 0, 100, [5, 5, 5, 5]),
+            Command("MX", 0, 150, 160, [0, 9]),
+            Command("M", 0, 200, 300, [5, 5, 5, 5]),
+        ]
+        assert merge_redundant_commands(cmds) == 0
+
+    def test_loop_in_between_blocks_merge(self):
+        loop = LoopCommand(150, 2)
+        loop.commands.append(Command("F", 0, 0, 10, [0.0, 1.0]))
+        cmds = [Command("F", 0, 0, 100, [1.0, 1.0]), loop, Command("F", 0, 200, 300, [1.0, 1.0])]
+        assert merge_redundant_commands(cmds) == 0
+
+    def test_merged_states_match(self):
+        rng = random.Random(3)
+        for _ in range(200):
+            obj = sprite()
+            for _ in range(rng.randrange(2, 8)):
+                kind = rng.choice(["F", "MX", "M", "S"])
+                start = rng.randrange(0, 1000, 100)
+                end = start + rng.choice([0, 100, 200])
+                value = rng.choice([0.0, 1.0])
+                params = [value] * (4 if kind == "M" else 2)
+                if rng.random() < 0.3:
+                    params[-1] = 0.5
+                obj.commands.append(Command(kind, rng.choice([0, 3]), start, end, params))
+            sb = Storyboard()
+            sb.add_object(obj)
+            engine = StateEngine(sb)
+            original = copy.deepcopy(obj)
+            merge_redundant_commands(obj.commands)
+            assert (obj.life_start, obj.life_end) == (original.life_start, original.life_end)
+            for t in range(-50, 1300, 25):
+                assert engine.get_object_state(obj, t) == engine.get_object_state(original, t)
+
+
+# ---------------------------------------------------------------------------
+# Whole storyboard
+# ---------------------------------------------------------------------------
+class TestOptimize:
+    def _storyboard(self):
+        sb = Storyboard()
+        sb.add_object(sprite(Command("F", 0, 0, 1000, [0.0, 1.0]), Command("F", 0, 1000, 1000, [0.0, 1.0])))
+        sb.add_object(sprite(Command("F", 0, 0, 1000, [0.0, 0.0]), Command("M", 0, 0, 9000, [0, 0, 1, 1])))
+        sb.add_object(sprite(Command("S", 0, 0, 1000, [0.0, 0.0])))
+        sb.add_object(sprite(Command("F", 0, 0, 1000, [0.0, 1.0]), path="gone.png"))
+        return sb
+
+    def test_stats_and_layers(self):
+        sb = self._storyboard()
+        layer = sb.pass_layer
+        stats = StoryboardOptimizer(image_size=_sizes(**{"x.png": (8, 8)})).optimize(sb)
+
+        assert sb.pass_layer is layer
+        assert len(layer) == 1
+        assert stats.objects_before == 4
+        assert stats.commands_before == 6
+        assert stats.removed_objects == {TRANSPARENT: 1, ZERO_SCALE: 1, MISSING_ASSET: 1}
+        assert stats.merged_commands == 0
+        assert stats.removed_commands == 4
+        assert "removed 3 of 4 objects" in stats.summary()
+
+    def test_computes_lifetimes_when_missing(self):
+        sb = self._storyboard()
+        StoryboardOptimizer().optimize(sb)
+        assert sb.lifetimes_computed
+        assert (sb.pass_layer[0].life_start, sb.pass_layer[0].life_end) == (0, 1000)
+
+    def test_merge_can_be_disabled(self):
+        sb = Storyboard()
+        sb.add_object(sprite(Command("F", 0, 0, 100, [1.0, 1.0]), Command("F", 0, 100, 200, [1.0, 1.0])))
+        assert StoryboardOptimizer(merge_commands=False).optimize(sb).merged_commands == 0
+        stats = StoryboardOptimizer().optimize(sb)
+        assert stats.merged_commands == stats.removed_commands == 1
+        assert len(sb.pass_layer[0].commands) == 1
@@ -0,0 +1,235 @@
+"""Unit tests for src/parse_cache.py — on-disk cache of parsed storyboards."""
+
+import os
+import shutil
+import tempfile
+import pytest
+from src.columnar import ColumnarCommands
+from src.models import (
+    Storyboard, Sprite, Layer, Origin, Command, LoopCommand, Vector2,
+)
+from src.parser import StoryboardParser
+from src.parse_cache import ParseCache, CACHE_VERSION, _HEADER, parser_options
+from src.parse_diagnostics import StoryboardParseError
+from src.state_engine import StateEngine
+
+
+OSB = """
+[Events]
+Sprite,Pass,Centre,"x.png",320,240
+_F,0,1000,2000,0,1
+_L,3000,2
+__S,0,0,500,1,2
+"""
+
+
+@pytest.fixture
+def workdir():
+    path = tempfile.mkdtemp()
+    yield path
+    shutil.rmtree(path, ignore_errors=True)
+
+
+def _write(path: str, content: str):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+class _CountingParser(StoryboardParser):
+    """Parser that records how often a text parse actually ran."""
+
+    calls = 0
+
+    def parse(self, filepath: str) -> Storyboard:
+        _CountingParser.calls += 1
+        return super().parse(filepath)
+
+
+@pytest.fixture(autouse=True)
+def _reset_counter():
+    _CountingParser.calls = 0
+
+
+# ---------------------------------------------------------------------------
+# Hits and misses
+# ---------------------------------------------------------------------------
+class TestHitMiss:
+    def test_cold_then_warm(self, workdir):
+        osb = os.path.join(workdir, "map.osb")
+        _write(osb, OSB)
+        cache = ParseCache(os.path.join(workdir, "cache"))
+
+        first = cache.parse(osb, _CountingParser)
+        second = cache.parse(osb, _CountingParser)
+
+        assert _CountingParser.calls == 1
+        assert (cache.hits, cache.misses) == (1, 1)
+        assert second == first
+        assert second is not first
+
+    def test_cached_storyboard_carries_lifetimes(self, workdir):
+        osb = os.path.join(workdir, "map.osb")
+        _write(osb, OSB)
+        cache = ParseCache(os.path.join(workdir, "cache"))
+        cache.parse(osb)
+
+        sb = cache.load(osb)
+        obj = sb.pass_layer[0]
+        assert sb.lifetimes_computed is True
+        assert (obj.life_start, obj.life_end) == (1000, 4000)
+        loop = obj.commands[-1]
+        assert isinstance(loop, LoopCommand)
+        assert loop.sub_max == 500
+
+    def test_content_change_invalidates(self, workdir):
+        osb = os.path.join(workdir, "map.osb")
+        _write(osb, OSB)
+        cache = ParseCache(os.path.join(workdir, "cache"))
+        cache.parse(osb)
+
+        _write(osb, OSB.replace("320,240", "100,100"))
+        sb = cache.parse(osb, _CountingParser)
+        assert _CountingParser.calls == 1
+        assert sb.pass_layer[0].position.x == 100
+
+    def test_same_size_and_mtime_but_different_content(self, workdir):
+        osb = os.path.join(workdir, "map.osb")
+        _write(osb, OSB)
+        cache = ParseCache(os.path.join(workdir, "cache"))
+        cache.parse(osb)
+        st = os.stat(osb)
+
+        _write(osb, OSB.replace("320,240", "111,222"))
+        os.utime(osb, ns=(st.st_atime_ns, st.st_mtime_ns))
+        assert cache.load(osb) is None
+
+    def test_parser_settings_use_their_own_entries(self, workdir):
+        osb = os.path.join(workdir, "map.osb")
+        _write(osb, OSB + "_F,0,oops\n")
+        cache = ParseCache(os.path.join(workdir, "cache"))
+        cache.parse(osb, _CountingParser)
+
+        # a strict run must see the malformed line, not the lenient entry
+        with pytest.raises(StoryboardParseError):
+            cache.parse(osb, lambda: _CountingParser(strict=True))
+        columnar = cache.parse(osb, lambda: _CountingParser(columnar=True))
+        assert _CountingParser.calls == 3
+        assert cache.hits == 0
+        cached = cache.parse(osb, lambda: _CountingParser(columnar=True))
+        assert cached == columnar
+        assert (_CountingParser.calls, cache.hits) == (3, 1)
+        # a columnar hit is columnar too
+        assert isinstance(cached.pass_layer[0].commands, ColumnarCommands)
+        assert cache.entry_path(osb, parser_options(StoryboardParser(columnar=True))) != cache.entry_path(osb)
+        # parallel parses give the same storyboard, so they share the entry
+        assert parser_options(StoryboardParser(workers=4)) == ""
+
+    def test_hit_restores_diagnostics(self, workdir):
+        osb = os.path.join(workdir, "map.osb")
+        _write(osb, OSB + "_F,0,oops\n_Q,0,0,0,1\n")
+        cache = ParseCache(os.path.join(workdir, "cache"))
+        parsed = _CountingParser()
+        cache.parse(osb, lambda: parsed)
+        assert parsed.diagnostics
+
+        warm = _CountingParser()
+        cache.parse(osb, lambda: warm)
+        assert cache.hits == 1
+        assert warm.diagnostics == parsed.diagnostics
+        assert warm.diagnostics.summary("map.osb") == parsed.diagnostics.summary("map.osb")
+
+    def test_missing_entry(self, workdir):
+        osb = os.path.join(workdir, "map.osb")
+        _write(osb, OSB)
+        assert ParseCache(os.path.join(workdir, "cache")).load(osb) is None
+
+
+# ---------------------------------------------------------------------------
+# Format versioning and corruption
+# ---------------------------------------------------------------------------
+class TestFormat:
+    def test_other_version_is_discarded(self, workdir):
+        osb = os.path.join(workdir, "map.osb")
+        _write(osb, OSB)
+        cache = ParseCache(os.path.join(workdir, "cache"))
+        cache.parse(osb)
+
+        entry = cache.entry_path(osb)
+        with open(entry, "r+b") as f:
+            header = list(_HEADER.unpack(f.read(_HEADER.size)))
+            header[1] = CACHE_VERSION + 1
+            f.seek(0)
+            f.write(_HEADER.pack(*header))
+
+        assert cache.load(osb) is None
+        assert not os.path.exists(entry)
+
+    def test_corrupt_entry_is_discarded(self, workdir):
+        osb = os.path.join(workdir, "map.osb")
+        _write(osb, OSB)
+        cache = ParseCache(os.path.join(workdir, "cache"))
+        cache.parse(osb)
+
+        entry = cache.entry_path(osb)
+        with open(entry, "r+b") as f:
+            f.truncate(_HEADER.size + 3)
+
+        assert cache.load(osb) is None
+        assert not os.path.exists(entry)
+
+
+# ---------------------------------------------------------------------------
+# Size cap / LRU eviction
+# ---------------------------------------------------------------------------
+class TestEviction:
+    def test_least_recently_used_is_evicted(self, workdir):
+        cache_dir = os.path.join(workdir, "cache")
+        paths = []
+        for name in ("a", "b", "c"):
+            p = os.path.join(workdir, f"{name}.osb")
+            _write(p, OSB)
+            paths.append(p)
+
+        cache = ParseCache(cache_dir, max_bytes=1 << 30)
+        for i, p in enumerate(paths):
+            cache.parse(p)
+            os.utime(cache.entry_path(p), (1000 + i, 1000 + i))
+        # touching "a" makes "b" the least recently used
+        assert cache.load(paths[0]) is not None
+
+        entry_size = os.path.getsize(cache.entry_path(paths[0]))
+        cache.max_bytes = entry_size * 2
+        cache._evict()
+
+        assert os.path.exists(cache.entry_path(paths[0]))
+        assert not os.path.exists(cache.entry_path(paths[1]))
+        assert os.path.exists(cache.entry_path(paths[2]))
+
+    def test_clear(self, workdir):
+        osb = os.path.join(workdir, "map.osb")
+        _write(osb, OSB)
+        cache = ParseCache(os.path.join(workdir, "cache"))
+        cache.parse(osb)
+        cache.clear()
+        assert cache.load(osb) is None
+
+
+# ---------------------------------------------------------------------------
+# Lifetime flag
+# ---------------------------------------------------------------------------
+class TestLifetimeFlag:
+    def test_engine_skips_computed_lifetimes(self):
+        sb = Storyboard()
+        obj = Sprite(Layer.Pass, Origin.Centre, "x.png", Vector2(0, 0))
+        obj.commands.append(Command("F", 0, 1000, 2000, [0.0, 1.0]))
+        sb.add_object(obj)
+        sb.lifetimes_computed = True
+
+        StateEngine(sb)
+        assert (obj.life_start, obj.life_end) == (0, 0)
+
+    def test_merge_requires_both(self):
+        a, b = Storyboard(lifetimes_computed=True), Storyboard()
+        assert a.merge(b).lifetimes_computed is False
+        a, b = Storyboard(lifetimes_computed=True), Storyboard(lifetimes_computed=True)
+        assert a.merge(b).lifetimes_computed is True
@@ -0,0 +1,81 @@
+"""Unit tests for src/parse_diagnostics.py — aggregated parse problems."""
+
+import pickle
+import pytest
+from src.parse_diagnostics import (
+    ParseDiagnostics,
+    StoryboardParseError,
+    INVALID_COMMAND,
+    UNKNOWN_COMMAND,
+    MAX_SAMPLES,
+)
+
+
+# ---------------------------------------------------------------------------
+# Collecting
+# ---------------------------------------------------------------------------
+class TestCollect:
+    def test_empty(self):
+        diag = ParseDiagnostics()
+        assert not diag
+        assert diag.total == 0
+
+    def test_counts_and_sample_cap(self):
+        diag = ParseDiagnostics()
+        for i in range(10):
+            diag.add(INVALID_COMMAND, i + 1, f"_F,0,x{i}", "bad int")
+        diag.add(UNKNOWN_COMMAND, 20, "_Q,0,0", "Q")
+        assert diag
+        assert diag.counts == {INVALID_COMMAND: 10, UNKNOWN_COMMAND: 1}
+        assert diag.total == 11
+        assert len(diag.samples[INVALID_COMMAND]) == MAX_SAMPLES
+        assert diag.samples[INVALID_COMMAND][0].line_no == 1
+
+    def test_merge_shifts_line_numbers(self):
+        a, b = ParseDiagnostics(), ParseDiagnostics()
+        a.add(INVALID_COMMAND, 3, "x")
+        b.add(INVALID_COMMAND, 2, "y")
+        b.add(UNKNOWN_COMMAND, 5, "z")
+        a.merge(b, line_offset=100)
+        assert a.counts == {INVALID_COMMAND: 2, UNKNOWN_COMMAND: 1}
+        assert [s.line_no for s in a.samples[INVALID_COMMAND]] == [3, 102]
+        assert a.samples[UNKNOWN_COMMAND][0].line_no == 105
+
+    def test_summary_most_frequent_first(self):
+        diag = ParseDiagnostics()
+        diag.add(UNKNOWN_COMMAND, 9, "_Q,0,0", "Q")
+        diag.add(INVALID_COMMAND, 1, "_F,a", "bad")
+        diag.add(INVALID_COMMAND, 2, "_F,b", "bad")
+        text = diag.summary("map.osb")
+        lines = text.splitlines()
+        assert lines[0] == "Skipped 3 malformed storyboard line(s) in map.osb:"
+        assert lines[1] == f"  {INVALID_COMMAND}: 2"
+        assert "line 9: _Q,0,0 (Q)" in text
+
+    def test_clear(self):
+        diag = ParseDiagnostics()
+        diag.add(INVALID_COMMAND, 1, "x")
+        diag.clear()
+        assert not diag
+
+
+# ---------------------------------------------------------------------------
+# Strict mode
+# ---------------------------------------------------------------------------
+class TestStrict:
+    def test_raises_on_first_problem(self):
+        diag = ParseDiagnostics(strict=True)
+        with pytest.raises(StoryboardParseError) as info:
+            diag.add(INVALID_COMMAND, 42, "_F,0,x", "bad int")
+        err = info.value
+        assert (err.category, err.line_no, err.line) == (INVALID_COMMAND, 42, "_F,0,x")
+        assert "line 42" in str(err)
+        assert not diag
+
+    def test_error_pickles(self):
+        err = StoryboardParseError(INVALID_COMMAND, 7, "_F", "detail")
+        clone = pickle.loads(pickle.dumps(err))
+        assert (clone.line_no, clone.detail, str(clone)) == (7, "detail", str(err))
+
+    def test_is_value_error(self):
+        assert issubclass(StoryboardParseError, ValueError)
@@ -1,9 +1,11 @@
 """Unit tests for src/parser.py — StoryboardParser for .osu/.osb files."""
 
+import io
 import os
+import time
 import tempfile
 import pytest
-from src.parser import StoryboardParser
+from src.parser import StoryboardParser, VariableSubstituter
 from src.models import (
     Storyboard, Sprite, Animation, VideoObject,
     Layer, Origin, LoopType, Command, LoopCommand, Vector2,
@@ -539,6 +541,72 @@ _ZZ,0,0,100,1,2
             os.unlink(path)
 
 
+# ---------------------------------------------------------------------------
+# _parse_basic_command shapes (fast paths and general expansion)
+# ---------------------------------------------------------------------------
+class TestBasicCommandShapes:
+    @staticmethod
+    def _commands(line: str):
+        target = []
+        StoryboardParser()._parse_basic_command(line.split(","), target)
+        return target
+
+    def test_full_pair(self):
+        assert self._commands("S,2,0,100,0.5,1") == [Command("S", 2, 0, 100, [0.5, 1.0])]
+
+    def test_empty_end_time_single_value(self):
+        assert self._commands("R,0,300,,1.5") == [Command("R", 0, 300, 300, [1.5, 1.5])]
+
+    def test_single_state_multi_value(self):
+        assert self._commands("C,0,0,10,255,128,0") == [
+            Command("C", 0, 0, 10, [255.0, 128.0, 0.0, 255.0, 128.0, 0.0])
+        ]
+
+    def test_empty_value_falls_back(self):
+        # empty values are skipped, leaving a single state
+        assert self._commands("F,0,0,100,,1") == [Command("F", 0, 0, 100, [1.0, 1.0])]
+
+    def test_trailing_comma(self):
+        assert self._commands("F,0,0,100,0,1,") == [Command("F", 0, 0, 100, [0.0, 1.0])]
+
+    def test_repeated_segments_ignore_partial_state(self):
+        cmds = self._commands("MX,0,0,10,1,2,3")
+        assert [(c.start_time, c.end_time, c.params) for c in cmds] == [
+            (0, 10, [1.0, 2.0]), (10, 20, [2.0, 3.0]),
+        ]
+        # a trailing half state of M is dropped
+        assert len(self._commands("M,0,0,10,1,2,3,4,5")) == 1
+
+    def test_parameter_command(self):
+        assert self._commands("P,0,0,,H") == [Command("P", 0, 0, 0, ["H"])]
+        assert self._commands("P,0,0,10") == []
+
+    def test_bad_numbers_emit_nothing(self):
+        assert self._commands("F,x,0,100,0,1") == []
+        assert self._commands("F,0,0,100,0,oops") == []
+        assert self._commands("F,0") == []
+
+    def test_throughput(self, record_property):
+        """Reports commands/s for the common shapes (``pytest -s`` prints it)."""
+        lines = [
+            "F,0,1000,1500,0,1", "F,0,1000,,0.5", "S,0,1000,1500,0.2,0.8",
+            "R,3,1000,1800,0,3.1416", "M,1,1000,2000,10,20,300,400",
+            "C,0,1000,,255,128,0", "P,0,1000,1100,A", "F,0,0,100,0,1,0,1,0",
+        ]
+        batch = [line.split(",") for line in lines] * 2500
+        parser = StoryboardParser()
+        target = []
+        t0 = time.perf_counter()
+        for parts in batch:
+            parser._parse_basic_command(parts, target)
+        secs = time.perf_counter() - t0
+
+        assert len(target) == 2500 * (len(lines) + 3)
+        rate = len(target) / secs
+        record_property("commands_per_second", round(rate))
+        print(f"\n_parse_basic_command: {rate:,.0f} commands/s")
+
+
 # ---------------------------------------------------------------------------
 # Loop command parsing
 # ---------------------------------------------------------------------------
@@ -691,6 +759,52 @@ _F,0,0,1000,0,1
         finally:
             os.unlink(path)
 
+    def test_prefix_variable_names(self):
+        """$a must not clobber the longer $ab."""
+        path = _write_temp_osb("""
+[Variables]
+$a=1
+$ab=0.25
+[Events]
+Sprite,Pass,Centre,"x.png",0,0
+_F,0,0,1000,$ab,$a
+""")
+        try:
+            parser = StoryboardParser()
+            sb = parser.parse(path)
+            assert sb.pass_layer[0].commands[0].params == [0.25, 1.0]
+            assert parser.substitution_count == 2
+        finally:
+            os.unlink(path)
+
+
+class TestVariableSubstituter:
+    def test_line_without_dollar_untouched(self):
+        sub = VariableSubstituter({"$x": "1"})
+        line = "_F,0,0,1000,0,1"
+        assert sub.substitute(line) is line
+        assert sub.count == 0
+
+    def test_counts_every_reference(self):
+        sub = VariableSubstituter({"$x": "320", "$y": "240"})
+        assert sub.substitute("_M,0,0,100,$x,$y,$x,$y") == "_M,0,0,100,320,240,320,240"
+        assert sub.count == 4
+
+    def test_longest_match_wins(self):
+        sub = VariableSubstituter({"$a": "A", "$abc": "C", "$ab": "B"})
+        assert sub.substitute("$abc,$ab,$a,$abd") == "C,B,A,Bd"
+
+    def test_added_variables_are_picked_up(self):
+        sub = VariableSubstituter()
+        assert sub.substitute("$v") == "$v"
+        sub.add("$v", "7")
+        assert sub.substitute("$v") == "7"
+
+    def test_empty_name_is_ignored(self):
+        sub = VariableSubstituter()
+        sub.add("", "junk")
+        assert sub.substitute("$x,1") == "$x,1"
+
 
 # ---------------------------------------------------------------------------
 # Indent-based parsing (spaces and underscores)
@@ -761,6 +875,22 @@ _M,0,not_a_number,500,0,0,320,240
         finally:
             os.unlink(path)
 
+    def test_malformed_object_closes_previous_loop(self):
+        path = _write_temp_osb("""
+[Events]
+Sprite,Pass,Centre,"x.png",0,0
+_L,0,2
+__F,0,0,100,0,1
+Sprite,Pass,Centre,"y.png",abc,0
+__F,0,0,200,0,1
+""")
+        try:
+            sb = StoryboardParser().parse(path)
+            # the loop line after the broken header belongs to no object
+            assert len(sb.pass_layer[0].commands[0].commands) == 1
+        finally:
+            os.unlink(path)
+
     def test_empty_parts_list(self):
         path = _write_temp_osb("""
 [Events]
@@ -772,3 +902,242 @@ _M,0,not_a_number,500,0,0,320,240
             assert sb.is_empty() is True
         finally:
             os.unlink(path)
+
+
+# ---------------------------------------------------------------------------
+# Streaming parse
+# ---------------------------------------------------------------------------
+class _LineOnlyFile:
+    """File-like object that only supports line iteration (no readlines/seek)."""
+
+    def __init__(self, content: str):
+        self._lines = content.splitlines(keepends=True)
+
+    def __iter__(self):
+        return iter(self._lines)
+
+
+class TestStreamingParse:
+    def test_parse_stream_from_file_object(self):
+        sb = StoryboardParser().parse_stream(io.StringIO("""
+[Events]
+Sprite,Pass,Centre,"x.png",0,0
+_F,0,0,1000,0,1
+"""))
+        assert len(sb.pass_layer) == 1
+        assert len(sb.pass_layer[0].commands) == 1
+
+    def test_only_iterates_lines(self):
+        sb = StoryboardParser().parse_stream(_LineOnlyFile("""
+[Variables]
+$v=0.5
+[Events]
+Sprite,Pass,Centre,"x.png",0,0
+_F,0,0,1000,$v
+"""))
+        assert sb.pass_layer[0].commands[0].params == [0.5, 0.5]
+
+    def test_iter_objects_yields_completed_objects_in_order(self):
+        parser = StoryboardParser()
+        objects = list(parser.iter_objects(io.StringIO("""
+[Events]
+Sprite,Pass,Centre,"a.png",0,0
+_F,0,0,1000,0,1
+Sprite,Background,Centre,"b.png",0,0
+_L,0,2
+__F,0,0,500,0,1
+Sprite,Pass,Centre,"c.png",0,0
+""")))
+        assert [o.filepath for o in objects] == ["a.png", "b.png", "c.png"]
+        assert len(objects[0].commands) == 1
+        assert isinstance(objects[1].commands[0], LoopCommand)
+        # iter_objects leaves placement to the caller
+        assert parser.storyboard.is_empty()
+
+    def test_variables_after_events_fall_back_to_second_pass(self):
+        path = _write_temp_osb("""
+[Events]
+Sprite,Pass,Centre,"$file",0,0
+_F,0,0,1000,0,1
+[Variables]
+$file=late.png
+""")
+        try:
+            parser = StoryboardParser()
+            sb = parser.parse(path)
+            assert len(sb.pass_layer) == 1
+            assert sb.pass_layer[0].filepath == "late.png"
+            assert len(sb.pass_layer[0].commands) == 1
+        finally:
+            os.unlink(path)
+
+    def test_variables_after_events_without_references(self):
+        """A trailing [Variables] section nobody used must not trigger a re-read."""
+        sb = StoryboardParser().parse_stream(_LineOnlyFile("""
+[Events]
+Sprite,Pass,Centre,"x.png",0,0
+[Variables]
+$unused=1
+"""))
+        assert len(sb.pass_layer) == 1
+
+
+# ---------------------------------------------------------------------------
+# Parallel parse
+# ---------------------------------------------------------------------------
+PARALLEL_OSB = """
+[Variables]
+$fade=0,1
+[Events]
+Video,0,"v.mp4"
+Sprite,Background,Centre,"bg.jpg",320,240
+_F,0,0,1000,$fade
+"""
+
+
+def _parallel_osb(objects: int) -> str:
+    lines = [PARALLEL_OSB]
+    layers = ["Background", "Pass", "Foreground", "Overlay"]
+    for i in range(objects):
+        lines.append(f'Sprite,{layers[i % 4]},Centre,"s{i}.png",{i},0')
+        lines.append(f"_F,0,{i},{i + 100},$fade")
+        if i % 7 == 0:
+            lines.append(f"_L,{i},3")
+            lines.append("__S,0,0,50,1,2")
+        if i % 11 == 0:
+            lines.append(f"Sample,{i},0,\"hit.wav\",100")  # non-object top-level line
+            lines.append(f"_R,0,{i},{i + 10},0,1")
+    return "\n".join(lines) + "\n"
+
+
+class TestParallelParse:
+    def test_matches_serial_parse(self, monkeypatch):
+        import src.parser as parser_module
+
+        # force many chunks out of a small file
+        monkeypatch.setattr(parser_module, "PARALLEL_CHUNK_MIN_BYTES", 2048)
+        path = _write_temp_osb(_parallel_osb(3000))
+        try:
+            serial = StoryboardParser().parse(path)
+            parallel = StoryboardParser(workers=3, parallel_min_bytes=0).parse(path)
+            assert parallel.background_layer == serial.background_layer
+            assert parallel.pass_layer == serial.pass_layer
+            assert parallel.foreground_layer == serial.foreground_layer
+            assert parallel.overlay_layer == serial.overlay_layer
+            assert parallel.video == serial.video
+        finally:
+            os.unlink(path)
+
+    def test_small_file_stays_serial(self, monkeypatch):
+        import src.parser as parser_module
+
+        def no_pool(*args, **kwargs):
+            raise AssertionError("process pool should not be used")
+
+        monkeypatch.setattr(parser_module.multiprocessing, "Pool", no_pool)
+        path = _write_temp_osb(_parallel_osb(10))
+        try:
+            sb = StoryboardParser(workers=4).parse(path)
+            assert len(sb.pass_layer) > 0
+        finally:
+            os.unlink(path)
+
+    def test_single_worker_is_serial(self, monkeypatch):
+        import src.parser as parser_module
+
+        def no_pool(*args, **kwargs):
+            raise AssertionError("process pool should not be used")
+
+        monkeypatch.setattr(parser_module.multiprocessing, "Pool", no_pool)
+        path = _write_temp_osb(_parallel_osb(10))
+        try:
+            sb = StoryboardParser(workers=1, parallel_min_bytes=0).parse(path)
+            assert len(sb.pass_layer) > 0
+        finally:
+            os.unlink(path)
+
+
+# ---------------------------------------------------------------------------
+# Diagnostics
+# ---------------------------------------------------------------------------
+_MALFORMED_OSB = """[Events]
+Video,x,"v.mp4"
+Sprite,Pass,Centre,"a.png",320,240
+_F,0,0,1000,0,1
+_F,0,abc,1000,0,1
+_Q,0,0,100,1
+_L,x,2
+Sprite,Nowhere,Centre,"b.png",0,0
+_M,0,0,100,1,2,3,4
+"""
+
+
+class TestDiagnostics:
+    def test_problems_are_collected_not_printed(self, capsys):
+        path = _write_temp_osb(_MALFORMED_OSB)
+        try:
+            parser = StoryboardParser()
+            sb = parser.parse(path)
+        finally:
+            os.unlink(path)
+
+        assert capsys.readouterr().out == ""
+        assert len(sb.pass_layer) == 1
+        assert len(sb.pass_layer[0].commands) == 1
+        diag = parser.diagnostics
+        assert diag.counts == {
+            "invalid video event": 1,
+            "invalid command": 1,
+            "unknown command type": 1,
+            "invalid loop": 1,
+            "invalid object": 1,
+        }
+        assert diag.samples["invalid command"][0].line_no == 5
+        assert diag.samples["invalid command"][0].line == "_F,0,abc,1000,0,1"
+        assert diag.samples["invalid object"][0].line_no == 8
+
+    def test_strict_fails_fast(self):
+        from src.parse_diagnostics import StoryboardParseError
+
+        path = _write_temp_osb(_MALFORMED_OSB)
+        try:
+            with pytest.raises(StoryboardParseError) as info:
+                StoryboardParser(strict=True, workers=4, parallel_min_bytes=0).parse(path)
+        finally:
+            os.unlink(path)
+        assert info.value.line_no == 2
+
+    def test_late_variables_do_not_double_count(self):
+        path = _write_temp_osb("""[Events]
+Sprite,Pass,Centre,"a.png",$x,0
+_F,0,zz,100,0,1
+[Variables]
+$x=1
+""")
+        try:
+            parser = StoryboardParser()
+            parser.parse(path)
+        finally:
+            os.unlink(path)
+        assert parser.diagnostics.counts == {"invalid command": 1}
+
+    def test_parallel_line_numbers(self, monkeypatch):
+        import src.parser as parser_module
+
+        monkeypatch.setattr(parser_module, "PARALLEL_CHUNK_MIN_BYTES", 2048)
+        content = _parallel_osb(400)
+        lines = content.splitlines()
+        # break one command deep inside the file (a later chunk)
+        bad = next(i for i in range(len(lines) - 1, 0, -1) if lines[i].startswith("_F"))
+        lines[bad] = "_F,0,oops,100,0,1"
+        path = _write_temp_osb("\n".join(lines) + "\n")
+        try:
+            serial = StoryboardParser()
+            serial.parse(path)
+            parallel = StoryboardParser(workers=3, parallel_min_bytes=0)
+            parallel.parse(path)
+        finally:
+            os.unlink(path)
+        assert parallel.diagnostics.counts == serial.diagnostics.counts == {"invalid command": 1}
+        assert parallel.diagnostics.samples["invalid command"][0].line_no == bad + 1
+        assert serial.diagnostics.samples["invalid command"][0].line_no == bad + 1
@@ -0,0 +1,116 @@
+"""Unit tests for src/state_batch.py — vectorised StateEngine.evaluate_batch."""
+
+import random
+import numpy as np
+import pytest
+import skia
+from src.easings import EasingLUT
+from src.managers import AssetLoader
+from src.models import Storyboard, Sprite, Layer, Origin, Command, Vector2
+from src.render_skia import SkiaRenderer
+from src.state_engine import StateEngine
+from tests.helpers import engine_for, random_object
+
+
+def _assert_matches(engine, rows, t):
+    states = engine.evaluate_batch(rows, t)
+    for i, row in enumerate(rows):
+        obj = engine.arrays.objects[row]
+        expected = engine.get_object_state(obj, t)
+        assert states.visible[i] == (expected is not None), (row, t)
+        if expected is None:
+            continue
+        got = (states.x[i], states.y[i], states.sx[i], states.sy[i], states.rotation[i],
+               states.opacity[i], states.r[i], states.g[i], states.b[i])
+        want = (expected.position.x, expected.position.y, expected.scale_vec.x, expected.scale_vec.y,
+                expected.rotation, expected.opacity, expected.r, expected.g, expected.b)
+        assert got == pytest.approx(want, abs=1e-9), (row, t)
+        assert (states.flip_h[i], states.flip_v[i], states.additive[i]) == (
+            expected.flip_h, expected.flip_v, expected.additive), (row, t)
+        assert states.frame_index[i] == expected.frame_index, (row, t)
+
+
+# ---------------------------------------------------------------------------
+# Equivalence with get_object_state
+# ---------------------------------------------------------------------------
+class TestEvaluateBatch:
+    def test_random_storyboard_matches_per_object_states(self):
+        rng = random.Random(21)
+        engine = engine_for([random_object(rng) for _ in range(300)])
+        rows = np.arange(len(engine.arrays))
+        for t in list(range(-50, 3500, 37)) + [0, 50, 100, 2000]:
+            _assert_matches(engine, rows, t)
+
+    def test_easing_tables_match_per_object_states(self):
+        rng = random.Random(22)
+        sb = Storyboard()
+        for _ in range(200):
+            sb.add_object(random_object(rng))
+        engine = StateEngine(sb, EasingLUT(64))
+        rows = np.arange(len(engine.arrays))
+        for t in range(-50, 3500, 97):
+            _assert_matches(engine, rows, t)
+
+    def test_subset_and_order_of_rows(self):
+        rng = random.Random(22)
+        engine = engine_for([random_object(rng, loop_p=False) for _ in range(50)])
+        rows = np.array([7, 3, 3, 40, 0])
+        for t in range(0, 2500, 100):
+            _assert_matches(engine, rows, t)
+
+    def test_empty_batch(self):
+        engine = engine_for([random_object(random.Random(1))])
+        states = engine.evaluate_batch(np.array([], dtype=np.int64), 100)
+        assert len(states.visible) == 0
+
+    def test_defaults_without_commands_for_a_property(self):
+        obj = Sprite(Layer.Pass, Origin.Centre, "x.png", Vector2(10, 20))
+        obj.commands.append(Command("MX", 0, 0, 100, [0.0, 100.0]))
+        engine = engine_for([obj])
+        states = engine.evaluate_batch([0], 50)
+        assert (states.x[0], states.y[0]) == (50.0, 20.0)
+        assert (states.sx[0], states.sy[0], states.rotation[0], states.opacity[0]) == (1.0, 1.0, 0.0, 1.0)
+        assert (states.r[0], states.g[0], states.b[0]) == (255.0, 255.0, 255.0)
+
+    def test_uncompiled_objects_are_evaluated_one_by_one(self):
+        obj = Sprite(Layer.Pass, Origin.Centre, "x.png", Vector2(0, 0))
+        engine = engine_for([obj])
+        # unsorted after the engine prepared it
+        obj.commands[:] = [Command("F", 0, 1000, 2000, [1.0, 0.5]), Command("F", 0, 0, 500, [0.0, 1.0])]
+        obj.life_start, obj.life_end = 0, 2000
+        engine.invalidate(obj)
+        states = engine.evaluate_batch([0], 250)
+        assert states.opacity[0] == pytest.approx(0.5)
+
+    def test_invalidate_rebuilds_tables(self):
+        obj = Sprite(Layer.Pass, Origin.Centre, "x.png", Vector2(0, 0))
+        obj.commands.append(Command("F", 0, 0, 1000, [0.0, 1.0]))
+        engine = engine_for([obj])
+        assert engine.evaluate_batch([0], 500).opacity[0] == pytest.approx(0.5)
+        engine.storyboard.add_object(Sprite(Layer.Pass, Origin.Centre, "y.png", Vector2(0, 0)))
+        engine.invalidate(engine.storyboard.pass_layer[1])
+        assert len(engine.arrays) == 2
+        assert engine.evaluate_batch([0, 1], 0).visible.tolist() == [False, True]
+
+
+# ---------------------------------------------------------------------------
+# Renderer batch mode
+# ---------------------------------------------------------------------------
+class TestRendererBatchStates:
+    def test_frames_match_per_object_rendering(self, tmp_path):
+        surface = skia.Surface(16, 16)
+        surface.getCanvas().clear(skia.Color(200, 120, 40, 255))
+        for name in ["x.png"] + [f"f{i}.png" for i in range(4)]:
+            surface.makeImageSnapshot().save(str(tmp_path / name), skia.kPNG)
+
+        rng = random.Random(5)
+        sb = Storyboard()
+        for _ in range(60):
+            sb.add_object(random_object(rng))
+        frames = {}
+        for batch in (False, True):
+            renderer = SkiaRenderer(StateEngine(sb), AssetLoader(str(tmp_path)), 640, 480, batch_states=batch)
+            frames[batch] = [renderer.render_frame(t).toarray() for t in (0, 250, 900, 1800)]
+        assert any(frame.any() for frame in frames[False])
+        for per_object, batched in zip(frames[False], frames[True]):
+            assert np.array_equal(per_object, batched)
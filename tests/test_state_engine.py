@@ -1,11 +1,27 @@
 """Unit tests for src/state_engine.py — StateEngine interpolation and state computation."""
 
+import random
 import pytest
 from src.models import (
     Storyboard, Sprite, Animation, VideoObject,
     Layer, Origin, LoopType, Command, LoopCommand, Vector2, ObjectState,
 )
+from src.easings import EasingLUT
 from src.state_engine import StateEngine
+from tests.helpers import random_object
+
+
+@pytest.fixture(autouse=True)
+def compiled_matches_scan(monkeypatch):
+    """Every state asked for in this module must equal the command-scanning evaluator's."""
+    compiled = StateEngine.get_object_state
+
+    def checked(self, obj, time):
+        state = compiled(self, obj, time)
+        assert state == self._scan_object_state(obj, time)
+        return state
+
+    monkeypatch.setattr(StateEngine, "get_object_state", checked)
 
 
 # ---------------------------------------------------------------------------
@@ -583,3 +599,235 @@ _M,0,2000,3000,320,240,400,300
             assert state.position.y == pytest.approx(270)
         finally:
             os.unlink(path)
+
+
+# ---------------------------------------------------------------------------
+# Compiled timelines
+# ---------------------------------------------------------------------------
+class TestCompiledTimelines:
+    def test_random_objects_match_scan(self):
+        rng = random.Random(11)
+        sb = Storyboard()
+        objects = [random_object(rng) for _ in range(300)]
+        for obj in objects:
+            sb.add_object(obj)
+        engine = StateEngine(sb)
+        for obj in objects:
+            times = {obj.life_start, obj.life_end}
+            for cmd in obj.commands:
+                times.update((cmd.start_time - 1, cmd.start_time, cmd.start_time + 1))
+                times.update(getattr(cmd, "end_time", cmd.start_time) + d for d in (-1, 0, 1))
+            times.update(rng.uniform(obj.life_start, obj.life_end) for _ in range(20))
+            for t in sorted(times):
+                # the autouse fixture compares with _scan_object_state
+                engine.get_object_state(obj, t)
+
+    def test_easing_tables_in_compiled_and_scanned_states(self):
+        rng = random.Random(14)
+        sb = Storyboard()
+        objects = [random_object(rng) for _ in range(150)]
+        for obj in objects:
+            sb.add_object(obj)
+        lut = EasingLUT(16)
+        engine = StateEngine(sb, lut)
+        for obj in objects:
+            for t in range(obj.life_start - 10, obj.life_end + 10, 37):
+                # the autouse fixture compares with _scan_object_state
+                engine.get_object_state(obj, t)
+
+        sb = Storyboard()
+        obj = Sprite(Layer.Pass, Origin.Centre, "x.png", Vector2(0, 0))
+        obj.commands.append(Command("F", 26, 0, 1000, [0.0, 1.0]))
+        sb.add_object(obj)
+        engine = StateEngine(sb, lut)
+        opacity = engine.get_object_state(obj, 333).opacity
+        assert opacity == lut.apply(26, 0.333)
+        assert opacity != StateEngine(sb).get_object_state(obj, 333).opacity
+        assert engine._scan_object_state(obj, 333).opacity == opacity
+
+    def test_unsorted_commands_fall_back_to_scan(self):
+        obj = Sprite(Layer.Pass, Origin.Centre, "x.png", Vector2(0, 0))
+        obj.commands.append(Command("F", 0, 1000, 2000, [1.0, 0.5]))
+        obj.commands.append(Command("F", 0, 0, 500, [0.0, 1.0]))
+        obj.life_start, obj.life_end = 0, 2000
+        engine = StateEngine(Storyboard())
+        assert engine._timeline(obj) is None
+        assert engine.get_object_state(obj, 250).opacity == pytest.approx(0.5)
+
+    def test_invalidate_recompiles(self):
+        sb = Storyboard()
+        obj = Sprite(Layer.Pass, Origin.Centre, "x.png", Vector2(0, 0))
+        obj.commands.append(Command("F", 0, 0, 1000, [0.0, 1.0]))
+        sb.add_object(obj)
+        engine = StateEngine(sb)
+        assert engine.get_object_state(obj, 500).opacity == pytest.approx(0.5)
+
+        obj.commands[0].params = [1.0, 1.0]
+        engine.invalidate(obj)
+        assert engine.get_object_state(obj, 500).opacity == pytest.approx(1.0)
+
+    def test_pickled_engine_drops_compiled_commands(self):
+        import pickle
+        sb = Storyboard()
+        obj = Sprite(Layer.Pass, Origin.Centre, "x.png", Vector2(0, 0))
+        obj.commands.append(Command("F", 0, 0, 1000, [0.0, 1.0]))
+        sb.add_object(obj)
+        engine = StateEngine(sb)
+        engine.get_object_state(obj, 500)
+
+        copy = pickle.loads(pickle.dumps(engine))
+        assert copy._timelines == {}
+        assert copy.get_object_state(copy.storyboard.pass_layer[0], 500).opacity == pytest.approx(0.5)
+
+
+class TestStateCursor:
+    def test_matches_engine_forward_and_after_seeks(self):
+        rng = random.Random(12)
+        sb = Storyboard()
+        objects = [random_object(rng) for _ in range(150)]
+        for obj in objects:
+            sb.add_object(obj)
+        engine = StateEngine(sb)
+        cursor = engine.cursor()
+
+        times = list(range(-100, 3500, 17))
+        # a few seeks back, as a preview scrubbing the timeline would
+        for seek in (1200, 400, 2900):
+            times.extend(range(seek, seek + 600, 13))
+        for t in times:
+            for obj in objects:
+                assert cursor.get_object_state(obj, t) == engine.get_object_state(obj, t)
+
+    def test_jump_over_many_commands(self):
+        sb = Storyboard()
+        obj = Sprite(Layer.Pass, Origin.Centre, "x.png", Vector2(0, 0))
+        for i in range(1000):
+            obj.commands.append(Command("MX", 0, i * 10, i * 10 + 10, [i, i + 1]))
+        sb.add_object(obj)
+        engine = StateEngine(sb)
+        cursor = engine.cursor()
+        for t in (0, 5, 15, 5005, 9999, 20):
+            assert cursor.get_object_state(obj, t) == engine.get_object_state(obj, t)
+
+    def test_follows_recompiled_objects(self):
+        sb = Storyboard()
+        obj = Sprite(Layer.Pass, Origin.Centre, "x.png", Vector2(0, 0))
+        obj.commands.append(Command("F", 0, 0, 100, [1.0, 1.0]))
+        obj.commands.append(Command("F", 0, 100, 1000, [1.0, 0.5]))
+        sb.add_object(obj)
+        engine = StateEngine(sb)
+        cursor = engine.cursor()
+        assert cursor.get_object_state(obj, 550).opacity == pytest.approx(0.75)
+
+        del obj.commands[1]
+        engine.invalidate(obj)
+        assert cursor.get_object_state(obj, 560).opacity == pytest.approx(1.0)
+
+
+# ---------------------------------------------------------------------------
+# Compiled loops
+# ---------------------------------------------------------------------------
+def _scan_loop(engine, loop, time, state):
+    """_process_loop as a walk over the loop's commands at the loop-local time."""
+    if time < loop.start_time:
+        return
+    duration = loop.sub_max
+    if time > loop.start_time + duration * loop.loop_count or duration == 0:
+        engine._process_commands(loop.commands, duration, state)
+    else:
+        engine._process_commands(loop.commands, (time - loop.start_time) % duration, state)
+
+
+class TestLoopTables:
+    def test_loops_match_scanned_commands(self):
+        rng = random.Random(13)
+        sb = Storyboard()
+        objects = [random_object(rng) for _ in range(300)]
+        for obj in objects:
+            sb.add_object(obj)
+        engine = StateEngine(sb)
+        loops = [cmd for obj in objects for cmd in obj.commands if isinstance(cmd, LoopCommand)]
+        assert loops
+        for loop in loops:
+            end = loop.start_time + loop.sub_max * loop.loop_count
+            for t in list(range(loop.start_time - 50, end + 100, 7)) + [end, end + 1]:
+                got, want = (ObjectState(visible=True, position=Vector2(1, 2)) for _ in range(2))
+                engine._process_loop(loop, t, got)
+                _scan_loop(engine, loop, t, want)
+                assert got == want, (loop, t)
+
+    def test_table_is_compiled_once(self):
+        loop = LoopCommand(100, 3, sub_max=150)
+        loop.commands.append(Command("M", 0, 0, 100, [0.0, 0.0, 1.0, 1.0]))
+        loop.commands.append(Command("C", 0, 50, 150, [0, 0, 0, 255, 255, 255]))
+        engine = StateEngine(Storyboard())
+        table = engine._loop_table(loop)
+        assert engine._loop_table(loop) is table
+        assert table.categories == {"x", "y", "color"}
+        engine.invalidate()
+        assert engine._loop_table(loop) is not table
+
+    def test_prepare_object_sets_sub_max(self):
+        obj = Sprite(Layer.Pass, Origin.Centre, "x.png", Vector2(0, 0))
+        loop = LoopCommand(1000, 4)
+        loop.commands.append(Command("F", 0, 0, 200, [0.0, 1.0]))
+        obj.commands.append(loop)
+        engine = StateEngine(Storyboard())  # obj is not in the storyboard
+        assert loop.sub_max is None
+        StateEngine.prepare_object(obj)
+        assert loop.sub_max == 200
+        assert (obj.life_start, obj.life_end) == (1000, 1800)
+        assert engine.get_object_state(obj, 1500).opacity == pytest.approx(0.5)
+        assert engine._scan_object_state(obj, 1500).opacity == pytest.approx(0.5)
+
+    def test_long_loop_evaluates_in_one_period(self):
+        sb = Storyboard()
+        obj = Sprite(Layer.Pass, Origin.Centre, "x.png", Vector2(0, 0))
+        loop = LoopCommand(0, 100000)
+        for i in range(500):
+            loop.commands.append(Command("MX", 0, i * 2, i * 2 + 2, [i, i + 1]))
+        obj.commands.append(loop)
+        sb.add_object(obj)
+        engine = StateEngine(sb)
+        # 10^5 iterations in, 3 ms into the period
+        assert engine.get_object_state(obj, 1000 * 99999 + 3).position.x == pytest.approx(1.5)
+
+
+# ---------------------------------------------------------------------------
+# Evaluating into reusable states
+# ---------------------------------------------------------------------------
+class TestObjectStateInto:
+    def test_reused_record_matches_new_states(self):
+        rng = random.Random(14)
+        sb = Storyboard()
+        objects = [random_object(rng) for _ in range(150)]
+        for obj in objects:
+            sb.add_object(obj)
+        # one object the timelines cannot compile
+        unsorted = Sprite(Layer.Pass, Origin.Centre, "u.png", Vector2(5, 5))
+        unsorted.commands[:] = [Command("M", 0, 500, 900, [0, 0, 9, 9]), Command("V", 0, 0, 400, [1, 2, 3, 4])]
+        unsorted.life_start, unsorted.life_end = 0, 900
+        objects.append(unsorted)
+        engine = StateEngine(sb)
+        cursor = engine.cursor()
+        out, cursor_out = ObjectState(), ObjectState()
+        for t in range(-50, 3000, 23):
+            for obj in objects:
+                expected = engine.get_object_state(obj, t)
+                assert engine.get_object_state_into(obj, t, out) == (expected is not None)
+                assert cursor.get_object_state_into(obj, t, cursor_out) == (expected is not None)
+                if expected is not None:
+                    assert out == expected
+                    assert cursor_out == expected
+
+    def test_object_position_is_not_touched(self):
+        obj = Sprite(Layer.Pass, Origin.Centre, "x.png", Vector2(3, 4))
+        obj.commands.append(Command("M", 0, 0, 100, [0, 0, 100, 100]))
+        sb = Storyboard()
+        sb.add_object(obj)
+        engine = StateEngine(sb)
+        out = ObjectState()
+        assert engine.get_object_state_into(obj, 50, out)
+        assert out.position == Vector2(50, 50)
+        assert engine._scan_object_state(obj, 50).position == Vector2(50, 50)
+        assert obj.position == Vector2(3, 4)
@@ -0,0 +1,106 @@
+"""Unit tests for src/state_streams.py — precomputed per-object state streams."""
+
+import pickle
+import random
+import numpy as np
+import pytest
+import skia
+import src.state_streams as state_streams
+from src.managers import AssetLoader
+from src.models import Storyboard
+from src.render_skia import SkiaRenderer
+from src.state_engine import StateEngine
+from src.state_streams import StateStreams, frame_times
+from tests.helpers import engine_for, random_object
+
+
+FPS, START, FRAMES = 60, 100, 150
+
+
+@pytest.fixture
+def engine():
+    rng = random.Random(3)
+    return engine_for([random_object(rng) for _ in range(120)])
+
+
+def _visible_matrix(states):
+    matrix = states.to_matrix()
+    return matrix[states.visible]
+
+
+# ---------------------------------------------------------------------------
+# StateEngine.state_stream
+# ---------------------------------------------------------------------------
+class TestStateStream:
+    def test_frames_cover_the_lifetime(self, engine):
+        for row in range(len(engine.arrays)):
+            first, matrix = engine.state_stream(row, FPS, START)
+            times = frame_times(FPS, START, first + len(matrix))[first:]
+            assert np.all(times >= engine.arrays.life_start[row])
+            assert np.all(times <= engine.arrays.life_end[row])
+            if first > 0:
+                assert frame_times(FPS, START, first)[-1] < engine.arrays.life_start[row]
+
+    def test_rows_equal_per_frame_states(self, engine):
+        for row in range(0, len(engine.arrays), 7):
+            first, matrix = engine.state_stream(row, FPS, START)
+            times = frame_times(FPS, START, first + len(matrix))[first:]
+            for t, values in zip(times.tolist(), matrix):
+                state = engine.get_object_state(engine.arrays.objects[row], t)
+                assert bool(values[0]) == (state is not None)
+                if state is not None:
+                    assert values[1:3].tolist() == pytest.approx([state.position.x, state.position.y])
+                    assert values[6] == pytest.approx(state.opacity)
+                    assert int(values[13]) == state.frame_index
+
+
+# ---------------------------------------------------------------------------
+# StateStreams
+# ---------------------------------------------------------------------------
+class TestStateStreams:
+    def test_states_match_evaluate_batch(self, engine, tmp_path):
+        streams = StateStreams.build(engine, str(tmp_path / "s.npy"), FPS, START, FRAMES)
+        rows = np.arange(len(engine.arrays))
+        for frame, t in enumerate(frame_times(FPS, START, FRAMES).tolist()):
+            assert streams.frame_of(t) == frame
+            got, want = streams.states(rows, frame), engine.evaluate_batch(rows, t)
+            assert np.array_equal(got.visible, want.visible)
+            assert np.array_equal(_visible_matrix(got), _visible_matrix(want))
+
+    def test_parallel_build_writes_the_same_file(self, engine, tmp_path, monkeypatch):
+        monkeypatch.setattr(state_streams, "_CHUNK", 500)
+        serial = StateStreams.build(engine, str(tmp_path / "a.npy"), FPS, START, FRAMES)
+        parallel = StateStreams.build(engine, str(tmp_path / "b.npy"), FPS, START, FRAMES, workers=2)
+        assert len(parallel._chunks()) > 1
+        assert np.array_equal(np.load(serial.path), np.load(parallel.path))
+
+    def test_pickled_streams_reopen_the_file(self, engine, tmp_path):
+        streams = StateStreams.build(engine, str(tmp_path / "s.npy"), FPS, START, FRAMES)
+        rows = np.arange(len(engine.arrays))
+        streams.states(rows, 10)
+        copy = pickle.loads(pickle.dumps(streams))
+        assert copy._data is None
+        assert np.array_equal(copy.states(rows, 10).to_matrix(), streams.states(rows, 10).to_matrix())
+
+    def test_times_between_frames(self, engine, tmp_path):
+        streams = StateStreams.build(engine, str(tmp_path / "s.npy"), FPS, START, FRAMES)
+        assert streams.frame_of(START + 1) is None
+        assert streams.frame_of(START - 100) is None
+
+    def test_empty_storyboard(self, tmp_path):
+        streams = StateStreams.build(StateEngine(Storyboard()), str(tmp_path / "s.npy"), FPS, 0, 10)
+        assert len(streams.states(np.array([], dtype=np.int64), 0).visible) == 0
+
+    def test_renderer_reads_streams(self, engine, tmp_path):
+        surface = skia.Surface(16, 16)
+        surface.getCanvas().clear(skia.Color(40, 160, 220, 255))
+        for name in ["x.png"] + [f"f{i}.png" for i in range(4)]:
+            surface.makeImageSnapshot().save(str(tmp_path / name), skia.kPNG)
+        streams = StateStreams.build(engine, str(tmp_path / "s.npy"), FPS, START, FRAMES)
+        plain = SkiaRenderer(engine, AssetLoader(str(tmp_path)), 640, 480)
+        streamed = SkiaRenderer(engine, AssetLoader(str(tmp_path)), 640, 480, streams=streams)
+        times = frame_times(FPS, START, FRAMES).tolist()[::15] + [START + 1]  # last one is not a frame
+        frames = [plain.render_frame(t).toarray() for t in times]
+        assert any(frame.any() for frame in frames)
+        for t, frame in zip(times, frames):
+            assert np.array_equal(streamed.render_frame(t).toarray(), frame)
@@ -0,0 +1,124 @@
+"""Unit tests for src/storyboard_arrays.py — the struct-of-arrays storyboard view."""
+
+import random
+from src.models import (
+    Storyboard, Sprite, Animation, Layer, Origin, LoopType, Command, Vector2,
+)
+from src.state_engine import StateEngine
+from src.storyboard_arrays import (
+    StoryboardArrays, LAYER_ORDER, KIND_SPRITE, KIND_ANIMATION,
+)
+
+
+def _sprite(layer, start, end, path="a.png", origin=Origin.Centre, position=(320, 240)):
+    obj = Sprite(layer, origin, path, Vector2(*position))
+    obj.commands.append(Command("F", 0, start, end, [0.0, 1.0]))
+    return obj
+
+
+def _storyboard():
+    sb = Storyboard()
+    sb.add_object(_sprite(Layer.Pass, 0, 1500, position=(1, 2)))
+    sb.add_object(_sprite(Layer.Background, 500, 700, path="bg.png", origin=Origin.TopLeft))
+    anim = Animation(Layer.Overlay, Origin.BottomRight, "f.png", Vector2(10, 20),
+                     frame_count=4, frame_delay=50.0, loop_type=LoopType.LoopOnce)
+    anim.commands.append(Command("F", 0, 2000, 4000, [1.0, 1.0]))
+    sb.add_object(anim)
+    sb.add_object(_sprite(Layer.Pass, 900, 3100))
+    return sb
+
+
+# ---------------------------------------------------------------------------
+# Columns
+# ---------------------------------------------------------------------------
+class TestColumns:
+    def test_rows_follow_layer_order(self):
+        sb = _storyboard()
+        arrays = StoryboardArrays.from_storyboard(sb)
+        assert arrays.objects == sb.background_layer + sb.pass_layer + sb.overlay_layer
+        assert len(arrays) == 4
+        assert arrays.layer.tolist() == [Layer.Background.value, Layer.Pass.value,
+                                         Layer.Pass.value, Layer.Overlay.value]
+        assert arrays.draw_order.tolist() == [0, 0, 1, 0]
+        assert arrays.layer_offsets.tolist() == [0, 1, 1, 3, 3, 4]
+
+    def test_header_columns_match_objects(self):
+        arrays = StoryboardArrays.from_storyboard(_storyboard())
+        for row, obj in enumerate(arrays.objects):
+            assert arrays.origin[row] == obj.origin.value
+            assert (arrays.x[row], arrays.y[row]) == (obj.position.x, obj.position.y)
+            assert (arrays.life_start[row], arrays.life_end[row]) == (obj.life_start, obj.life_end)
+            assert arrays.textures[arrays.texture_id[row]] == obj.filepath
+
+    def test_animation_columns(self):
+        arrays = StoryboardArrays.from_storyboard(_storyboard())
+        assert arrays.kind.tolist() == [KIND_SPRITE, KIND_SPRITE, KIND_SPRITE, KIND_ANIMATION]
+        assert arrays.frame_count.tolist() == [0, 0, 0, 4]
+        assert arrays.frame_delay.tolist() == [0.0, 0.0, 0.0, 50.0]
+        assert arrays.loop_type.tolist() == [0, 0, 0, LoopType.LoopOnce.value]
+
+    def test_textures_are_shared(self):
+        arrays = StoryboardArrays.from_storyboard(_storyboard())
+        assert arrays.textures == ["bg.png", "a.png", "f.png"]
+        assert arrays.texture_usage().tolist() == [1, 2, 1]
+
+    def test_computes_lifetimes_when_missing(self):
+        sb = _storyboard()
+        assert not sb.lifetimes_computed
+        arrays = StoryboardArrays.from_storyboard(sb)
+        assert sb.lifetimes_computed
+        assert arrays.life_end.tolist() == [700, 1500, 3100, 4000]
+
+    def test_empty_storyboard(self):
+        arrays = StoryboardArrays.from_storyboard(Storyboard())
+        assert len(arrays) == 0
+        assert arrays.alive(0).size == 0
+        assert list(arrays.buckets(Layer.Pass, 1000)) == []
+        assert arrays.texture_usage().size == 0
+
+
+# ---------------------------------------------------------------------------
+# Queries
+# ---------------------------------------------------------------------------
+class TestQueries:
+    def test_layer_slice(self):
+        arrays = StoryboardArrays.from_storyboard(_storyboard())
+        pass_rows = arrays.objects[arrays.layer_slice(Layer.Pass)]
+        assert [obj.life_end for obj in pass_rows] == [1500, 3100]
+        assert arrays.objects[arrays.layer_slice(Layer.Fail)] == []
+
+    def test_alive(self):
+        arrays = StoryboardArrays.from_storyboard(_storyboard())
+        assert arrays.alive(600).tolist() == [0, 1]
+        assert arrays.alive(1500).tolist() == [1, 2]
+        assert arrays.alive(1600, 2000).tolist() == [2, 3]
+        assert arrays.alive(5000).tolist() == []
+
+    def test_buckets_match_per_object_loop(self):
+        rng = random.Random(5)
+        sb = Storyboard()
+        for _ in range(300):
+            start = rng.randrange(-2000, 20000)
+            layer = rng.choice(LAYER_ORDER)
+            sb.add_object(_sprite(layer, start, start + rng.choice([0, 10, 999, 1000, 7500])))
+        StateEngine(sb)
+        arrays = StoryboardArrays.from_storyboard(sb)
+
+        for interval in (1000, 333):
+            for layer in LAYER_ORDER:
+                expected = {}
+                for obj in arrays.objects[arrays.layer_slice(layer)]:
+                    for bucket in range(int(obj.life_start // interval), int(obj.life_end // interval) + 1):
+                        expected.setdefault(bucket, []).append(id(obj))
+                got = [(bucket, [id(arrays.objects[row]) for row in rows])
+                       for bucket, rows in arrays.buckets(layer, interval)]
+                assert got == sorted(expected.items())
+
+    def test_buckets_with_wide_time_range(self):
+        # too many buckets for the 16-bit sort keys
+        sb = Storyboard()
+        sb.add_object(_sprite(Layer.Pass, 0, 0))
+        sb.add_object(_sprite(Layer.Pass, 70_000_000, 70_000_000))
+        arrays = StoryboardArrays.from_storyboard(sb)
+        got = [(bucket, rows.tolist()) for bucket, rows in arrays.buckets(Layer.Pass, 1000)]
+        assert got == [(0, [0]), (70_000, [1])]
@@ -0,0 +1,85 @@
+"""Unit tests for src/storyboard_codec.py — binary Storyboard encoding."""
+
+import pytest
+from src.models import (
+    Storyboard, Sprite, Animation, VideoObject,
+    Layer, Origin, LoopType, Command, LoopCommand, Vector2,
+)
+from src.columnar import ColumnarCommands
+from src.storyboard_codec import encode_storyboard, decode_storyboard
+
+
+# ---------------------------------------------------------------------------
+# Round trip
+# ---------------------------------------------------------------------------
+class TestRoundTrip:
+    def _storyboard(self) -> Storyboard:
+        sb = Storyboard()
+        sprite = Sprite(Layer.Foreground, Origin.BottomRight, "sb/a.png", Vector2(-1.5, 2.25))
+        sprite.commands.append(Command("F", 3, 0, 1000, [0.0, 1.0]))
+        sprite.commands.append(Command("C", 0, 10, 20, [255.0, 0.0, 0.0, 1.0, 2.0, 3.0]))
+        sprite.commands.append(Command("P", 0, 0, 0, ["A"]))
+        loop = LoopCommand(500, 3)
+        loop.commands.append(Command("M", 1, 0, 100, [0.0, 0.0, 1.0, 1.0]))
+        sprite.commands.append(loop)
+        sprite.life_start, sprite.life_end = 0, 1000
+        anim = Animation(
+            Layer.Background, Origin.Centre, "sb/f.png", Vector2(0, 0),
+            frame_count=4, frame_delay=33.5, loop_type=LoopType.LoopOnce,
+        )
+        anim.commands.append(LoopCommand(0, 2, sub_max=250))
+        sb.add_object(sprite)
+        sb.add_object(anim)
+        sb.video = VideoObject("bg.mp4", -200, 5, -6)
+        return sb
+
+    def test_round_trip(self):
+        sb = self._storyboard()
+        decoded = decode_storyboard(encode_storyboard(sb))
+        assert decoded.foreground_layer == sb.foreground_layer
+        assert decoded.background_layer == sb.background_layer
+        assert decoded.video == sb.video
+        assert decoded.lifetimes_computed is False
+        assert decoded.foreground_layer[0].commands[3].sub_max is None
+        assert isinstance(decoded.background_layer[0], Animation)
+
+    def test_lifetime_flag_round_trips(self):
+        sb = self._storyboard()
+        sb.lifetimes_computed = True
+        assert decode_storyboard(encode_storyboard(sb)).lifetimes_computed is True
+
+    def test_no_video(self):
+        sb = self._storyboard()
+        sb.video = None
+        assert decode_storyboard(encode_storyboard(sb)).video is None
+
+    def test_columnar_decode(self):
+        sb = self._storyboard()
+        decoded = decode_storyboard(encode_storyboard(sb), columnar=True)
+        sprite = decoded.foreground_layer[0]
+        assert isinstance(sprite.commands, ColumnarCommands)
+        assert sprite.commands._store.frozen
+        assert sprite.commands._store is decoded.background_layer[0].commands._store
+        assert decoded.foreground_layer == sb.foreground_layer
+        assert decoded.background_layer == sb.background_layer
+        assert decoded.background_layer[0].commands[0].sub_max == 250
+
+    def test_strings_are_shared(self):
+        sb = Storyboard()
+        for _ in range(3):
+            sb.add_object(Sprite(Layer.Pass, Origin.Centre, "same.png", Vector2(0, 0)))
+        decoded = decode_storyboard(encode_storyboard(sb))
+        a, b, _ = decoded.pass_layer
+        assert a.filepath is b.filepath
+
+
+# ---------------------------------------------------------------------------
+# Malformed input
+# ---------------------------------------------------------------------------
+class TestMalformed:
+    def test_truncated_data_raises(self):
+        sb = Storyboard()
+        sb.add_object(Sprite(Layer.Pass, Origin.Centre, "x.png", Vector2(0, 0)))
+        data = encode_storyboard(sb)
+        with pytest.raises(Exception):
+            decode_storyboard(data[: len(data) // 2])
@@ -0,0 +1,117 @@
+"""Unit tests for src/templates.py — templated (instanced) particle objects."""
+
+import pickle
+import random
+import pytest
+from src.models import (
+    Storyboard, Sprite, Animation, Layer, Origin, LoopType, Command, LoopCommand, ObjectState, Vector2,
+)
+from src.state_engine import StateEngine
+from tests.helpers import same_state
+
+
+def _particle(spawn, x, y, fade=1.0, cls=Sprite):
+    """One sprite of a generated effect: same commands, moved in time and space."""
+    if cls is Animation:
+        obj = Animation(Layer.Foreground, Origin.Centre, "sb/spark.png", Vector2(x, y),
+                        frame_count=3, frame_delay=50.0, loop_type=LoopType.LoopForever)
+    else:
+        obj = Sprite(Layer.Foreground, Origin.Centre, "sb/dot.png", Vector2(x, y))
+    obj.commands.append(Command("F", 1, spawn, spawn + 300, [0.0, fade]))
+    obj.commands.append(Command("M", 7, spawn, spawn + 2000, [x, y, x + 120, y - 80]))
+    obj.commands.append(Command("S", 0, spawn + 500, spawn + 1500, [1.0, 0.2]))
+    obj.commands.append(Command("P", 0, spawn, spawn + 2000, ["A"]))
+    loop = LoopCommand(spawn + 200, 4)
+    loop.commands.append(Command("R", 0, 0, 200, [0.0, 3.14]))
+    loop.commands.append(Command("MX", 2, 0, 100, [x, x + 10]))
+    obj.commands.append(loop)
+    obj.commands.append(Command("F", 0, spawn + 1800, spawn + 2000, [fade, 0.0]))
+    return obj
+
+
+def _storyboard(objects):
+    sb = Storyboard()
+    for obj in objects:
+        sb.add_object(obj)
+    return sb
+
+
+def _effect(count=40, seed=0):
+    rng = random.Random(seed)
+    objects = [_particle(rng.randrange(0, 5000, 10), rng.randrange(640), rng.randrange(480))
+               for _ in range(count)]
+    objects += [_particle(rng.randrange(0, 5000, 10), rng.randrange(640), rng.randrange(480), cls=Animation)
+                for _ in range(count // 4)]
+    objects.append(_particle(100, 10, 10, fade=0.5))  # a different value: its own family
+    return objects
+
+
+# ---------------------------------------------------------------------------
+# StateEngine.collapse_templates
+# ---------------------------------------------------------------------------
+class TestCollapseTemplates:
+    def test_families_and_summary(self):
+        engine = StateEngine(_storyboard(_effect()))
+        stats = engine.collapse_templates()
+        assert (stats.objects, stats.templates, stats.instances) == (51, 2, 48)
+        assert stats.summary().startswith("Templates: 50 objects collapsed into 2 templates")
+
+    def test_states_match_individual_timelines(self):
+        objects = _effect()
+        plain = StateEngine(_storyboard(objects))
+        engine = StateEngine(_storyboard(objects))
+        engine.collapse_templates()
+        cursor, out = engine.cursor(), ObjectState()
+        for t in range(0, 7200, 37):
+            for obj in objects:
+                want = plain.get_object_state(obj, t)
+                assert same_state(engine.get_object_state(obj, t), want), t
+                assert same_state(cursor.get_object_state(obj, t), want), t
+                drawn = cursor.get_object_state_into(obj, t, out)
+                assert drawn == (want is not None)
+                if drawn:
+                    assert same_state(out, want), t
+        # members never compile timelines of their own: two templates and the odd one out
+        assert len(engine._timelines) == 3
+
+    def test_positions_that_do_not_shift_exactly_stay_apart(self):
+        a, b = _particle(0, 0.1, 0), _particle(500, 0.2, 0)
+        b.commands[1].params[2] = 0.2 + 120.0000001
+        stats = StateEngine(_storyboard([a, b])).collapse_templates()
+        assert stats.instances == 0
+
+    def test_visible_intervals_follow_the_offset(self):
+        objects = _effect(8)
+        engine = StateEngine(_storyboard(objects))
+        expected = [StateEngine(_storyboard([obj])).visible_intervals(obj) for obj in objects]
+        engine.collapse_templates()
+        assert [engine.visible_intervals(obj) for obj in objects] == expected
+
+    def test_editing_a_template_releases_its_members(self):
+        objects = _effect(6)
+        engine = StateEngine(_storyboard(objects))
+        engine.collapse_templates()
+        template = objects[0]
+        template.commands[0].params = [0.0, 0.25]
+        engine.invalidate(template)
+        assert all(instance.template is not template for _, instance in engine._instances.values())
+        for obj in objects[1:6]:
+            state = engine.get_object_state(obj, obj.life_start + 300)
+            assert state.opacity == pytest.approx(1.0)
+
+    def test_pickled_engine_keeps_its_families(self):
+        engine = StateEngine(_storyboard(_effect(10)))
+        engine.collapse_templates()
+        copy = pickle.loads(pickle.dumps(engine))
+        assert len(copy._instances) == len(engine._instances)
+        objects = copy.storyboard.foreground_layer
+        # keyed by the copies, with templates among the copies too
+        assert set(copy._instances) <= {id(obj) for obj in objects}
+        assert all(any(instance.template is obj for obj in objects) for _, instance in copy._instances.values())
+        assert all(copy.get_object_state(obj, obj.life_start + 100) is not None for obj in objects[:5])
+
+    def test_objects_without_commands_are_skipped(self):
+        empty = Sprite(Layer.Pass, Origin.Centre, "x.png", Vector2(0, 0))
+        stats = StateEngine(_storyboard([empty, Sprite(Layer.Pass, Origin.Centre, "x.png", Vector2(1, 1))])
+                            ).collapse_templates()
+        assert stats.templates == 0
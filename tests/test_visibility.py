@@ -0,0 +1,112 @@
+"""Unit tests for src/visibility.py — conservative visible intervals."""
+
+import random
+import numpy as np
+import skia
+from src.active_index import ActiveIndex
+from src.managers import AssetLoader
+from src.models import Command, LoopCommand
+from src.render_skia import SkiaRenderer
+from src.storyboard_arrays import LAYER_ORDER
+from src.visibility import interval_arrays
+from tests.helpers import engine_for, random_object, sprite
+
+
+def _drawn(engine, obj, t):
+    state = engine.get_object_state(obj, t)
+    return state is not None and not (abs(state.scale_vec.x) < 0.001 and abs(state.scale_vec.y) < 0.001)
+
+
+def _covered(intervals, t):
+    return any(a <= t <= b for a, b in intervals)
+
+
+# ---------------------------------------------------------------------------
+# StateEngine.visible_intervals
+# ---------------------------------------------------------------------------
+class TestVisibleIntervals:
+    def test_every_drawn_time_is_covered(self):
+        rng = random.Random(5)
+        objects = [random_object(rng) for _ in range(400)]
+        engine = engine_for(objects)
+        hidden = 0
+        for obj in objects:
+            intervals = engine.visible_intervals(obj)
+            assert intervals == sorted(intervals)
+            for (_, b), (a, _) in zip(intervals, intervals[1:]):
+                assert b < a
+            assert all(obj.life_start <= a <= b <= obj.life_end for a, b in intervals)
+            for t in range(int(obj.life_start) - 5, int(obj.life_end) + 6, 5):
+                if _drawn(engine, obj, t):
+                    assert _covered(intervals, t), (obj.commands, t)
+                elif obj.life_start <= t <= obj.life_end and not _covered(intervals, t):
+                    hidden += 1
+        assert hidden > 0
+
+    def test_fade_out_gap_is_skipped(self):
+        obj = sprite(
+            Command("F", 0, 0, 500, [0.0, 1.0]),
+            Command("F", 0, 1000, 1500, [1.0, 0.0]),
+            Command("F", 0, 5000, 5500, [0.0, 1.0]),
+            Command("F", 0, 6000, 6000, [0.0, 0.0]),
+        )
+        assert engine_for([obj]).visible_intervals(obj) == [(0, 1500), (5000, 6000)]
+
+    def test_loop_iterations_and_zero_scale(self):
+        loop = LoopCommand(1000, 3)
+        loop.commands.append(Command("F", 0, 0, 100, [1.0, 0.0]))
+        loop.commands.append(Command("F", 0, 400, 400, [0.0, 0.0]))
+        obj = sprite(Command("S", 0, 0, 0, [0.0, 0.0]), Command("S", 0, 800, 800, [1.0, 1.0]), loop)
+        # at exactly the loop's end the engine evaluates local time 0 again
+        assert engine_for([obj]).visible_intervals(obj) == [(800, 1100), (1400, 1500), (1800, 1900), (2200, 2200)]
+
+    def test_overshooting_easing_counts_as_visible(self):
+        obj = sprite(Command("F", 29, 0, 1000, [0.0, 0.0005]))
+        assert engine_for([obj]).visible_intervals(obj) == [(0, 1000)]
+
+    def test_invalidate_recomputes(self):
+        obj = sprite(Command("F", 0, 0, 1000, [0.0, 0.0]))
+        engine = engine_for([obj])
+        assert engine.visible_intervals(obj) == []
+        obj.commands[0].params = [1.0, 1.0]
+        engine.invalidate(obj)
+        assert engine.visible_intervals(obj) == [(0, 1000)]
+
+
+# ---------------------------------------------------------------------------
+# ActiveIndex over visible intervals
+# ---------------------------------------------------------------------------
+class TestIntervalIndex:
+    def test_rows_and_stats(self):
+        rng = random.Random(8)
+        engine = engine_for([random_object(rng) for _ in range(300)])
+        rows, starts, ends = intervals = interval_arrays(engine)
+        index = ActiveIndex(engine.arrays, intervals)
+        times = list(range(-50, 3500, 13)) + list(range(3500, -50, -29))
+        for t in times:
+            for layer in LAYER_ORDER:
+                sl = engine.arrays.layer_slice(layer)
+                live = (rows >= sl.start) & (rows < sl.stop) & (starts <= t) & (t <= ends)
+                assert np.array_equal(index.rows(layer, t), np.sort(rows[live])), (layer, t)
+        stats = index.stats
+        assert stats.lookups == len(times) * len(LAYER_ORDER)
+        assert 0 < stats.returned < stats.alive
+        assert stats.avoided == stats.alive - stats.returned
+
+    def test_renderer_frames_are_unchanged(self, tmp_path):
+        surface = skia.Surface(16, 16)
+        surface.getCanvas().clear(skia.Color(200, 80, 40, 255))
+        for name in ["x.png"] + [f"f{i}.png" for i in range(4)]:
+            surface.makeImageSnapshot().save(str(tmp_path / name), skia.kPNG)
+        rng = random.Random(13)
+        engine = engine_for([random_object(rng) for _ in range(150)])
+        renderer = SkiaRenderer(engine, AssetLoader(str(tmp_path)), 640, 480)
+        lifetimes = SkiaRenderer(engine, AssetLoader(str(tmp_path)), 640, 480)
+        lifetimes.index = ActiveIndex(engine.arrays)
+        frames = 0
+        for t in range(0, 3000, 97):
+            frame = renderer.render_frame(t).toarray()
+            frames += bool(frame.any())
+            assert np.array_equal(frame, lifetimes.render_frame(t).toarray()), t
+        assert frames
+        assert renderer.index.stats.avoided > 0
@@ -0,0 +1,266 @@
+"""Unit tests for src/watch.py — incremental reparse and live preview."""
+
+import os
+import random
+import shutil
+import tempfile
+import pytest
+from src.models import Layer
+from src.parser import StoryboardParser
+from src.state_engine import StateEngine
+from src.watch import IncrementalStoryboard, PreviewSession, split_events
+
+
+OSU = """osu file format v14
+
+[General]
+AudioFilename: audio.mp3
+
+[Events]
+//Background and Video events
+0,0,"bg.jpg",0,0
+Video,500,"video.mp4"
+Sprite,Background,Centre,"osu.png",320,240
+_F,0,0,1000,0,1
+
+[HitObjects]
+256,192,1000,1,0,0:0:0:0:
+"""
+
+OSB = """[Variables]
+$c=255,0,0
+[Events]
+Sprite,Pass,Centre,"a.png",320,240
+_F,0,0,1000,0,1
+_C,0,0,1000,$c
+Sprite,Pass,Centre,"b.png",100,100
+_L,0,4
+__R,0,0,250,0,1
+Animation,Foreground,TopLeft,"f.png",0,0,2,100
+_M,0,2000,3000,0,0,100,100
+Sprite,Overlay,Centre,"o.png",0,0
+_S,0,0,,2
+"""
+
+
+@pytest.fixture
+def workdir():
+    path = tempfile.mkdtemp()
+    yield path
+    shutil.rmtree(path, ignore_errors=True)
+
+
+def _write(path: str, content: str):
+    # bump mtime explicitly; some filesystems have coarse timestamps
+    stamp = os.stat(path).st_mtime_ns + 1_000_000 if os.path.exists(path) else None
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    if stamp is not None:
+        os.utime(path, ns=(stamp, stamp))
+
+
+def _full_parse(osu_path: str, osb_path: str):
+    storyboard = StoryboardParser().parse(osu_path)
+    if os.path.exists(osb_path):
+        storyboard.merge(StoryboardParser().parse(osb_path))
+    StateEngine(storyboard)
+    return storyboard
+
+
+def _same_storyboard(a, b):
+    for layer in ("background_layer", "fail_layer", "pass_layer", "foreground_layer", "overlay_layer"):
+        assert getattr(a, layer) == getattr(b, layer)
+        assert [(o.life_start, o.life_end) for o in getattr(a, layer)] == [
+            (o.life_start, o.life_end) for o in getattr(b, layer)
+        ]
+    assert a.video == b.video
+
+
+@pytest.fixture
+def beatmap(workdir):
+    osu_path = os.path.join(workdir, "map.osu")
+    osb_path = os.path.join(workdir, "map.osb")
+    _write(osu_path, OSU)
+    _write(osb_path, OSB)
+    return osu_path, osb_path
+
+
+# ---------------------------------------------------------------------------
+# Block splitting
+# ---------------------------------------------------------------------------
+class TestSplitEvents:
+    def test_variables_and_blocks(self):
+        variables, blocks = split_events(OSB)
+        assert variables == {"$c": "255,0,0"}
+        assert len(blocks) == 4
+        assert blocks[0][0] == 4  # "Sprite,Pass,...a.png" is line 4
+        assert blocks[1][1].startswith('Sprite,Pass,Centre,"b.png"')
+        assert blocks[1][0] == 7
+
+    def test_leading_non_object_block(self):
+        _, blocks = split_events(OSU)
+        assert blocks[0][1].startswith("//Background")
+        assert blocks[1][1].startswith("Sprite,Background")
+
+    def test_indented_sprite_is_not_a_header(self):
+        _, blocks = split_events("[Events]\nSprite,Pass,Centre,\"a.png\",0,0\n Sprite,x\n")
+        assert len(blocks) == 1
+
+
+# ---------------------------------------------------------------------------
+# Incremental reparse
+# ---------------------------------------------------------------------------
+class TestIncrementalStoryboard:
+    def test_initial_load_matches_full_parse(self, beatmap):
+        osu_path, osb_path = beatmap
+        source = IncrementalStoryboard([osu_path, osb_path])
+        change = source.refresh()
+        assert change.reparsed_blocks == 6
+        assert len(change.added) == 5
+        _same_storyboard(source.storyboard, _full_parse(osu_path, osb_path))
+
+    def test_unchanged_files_do_nothing(self, beatmap):
+        source = IncrementalStoryboard(list(beatmap))
+        source.refresh()
+        assert source.refresh() is None
+
+    def test_edit_reparses_only_that_block(self, beatmap):
+        osu_path, osb_path = beatmap
+        source = IncrementalStoryboard([osu_path, osb_path])
+        source.refresh()
+        before = list(source.storyboard.pass_layer)
+        layer_list = source.storyboard.pass_layer
+
+        _write(osb_path, OSB.replace('"b.png",100,100', '"b.png",200,100'))
+        change = source.refresh()
+
+        assert change.reparsed_blocks == 1
+        assert [o.filepath for o in change.removed] == ["b.png"]
+        assert [o.position.x for o in change.added] == [200]
+        assert source.storyboard.pass_layer is layer_list  # patched in place
+        assert source.storyboard.pass_layer[0] is before[0]
+        _same_storyboard(source.storyboard, _full_parse(osu_path, osb_path))
+
+    def test_edit_to_video_line_only(self, beatmap):
+        osu_path, osb_path = beatmap
+        source = IncrementalStoryboard([osu_path, osb_path])
+        source.refresh()
+        assert source.storyboard.video.start_time == 500
+
+        _write(osu_path, OSU.replace("Video,500,", "Video,-250,"))
+        change = source.refresh()
+        assert (change.reparsed_blocks, change.added, change.removed) == (1, [], [])
+        assert source.storyboard.video.start_time == -250
+        _same_storyboard(source.storyboard, _full_parse(osu_path, osb_path))
+
+        _write(osu_path, OSU.replace('Video,500,"video.mp4"\n', ""))
+        source.refresh()
+        assert source.storyboard.video is None
+
+    def test_added_and_deleted_objects(self, beatmap):
+        osu_path, osb_path = beatmap
+        source = IncrementalStoryboard([osu_path, osb_path])
+        source.refresh()
+
+        edited = OSB.replace('Sprite,Overlay,Centre,"o.png",0,0\n_S,0,0,,2\n', "")
+        edited += 'Sprite,Pass,Centre,"new.png",0,0\n_F,0,5000,6000,1,0\n'
+        _write(osb_path, edited)
+        change = source.refresh()
+
+        assert change.reparsed_blocks == 1
+        assert [o.filepath for o in change.removed] == ["o.png"]
+        assert [o.filepath for o in change.added] == ["new.png"]
+        assert change.added[0].life_end == 6000
+        _same_storyboard(source.storyboard, _full_parse(osu_path, osb_path))
+
+    def test_variable_change_reparses_file(self, beatmap):
+        osu_path, osb_path = beatmap
+        source = IncrementalStoryboard([osu_path, osb_path])
+        source.refresh()
+
+        _write(osb_path, OSB.replace("$c=255,0,0", "$c=0,0,255"))
+        change = source.refresh()
+        assert change.reparsed_blocks == 4
+        _same_storyboard(source.storyboard, _full_parse(osu_path, osb_path))
+
+    def test_missing_osb_appears_and_disappears(self, workdir):
+        osu_path = os.path.join(workdir, "map.osu")
+        osb_path = os.path.join(workdir, "map.osb")
+        _write(osu_path, OSU)
+        source = IncrementalStoryboard([osu_path, osb_path])
+        source.refresh()
+        assert len(source.storyboard.pass_layer) == 0
+
+        _write(osb_path, OSB)
+        assert len(source.refresh().added) == 4
+        os.unlink(osb_path)
+        assert len(source.refresh().removed) == 4
+        assert source.storyboard.pass_layer == []
+
+    def test_diagnostics_use_file_line_numbers(self, beatmap):
+        osu_path, osb_path = beatmap
+        source = IncrementalStoryboard([osu_path, osb_path])
+        source.refresh()
+        _write(osb_path, OSB.replace("_L,0,4", "_L,zz,4"))
+        change = source.refresh()
+        sample = change.diagnostics.samples["invalid loop"][0]
+        assert sample.line_no == 8
+
+    def test_object_continues_across_section_switch(self, beatmap):
+        osu_path, osb_path = beatmap
+        text = OSB.replace("_L,0,4\n", "_L,0,4\n[HitObjects]\n1,1,1\n[Events]\n")
+        _write(osb_path, text)
+        source = IncrementalStoryboard([osu_path, osb_path])
+        source.refresh()
+        _same_storyboard(source.storyboard, _full_parse(osu_path, osb_path))
+        assert source.storyboard.pass_layer[1].commands[0].commands
+
+    def test_random_edits_match_full_parse(self, beatmap):
+        osu_path, osb_path = beatmap
+        rng = random.Random(7)
+        snippets = [
+            'Sprite,Pass,Centre,"x.png",1,2\n', "_F,0,0,1000,0,1\n", "__F,0,0,100,0,1\n",
+            "_L,0,2\n", "Sprite,", ",", "9", "\n", "[Events]\n", "$c=1,2,3\n",
+        ]
+        text = OSB * 3
+        _write(osb_path, text)
+        source = IncrementalStoryboard([osu_path, osb_path])
+        source.refresh()
+        for _ in range(60):
+            i = rng.randrange(len(text) + 1)
+            if rng.random() < 0.5:
+                text = text[:i] + rng.choice(snippets) + text[i:]
+            else:
+                text = text[:i] + text[i + rng.randrange(1, 30):]
+            _write(osb_path, text)
+            source.refresh()
+            _same_storyboard(source.storyboard, _full_parse(osu_path, osb_path))
+
+
+# ---------------------------------------------------------------------------
+# Preview session
+# ---------------------------------------------------------------------------
+class TestPreviewSession:
+    def test_index_follows_edits_and_frames_rerender(self, beatmap, workdir):
+        osu_path, osb_path = beatmap
+        frames = []
+        session = PreviewSession(
+            [osu_path, osb_path], workdir, 500, frames.append, width=64, height=48
+        )
+        assert len(frames) == 1
+        assert session.poll() is False
+
+        edited = OSB.replace('"b.png",100,100', '"b.png",200,100')
+        edited += 'Sprite,Pass,Centre,"late.png",0,0\n_F,0,1500,4500,1,0\n'
+        _write(osb_path, edited)
+        assert session.poll() is True
+        assert len(frames) == 2
+
+        storyboard = session.source.storyboard
+        layers = {Layer.Pass: storyboard.pass_layer, Layer.Foreground: storyboard.foreground_layer,
+                  Layer.Overlay: storyboard.overlay_layer}
+        objects = session.renderer.engine.arrays.objects
+        for t in (0, 500, 1500, 2500, 4500, 100):
+            for layer, expected in layers.items():
+                alive = [id(o) for o in expected if o.life_start <= t <= o.life_end]
+                assert [id(objects[r]) for r in session.renderer.index.rows(layer, t)] == alive